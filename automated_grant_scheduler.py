@@ -40,6 +40,8 @@ class GrantScheduler:
         self.scraper_script = os.path.join(self.base_dir, 'enhanced_grant_scraper_v2.py')
         self.processor_script = os.path.join(self.base_dir, 'national_mapping_processor.py')
         self.mapping_component_path = os.path.join(self.base_dir, 'grantthrive-mapping-component/public/grant_mapping_data.json')
+        self.page_cache_path = os.path.join(self.data_dir, 'grant_page_cache.db')
+        self.scrape_stats_path = os.path.join(self.data_dir, 'last_scrape_stats.json')
         
         # Configuration
         self.config = {
@@ -93,9 +95,14 @@ class GrantScheduler:
             logging.info(f"🚀 Starting {'full' if full_scan else 'incremental'} grant scraping...")
             
             # Run the enhanced scraper
-            cmd = ['python3', self.scraper_script]
+            # Unchanged pages are revalidated against the shared page cache
+            cmd = ['python3', self.scraper_script,
+                   '--cache', self.page_cache_path,
+                   '--stats-file', self.scrape_stats_path]
             if full_scan:
                 cmd.append('--full-scan')
+            if os.path.exists(self.scrape_stats_path):
+                os.remove(self.scrape_stats_path)
             
             result = subprocess.run(
                 cmd,
@@ -187,6 +194,24 @@ class GrantScheduler:
             logging.error(f"❌ Failed to get data statistics: {e}")
             return None
     
+    def get_cache_summary(self):
+        """One-line page cache hit-rate summary from the last scraper run"""
+        try:
+            if not os.path.exists(self.scrape_stats_path):
+                return 'Unknown'
+            with open(self.scrape_stats_path, 'r') as f:
+                cache = json.load(f).get('cache')
+            if not cache:
+                return 'Disabled'
+            
+            return (f"{cache['hit_rate'] * 100:.1f}% hit rate "
+                    f"({cache['fresh_hits'] + cache['revalidated']} of {cache['lookups']} pages unchanged, "
+                    f"{cache['misses']} downloaded, {cache['bytes_saved'] / 1048576:.1f} MB saved)")
+        
+        except Exception as e:
+            logging.error(f"❌ Failed to read scrape statistics: {e}")
+            return 'Unknown'
+    
     def send_notification(self, subject, message, is_error=False):
         """Send email notification about scraping results"""
         try:
@@ -250,6 +275,7 @@ Statistics:
 - Total Grants: {stats['total_grants'] if stats else 'Unknown'}
 - Total Value: ${stats['total_value']:,.2f if stats else 'Unknown'}
 - States Covered: {stats['states_covered'] if stats else 'Unknown'}
+- Page Cache: {self.get_cache_summary()}
 - Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 All systems updated and operational.
@@ -261,6 +287,7 @@ All systems updated and operational.
                 message = f"""Daily grant data update completed with issues.
                 
 Success Rate: {success_count}/{total_steps} steps completed
+Page Cache: {self.get_cache_summary()}
                 
 Please check logs for details.
 Backup available at: {backup_file if backup_file else 'No backup created'}
@@ -311,6 +338,7 @@ Statistics:
 - Total Grants: {stats['total_grants'] if stats else 'Unknown'}
 - Total Value: ${stats['total_value']:,.2f if stats else 'Unknown'}
 - States Covered: {stats['states_covered'] if stats else 'Unknown'}
+- Page Cache: {self.get_cache_summary()}
 - Scan Type: Full historical scan
 - Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
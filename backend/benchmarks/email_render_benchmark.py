@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Per-message cost of rendering and MIME-building a bulk email send
+
+Compares what EmailService did before (compile the Jinja2 source for every
+message, build a fresh MIME tree per recipient) with the compiled template
+layer and MessageBatch. Nothing is sent; only the CPU spent turning a
+recipient into message text is measured.
+
+Usage:
+    python benchmarks/email_render_benchmark.py [--recipients 10000] [--attachment-kb 0]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Template
+from src.utils.email import EmailService, MessageBatch
+from src.utils.email_templates import TEMPLATE_DIR, render_email, precompile_templates
+
+def recipients(count):
+    return [
+        {
+            'user_email': f'applicant{index}@example.org',
+            'user_name': f'Applicant {index}',
+            'grant_title': 'Community Resilience Fund 2025',
+            'application_id': 100000 + index,
+            'current_date': datetime(2025, 3, 1).strftime("%B %d, %Y")
+        }
+        for index in range(count)
+    ]
+
+def run_legacy(service, people, attachments):
+    """Template(source) per message, then build_message().as_string()"""
+    with open(os.path.join(TEMPLATE_DIR, 'application_confirmation.html')) as f:
+        source = f.read()
+    
+    render_seconds = mime_seconds = 0.0
+    for person in people:
+        started = time.perf_counter()
+        html_content = Template(source).render(**person)
+        rendered = time.perf_counter()
+        service.build_message(
+            person['user_email'], f"Application Submitted: {person['grant_title']}", html_content,
+            attachments=attachments
+        ).as_string()
+        mime_seconds += time.perf_counter() - rendered
+        render_seconds += rendered - started
+    return render_seconds, mime_seconds
+
+def run_compiled(service, people, attachments):
+    """Compiled template plus one MessageBatch for the whole send"""
+    precompile_templates()
+    render_seconds = mime_seconds = 0.0
+    started = time.perf_counter()
+    batch = MessageBatch(f"{service.from_name} <{service.from_email}>", attachments)
+    mime_seconds += time.perf_counter() - started
+    for person in people:
+        started = time.perf_counter()
+        html_content = render_email('application_confirmation.html', **person)
+        rendered = time.perf_counter()
+        batch.render(person['user_email'], f"Application Submitted: {person['grant_title']}", html_content)
+        mime_seconds += time.perf_counter() - rendered
+        render_seconds += rendered - started
+    return render_seconds, mime_seconds
+
+def report(label, count, render_seconds, mime_seconds):
+    total = render_seconds + mime_seconds
+    print(f"{label:<22} render {render_seconds / count * 1e6:8.1f} us/msg   "
+          f"mime {mime_seconds / count * 1e6:8.1f} us/msg   "
+          f"total {total / count * 1e6:8.1f} us/msg ({total:.2f}s)")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='Email render benchmark')
+    parser.add_argument('--recipients', type=int, default=10000)
+    parser.add_argument('--legacy-recipients', type=int, default=1000,
+                        help='recipients rendered the old way (its cost is per message, so this extrapolates)')
+    parser.add_argument('--attachment-kb', type=int, default=0, help='attach a file of this size to every message')
+    args = parser.parse_args()
+    
+    attachments = None
+    if args.attachment_kb:
+        handle, path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(os.urandom(args.attachment_kb * 1024))
+        attachments = [path]
+    
+    service = EmailService()
+    legacy_people = recipients(args.legacy_recipients)
+    people = recipients(args.recipients)
+    
+    print(f"{args.recipients:,} recipients, attachment {args.attachment_kb} KB")
+    legacy = report('per-message compile', len(legacy_people), *run_legacy(service, legacy_people, attachments))
+    compiled = report('compiled + batch', len(people), *run_compiled(service, people, attachments))
+    print(f"speedup per message: {legacy / len(legacy_people) / (compiled / len(people)):.1f}x")
+    
+    if attachments:
+        os.remove(attachments[0])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Sensitive field encryption throughput
+
+Compares deriving the PBKDF2 key on every encrypt/decrypt call (what
+EncryptionManager did before the keyring) with the cached keyring, both one
+field at a time and through encrypt_many/decrypt_many on a row set shaped
+like an application export.
+
+Usage:
+    python benchmarks/encryption_benchmark.py [--rows 100] [--legacy-fields 50]
+"""
+
+import os
+import sys
+import time
+import base64
+import argparse
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+from src.utils.encryption import EncryptionManager, SecureDataHandler, derive_key
+
+def export_rows(count):
+    return [
+        {
+            'application_id': index,
+            'bank_account': f'GrantThrive Applicant {index}',
+            'bsb': f'{index % 1000:03d}-{index % 997:03d}',
+            'account_number': f'{10000000 + index}',
+            'abn': f'{51824753556 + index}'
+        }
+        for index in range(count)
+    ]
+
+def legacy_round_trip(manager, values):
+    """Key derived from scratch for every call, as before"""
+    for value in values:
+        key = derive_key.__wrapped__(manager.password, manager.salt)
+        token = base64.urlsafe_b64encode(Fernet(key).encrypt(value.encode())).decode()
+        key = derive_key.__wrapped__(manager.password, manager.salt)
+        Fernet(key).decrypt(base64.urlsafe_b64decode(token.encode())).decode()
+
+def cached_round_trip(manager, values):
+    for value in values:
+        manager.decrypt(manager.encrypt(value))
+
+def report(label, fields, seconds):
+    print(f"{label:<28} {fields / seconds:12,.0f} fields/s  ({seconds * 1000 / fields:8.3f} ms/field)")
+    return fields / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Encryption benchmark')
+    parser.add_argument('--rows', type=int, default=100, help='rows in the exported row set')
+    parser.add_argument('--legacy-fields', type=int, default=50,
+                        help='fields round-tripped the old way (its cost is per call, so this extrapolates)')
+    args = parser.parse_args()
+    
+    manager = EncryptionManager('benchmark-password')
+    rows = export_rows(args.rows)
+    fields = SecureDataHandler.FINANCIAL_FIELDS
+    values = [row[field] for row in rows for field in fields]
+    
+    print(f"{args.rows} rows x {len(fields)} sensitive fields; encrypt + decrypt per field")
+    
+    started = time.perf_counter()
+    legacy_round_trip(manager, values[:args.legacy_fields])
+    legacy = report('derive key per call', min(args.legacy_fields, len(values)), time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    manager.fernet  # first use derives the key once
+    print(f"{'one-off key derivation':<28} {(time.perf_counter() - started) * 1000:12.1f} ms")
+    
+    started = time.perf_counter()
+    cached_round_trip(manager, values)
+    cached = report('cached keyring', len(values), time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    for field in fields:
+        manager.decrypt_many(manager.encrypt_many([row[field] for row in rows]))
+    batch = report('encrypt_many/decrypt_many', len(values), time.perf_counter() - started)
+    
+    print(f"speedup: cached {cached / legacy:,.0f}x, batch {batch / legacy:,.0f}x")
+
+if __name__ == '__main__':
+    main()
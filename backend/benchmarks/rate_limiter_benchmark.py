@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of rate limiter decisions per second for each backend
+
+Usage:
+    python benchmarks/rate_limiter_benchmark.py [--decisions 200000] [--clients 50000] [--workers 4]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.middleware.rate_limiter import InMemoryRateLimiter, SQLiteRateLimiter
+
+LIMIT = 100
+WINDOW_SECONDS = 900
+
+def client_keys(count, clients, seed):
+    rng = random.Random(seed)
+    return [f'client-{rng.randrange(clients)}' for _ in range(count)]
+
+def run(limiter, keys):
+    allowed = 0
+    started = time.perf_counter()
+    for key in keys:
+        if limiter.hit(key, LIMIT, WINDOW_SECONDS).allowed:
+            allowed += 1
+    elapsed = time.perf_counter() - started
+    return len(keys) / elapsed, allowed
+
+def sqlite_worker(path, keys, results):
+    rate, allowed = run(SQLiteRateLimiter(path=path), keys)
+    results.put((rate, allowed))
+
+def main():
+    parser = argparse.ArgumentParser(description='Rate limiter benchmark')
+    parser.add_argument('--decisions', type=int, default=200000)
+    parser.add_argument('--clients', type=int, default=50000)
+    parser.add_argument('--max-clients', type=int, default=10000, help='LRU bound for in-memory backends')
+    parser.add_argument('--workers', type=int, default=4, help='processes sharing the SQLite backend')
+    args = parser.parse_args()
+    
+    keys = client_keys(args.decisions, args.clients, seed=1)
+    
+    for strategy in ('sliding_window', 'token_bucket'):
+        limiter = InMemoryRateLimiter(strategy=strategy, max_clients=args.max_clients)
+        rate, allowed = run(limiter, keys)
+        stats = limiter.get_stats()
+        print(f"memory:{strategy:<15} {rate:>10,.0f} decisions/s  "
+              f"clients held {stats['clients']:,} (evicted {stats['evictions']:,})")
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='rate_limit_bench_'), 'limits.db')
+    single = keys[:max(1, args.decisions // 10)]
+    rate, _ = run(SQLiteRateLimiter(path=path), single)
+    print(f"sqlite (1 process)       {rate:>10,.0f} decisions/s")
+    
+    # Several processes hammering the same file, as gunicorn workers would
+    per_worker = max(1, args.decisions // 10 // args.workers)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=sqlite_worker,
+            args=(path, client_keys(per_worker, args.clients, seed=100 + i), results)
+        )
+        for i in range(args.workers)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    total = per_worker * args.workers
+    print(f"sqlite ({args.workers} processes)     {total / elapsed:>10,.0f} decisions/s aggregate")
+    
+    # Shared state check: one hot client across processes must still be capped at LIMIT
+    hot_path = os.path.join(os.path.dirname(path), 'hot.db')
+    hot_results = multiprocessing.Queue()
+    hot_workers = [
+        multiprocessing.Process(target=sqlite_worker, args=(hot_path, ['hot-client'] * LIMIT, hot_results))
+        for _ in range(args.workers)
+    ]
+    for worker in hot_workers:
+        worker.start()
+    for worker in hot_workers:
+        worker.join()
+    allowed = sum(hot_results.get()[1] for _ in hot_workers)
+    print(f"shared limit check: {allowed} of {LIMIT * args.workers} requests allowed (limit {LIMIT})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Bulk email throughput: connection per message (previous behaviour) vs the pooled delivery engine
+
+Runs against a local SMTP sink that adds a configurable round-trip delay
+per command and a connection setup cost standing in for the TLS handshake.
+Point --host/--port at another stand-in (e.g. python -m aiosmtpd -n -l
+localhost:8025) to use that instead.
+
+Usage:
+    python benchmarks/smtp_delivery_benchmark.py [--messages 2000] [--workers 8] [--latency-ms 5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import socketserver
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smtplib
+from src.utils.smtp_delivery import SMTPConnectionPool, SMTPDeliveryEngine
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Minimal ESMTP receiver: accepts any login and discards the mail"""
+    
+    def reply(self, line):
+        time.sleep(self.server.latency)
+        self.wfile.write(line.encode() + b'\r\n')
+    
+    def handle(self):
+        time.sleep(self.server.handshake)
+        self.reply('220 sink ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                time.sleep(self.server.latency)
+                self.wfile.write(b'250-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+            elif command.startswith('HELO'):
+                self.reply('250 sink')
+            elif command.startswith('AUTH'):
+                self.reply('235 Authentication successful')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply('250 Queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, address, latency, handshake):
+        super().__init__(address, SinkHandler)
+        self.latency = latency
+        self.handshake = handshake
+        self.lock = threading.Lock()
+        self.messages = 0
+
+def build_message(index):
+    return (
+        f"From: GrantThrive <noreply@grantthrive.com>\r\nTo: applicant{index}@example.org\r\n"
+        f"Subject: Funding round closed\r\n\r\n" + "The round you applied to has closed.\r\n" * 40
+    )
+
+def send_legacy(host, port, count):
+    """What EmailService.send_email did: a new connection and login for every message"""
+    for index in range(count):
+        with smtplib.SMTP(host, port) as server:
+            server.login('noreply@grantthrive.com', 'password')
+            server.sendmail('noreply@grantthrive.com', f'applicant{index}@example.org', build_message(index))
+
+def main():
+    parser = argparse.ArgumentParser(description='SMTP delivery benchmark')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--legacy-messages', type=int, default=200,
+                        help='messages sent the old way (its rate is extrapolated)')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=0, help='provider limit in messages/s (0: unlimited)')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='sink delay per SMTP reply')
+    parser.add_argument('--handshake-ms', type=float, default=60.0, help='sink delay per new connection')
+    parser.add_argument('--host', help='use an external SMTP stand-in instead of the built-in sink')
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+    
+    sink = None
+    host, port = args.host, args.port
+    if host is None:
+        sink = SinkServer(('127.0.0.1', 0), args.latency_ms / 1000, args.handshake_ms / 1000)
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        host, port = sink.server_address
+    
+    started = time.perf_counter()
+    send_legacy(host, port, args.legacy_messages)
+    legacy_rate = args.legacy_messages / (time.perf_counter() - started)
+    print(f"connection per message: {legacy_rate:8.1f} msg/s "
+          f"({args.messages:,} messages would take {args.messages / legacy_rate:,.0f}s)")
+    
+    pool = SMTPConnectionPool(host, port, 'noreply@grantthrive.com', 'password', use_tls=False, size=args.workers)
+    engine = SMTPDeliveryEngine(pool, workers=args.workers, rate_limit=args.rate or 1e9)
+    messages = [
+        {
+            'from_addr': 'noreply@grantthrive.com',
+            'to_addrs': f'applicant{index}@example.org',
+            'message': build_message(index)
+        }
+        for index in range(args.messages)
+    ]
+    started = time.perf_counter()
+    results = engine.send_many(messages)
+    elapsed = time.perf_counter() - started
+    pool.close()
+    
+    stats = engine.get_stats()
+    assert all(result['success'] for result in results), [r for r in results if not r['success']][:3]
+    print(f"pooled, {args.workers} workers:  {args.messages / elapsed:8.1f} msg/s "
+          f"({args.messages:,} messages in {elapsed:.1f}s, {stats['connections_opened']} connections, "
+          f"{stats['retries']} retries)")
+    print(f"speedup: {args.messages / elapsed / legacy_rate:.1f}x")
+    if sink is not None:
+        print(f"sink received {sink.messages:,} messages")
+        sink.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Per-vote analytics cost: full campaign rescan (previous behaviour) vs incremental tallies
+
+Usage:
+    python benchmarks/voting_analytics_benchmark.py [--votes 100000] [--voters 40000]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, event
+from src.models.community_voting import (
+    Base, VotingCampaign, VotingOption, CommunityVote, VotingAnalytics
+)
+from src.services.voting_analytics_service import voting_analytics_service
+
+OPTIONS = 12
+POSTCODES = [str(2000 + i) for i in range(300)]
+AGE_GROUPS = ['18-24', '25-34', '35-44', '45-54', '55-64', '65+']
+
+def make_votes(count, voters, seed=1):
+    rng = random.Random(seed)
+    return [
+        {
+            'campaign_id': 1,
+            'option_id': rng.randint(1, OPTIONS),
+            'voter_hash': hashlib.sha256(f'voter-{rng.randrange(voters)}'.encode()).hexdigest(),
+            'voter_postcode': rng.choice(POSTCODES),
+            'voter_age_group': rng.choice(AGE_GROUPS),
+            'vote_timestamp': datetime.utcnow()
+        }
+        for _ in range(count)
+    ]
+
+def setup(path):
+    engine = create_engine(f'sqlite:///{path}')
+    
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA journal_mode=WAL')
+        dbapi_connection.execute('PRAGMA synchronous=NORMAL')
+    
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        now = datetime.utcnow()
+        connection.execute(VotingCampaign.__table__.insert().values(
+            id=1, council_id='bench', title='Participatory budget', created_by='bench',
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=7)
+        ))
+        connection.execute(VotingOption.__table__.insert(), [
+            {'id': i, 'campaign_id': 1, 'title': f'Option {i}'} for i in range(1, OPTIONS + 1)
+        ])
+    return engine
+
+def legacy_rescan(connection, campaign_id):
+    """What _update_voting_analytics did after every vote"""
+    votes = connection.execute(
+        select(CommunityVote.__table__).where(CommunityVote.__table__.c.campaign_id == campaign_id)
+    ).all()
+    postcode_counts, age_counts = {}, {}
+    for vote in votes:
+        if vote.voter_postcode:
+            postcode_counts[vote.voter_postcode] = postcode_counts.get(vote.voter_postcode, 0) + 1
+        if vote.voter_age_group:
+            age_counts[vote.voter_age_group] = age_counts.get(vote.voter_age_group, 0) + 1
+    return len(votes), len(set(vote.voter_hash for vote in votes)), json.dumps(postcode_counts), json.dumps(age_counts)
+
+def main():
+    parser = argparse.ArgumentParser(description='Voting analytics benchmark')
+    parser.add_argument('--votes', type=int, default=100000)
+    parser.add_argument('--voters', type=int, default=40000)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix='voting_bench_')
+    votes = make_votes(args.votes, args.voters)
+    vote_table = CommunityVote.__table__
+    
+    # Incremental: one transaction per vote, as submit_vote runs it
+    engine = setup(os.path.join(workdir, 'incremental.db'))
+    latencies = []
+    started = time.perf_counter()
+    for vote in votes:
+        with engine.begin() as connection:
+            connection.execute(vote_table.insert().values(**vote))
+            t0 = time.perf_counter()
+            voting_analytics_service.apply_votes(connection, [vote])
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    
+    first, last = latencies[:1000], latencies[-1000:]
+    print(f"incremental: {args.votes:,} votes in {elapsed:.1f}s ({args.votes / elapsed:,.0f} votes/s "
+          f"including insert and commit)")
+    print(f"  analytics cost per vote p50: first 1k {statistics.median(first) * 1000:.3f}ms, "
+          f"last 1k {statistics.median(last) * 1000:.3f}ms")
+    
+    with engine.connect() as connection:
+        summary = voting_analytics_service.get_summary(connection, 1)
+        expected = legacy_rescan(connection, 1)
+    assert summary['total_votes'] == expected[0], (summary['total_votes'], expected[0])
+    assert summary['unique_voters'] == expected[1], (summary['unique_voters'], expected[1])
+    assert summary['postcode_distribution'] == json.loads(expected[2])
+    assert summary['age_group_distribution'] == json.loads(expected[3])
+    print(f"  totals match a full rescan: {summary['total_votes']:,} votes, "
+          f"{summary['unique_voters']:,} unique voters")
+    
+    # Reconciliation over the full campaign, after deliberately corrupting the counters
+    with engine.begin() as connection:
+        connection.execute(VotingAnalytics.__table__.update().values(total_votes=0))
+        started = time.perf_counter()
+        result = voting_analytics_service.reconcile(connection)
+        reconcile_seconds = time.perf_counter() - started
+    print(f"reconcile: {reconcile_seconds:.2f}s, {result['drifted']} drifted campaign corrected")
+    
+    # Previous behaviour: the rescan cost at a few campaign sizes; the run total is its sum
+    with engine.connect() as connection:
+        samples = []
+        for size in sorted({min(1000, args.votes), min(10000, args.votes), args.votes}):
+            connection.execute(vote_table.delete().where(vote_table.c.id > size))
+            t0 = time.perf_counter()
+            legacy_rescan(connection, 1)
+            samples.append((size, time.perf_counter() - t0))
+            connection.rollback()
+    for size, seconds in samples:
+        print(f"full rescan at {size:>7,} votes: {seconds * 1000:8.1f}ms per vote")
+    per_vote_at_end = samples[-1][1]
+    print(f"full rescan over the whole campaign: ~{per_vote_at_end * args.votes / 2 / 60:,.0f} min "
+          f"(O(n^2); average rescan covers n/2 votes)")
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,16 @@
 import os
+import json
 import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import click
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.auth import auth_bp
-from src.routes.grants import grants_bp
+from src.routes.grants import grants_bp, grant_view_counter
 from src.routes.applications import applications_bp
 from src.routes.admin import admin_bp
 from src.routes.files import files_bp
@@ -19,6 +21,13 @@ from src.routes.communication_routes import communication_bp
 from src.routes.qr_code_routes import qr_code_bp
 from src.routes.quick_wins_routes import quick_wins_bp
 from src.routes.community_engagement_routes import community_engagement_bp
+from src.services.grant_search_service import grant_search_service
+from src.services.analytics_rollup_service import analytics_rollup_service
+from src.services.voting_analytics_service import voting_analytics_service
+from src.services.job_queue_service import job_queue, JobWorker
+from src.services.notification_log_service import notification_log_store
+from src.utils.audit import audit_writer, audit_archive, ensure_audit_schema
+from src.services.file_storage_service import file_storage_service
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -46,9 +55,100 @@ app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirnam
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
+# Keep analytics rollups in step with grant/application writes
+analytics_rollup_service.register()
+
+# Buffered grant view counts, notification log entries and audit events flush inside the app context
+grant_view_counter.init_app(app)
+notification_log_store.init_app(app)
+audit_writer.init_app(app)
+
+# Uploaded file blobs, resumable upload parts and temporary files
+file_storage_service.init_app(app)
+# Let the front server send file downloads: nginx via X-Accel-Redirect, Apache/lighttpd via X-Sendfile
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
 # Create tables
 with app.app_context():
     db.create_all()
+    grant_search_service.ensure_index(db.engine)
+    # Databases from before the rollups get them built once
+    with db.engine.begin() as connection:
+        analytics_rollup_service.ensure_populated(connection)
+        # Votes cast before the running tallies are tallied once
+        voting_analytics_service.ensure_populated(connection)
+    ensure_audit_schema(db.engine)
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Rebuild the grant full-text search index"""
+    grant_search_service.rebuild_index(db.engine)
+    print('Grant search index rebuilt')
+
+@app.cli.command('rebuild-analytics-rollups')
+def rebuild_analytics_rollups():
+    """Recompute the per-council daily analytics rollups"""
+    with db.engine.begin() as connection:
+        counts = analytics_rollup_service.rebuild(connection)
+    print(f"Analytics rollups rebuilt: {counts['grant_rollups']} grant rows, "
+          f"{counts['application_rollups']} application rows")
+
+@app.cli.command('reconcile-voting-analytics')
+@click.option('--campaign-id', type=int, default=None, help='Only reconcile this campaign')
+def reconcile_voting_analytics(campaign_id):
+    """Recompute voting tallies and unique voters from the vote rows (run periodically)"""
+    with db.engine.begin() as connection:
+        result = voting_analytics_service.reconcile(connection, campaign_id)
+    print(f"Voting analytics reconciled: {result['campaigns']} campaigns, "
+          f"{result['drifted']} corrected")
+
+@app.cli.command('run-job-worker')
+@click.option('--queues', default='default,notifications,email,push,exports', help='Comma-separated queues to work')
+@click.option('--concurrency', type=int, default=4, help='Jobs run in parallel')
+@click.option('--burst', is_flag=True, help='Exit once the queues are empty')
+def run_job_worker(queues, concurrency, burst):
+    """Run background jobs (notifications, emails, push, exports) until stopped"""
+    worker = JobWorker(app, job_queue, [queue.strip() for queue in queues.split(',') if queue.strip()],
+                       concurrency=concurrency, burst=burst)
+    counts = worker.run()
+    print(f"Job worker stopped: {counts['processed']} processed, {counts['failed']} failed")
+
+@app.cli.command('job-queue-stats')
+@click.option('--window-minutes', type=int, default=60, help='Latency window')
+def job_queue_stats(window_minutes):
+    """Queue depth, oldest runnable job and per-task wait/run percentiles"""
+    print(json.dumps(job_queue.get_metrics(db.engine, window_minutes), indent=2))
+
+@app.cli.command('requeue-dead-jobs')
+@click.option('--job-id', type=int, default=None, help='Only requeue this job')
+@click.option('--task', default=None, help='Only requeue jobs for this task')
+def requeue_dead_jobs(job_id, task):
+    """Give dead-lettered jobs a fresh set of attempts"""
+    print(f"Requeued {job_queue.requeue_dead(db.engine, job_id, task)} dead jobs")
+
+@app.cli.command('compact-notification-log')
+@click.option('--retention-days', type=int, default=None, help='Keep this many days (default NOTIFICATION_LOG_RETENTION_DAYS)')
+def compact_notification_log(retention_days):
+    """Delete notification log entries past retention (daily statistics are kept)"""
+    deleted = notification_log_store.compact(db.engine, retention_days)
+    print(f"Notification log compacted: {deleted} entries deleted")
+
+@app.cli.command('archive-audit-logs')
+@click.option('--keep-months', type=int, default=12, help='Whole months kept in audit_logs')
+def archive_audit_logs(keep_months):
+    """Move older audit events into monthly audit_logs_YYYY_MM tables"""
+    moved = audit_archive.archive(db.engine, keep_months)
+    for table, count in sorted(moved.items()):
+        print(f"{table}: {count} events archived")
+    print(f"Audit log archived: {sum(moved.values())} events")
+
+@app.cli.command('cleanup-upload-sessions')
+@click.option('--ttl-hours', type=int, default=None, help='Idle hours before a resumable upload expires (default UPLOAD_SESSION_TTL_HOURS)')
+def cleanup_upload_sessions(ttl_hours):
+    """Abort resumable uploads that have stopped receiving chunks"""
+    removed = file_storage_service.cleanup_expired_sessions(ttl_hours)
+    print(f"Upload sessions cleaned up: {removed} expired")
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
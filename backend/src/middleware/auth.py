@@ -1,33 +1,80 @@
 from functools import wraps
 from flask import request, jsonify, g
-from src.models.user import User
-from src.routes.auth import verify_token
+from src.models.user import User, UserStatus
+from src.routes.auth import decode_token
+from src.utils.auth_cache import auth_cache, UserSnapshot
 
-def require_auth(f):
-    """Decorator to require authentication for routes"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authorization header required'}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = verify_token(token)
-        
-        if not user_id:
-            return jsonify({'error': 'Invalid or expired token'}), 401
+def get_bearer_token():
+    """Bearer token from the Authorization header, or None"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
+def resolve_user(token, active_only=True):
+    """
+    Resolve a bearer token to a snapshot of its user
+    
+    Served from the auth cache when possible; otherwise the token is verified
+    and the user loaded once, then cached until the TTL or token expiry. The
+    snapshot is cached whatever the user's status; active_only is applied on
+    every lookup, so PENDING or SUSPENDED users are only let through where
+    the caller allows it.
+    
+    Returns:
+        tuple: (UserSnapshot or None, error message or None)
+    """
+    if auth_cache.is_revoked(token):
+        return None, 'Invalid or expired token'
+    
+    snapshot = auth_cache.get(token)
+    if not snapshot:
+        payload = decode_token(token)
+        if not payload:
+            return None, 'Invalid or expired token'
         
-        user = User.query.get(user_id)
-        if not user or not user.is_active:
-            return jsonify({'error': 'User not found or inactive'}), 401
+        user = User.query.get(payload['user_id'])
+        if not user:
+            return None, 'User not found'
         
-        # Store user in Flask's g object for use in the route
-        g.current_user = user
+        snapshot = UserSnapshot(user)
+        auth_cache.put(token, snapshot, payload.get('exp'))
+    
+    if active_only and snapshot.status != UserStatus.ACTIVE:
+        return None, 'User not found or inactive'
+    return snapshot, None
+
+def require_auth(f=None, active_only=True):
+    """
+    Decorator to require authentication for routes
+    
+    Use as @require_auth (active users only) or
+    @require_auth(active_only=False) for blueprints that accept any existing
+    user, e.g. PENDING applicants, as grants, applications, admin and files
+    always have.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            token = get_bearer_token()
+            if not token:
+                return jsonify({'error': 'Authentication required'}), 401
+            
+            user, error = resolve_user(token, active_only)
+            if not user:
+                return jsonify({'error': error}), 401
+            
+            # Available as g.current_user and (for older routes) request.current_user
+            g.current_user = user
+            request.current_user = user
+            
+            return f(*args, **kwargs)
         
-        return f(*args, **kwargs)
+        return decorated_function
     
-    return decorated_function
+    if f is None:
+        return decorator
+    return decorator(f)
 
 def require_role(*allowed_roles):
     """Decorator to require specific roles for routes"""
@@ -77,16 +124,13 @@ def optional_auth(f):
     """Decorator for optional authentication (sets g.current_user if authenticated)"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
+        token = get_bearer_token()
         
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            user_id = verify_token(token)
-            
-            if user_id:
-                user = User.query.get(user_id)
-                if user and user.is_active:
-                    g.current_user = user
+        if token:
+            user, _ = resolve_user(token)
+            if user:
+                g.current_user = user
+                request.current_user = user
         
         # If no valid auth, g.current_user will not be set
         return f(*args, **kwargs)
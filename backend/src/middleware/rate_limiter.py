@@ -0,0 +1,237 @@
+"""
+Rate Limiter Backends for GrantThrive
+Constant-memory per-client limiters: in-process (sliding window counter or
+token bucket) and a SQLite-backed one shared by every worker on a host
+"""
+
+import os
+import math
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+RateLimitDecision = namedtuple('RateLimitDecision', ['allowed', 'remaining', 'retry_after'])
+
+def _sliding_window(state, limit, window_seconds, now):
+    """
+    Sliding window counter decision
+
+    state is (window_index, previous_count, current_count). The request
+    rate is estimated as the previous window's count weighted by how much
+    of it still overlaps the sliding window, plus the current count.
+
+    Returns:
+        tuple: (new_state, RateLimitDecision)
+    """
+    window_index = int(now // window_seconds)
+    elapsed = now - window_index * window_seconds
+    
+    index, previous, current = state or (window_index, 0, 0)
+    if index == window_index - 1:
+        previous, current = current, 0
+    elif index != window_index:
+        previous, current = 0, 0
+    
+    overlap = (window_seconds - elapsed) / window_seconds
+    estimated = previous * overlap + current
+    
+    if estimated + 1 > limit:
+        if current + 1 > limit or previous == 0:
+            wait = window_seconds - elapsed
+        else:
+            # Time until the previous window's weight decays enough to admit one request
+            wait = (window_seconds - elapsed) - (limit - current - 1) * window_seconds / previous
+        decision = RateLimitDecision(False, 0, max(1, math.ceil(wait)))
+        return (window_index, previous, current), decision
+    
+    current += 1
+    remaining = max(0, int(limit - (previous * overlap + current)))
+    return (window_index, previous, current), RateLimitDecision(True, remaining, 0)
+
+def _token_bucket(state, limit, window_seconds, now):
+    """
+    Token bucket decision: capacity `limit`, refilled at limit/window_seconds per second
+
+    state is (tokens, last_refill).
+    """
+    rate = limit / window_seconds
+    tokens, last = state or (float(limit), now)
+    tokens = min(float(limit), tokens + (now - last) * rate)
+    
+    if tokens < 1:
+        decision = RateLimitDecision(False, 0, max(1, math.ceil((1 - tokens) / rate)))
+        return (tokens, now), decision
+    
+    tokens -= 1
+    return (tokens, now), RateLimitDecision(True, int(tokens), 0)
+
+class InMemoryRateLimiter:
+    """
+    Per-process limiter holding one small tuple per client
+
+    Clients are kept in LRU order and the least recently seen are evicted
+    once max_clients is reached, so memory stays bounded no matter how many
+    distinct IPs hit the service. An evicted client simply starts afresh.
+    """
+    
+    STRATEGIES = {
+        'sliding_window': _sliding_window,
+        'token_bucket': _token_bucket
+    }
+    
+    def __init__(self, strategy='sliding_window', max_clients=100000):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f'Unknown rate limit strategy: {strategy}')
+        self.strategy = strategy
+        self._decide = self.STRATEGIES[strategy]
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def hit(self, key, limit, window_seconds, now=None):
+        """Record a request for key and decide whether it is allowed"""
+        now = time.time() if now is None else now
+        with self._lock:
+            state, decision = self._decide(self._clients.get(key), limit, window_seconds, now)
+            self._clients[key] = state
+            self._clients.move_to_end(key)
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+        return decision
+    
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._clients.clear()
+            else:
+                self._clients.pop(key, None)
+    
+    def get_stats(self):
+        return {
+            'backend': f'memory:{self.strategy}',
+            'clients': len(self._clients),
+            'max_clients': self.max_clients,
+            'evictions': self.evictions
+        }
+
+class SQLiteRateLimiter:
+    """
+    Sliding window counter stored in a local SQLite file
+
+    Every gunicorn worker on the host opens the same file, so limits are
+    enforced across processes. Each decision is one short IMMEDIATE
+    transaction on a WAL-mode database; idle clients are pruned periodically.
+    """
+    
+    def __init__(self, path=None, prune_every=10000, busy_timeout_ms=2000):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'grantthrive_rate_limits.db')
+        self.prune_every = prune_every
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._decisions = 0
+        self._counter_lock = threading.Lock()
+    
+    def hit(self, key, limit, window_seconds, now=None):
+        """Record a request for key and decide whether it is allowed"""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT window_index, previous_count, current_count FROM rate_limits WHERE key = ?',
+                (key,)
+            ).fetchone()
+            state, decision = _sliding_window(row, limit, window_seconds, now)
+            conn.execute(
+                'INSERT INTO rate_limits (key, window_index, previous_count, current_count, window_seconds) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET window_index = excluded.window_index, '
+                'previous_count = excluded.previous_count, current_count = excluded.current_count, '
+                'window_seconds = excluded.window_seconds',
+                (key, state[0], state[1], state[2], window_seconds)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        
+        with self._counter_lock:
+            self._decisions += 1
+            prune = self._decisions % self.prune_every == 0
+        if prune:
+            self.prune(now)
+        return decision
+    
+    def prune(self, now=None):
+        """Delete clients idle for two full windows (their state is equivalent to fresh)"""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute(
+            'DELETE FROM rate_limits WHERE (window_index + 2) * window_seconds <= ?',
+            (now,)
+        )
+    
+    def reset(self, key=None):
+        conn = self._connection()
+        if key is None:
+            conn.execute('DELETE FROM rate_limits')
+        else:
+            conn.execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+    
+    def get_stats(self):
+        clients = self._connection().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'clients': clients
+        }
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are managed explicitly in hit()
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                'key TEXT PRIMARY KEY, window_index INTEGER NOT NULL, '
+                'previous_count INTEGER NOT NULL, current_count INTEGER NOT NULL, '
+                'window_seconds REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+def create_rate_limiter(backend=None):
+    """
+    Build the limiter selected by RATE_LIMIT_BACKEND
+
+    Backends:
+        sliding_window (default) - in-process sliding window counter
+        token_bucket - in-process token bucket
+        sqlite - sliding window counter shared through RATE_LIMIT_SQLITE_PATH
+    """
+    backend = backend or os.environ.get('RATE_LIMIT_BACKEND', 'sliding_window')
+    if backend == 'sqlite':
+        return SQLiteRateLimiter(path=os.environ.get('RATE_LIMIT_SQLITE_PATH'))
+    return InMemoryRateLimiter(
+        strategy=backend,
+        max_clients=int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', 100000))
+    )
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Process-wide limiter, created on first use"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = create_rate_limiter()
+    return _rate_limiter
@@ -1,12 +1,15 @@
+import os
 import re
 import time
 from functools import wraps
 from flask import request, jsonify, g
-from collections import defaultdict, deque
-from datetime import datetime, timedelta
+from datetime import datetime
+from src.middleware.rate_limiter import get_rate_limiter
 
-# Rate limiting storage (in production, use Redis)
-rate_limit_storage = defaultdict(lambda: deque())
+# Budget shared by every rate-limited endpoint for one client, checked on top
+# of each endpoint's own limit
+CLIENT_RATE_LIMIT = int(os.environ.get('RATE_LIMIT_CLIENT_MAX_REQUESTS', 100))
+CLIENT_RATE_LIMIT_WINDOW_MINUTES = int(os.environ.get('RATE_LIMIT_CLIENT_WINDOW_MINUTES', 15))
 
 def validate_input(f):
     """Decorator to validate and sanitize input data"""
@@ -39,7 +42,7 @@ def sanitize_data(data):
         return data
 
 def rate_limit(max_requests=100, window_minutes=15):
-    """Rate limiting decorator"""
+    """Rate limiting decorator (backend chosen by RATE_LIMIT_BACKEND)"""
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -48,23 +51,29 @@ def rate_limit(max_requests=100, window_minutes=15):
             if hasattr(g, 'current_user') and g.current_user:
                 client_id = f"user_{g.current_user.id}"
             
-            now = datetime.utcnow()
-            window_start = now - timedelta(minutes=window_minutes)
+            # Each decorated endpoint keeps its own budget per client, and the
+            # client's requests to all of them also count against one overall
+            # budget; a request refused by its endpoint does not use up the latter
+            limiter = get_rate_limiter()
+            decision = limiter.hit(
+                f"{f.__module__}.{f.__name__}:{client_id}",
+                max_requests,
+                window_minutes * 60
+            )
+            if decision.allowed:
+                decision = limiter.hit(
+                    f"client:{client_id}",
+                    CLIENT_RATE_LIMIT,
+                    CLIENT_RATE_LIMIT_WINDOW_MINUTES * 60
+                )
             
-            # Clean old requests
-            client_requests = rate_limit_storage[client_id]
-            while client_requests and client_requests[0] < window_start:
-                client_requests.popleft()
-            
-            # Check rate limit
-            if len(client_requests) >= max_requests:
-                return jsonify({
+            if not decision.allowed:
+                response = jsonify({
                     'error': 'Rate limit exceeded',
-                    'retry_after': window_minutes * 60
-                }), 429
-            
-            # Add current request
-            client_requests.append(now)
+                    'retry_after': decision.retry_after
+                })
+                response.headers['Retry-After'] = str(decision.retry_after)
+                return response, 429
             
             return f(*args, **kwargs)
         
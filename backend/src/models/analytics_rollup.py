@@ -0,0 +1,53 @@
+from src.models.user import db
+
+class GrantDailyRollup(db.Model):
+    """Grant counts and funding per council, creation day, status and category"""
+    __tablename__ = 'grant_daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('council_id', 'day', 'status', 'category', name='uq_grant_daily_rollup'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    council_id = db.Column(db.Integer, nullable=False, index=True)
+    day = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    
+    grant_count = db.Column(db.Integer, nullable=False, default=0)
+    funding_total = db.Column(db.Float, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'council_id': self.council_id,
+            'day': self.day.isoformat() if self.day else None,
+            'status': self.status,
+            'category': self.category,
+            'grant_count': self.grant_count,
+            'funding_total': self.funding_total
+        }
+
+class ApplicationDailyRollup(db.Model):
+    """Application counts and requested amounts per council, creation day, status and grant category"""
+    __tablename__ = 'application_daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('council_id', 'day', 'status', 'category', name='uq_application_daily_rollup'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    council_id = db.Column(db.Integer, nullable=False, index=True)
+    day = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    
+    application_count = db.Column(db.Integer, nullable=False, default=0)
+    requested_total = db.Column(db.Float, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'council_id': self.council_id,
+            'day': self.day.isoformat() if self.day else None,
+            'status': self.status,
+            'category': self.category,
+            'application_count': self.application_count,
+            'requested_total': self.requested_total
+        }
@@ -15,6 +15,11 @@ class ApplicationStatus(enum.Enum):
 
 class Application(db.Model):
     __tablename__ = 'applications'
+    __table_args__ = (
+        # Keyset pagination order, overall and per applicant
+        db.Index('ix_applications_created_at_id', 'created_at', 'id'),
+        db.Index('ix_applications_applicant_created_at_id', 'applicant_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -0,0 +1,51 @@
+from datetime import datetime
+from src.models.user import db
+
+class BackgroundJob(db.Model):
+    """A unit of deferred work (notification, email, export) claimed and run by a job worker"""
+    __tablename__ = 'background_jobs'
+    __table_args__ = (
+        # Claim query: next runnable job on a queue
+        db.Index('ix_background_jobs_claim', 'queue', 'status', 'run_at'),
+        # Stale-lock recovery
+        db.Index('ix_background_jobs_status_locked', 'status', 'locked_at'),
+    )
+    
+    # queued -> running -> succeeded; failures go back to queued until max_attempts, then dead
+    STATUSES = ('queued', 'running', 'succeeded', 'dead')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    queue = db.Column(db.String(50), nullable=False, default='default')
+    task = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    last_error = db.Column(db.Text)
+    result = db.Column(db.Text)  # JSON
+    
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'queue': self.queue,
+            'task': self.task,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'result': self.result,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
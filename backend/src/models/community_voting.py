@@ -4,7 +4,7 @@ Enables public voting on grant priorities and community engagement
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -70,6 +70,10 @@ class VotingOption(Base):
 class CommunityVote(Base):
     """Model for individual community votes"""
     __tablename__ = 'community_votes'
+    __table_args__ = (
+        # Per-voter vote counts within a campaign (duplicate checks, ingestion cache warm-up)
+        Index('ix_community_votes_campaign_voter', 'campaign_id', 'voter_hash'),
+    )
     
     id = Column(Integer, primary_key=True)
     campaign_id = Column(Integer, ForeignKey('voting_campaigns.id'), nullable=False)
@@ -99,6 +103,9 @@ class CommunityVote(Base):
 class VotingAnalytics(Base):
     """Model for storing voting analytics and insights"""
     __tablename__ = 'voting_analytics'
+    __table_args__ = (
+        UniqueConstraint('campaign_id', name='uq_voting_analytics_campaign'),
+    )
     
     id = Column(Integer, primary_key=True)
     campaign_id = Column(Integer, ForeignKey('voting_campaigns.id'), nullable=False)
@@ -126,6 +133,48 @@ class VotingAnalytics(Base):
     def __repr__(self):
         return f"<VotingAnalytics(id={self.id}, campaign_id={self.campaign_id}, total_votes={self.total_votes})>"
 
+class VotingTally(Base):
+    """Running vote count per campaign and bucket of one dimension (option, postcode, age group)"""
+    __tablename__ = 'voting_tallies'
+    __table_args__ = (
+        UniqueConstraint('campaign_id', 'dimension', 'bucket', name='uq_voting_tally'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey('voting_campaigns.id'), nullable=False)
+    dimension = Column(String(20), nullable=False)  # "option", "postcode", "age_group"
+    bucket = Column(String(64), nullable=False)
+    votes = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<VotingTally(campaign_id={self.campaign_id}, {self.dimension}={self.bucket}, votes={self.votes})>"
+
+class CampaignVoter(Base):
+    """Votes cast by each voter hash in a campaign; one row per unique voter"""
+    __tablename__ = 'campaign_voters'
+    __table_args__ = (
+        UniqueConstraint('campaign_id', 'voter_hash', name='uq_campaign_voter'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey('voting_campaigns.id'), nullable=False)
+    voter_hash = Column(String(64), nullable=False)
+    votes = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<CampaignVoter(campaign_id={self.campaign_id}, votes={self.votes})>"
+
+class VoteIngestCheckpoint(Base):
+    """Highest vote spool sequence number written to the database, per spool file"""
+    __tablename__ = 'vote_ingest_checkpoints'
+    
+    spool_id = Column(String(300), primary_key=True)
+    last_seq = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<VoteIngestCheckpoint(spool_id='{self.spool_id}', last_seq={self.last_seq})>"
+
 class VotingComment(Base):
     """Model for community comments on voting options"""
     __tablename__ = 'voting_comments'
@@ -26,6 +26,10 @@ class GrantCategory(enum.Enum):
 
 class Grant(db.Model):
     __tablename__ = 'grants'
+    __table_args__ = (
+        # Keyset pagination order (newest first)
+        db.Index('ix_grants_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -4,7 +4,7 @@ Enables public mapping of funded grants and community projects
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -13,10 +13,15 @@ Base = declarative_base()
 class GrantLocation(Base):
     """Model for grant project locations"""
     __tablename__ = 'grant_locations'
+    __table_args__ = (
+        # Public map feed: one council's locations inside a bounding box
+        Index('ix_grant_locations_council_lat_lng', 'council_id', 'latitude', 'longitude'),
+    )
     
     id = Column(Integer, primary_key=True)
     grant_id = Column(String(100), nullable=False)  # Links to existing grant system
     application_id = Column(String(100))  # Links to specific application
+    council_id = Column(String(100))  # Council whose public map shows this location
     
     # Location data
     address = Column(String(500), nullable=False)
@@ -52,6 +57,10 @@ class GrantLocation(Base):
 class ProjectUpdate(Base):
     """Model for project progress updates with photos and status"""
     __tablename__ = 'project_updates'
+    __table_args__ = (
+        # Latest public update per grant
+        Index('ix_project_updates_grant_public_submitted', 'grant_id', 'is_public', 'submitted_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     grant_id = Column(String(100), nullable=False)
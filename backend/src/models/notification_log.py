@@ -0,0 +1,71 @@
+from datetime import datetime
+from src.models.user import db
+
+class NotificationLogEntry(db.Model):
+    """Delivery summary of one notification (what NotificationService.send_notification returns)"""
+    __tablename__ = 'notification_log'
+    __table_args__ = (
+        # History pages: a council's most recent notifications
+        db.Index('ix_notification_log_council_timestamp', 'council_id', 'timestamp'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    council_id = db.Column(db.String(100), nullable=False)
+    applicant_id = db.Column(db.String(100))
+    event_type = db.Column(db.String(50), nullable=False)
+    effective_preference = db.Column(db.String(20), nullable=False)
+    
+    email_sent = db.Column(db.Boolean, nullable=False, default=False)
+    sms_sent = db.Column(db.Boolean, nullable=False, default=False)
+    email_result = db.Column(db.String(500))
+    sms_result = db.Column(db.String(500))
+    result = db.Column(db.String(500))
+    
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    
+    def to_dict(self):
+        summary = {
+            'council_id': self.council_id,
+            'applicant_id': self.applicant_id,
+            'event_type': self.event_type,
+            'effective_preference': self.effective_preference,
+            'email_sent': self.email_sent,
+            'sms_sent': self.sms_sent,
+            'email_result': self.email_result,
+            'sms_result': self.sms_result,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+        }
+        if self.result:
+            summary['result'] = self.result
+        return summary
+
+class NotificationDailyStat(db.Model):
+    """Notification counts per council, day, event type and delivery channel"""
+    __tablename__ = 'notification_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('council_id', 'day', 'event_type', 'effective_preference',
+                            name='uq_notification_daily_stat'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    council_id = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    effective_preference = db.Column(db.String(20), nullable=False)
+    
+    notification_count = db.Column(db.Integer, nullable=False, default=0)
+    emails_sent = db.Column(db.Integer, nullable=False, default=0)
+    sms_sent = db.Column(db.Integer, nullable=False, default=0)
+    delivered_count = db.Column(db.Integer, nullable=False, default=0)  # email or SMS went out
+    
+    def to_dict(self):
+        return {
+            'council_id': self.council_id,
+            'day': self.day.isoformat() if self.day else None,
+            'event_type': self.event_type,
+            'effective_preference': self.effective_preference,
+            'notification_count': self.notification_count,
+            'emails_sent': self.emails_sent,
+            'sms_sent': self.sms_sent,
+            'delivered_count': self.delivered_count
+        }
@@ -0,0 +1,69 @@
+from datetime import datetime
+from src.models.user import db
+
+class StoredFile(db.Model):
+    """An uploaded file: who uploaded it, for which application, and the content blob it points at"""
+    __tablename__ = 'stored_files'
+    __table_args__ = (
+        # A user's uploads / an application's documents, newest first
+        db.Index('ix_stored_files_uploader_uploaded', 'uploaded_by', 'uploaded_at'),
+        db.Index('ix_stored_files_application_uploaded', 'application_id', 'uploaded_at'),
+        # Blob reference counting on delete
+        db.Index('ix_stored_files_sha256', 'sha256'),
+    )
+    
+    id = db.Column(db.String(64), primary_key=True)  # <uuid hex>.<extension>, used in /api/files/<id>
+    sha256 = db.Column(db.String(64), nullable=False)  # Content address of the blob
+    original_name = db.Column(db.String(255), nullable=False)
+    file_size = db.Column(db.BigInteger, nullable=False)
+    file_type = db.Column(db.String(20), nullable=False)
+    mime_type = db.Column(db.String(100), nullable=False)
+    
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    application_id = db.Column(db.Integer, nullable=True)  # applications live in their own metadata
+    uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'original_name': self.original_name,
+            'filename': self.id,
+            'file_size': self.file_size,
+            'file_type': self.file_type,
+            'mime_type': self.mime_type,
+            'sha256': self.sha256,
+            'uploaded_by': self.uploaded_by,
+            'application_id': self.application_id,
+            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
+            'url': f'/api/files/{self.id}'
+        }
+
+class UploadSession(db.Model):
+    """A resumable chunked upload in progress; the bytes received so far sit in a part file"""
+    __tablename__ = 'upload_sessions'
+    __table_args__ = (
+        # Expired session cleanup
+        db.Index('ix_upload_sessions_updated', 'updated_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid hex
+    original_name = db.Column(db.String(255), nullable=False)
+    file_type = db.Column(db.String(20), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    application_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'original_name': self.original_name,
+            'total_size': self.total_size,
+            'offset': self.received_bytes,
+            'application_id': self.application_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'url': f'/api/files/uploads/{self.id}'
+        }
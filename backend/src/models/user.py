@@ -20,6 +20,10 @@ class UserStatus(enum.Enum):
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Keyset pagination order (newest first)
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
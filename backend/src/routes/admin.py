@@ -1,32 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from src.models.user import db, User, UserStatus, UserRole
-from src.routes.auth import verify_token
+from src.middleware.auth import require_auth
+from src.utils.auth_cache import auth_cache
+from src.utils.pagination import wants_cursor, wants_total, keyset_paginate, cursor_pagination_meta
+from src.utils.audit import ComplianceReporter
 from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__)
 
-def require_auth(f):
-    """Decorator to require authentication"""
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = verify_token(token)
-        if not user_id:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 401
-        
-        request.current_user = user
-        return f(*args, **kwargs)
-    
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 def require_admin(f):
     """Decorator to require admin access"""
     def decorated_function(*args, **kwargs):
@@ -38,7 +19,7 @@ def require_admin(f):
     return decorated_function
 
 @admin_bp.route('/admin/users', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def get_users():
     """Get all users with filtering"""
@@ -78,6 +59,20 @@ def get_users():
         # Order by creation date (newest first)
         query = query.order_by(User.created_at.desc())
         
+        # Keyset pagination when the client opts in with ?cursor=
+        if wants_cursor():
+            try:
+                page_data = keyset_paginate(
+                    query, User, request.args.get('cursor'), per_page, include_total=wants_total()
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'users': [user.to_dict() for user in page_data['items']],
+                'pagination': cursor_pagination_meta(page_data, per_page)
+            }), 200
+        
         # Paginate
         users = query.paginate(
             page=page,
@@ -101,7 +96,7 @@ def get_users():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/users/pending', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def get_pending_users():
     """Get users pending approval"""
@@ -124,7 +119,7 @@ def get_pending_users():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/users/<int:user_id>/approve', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def approve_user(user_id):
     """Approve pending user"""
@@ -148,7 +143,7 @@ def approve_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/users/<int:user_id>/reject', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def reject_user(user_id):
     """Reject pending user"""
@@ -176,7 +171,7 @@ def reject_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/users/<int:user_id>/suspend', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def suspend_user(user_id):
     """Suspend active user"""
@@ -203,7 +198,7 @@ def suspend_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/users/<int:user_id>/reactivate', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def reactivate_user(user_id):
     """Reactivate suspended user"""
@@ -227,7 +222,7 @@ def reactivate_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/users/<int:user_id>', methods=['PUT'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def update_user(user_id):
     """Update user information (admin only)"""
@@ -268,7 +263,7 @@ def update_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/stats', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def get_admin_stats():
     """Get admin dashboard statistics"""
@@ -305,7 +300,7 @@ def get_admin_stats():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/users/<int:user_id>', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 @require_admin
 def get_user_details(user_id):
     """Get detailed user information"""
@@ -314,15 +309,20 @@ def get_user_details(user_id):
         
         user_data = user.to_dict(include_sensitive=True)
         
-        # Add application statistics
+        # Add application statistics (counted in the database, not by loading every row)
         from src.models.application import Application
-        user_applications = Application.query.filter(Application.applicant_id == user_id).all()
+        status_counts = {
+            status.value: count
+            for status, count in db.session.query(
+                Application.status, db.func.count(Application.id)
+            ).filter(Application.applicant_id == user_id).group_by(Application.status)
+        }
         
         user_data['application_stats'] = {
-            'total_applications': len(user_applications),
-            'submitted': len([app for app in user_applications if app.status.value == 'submitted']),
-            'approved': len([app for app in user_applications if app.status.value == 'approved']),
-            'rejected': len([app for app in user_applications if app.status.value == 'rejected'])
+            'total_applications': sum(status_counts.values()),
+            'submitted': status_counts.get('submitted', 0),
+            'approved': status_counts.get('approved', 0),
+            'rejected': status_counts.get('rejected', 0)
         }
         
         return jsonify(user_data), 200
@@ -330,3 +330,53 @@ def get_user_details(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@admin_bp.route('/admin/auth-cache/stats', methods=['GET'])
+@require_auth(active_only=False)
+@require_admin
+def get_auth_cache_stats():
+    """Get authentication cache hit/miss counters"""
+    try:
+        return jsonify(auth_cache.get_stats()), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/admin/audit/reports/<report_type>', methods=['GET'])
+@require_auth(active_only=False)
+@require_admin
+def export_audit_report(report_type):
+    """
+    Stream a compliance report as NDJSON (default) or CSV
+    
+    Query: format, start_date, end_date (ISO 8601), and per report
+    user_id / resource_type + resource_id / severity
+    """
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': 'format must be ndjson or csv'}), 400
+        
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start_date = datetime.fromisoformat(start_date) if start_date else None
+        end_date = datetime.fromisoformat(end_date) if end_date else None
+        
+        filters = ComplianceReporter.report_filters(
+            report_type,
+            user_id=request.args.get('user_id'),
+            resource_type=request.args.get('resource_type'),
+            resource_id=request.args.get('resource_id'),
+            severity=request.args.get('severity')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    rows = ComplianceReporter.iter_logs(filters, start_date, end_date)
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(ComplianceReporter.stream_report(rows, export_format)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=audit_{report_type}.{export_format}'}
+    )
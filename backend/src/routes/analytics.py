@@ -1,11 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_, or_
+import json
+import os
+from sqlalchemy import func, or_
 from src.models.user import User
 from src.models.grant import Grant
 from src.models.application import Application
 from src.middleware.auth import require_auth, require_role
 from src.utils.audit import log_activity
+from src.services.analytics_service import analytics_service
+from src.services.job_queue_service import job_queue
 import calendar
 
 analytics_bp = Blueprint('analytics', __name__)
@@ -17,53 +21,39 @@ def get_dashboard_metrics():
     try:
         user = request.current_user
         
-        # Base queries with user filtering
+        # Calculate basic metrics (one aggregate query per entity)
         if user.role in ['council_admin', 'council_staff']:
-            # Council users see their council's data
-            grants_query = Grant.query.filter_by(council_id=user.council_id)
-            applications_query = Application.query.join(Grant).filter(Grant.council_id == user.council_id)
+            # Council users see their council's data, read from the daily rollups
+            grant_stats = analytics_service.council_grant_summary(user.council_id)
+            application_stats = analytics_service.council_application_summary(user.council_id)
         else:
             # Community users see their own applications
             grants_query = Grant.query.filter_by(status='open')
             applications_query = Application.query.filter_by(user_id=user.id)
-
-        # Calculate basic metrics
-        total_grants = grants_query.count()
-        total_applications = applications_query.count()
+            grant_stats = analytics_service.grant_summary(grants_query)
+            application_stats = analytics_service.application_summary(applications_query)
         
-        # Grant value metrics
-        total_grant_value = grants_query.with_entities(func.sum(Grant.amount)).scalar() or 0
+        total_grants = grant_stats['total']
+        total_applications = application_stats['total']
+        total_grant_value = grant_stats['total_value']
         
         # Application metrics
-        approved_applications = applications_query.filter_by(status='approved').count()
-        pending_applications = applications_query.filter(
-            Application.status.in_(['submitted', 'under_review'])
-        ).count()
+        approved_applications = application_stats['approved']
+        pending_applications = application_stats['pending']
         
         # Success rate calculation
         success_rate = (approved_applications / total_applications * 100) if total_applications > 0 else 0
         
         # Amount metrics
-        total_requested = applications_query.with_entities(
-            func.sum(Application.requested_amount)
-        ).scalar() or 0
-        
-        total_approved_amount = applications_query.filter_by(status='approved').with_entities(
-            func.sum(Application.requested_amount)
-        ).scalar() or 0
+        total_requested = application_stats['total_requested']
+        total_approved_amount = application_stats['total_approved_amount']
 
         # Open grants count
-        open_grants = grants_query.filter_by(status='open').count()
+        open_grants = grant_stats['open']
 
         # Recent activity (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_applications = applications_query.filter(
-            Application.created_at >= thirty_days_ago
-        ).count()
-        
-        recent_grants = grants_query.filter(
-            Grant.created_at >= thirty_days_ago
-        ).count()
+        recent_applications = application_stats['last_30_days']
+        recent_grants = grant_stats['last_30_days']
 
         metrics = {
             'total_grants': total_grants,
@@ -105,71 +95,15 @@ def get_trends_data():
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=months * 30)
         
-        # Base queries with user filtering
+        # Generate monthly data (grouped per entity, not per month)
         if user.role in ['council_admin', 'council_staff']:
-            grants_query = Grant.query.filter_by(council_id=user.council_id)
-            applications_query = Application.query.join(Grant).filter(Grant.council_id == user.council_id)
+            trends_data = analytics_service.council_monthly_trends(user.council_id, start_date, end_date)
         else:
             grants_query = Grant.query.filter_by(status='open')
             applications_query = Application.query.filter_by(user_id=user.id)
-
-        # Generate monthly data
-        trends_data = []
-        current_date = start_date.replace(day=1)
-        
-        while current_date <= end_date:
-            month_start = current_date
-            if current_date.month == 12:
-                month_end = current_date.replace(year=current_date.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                month_end = current_date.replace(month=current_date.month + 1, day=1) - timedelta(days=1)
-            
-            # Applications for this month
-            month_applications = applications_query.filter(
-                and_(
-                    Application.created_at >= month_start,
-                    Application.created_at <= month_end
-                )
-            ).count()
-            
-            # Grants for this month
-            month_grants = grants_query.filter(
-                and_(
-                    Grant.created_at >= month_start,
-                    Grant.created_at <= month_end
-                )
-            ).count()
-            
-            # Approved applications for this month
-            month_approved = applications_query.filter(
-                and_(
-                    Application.created_at >= month_start,
-                    Application.created_at <= month_end,
-                    Application.status == 'approved'
-                )
-            ).count()
-            
-            # Total value for this month
-            month_value = applications_query.filter(
-                and_(
-                    Application.created_at >= month_start,
-                    Application.created_at <= month_end
-                )
-            ).with_entities(func.sum(Application.requested_amount)).scalar() or 0
-
-            trends_data.append({
-                'month': current_date.strftime('%b %Y'),
-                'applications': month_applications,
-                'grants': month_grants,
-                'approved': month_approved,
-                'value': float(month_value)
-            })
-            
-            # Move to next month
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1)
+            trends_data = analytics_service.monthly_trends(
+                grants_query, applications_query, start_date, end_date
+            )
 
         log_activity(user.id, 'analytics_trends_viewed', {'months': months})
         
@@ -191,20 +125,18 @@ def get_category_distribution():
     try:
         user = request.current_user
         
-        # Base query with user filtering
+        # Get category distribution
         if user.role in ['council_admin', 'council_staff']:
-            grants_query = Grant.query.filter_by(council_id=user.council_id)
+            category_data = analytics_service.council_category_distribution(user.council_id)
         else:
             grants_query = Grant.query.filter_by(status='open')
+            category_data = grants_query.with_entities(
+                Grant.category,
+                func.count(Grant.id).label('count'),
+                func.sum(Grant.amount).label('total_value')
+            ).group_by(Grant.category).all()
 
-        # Get category distribution
-        category_data = grants_query.with_entities(
-            Grant.category,
-            func.count(Grant.id).label('count'),
-            func.sum(Grant.amount).label('total_value')
-        ).group_by(Grant.category).all()
-
-        total_grants = grants_query.count()
+        total_grants = sum(count for _, count, _ in category_data)
         
         distribution = []
         for category, count, total_value in category_data:
@@ -238,18 +170,16 @@ def get_status_distribution():
     try:
         user = request.current_user
         
-        # Base query with user filtering
+        # Get status distribution
         if user.role in ['council_admin', 'council_staff']:
-            applications_query = Application.query.join(Grant).filter(Grant.council_id == user.council_id)
+            status_data = analytics_service.council_status_distribution(user.council_id)
         else:
             applications_query = Application.query.filter_by(user_id=user.id)
-
-        # Get status distribution
-        status_data = applications_query.with_entities(
-            Application.status,
-            func.count(Application.id).label('count'),
-            func.sum(Application.requested_amount).label('total_amount')
-        ).group_by(Application.status).all()
+            status_data = applications_query.with_entities(
+                Application.status,
+                func.count(Application.id).label('count'),
+                func.sum(Application.requested_amount).label('total_amount')
+            ).group_by(Application.status).all()
 
         distribution = []
         status_colors = {
@@ -301,20 +231,26 @@ def get_performance_metrics():
             applications_query = Application.query.filter_by(user_id=user.id)
 
         # Calculate performance metrics
-        total_applications = applications_query.count()
-        approved_applications = applications_query.filter_by(status='approved').count()
-        rejected_applications = applications_query.filter_by(status='rejected').count()
+        is_council_user = user.role in ['council_admin', 'council_staff']
+        if is_council_user:
+            grant_stats = analytics_service.council_grant_summary(user.council_id)
+            application_stats = analytics_service.council_application_summary(user.council_id)
+        else:
+            grant_stats = analytics_service.grant_summary(grants_query)
+            application_stats = analytics_service.application_summary(applications_query)
+        
+        total_applications = application_stats['total']
+        approved_applications = application_stats['approved']
+        rejected_applications = application_stats['rejected']
         
         # Success and rejection rates
         success_rate = (approved_applications / total_applications * 100) if total_applications > 0 else 0
         rejection_rate = (rejected_applications / total_applications * 100) if total_applications > 0 else 0
         
         # Amount metrics
-        total_grant_value = grants_query.with_entities(func.sum(Grant.amount)).scalar() or 0
-        total_requested = applications_query.with_entities(func.sum(Application.requested_amount)).scalar() or 0
-        total_approved_amount = applications_query.filter_by(status='approved').with_entities(
-            func.sum(Application.requested_amount)
-        ).scalar() or 0
+        total_grant_value = grant_stats['total_value']
+        total_requested = application_stats['total_requested']
+        total_approved_amount = application_stats['total_approved_amount']
         
         # Utilization rate
         utilization_rate = (total_approved_amount / total_grant_value * 100) if total_grant_value > 0 else 0
@@ -333,11 +269,14 @@ def get_performance_metrics():
         avg_processing_time = sum(processing_times) / len(processing_times) if processing_times else 0
         
         # Top performing categories
-        top_categories = applications_query.join(Grant).filter_by(status='approved').with_entities(
-            Grant.category,
-            func.count(Application.id).label('approved_count'),
-            func.sum(Application.requested_amount).label('approved_amount')
-        ).group_by(Grant.category).order_by(func.count(Application.id).desc()).limit(5).all()
+        if is_council_user:
+            top_categories = analytics_service.council_top_categories(user.council_id, limit=5)
+        else:
+            top_categories = applications_query.join(Grant).filter_by(status='approved').with_entities(
+                Grant.category,
+                func.count(Application.id).label('approved_count'),
+                func.sum(Application.requested_amount).label('approved_amount')
+            ).group_by(Grant.category).order_by(func.count(Application.id).desc()).limit(5).all()
 
         performance_data = {
             'success_rate': round(success_rate, 1),
@@ -390,11 +329,10 @@ def get_insights():
         recommendations = []
         
         # Calculate key metrics for insights
-        total_applications = applications_query.count()
-        approved_applications = applications_query.filter_by(status='approved').count()
-        pending_applications = applications_query.filter(
-            Application.status.in_(['submitted', 'under_review'])
-        ).count()
+        application_stats = analytics_service.application_summary(applications_query)
+        total_applications = application_stats['total']
+        approved_applications = application_stats['approved']
+        pending_applications = application_stats['pending']
         
         success_rate = (approved_applications / total_applications * 100) if total_applications > 0 else 0
         
@@ -434,22 +372,8 @@ def get_insights():
             })
         
         # Trend analysis (compare last 2 months)
-        two_months_ago = datetime.utcnow() - timedelta(days=60)
-        one_month_ago = datetime.utcnow() - timedelta(days=30)
-        
-        last_month_apps = applications_query.filter(
-            and_(
-                Application.created_at >= one_month_ago,
-                Application.created_at < datetime.utcnow()
-            )
-        ).count()
-        
-        previous_month_apps = applications_query.filter(
-            and_(
-                Application.created_at >= two_months_ago,
-                Application.created_at < one_month_ago
-            )
-        ).count()
+        last_month_apps = application_stats['last_30_days']
+        previous_month_apps = application_stats['previous_30_days']
         
         if last_month_apps > previous_month_apps * 1.2:
             insights.append({
@@ -503,27 +427,46 @@ def get_insights():
 @analytics_bp.route('/export', methods=['POST'])
 @require_auth
 def export_analytics_data():
-    """Export analytics data in various formats"""
+    """Queue an analytics export; poll /export/<job_id> until it is ready"""
     try:
         user = request.current_user
-        data = request.get_json()
-        export_type = data.get('type', 'json')  # json, csv, pdf
+        data = request.get_json() or {}
+        export_type = data.get('type', 'json')  # json, csv
         date_range = data.get('date_range', '12months')
         
-        # This would typically generate and return file data
-        # For now, return a success message
+        if export_type not in ('json', 'csv'):
+            return jsonify({
+                'success': False,
+                'message': f'Unsupported export type: {export_type}'
+            }), 400
+        
+        try:
+            months = int(str(date_range).replace('months', '') or 12)
+        except ValueError:
+            months = 12
+        
+        # Building the export runs on a job worker, not this request
+        job_id = job_queue.enqueue('analytics.export', {
+            'user_id': user.id,
+            'role': getattr(user.role, 'value', user.role),
+            'council_id': user.council_id,
+            'export_type': export_type,
+            'months': months,
+            'requested_at': datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+        })
         
         log_activity(user.id, 'analytics_data_exported', {
             'export_type': export_type,
-            'date_range': date_range
+            'date_range': date_range,
+            'job_id': job_id
         })
         
         return jsonify({
             'success': True,
-            'message': f'Analytics data exported successfully as {export_type}',
-            'download_url': f'/api/analytics/download/{export_type}',
-            'expires_at': (datetime.utcnow() + timedelta(hours=24)).isoformat()
-        })
+            'message': f'Analytics export queued as {export_type}',
+            'job_id': job_id,
+            'status_url': f'/api/analytics/export/{job_id}'
+        }), 202
 
     except Exception as e:
         return jsonify({
@@ -531,3 +474,75 @@ def export_analytics_data():
             'message': f'Error exporting analytics data: {str(e)}'
         }), 500
 
+def _get_export_job(job_id, user):
+    """The user's export job, or None (someone else's job is treated as missing)"""
+    job = job_queue.get_job(job_id)
+    if job is None or job.task != 'analytics.export':
+        return None
+    if json.loads(job.payload or '{}').get('user_id') != user.id:
+        return None
+    return job
+
+@analytics_bp.route('/export/<int:job_id>', methods=['GET'])
+@require_auth
+def get_export_status(job_id):
+    """Status of a queued analytics export"""
+    try:
+        job = _get_export_job(job_id, request.current_user)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'message': 'Export not found'
+            }), 404
+        
+        status = {
+            'job_id': job.id,
+            'status': job.status,
+            'attempts': job.attempts,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None
+        }
+        if job.status == 'succeeded':
+            status['download_url'] = f'/api/analytics/export/{job.id}/download'
+            status['expires_at'] = (job.finished_at + timedelta(hours=24)).isoformat()
+        elif job.status == 'dead':
+            status['error'] = job.last_error
+        
+        return jsonify({
+            'success': True,
+            'data': status
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error fetching export status: {str(e)}'
+        }), 500
+
+@analytics_bp.route('/export/<int:job_id>/download', methods=['GET'])
+@require_auth
+def download_export(job_id):
+    """Download a finished analytics export"""
+    try:
+        job = _get_export_job(job_id, request.current_user)
+        if job is None or job.status != 'succeeded':
+            return jsonify({
+                'success': False,
+                'message': 'Export not ready'
+            }), 404
+        
+        path = json.loads(job.result)['path']
+        if not os.path.exists(path):
+            return jsonify({
+                'success': False,
+                'message': 'Export has expired'
+            }), 410
+        
+        return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error downloading export: {str(e)}'
+        }), 500
+
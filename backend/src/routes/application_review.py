@@ -5,6 +5,7 @@ from ..models.application import Application
 from ..models.grant import Grant
 from ..models.user import User, db
 from ..utils.email import EmailService
+from ..utils.query_profiles import apply_profile
 import uuid
 
 application_review_bp = Blueprint('application_review', __name__)
@@ -26,12 +27,14 @@ def get_applications_for_review(grant_id):
         if grant.created_by != current_user_id and user.role not in ['council_admin', 'council_staff']:
             return jsonify({'success': False, 'message': 'Unauthorized'}), 403
         
-        # Get applications for this grant
-        applications = Application.query.filter_by(grant_id=grant_id).all()
+        # Get applications for this grant (applicants loaded in the same query)
+        applications = apply_profile(
+            Application.query.filter_by(grant_id=grant_id), Application, 'review'
+        ).all()
         
         applications_data = []
         for app in applications:
-            applicant = User.query.get(app.applicant_id)
+            applicant = app.applicant
             
             applications_data.append({
                 'id': app.id,
@@ -147,7 +150,7 @@ def score_application(application_id):
             email_service = EmailService()
             decision_text = 'approved' if recommendation == 'approve' else 'declined'
             
-            email_service.send_email(
+            email_service.queue_email(
                 to_email=applicant.email,
                 subject=f'Grant Application Decision: {grant.title}',
                 html_content=f'''
@@ -213,7 +216,7 @@ def assign_reviewers(application_id):
         email_service = EmailService()
         for reviewer_id in reviewers:
             reviewer = User.query.get(reviewer_id)
-            email_service.send_email(
+            email_service.queue_email(
                 to_email=reviewer.email,
                 subject=f'Application Review Assignment: {grant.title}',
                 html_content=f'''
@@ -1,37 +1,17 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, User
+from src.models.user import db
 from src.models.grant import Grant
 from src.models.application import Application, ApplicationStatus
-from src.routes.auth import verify_token
+from src.middleware.auth import require_auth
+from src.utils.query_profiles import apply_profile
+from src.utils.pagination import wants_cursor, wants_total, keyset_paginate, cursor_pagination_meta
 from datetime import datetime
 import json
 
 applications_bp = Blueprint('applications', __name__)
 
-def require_auth(f):
-    """Decorator to require authentication"""
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = verify_token(token)
-        if not user_id:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 401
-        
-        request.current_user = user
-        return f(*args, **kwargs)
-    
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @applications_bp.route('/applications', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 def get_applications():
     """Get applications (filtered by user role)"""
     try:
@@ -62,16 +42,39 @@ def get_applications():
         # Order by creation date (newest first)
         query = query.order_by(Application.created_at.desc())
         
-        # Paginate
-        applications = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        # Load grant and applicant with the page instead of once per row
+        query = apply_profile(query, Application, 'list')
+        
+        if wants_cursor():
+            # Keyset pagination (opt-in with ?cursor=)
+            try:
+                page_data = keyset_paginate(
+                    query, Application, request.args.get('cursor'), per_page, include_total=wants_total()
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            items = page_data['items']
+            pagination = cursor_pagination_meta(page_data, per_page)
+        else:
+            # Paginate
+            applications = query.paginate(
+                page=page,
+                per_page=per_page,
+                error_out=False
+            )
+            items = applications.items
+            pagination = {
+                'page': applications.page,
+                'pages': applications.pages,
+                'per_page': applications.per_page,
+                'total': applications.total,
+                'has_next': applications.has_next,
+                'has_prev': applications.has_prev
+            }
         
         # Prepare response data
         app_data = []
-        for app in applications.items:
+        for app in items:
             app_dict = app.to_dict()
             
             # Add grant information
@@ -96,21 +99,14 @@ def get_applications():
         
         return jsonify({
             'applications': app_data,
-            'pagination': {
-                'page': applications.page,
-                'pages': applications.pages,
-                'per_page': applications.per_page,
-                'total': applications.total,
-                'has_next': applications.has_next,
-                'has_prev': applications.has_prev
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @applications_bp.route('/applications/<int:application_id>', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 def get_application(application_id):
     """Get specific application by ID"""
     try:
@@ -143,7 +139,7 @@ def get_application(application_id):
         return jsonify({'error': str(e)}), 500
 
 @applications_bp.route('/applications', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 def create_application():
     """Create new application"""
     try:
@@ -223,7 +219,7 @@ def create_application():
         return jsonify({'error': str(e)}), 500
 
 @applications_bp.route('/applications/<int:application_id>', methods=['PUT'])
-@require_auth
+@require_auth(active_only=False)
 def update_application(application_id):
     """Update existing application"""
     try:
@@ -270,7 +266,7 @@ def update_application(application_id):
         return jsonify({'error': str(e)}), 500
 
 @applications_bp.route('/applications/<int:application_id>/submit', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 def submit_application(application_id):
     """Submit application for review"""
     try:
@@ -312,7 +308,7 @@ def submit_application(application_id):
         return jsonify({'error': str(e)}), 500
 
 @applications_bp.route('/applications/<int:application_id>/review', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 def review_application(application_id):
     """Review application (admin only)"""
     try:
@@ -350,7 +346,7 @@ def review_application(application_id):
         return jsonify({'error': str(e)}), 500
 
 @applications_bp.route('/applications/stats', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 def get_application_stats():
     """Get application statistics"""
     try:
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.security import generate_password_hash
 from src.models.user import db, User, UserRole, UserStatus
+from src.utils.auth_cache import auth_cache
 import jwt
 from datetime import datetime, timedelta
 import re
@@ -24,16 +25,22 @@ def generate_token(user_id):
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
-def verify_token(token):
-    """Verify JWT token"""
+def decode_token(token):
+    """Verify JWT token and return its payload"""
     try:
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload['user_id']
+        return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+def verify_token(token):
+    """Verify JWT token"""
+    payload = decode_token(token)
+    if not payload or auth_cache.is_revoked(token):
+        return None
+    return payload['user_id']
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """User registration endpoint"""
@@ -256,7 +263,14 @@ def demo_login():
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
     """User logout endpoint"""
-    # In a JWT system, logout is typically handled client-side
-    # by removing the token from storage
+    # The client discards the token; we also revoke it so cached
+    # sessions for it stop authenticating immediately
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+        payload = decode_token(token)
+        if payload:
+            auth_cache.revoke(token, payload.get('exp'))
+    
     return jsonify({'message': 'Logout successful'}), 200
 
@@ -105,14 +105,15 @@ def send_notification():
                     "message": f"Missing required field: {field}"
                 }), 400
         
-        success, result = notification_service.send_notification(data)
+        # Delivered by a job worker; result carries the job id
+        success, result = notification_service.enqueue_notification(data)
         
         if success:
             return jsonify({
                 "status": "success",
-                "message": "Notification sent successfully",
+                "message": "Notification queued",
                 "data": result
-            }), 200
+            }), 202
         else:
             return jsonify({
                 "status": "error",
@@ -139,14 +140,14 @@ def send_bulk_notification():
                 "message": "Recipients list is required"
             }), 400
         
-        success, result = notification_service.send_bulk_notification(data)
+        success, result = notification_service.enqueue_bulk_notification(data)
         
         if success:
             return jsonify({
                 "status": "success",
-                "message": "Bulk notifications processed",
+                "message": "Bulk notifications queued",
                 "data": result
-            }), 200
+            }), 202
         else:
             return jsonify({
                 "status": "error",
@@ -166,7 +167,14 @@ def get_notification_history(council_id):
     """
     try:
         limit = request.args.get('limit', 100, type=int)
-        history = notification_service.get_notification_history(council_id, limit)
+        before = request.args.get('before')  # timestamp of the last record on the previous page
+        try:
+            history = notification_service.get_notification_history(council_id, limit, before)
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "before must be an ISO timestamp"
+            }), 400
         
         return jsonify({
             "status": "success",
@@ -192,9 +200,15 @@ def get_notification_statistics(council_id):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        stats = notification_service.get_notification_statistics(
-            council_id, start_date, end_date
-        )
+        try:
+            stats = notification_service.get_notification_statistics(
+                council_id, start_date, end_date
+            )
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "start_date and end_date must be ISO dates (YYYY-MM-DD)"
+            }), 400
         
         return jsonify({
             "status": "success",
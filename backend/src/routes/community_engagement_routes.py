@@ -3,10 +3,12 @@ Community Engagement Routes for GrantThrive
 API endpoints for community voting and grant mapping functionality
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services.community_voting_service import CommunityVotingService
 from ..services.grant_mapping_service import GrantMappingService
+from ..services.vote_ingestion_service import vote_ingestion_service
+from ..services.map_snapshot_service import map_snapshot_service
 from ..utils.database import get_db_session
 
 # Create blueprint
@@ -102,6 +104,45 @@ def submit_vote(campaign_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@community_engagement_bp.route('/voting/campaigns/<int:campaign_id>/vote/queued', methods=['POST'])
+def submit_vote_queued(campaign_id):
+    """Submit a vote through the batched ingestion path (public endpoint, for high-traffic campaigns)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        # Validate required fields
+        if data.get('option_id') is None:
+            return jsonify({'success': False, 'error': 'Option ID is required'}), 400
+        try:
+            option_id = int(data['option_id'])
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Option ID must be an integer'}), 400
+        
+        voter_data = {
+            'email': data.get('email'),
+            'phone': data.get('phone'),
+            'postcode': data.get('postcode'),
+            'age_group': data.get('age_group'),
+            'ip_address': request.remote_addr,
+            'is_verified': data.get('is_verified', False),
+            'verification_method': data.get('verification_method', 'none')
+        }
+        
+        vote_ingestion_service.start(get_db_session().get_bind())
+        result = vote_ingestion_service.submit(campaign_id, option_id, voter_data)
+        
+        if result['success']:
+            return jsonify(result), 202
+        elif 'retry_after' in result:
+            response = jsonify(result)
+            response.headers['Retry-After'] = str(result['retry_after'])
+            return response, 503
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @community_engagement_bp.route('/voting/campaigns/<int:campaign_id>/results', methods=['GET'])
 def get_campaign_results(campaign_id):
     """Get voting results for a campaign (public endpoint)"""
@@ -224,12 +265,30 @@ def get_public_grant_map(council_id):
         if request.args.get('project_status'):
             filters['project_status'] = request.args.get('project_status')
         
+        # Viewport: bbox=west,south,east,north and the map zoom level
+        bbox = None
+        if request.args.get('bbox'):
+            try:
+                bbox = tuple(float(value) for value in request.args.get('bbox').split(','))
+            except ValueError:
+                bbox = ()
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                return jsonify({'success': False, 'error': 'bbox must be west,south,east,north'}), 400
+        
+        zoom = request.args.get('zoom', type=int)
+        
         db_session = get_db_session()
         mapping_service = GrantMappingService(db_session)
         
-        result = mapping_service.get_public_grant_map_data(council_id, filters)
+        result = mapping_service.get_public_grant_map_data(council_id, filters, bbox=bbox, zoom=zoom)
         
         if result['success']:
+            # Initial loads count as map views; viewport refreshes do not. Only
+            # councils that have a public map accumulate view counts
+            if bbox is None:
+                _bind_map_snapshots(db_session)
+                if map_snapshot_service.has_locations(council_id):
+                    map_snapshot_service.record_interaction(council_id, 'view')
             return jsonify(result), 200
         else:
             return jsonify(result), 400
@@ -237,6 +296,56 @@ def get_public_grant_map(council_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@community_engagement_bp.route('/mapping/public/<council_id>/snapshot', methods=['GET'])
+def get_public_map_snapshot(council_id):
+    """Pre-rendered GeoJSON of a council's public grant map (supports If-None-Match)"""
+    try:
+        _bind_map_snapshots(get_db_session())
+        
+        response = _snapshot_response(council_id, 'locations.geojson', 'application/geo+json')
+        # Only councils that have a public map accumulate view counts
+        if response.status_code != 404:
+            map_snapshot_service.record_interaction(council_id, 'view')
+        return response
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@community_engagement_bp.route('/mapping/public/<council_id>/clusters/<int:zoom>', methods=['GET'])
+def get_public_map_clusters(council_id, zoom):
+    """Pre-rendered marker clusters for one zoom level (supports If-None-Match)"""
+    try:
+        _bind_map_snapshots(get_db_session())
+        
+        return _snapshot_response(council_id, f'clusters-{zoom}.json', 'application/json')
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def _bind_map_snapshots(db_session):
+    if map_snapshot_service.engine is None:
+        map_snapshot_service.bind(db_session.get_bind())
+
+def _snapshot_response(council_id, name, mimetype):
+    """Serve a snapshot file, answering 304 when the client already has this version"""
+    etag = map_snapshot_service.get_etag(council_id, name)
+    if etag is not None and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        snapshot = map_snapshot_service.get_file(council_id, name)
+        if snapshot is None:
+            # Unknown councils and councils without public locations are not built
+            response = jsonify({'success': False, 'error': 'No public map snapshot for this council and zoom level'})
+            response.status_code = 404
+            return response
+        body, etag = snapshot
+        response = Response(body, mimetype=mimetype)
+    
+    response.set_etag(etag)
+    # Clients keep the file but revalidate every time, so edits show up immediately
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
 @community_engagement_bp.route('/mapping/grants/<grant_id>/details', methods=['GET'])
 def get_grant_project_details(grant_id):
     """Get detailed information about a grant project (public endpoint)"""
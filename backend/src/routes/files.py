@@ -1,45 +1,29 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, send_file, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
-from src.routes.auth import verify_token
-from src.models.user import User
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from src.middleware.auth import require_auth
+from src.models.application import Application
+from src.services.file_storage_service import file_storage_service, FileTooLarge, UploadOffsetMismatch
 import os
-import uuid
+import re
 from datetime import datetime
-import mimetypes
+from functools import lru_cache
 
 files_bp = Blueprint('files', __name__)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+MAX_CHUNKED_UPLOAD_SIZE = int(os.environ.get('MAX_CHUNKED_UPLOAD_SIZE', 1024 * 1024 * 1024))  # 1GB
+# A file id always refers to the same content, so browsers may keep it; private as documents are not public
+DOWNLOAD_MAX_AGE = int(os.environ.get('FILE_DOWNLOAD_MAX_AGE', 24 * 60 * 60))
 ALLOWED_EXTENSIONS = {
     'pdf', 'doc', 'docx', 'txt', 'rtf',  # Documents
     'jpg', 'jpeg', 'png', 'gif', 'bmp',  # Images
     'xls', 'xlsx', 'csv',  # Spreadsheets
     'zip', 'rar'  # Archives
 }
-
-def require_auth(f):
-    """Decorator to require authentication"""
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = verify_token(token)
-        if not user_id:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 401
-        
-        request.current_user = user
-        return f(*args, **kwargs)
-    
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -63,16 +47,88 @@ def get_file_type(filename):
 
 def ensure_upload_directory():
     """Ensure upload directory exists"""
-    upload_path = os.path.join(current_app.root_path, UPLOAD_FOLDER)
-    if not os.path.exists(upload_path):
-        os.makedirs(upload_path)
+    return _upload_directory(current_app.root_path)
+
+@lru_cache(maxsize=None)
+def _upload_directory(root_path):
+    # Created once per app root rather than checked on every request
+    upload_path = os.path.join(root_path, UPLOAD_FOLDER)
+    os.makedirs(upload_path, exist_ok=True)
     return upload_path
 
+def can_manage_file(user, uploaded_by):
+    """Uploaders manage their own files; admins manage any"""
+    return user.id == uploaded_by or user.is_admin
+
+def can_view_application_files(user, uploaded_by=None):
+    """Council staff review every document; applicants see their own uploads"""
+    return user.is_admin or user.is_council_staff or user.id == uploaded_by
+
+def application_access_error(user, application_id):
+    """Error response if user may not attach files to application_id, else None"""
+    if application_id is None:
+        return None
+    if isinstance(application_id, bool) or not isinstance(application_id, int):
+        return jsonify({'error': 'application_id must be an integer'}), 400
+    
+    application = Application.query.get(application_id)
+    if application is None:
+        return jsonify({'error': 'Application not found'}), 404
+    if application.applicant_id != user.id and not (user.is_admin or user.is_council_staff):
+        return jsonify({'error': 'Permission denied'}), 403
+    return None
+
+def send_stored_file(stored):
+    """
+    Send a stored file with a strong ETag (its SHA-256) and Range support
+
+    With X_ACCEL_REDIRECT_PREFIX configured, nginx serves the blob from an
+    internal location mapped onto the storage root, e.g.
+
+        location /protected-uploads/ { internal; alias <uploads root>/; }
+
+    and with USE_X_SENDFILE the front server does the same via X-Sendfile;
+    the worker then only answers conditional requests and sets headers.
+    """
+    blob_path = file_storage_service.blob_path(stored.sha256)
+    accel_prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    
+    if accel_prefix:
+        response = Response(mimetype=stored.mime_type)
+        response.headers['X-Accel-Redirect'] = '/'.join([
+            accel_prefix.rstrip('/'),
+            os.path.relpath(blob_path, file_storage_service.root).replace(os.sep, '/')
+        ])
+        response.headers.set('Content-Disposition', 'attachment', filename=stored.original_name)
+        response.set_etag(stored.sha256)
+        response.last_modified = stored.uploaded_at
+        # 304 for a matching If-None-Match; nginx handles Range itself
+        response = response.make_conditional(request)
+    else:
+        response = send_file(blob_path, mimetype=stored.mime_type, as_attachment=True,
+                             download_name=stored.original_name, etag=stored.sha256,
+                             last_modified=stored.uploaded_at, max_age=DOWNLOAD_MAX_AGE)
+    
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = DOWNLOAD_MAX_AGE
+    return response
+
+def legacy_file_path(filename):
+    """Path of a file saved before uploads were recorded in stored_files, if it exists"""
+    file_path = os.path.join(ensure_upload_directory(), filename)
+    return file_path if os.path.isfile(file_path) else None
+
 @files_bp.route('/files/upload', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 def upload_file():
     """Upload file endpoint"""
     try:
+        # Reject oversized requests up front when the client declares a length;
+        # the limit is enforced again on the bytes actually streamed
+        if request.content_length is not None and request.content_length > MAX_FILE_SIZE:
+            return jsonify({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'}), 400
+        
         # Check if file is in request
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -83,50 +139,141 @@ def upload_file():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        # Check file size
-        if request.content_length > MAX_FILE_SIZE:
-            return jsonify({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'}), 400
-        
         # Check file extension
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not allowed'}), 400
         
-        # Generate secure filename
         original_filename = secure_filename(file.filename)
-        file_extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
-        unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
+        application_id = request.form.get('application_id')
+        if application_id is not None:
+            application_id = int(application_id) if application_id.isdigit() else application_id
+        error = application_access_error(request.current_user, application_id)
+        if error:
+            return error
+        
+        # Streamed to disk in chunks while hashing; identical content is stored once
+        stored = file_storage_service.store_stream(
+            file.stream,
+            original_filename,
+            request.current_user.id,
+            get_file_type(original_filename),
+            application_id=application_id,
+            max_size=MAX_FILE_SIZE
+        )
         
-        # Ensure upload directory exists
-        upload_path = ensure_upload_directory()
+        return jsonify({
+            'message': 'File uploaded successfully',
+            'file': stored.to_dict()
+        }), 201
+    
+    except FileTooLarge:
+        return jsonify({'error': f'File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@files_bp.route('/files/uploads', methods=['POST'])
+@require_auth(active_only=False)
+def create_upload():
+    """Start a resumable chunked upload"""
+    try:
+        data = request.get_json() or {}
+        filename = secure_filename(data.get('filename') or '')
+        total_size = data.get('total_size')
+        
+        if not filename:
+            return jsonify({'error': 'filename is required'}), 400
+        if not allowed_file(filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+        if not isinstance(total_size, int) or total_size <= 0:
+            return jsonify({'error': 'total_size must be a positive integer'}), 400
+        if total_size > MAX_CHUNKED_UPLOAD_SIZE:
+            return jsonify({'error': f'File too large. Maximum size is {MAX_CHUNKED_UPLOAD_SIZE // (1024*1024)}MB'}), 413
         
-        # Save file
-        file_path = os.path.join(upload_path, unique_filename)
-        file.save(file_path)
+        error = application_access_error(request.current_user, data.get('application_id'))
+        if error:
+            return error
         
-        # Get file info
-        file_size = os.path.getsize(file_path)
-        file_type = get_file_type(original_filename)
-        mime_type = mimetypes.guess_type(original_filename)[0] or 'application/octet-stream'
+        upload = file_storage_service.create_upload_session(
+            filename,
+            total_size,
+            request.current_user.id,
+            get_file_type(filename),
+            application_id=data.get('application_id')
+        )
         
-        # Create file record (in a full implementation, you'd save this to database)
-        file_info = {
-            'id': unique_filename,
-            'original_name': original_filename,
-            'filename': unique_filename,
-            'file_path': file_path,
-            'file_size': file_size,
-            'file_type': file_type,
-            'mime_type': mime_type,
-            'uploaded_by': request.current_user.id,
-            'uploaded_at': datetime.utcnow().isoformat(),
-            'url': f'/api/files/{unique_filename}'
-        }
+        return jsonify({'upload': upload.to_dict()}), 201
         
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@files_bp.route('/files/uploads/<upload_id>', methods=['GET'])
+@require_auth(active_only=False)
+def get_upload(upload_id):
+    """Resumable upload progress; clients resume from 'offset'"""
+    try:
+        upload = file_storage_service.get_upload(upload_id)
+        if not upload or upload.uploaded_by != request.current_user.id:
+            return jsonify({'error': 'Upload not found'}), 404
+        
+        return jsonify({'upload': upload.to_dict()}), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@files_bp.route('/files/uploads/<upload_id>', methods=['PUT'])
+@require_auth(active_only=False)
+def upload_chunk(upload_id):
+    """
+    Send the next chunk of a resumable upload as the raw request body
+
+    The chunk's offset comes from a 'Content-Range: bytes start-end/total'
+    header or an ?offset= parameter and must equal the upload's current offset.
+    """
+    try:
+        upload = file_storage_service.get_upload(upload_id)
+        if not upload or upload.uploaded_by != request.current_user.id:
+            return jsonify({'error': 'Upload not found'}), 404
+        
+        content_range = request.headers.get('Content-Range')
+        if content_range:
+            match = CONTENT_RANGE.match(content_range.strip())
+            if not match:
+                return jsonify({'error': 'Invalid Content-Range header'}), 400
+            offset = int(match.group(1))
+        else:
+            offset = request.args.get('offset', type=int)
+            if offset is None:
+                return jsonify({'error': 'Content-Range header or offset is required'}), 400
+        
+        stored = file_storage_service.write_chunk(upload, offset, request.stream)
+        
+        if stored is None:
+            return jsonify({'upload': upload.to_dict()}), 200
         return jsonify({
             'message': 'File uploaded successfully',
-            'file': file_info
+            'file': stored.to_dict()
         }), 201
         
+    except UploadOffsetMismatch as e:
+        return jsonify({'error': 'Chunk does not start at the upload offset', 'offset': e.expected_offset}), 409
+    except FileTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@files_bp.route('/files/uploads/<upload_id>', methods=['DELETE'])
+@require_auth(active_only=False)
+def abort_upload(upload_id):
+    """Abandon a resumable upload"""
+    try:
+        upload = file_storage_service.get_upload(upload_id)
+        if not upload or upload.uploaded_by != request.current_user.id:
+            return jsonify({'error': 'Upload not found'}), 404
+        
+        file_storage_service.abort_upload(upload)
+        
+        return jsonify({'message': 'Upload cancelled'}), 200
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -138,29 +285,32 @@ def download_file(filename):
         if not filename or '..' in filename:
             return jsonify({'error': 'Invalid filename'}), 400
         
-        upload_path = ensure_upload_directory()
-        file_path = os.path.join(upload_path, filename)
+        stored = file_storage_service.get_file(filename)
+        if stored:
+            return send_stored_file(stored)
         
-        # Check if file exists
-        if not os.path.exists(file_path):
+        file_path = legacy_file_path(filename)
+        if not file_path:
             return jsonify({'error': 'File not found'}), 404
         
-        # Get original filename (in a full implementation, this would come from database)
-        # For now, we'll use the stored filename
         return send_file(file_path, as_attachment=True, download_name=filename)
         
+    except RequestedRangeNotSatisfiable as e:
+        return e
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @files_bp.route('/files/<filename>/info', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 def get_file_info(filename):
     """Get file information"""
     try:
-        upload_path = ensure_upload_directory()
-        file_path = os.path.join(upload_path, filename)
+        stored = file_storage_service.get_file(filename)
+        if stored:
+            return jsonify(stored.to_dict()), 200
         
-        if not os.path.exists(file_path):
+        file_path = legacy_file_path(filename)
+        if not file_path:
             return jsonify({'error': 'File not found'}), 404
         
         # Get file stats
@@ -182,7 +332,7 @@ def get_file_info(filename):
         return jsonify({'error': str(e)}), 500
 
 @files_bp.route('/files/<filename>', methods=['DELETE'])
-@require_auth
+@require_auth(active_only=False)
 def delete_file(filename):
     """Delete file endpoint"""
     try:
@@ -190,14 +340,23 @@ def delete_file(filename):
         if not filename or '..' in filename:
             return jsonify({'error': 'Invalid filename'}), 400
         
-        upload_path = ensure_upload_directory()
-        file_path = os.path.join(upload_path, filename)
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
+        stored = file_storage_service.get_file(filename)
+        if stored:
+            if not can_manage_file(request.current_user, stored.uploaded_by):
+                return jsonify({'error': 'Permission denied'}), 403
+            
+            # The blob itself goes once no other upload shares the content
+            file_storage_service.delete_file(stored)
+            return jsonify({'message': 'File deleted successfully'}), 200
+        
+        file_path = legacy_file_path(filename)
+        if not file_path:
             return jsonify({'error': 'File not found'}), 404
         
-        # Delete file
+        # Files from before stored_files have no recorded owner
+        if not request.current_user.is_admin:
+            return jsonify({'error': 'Permission denied'}), 403
+        
         os.remove(file_path)
         
         return jsonify({'message': 'File deleted successfully'}), 200
@@ -206,7 +365,7 @@ def delete_file(filename):
         return jsonify({'error': str(e)}), 500
 
 @files_bp.route('/files/user/<int:user_id>', methods=['GET'])
-@require_auth
+@require_auth(active_only=False)
 def get_user_files(user_id):
     """Get files uploaded by specific user"""
     try:
@@ -214,26 +373,68 @@ def get_user_files(user_id):
         if request.current_user.id != user_id and not request.current_user.is_admin:
             return jsonify({'error': 'Permission denied'}), 403
         
-        upload_path = ensure_upload_directory()
+        limit = min(request.args.get('limit', 100, type=int), 500)
+        files = file_storage_service.files_for_user(
+            user_id,
+            application_id=request.args.get('application_id', type=int),
+            limit=limit
+        )
         
-        # In a full implementation, you'd query the database for files by user
-        # For now, we'll return a placeholder response
-        files = []
+        return jsonify({
+            'files': [stored.to_dict() for stored in files],
+            'count': len(files)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@files_bp.route('/files/application/<int:application_id>', methods=['GET'])
+@require_auth(active_only=False)
+def get_application_files(application_id):
+    """Get the supporting documents uploaded for an application"""
+    try:
+        user = request.current_user
+        
+        uploaded_by = None if can_view_application_files(user) else user.id
+        files = file_storage_service.files_for_application(application_id, uploaded_by=uploaded_by)
         
         return jsonify({
-            'files': files,
+            'files': [stored.to_dict() for stored in files],
             'count': len(files)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@files_bp.route('/files/application/<int:application_id>/archive', methods=['GET'])
+@require_auth(active_only=False)
+def download_application_files(application_id):
+    """Download all of an application's documents as a ZIP built while it is sent"""
+    try:
+        user = request.current_user
+        
+        uploaded_by = None if can_view_application_files(user) else user.id
+        files = file_storage_service.files_for_application(application_id, uploaded_by=uploaded_by)
+        if not files:
+            return jsonify({'error': 'No files for this application'}), 404
+        
+        response = Response(stream_with_context(file_storage_service.iter_zip(files)), mimetype='application/zip')
+        response.headers.set('Content-Disposition', 'attachment',
+                             filename=f'application-{application_id}-documents.zip')
+        response.cache_control.no_store = True
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @files_bp.route('/files/config', methods=['GET'])
 def get_upload_config():
     """Get upload configuration"""
     return jsonify({
         'max_file_size': MAX_FILE_SIZE,
         'max_file_size_mb': MAX_FILE_SIZE // (1024 * 1024),
+        'max_chunked_upload_size': MAX_CHUNKED_UPLOAD_SIZE,
+        'chunk_size': file_storage_service.chunk_size,
         'allowed_extensions': list(ALLOWED_EXTENSIONS),
         'allowed_types': {
             'documents': ['pdf', 'doc', 'docx', 'txt', 'rtf'],
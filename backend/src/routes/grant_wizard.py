@@ -246,7 +246,7 @@ def publish_grant():
         if grant.notification_settings.get('emailCommittee', True):
             email_service = EmailService()
             for reviewer in grant.review_committee:
-                email_service.send_email(
+                email_service.queue_email(
                     to_email=reviewer['email'],
                     subject=f'New Grant Program for Review: {grant.title}',
                     html_content=f'''
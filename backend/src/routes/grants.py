@@ -1,33 +1,37 @@
 from flask import Blueprint, request, jsonify, current_app
-from src.models.user import db, User
+from src.models.user import db
 from src.models.grant import Grant, GrantStatus, GrantCategory
-from src.routes.auth import verify_token
+from src.middleware.auth import require_auth
+from src.services.grant_search_service import grant_search_service
+from src.services.analytics_service import analytics_service
+from src.utils.pagination import wants_cursor, wants_total, keyset_paginate, cursor_pagination_meta
+from src.utils.query_profiles import apply_profile
+from src.utils.counters import BufferedCounter
+from sqlalchemy import update, bindparam
 from datetime import datetime
 import json
+import os
 
 grants_bp = Blueprint('grants', __name__)
 
-def require_auth(f):
-    """Decorator to require authentication"""
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = verify_token(token)
-        if not user_id:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 401
-        
-        request.current_user = user
-        return f(*args, **kwargs)
-    
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+def flush_grant_views(counts):
+    """Apply buffered view increments in one batched UPDATE"""
+    grants_table = Grant.__table__
+    db.session.execute(
+        update(grants_table)
+        .where(grants_table.c.id == bindparam('grant_key'))
+        .values(view_count=db.func.coalesce(grants_table.c.view_count, 0) + bindparam('views')),
+        [{'grant_key': grant_id, 'views': views} for grant_id, views in counts.items()]
+    )
+    db.session.commit()
+
+# Grant detail views are counted in memory and written in batches
+grant_view_counter = BufferedCounter(
+    'grant_views',
+    flush_grant_views,
+    flush_interval=float(os.environ.get('GRANT_VIEW_FLUSH_SECONDS', 10)),
+    flush_threshold=int(os.environ.get('GRANT_VIEW_FLUSH_THRESHOLD', 500))
+)
 
 @grants_bp.route('/grants', methods=['GET'])
 def get_grants():
@@ -61,11 +65,9 @@ def get_grants():
                 pass
         
         if search:
-            query = query.filter(
-                Grant.title.contains(search) |
-                Grant.description.contains(search) |
-                Grant.short_description.contains(search)
-            )
+            # Ranked full-text match (falls back to substring search without an index);
+            # cursor pages are ordered by recency, so search only filters there
+            query = grant_search_service.apply_search(query, search, db.engine, ranked=not wants_cursor())
         
         if min_funding:
             query = query.filter(Grant.funding_amount >= min_funding)
@@ -73,9 +75,23 @@ def get_grants():
         if max_funding:
             query = query.filter(Grant.funding_amount <= max_funding)
         
-        # Order by creation date (newest first)
+        # Order by creation date (newest first), after relevance when searching
         query = query.order_by(Grant.created_at.desc())
         
+        # Keyset pagination when the client opts in with ?cursor=
+        if wants_cursor():
+            try:
+                page_data = keyset_paginate(
+                    query, Grant, request.args.get('cursor'), per_page, include_total=wants_total()
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'grants': [grant.to_dict() for grant in page_data['items']],
+                'pagination': cursor_pagination_meta(page_data, per_page)
+            }), 200
+        
         # Paginate
         grants = query.paginate(
             page=page, 
@@ -102,13 +118,13 @@ def get_grants():
 def get_grant(grant_id):
     """Get specific grant by ID"""
     try:
-        grant = Grant.query.get_or_404(grant_id)
+        grant = apply_profile(Grant.query, Grant, 'detail').filter(Grant.id == grant_id).first_or_404()
         
-        # Increment view count
-        grant.view_count += 1
-        db.session.commit()
+        # Count the view without a write transaction; flushed in batches
+        grant_view_counter.increment(grant.id)
         
         grant_data = grant.to_dict()
+        grant_data['view_count'] = (grant.view_count or 0) + grant_view_counter.pending(grant.id)
         
         # Add creator information
         if grant.created_by:
@@ -117,13 +133,16 @@ def get_grant(grant_id):
                 'organization': grant.created_by.organization_name
             }
         
-        return jsonify(grant_data), 200
+        response = jsonify(grant_data)
+        # Read-only now, so shared caches may serve it briefly
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @grants_bp.route('/grants', methods=['POST'])
-@require_auth
+@require_auth(active_only=False)
 def create_grant():
     """Create new grant (admin only)"""
     try:
@@ -186,7 +205,7 @@ def create_grant():
         return jsonify({'error': str(e)}), 500
 
 @grants_bp.route('/grants/<int:grant_id>', methods=['PUT'])
-@require_auth
+@require_auth(active_only=False)
 def update_grant(grant_id):
     """Update existing grant (admin only)"""
     try:
@@ -250,7 +269,7 @@ def update_grant(grant_id):
         return jsonify({'error': str(e)}), 500
 
 @grants_bp.route('/grants/<int:grant_id>', methods=['DELETE'])
-@require_auth
+@require_auth(active_only=False)
 def delete_grant(grant_id):
     """Delete grant (admin only)"""
     try:
@@ -283,23 +302,14 @@ def get_categories():
 def get_grant_stats():
     """Get grant statistics"""
     try:
-        total_grants = Grant.query.count()
-        open_grants = Grant.query.filter(Grant.status == GrantStatus.OPEN).count()
-        total_funding = db.session.query(db.func.sum(Grant.funding_amount)).scalar() or 0
-        
-        # Category breakdown
-        category_stats = db.session.query(
-            Grant.category, 
-            db.func.count(Grant.id)
-        ).group_by(Grant.category).all()
-        
-        category_breakdown = {cat.value: count for cat, count in category_stats}
+        # Totals and category breakdown come from the daily rollups
+        stats = analytics_service.overall_grant_stats()
         
         return jsonify({
-            'total_grants': total_grants,
-            'open_grants': open_grants,
-            'total_funding': total_funding,
-            'category_breakdown': category_breakdown
+            'total_grants': stats['total_grants'],
+            'open_grants': stats['open_grants'],
+            'total_funding': stats['total_funding'],
+            'category_breakdown': stats['category_breakdown']
         }), 200
         
     except Exception as e:
@@ -0,0 +1,261 @@
+"""
+Analytics Rollup Service for GrantThrive
+Keeps per-council, per-day grant and application rollups in step with the fact tables
+"""
+
+from datetime import datetime
+from typing import Dict, Any
+from sqlalchemy import event, inspect, select, func, Date
+from src.models.grant import Grant
+from src.models.application import Application
+from src.models.analytics_rollup import GrantDailyRollup, ApplicationDailyRollup
+from src.utils.db_helpers import upsert_increment
+
+class AnalyticsRollupService:
+    """Applies incremental deltas to the rollup tables and rebuilds them on demand"""
+    
+    def register(self):
+        """Attach the incremental refresh hooks to the Grant and Application mappers"""
+        if getattr(self, '_registered', False):
+            return
+        event.listen(Grant, 'after_insert', self._grant_inserted)
+        event.listen(Grant, 'after_update', self._grant_updated)
+        event.listen(Grant, 'after_delete', self._grant_deleted)
+        event.listen(Application, 'after_insert', self._application_inserted)
+        event.listen(Application, 'after_update', self._application_updated)
+        event.listen(Application, 'after_delete', self._application_deleted)
+        self._registered = True
+    
+    def rebuild(self, connection) -> Dict[str, Any]:
+        """
+        Recompute both rollup tables from scratch
+
+        Args:
+            connection: Open connection; the caller owns the transaction
+
+        Returns:
+            dict: Number of rollup rows written per table
+        """
+        grants = Grant.__table__
+        applications = Application.__table__
+        grant_council = self._council_column(grants)
+        
+        connection.execute(GrantDailyRollup.__table__.delete())
+        connection.execute(ApplicationDailyRollup.__table__.delete())
+        
+        grant_day = func.date(grants.c.created_at, type_=Date)
+        grant_rows = [
+            {
+                'council_id': council_id,
+                'day': day,
+                'status': self._label(status),
+                'category': self._label(category),
+                'grant_count': count,
+                'funding_total': float(funding or 0)
+            }
+            for council_id, day, status, category, count, funding in connection.execute(
+                select(
+                    grant_council, grant_day, grants.c.status, grants.c.category,
+                    func.count(grants.c.id), func.sum(grants.c.funding_amount)
+                ).group_by(grant_council, grant_day, grants.c.status, grants.c.category)
+            )
+        ]
+        
+        application_day = func.date(applications.c.created_at, type_=Date)
+        application_rows = [
+            {
+                'council_id': council_id,
+                'day': day,
+                'status': self._label(status),
+                'category': self._label(category),
+                'application_count': count,
+                'requested_total': float(requested or 0)
+            }
+            for council_id, day, status, category, count, requested in connection.execute(
+                select(
+                    grant_council, application_day, applications.c.status, grants.c.category,
+                    func.count(applications.c.id), func.sum(applications.c.requested_amount)
+                ).select_from(
+                    applications.join(grants, applications.c.grant_id == grants.c.id)
+                ).group_by(grant_council, application_day, applications.c.status, grants.c.category)
+            )
+        ]
+        
+        if grant_rows:
+            connection.execute(GrantDailyRollup.__table__.insert(), grant_rows)
+        if application_rows:
+            connection.execute(ApplicationDailyRollup.__table__.insert(), application_rows)
+        
+        return {
+            'grant_rollups': len(grant_rows),
+            'application_rollups': len(application_rows)
+        }
+    
+    def ensure_populated(self, connection) -> bool:
+        """
+        Build the rollups on a database that has grants but no rollup rows yet
+
+        The stats endpoints read only the rollups, so a database that
+        predates them would otherwise report zeros until a manual rebuild.
+        Grants and applications live in their own metadata, which
+        db.create_all() does not create, so nothing is done on a database
+        missing any of the four tables.
+
+        Returns:
+            bool: Whether a rebuild was run
+        """
+        inspector = inspect(connection)
+        tables = (Grant.__table__, Application.__table__, GrantDailyRollup.__table__, ApplicationDailyRollup.__table__)
+        if not all(inspector.has_table(table.name) for table in tables):
+            return False
+        
+        has_rollups = connection.execute(
+            select(GrantDailyRollup.__table__.c.council_id).limit(1)
+        ).first() is not None
+        if has_rollups:
+            return False
+        has_grants = connection.execute(select(Grant.__table__.c.id).limit(1)).first() is not None
+        if not has_grants:
+            return False
+        self.rebuild(connection)
+        return True
+    
+    # Grant hooks
+    
+    def _grant_inserted(self, mapper, connection, target):
+        self._apply_grant(connection, self._grant_key(target), 1, target.funding_amount)
+    
+    def _grant_updated(self, mapper, connection, target):
+        state = inspect(target)
+        tracked = ('status', 'category', 'funding_amount', 'organization_id', 'created_at')
+        if not any(state.attrs[name].history.has_changes() for name in tracked if name in state.attrs):
+            return
+        
+        old_key = self._grant_key(target, lambda name: self._previous(state, name))
+        new_key = self._grant_key(target)
+        self._apply_grant(connection, old_key, -1, self._previous(state, 'funding_amount'))
+        self._apply_grant(connection, new_key, 1, target.funding_amount)
+        
+        # Application rollups are keyed by their grant's council and category too
+        if (old_key['council_id'], old_key['category']) != (new_key['council_id'], new_key['category']):
+            self._move_grant_applications(connection, target.id, old_key, new_key)
+    
+    def _grant_deleted(self, mapper, connection, target):
+        state = inspect(target)
+        old_key = self._grant_key(target, lambda name: self._previous(state, name))
+        self._apply_grant(connection, old_key, -1, self._previous(state, 'funding_amount'))
+    
+    # Application hooks
+    
+    def _application_inserted(self, mapper, connection, target):
+        key = self._application_key(connection, target)
+        if key:
+            self._apply_application(connection, key, 1, target.requested_amount)
+    
+    def _application_updated(self, mapper, connection, target):
+        state = inspect(target)
+        tracked = ('status', 'requested_amount', 'grant_id', 'created_at')
+        if not any(state.attrs[name].history.has_changes() for name in tracked):
+            return
+        
+        old_key = self._application_key(connection, target, lambda name: self._previous(state, name))
+        if old_key:
+            self._apply_application(connection, old_key, -1, self._previous(state, 'requested_amount'))
+        new_key = self._application_key(connection, target)
+        if new_key:
+            self._apply_application(connection, new_key, 1, target.requested_amount)
+    
+    def _application_deleted(self, mapper, connection, target):
+        state = inspect(target)
+        old_key = self._application_key(connection, target, lambda name: self._previous(state, name))
+        if old_key:
+            self._apply_application(connection, old_key, -1, self._previous(state, 'requested_amount'))
+    
+    # Helpers
+    
+    def _move_grant_applications(self, connection, grant_id, old_key, new_key):
+        """Move a grant's application counts to its new (council, category) bucket"""
+        applications = Application.__table__
+        application_day = func.date(applications.c.created_at, type_=Date)
+        for day, status, count, requested in connection.execute(
+            select(
+                application_day, applications.c.status,
+                func.count(applications.c.id), func.sum(applications.c.requested_amount)
+            ).where(applications.c.grant_id == grant_id).group_by(application_day, applications.c.status)
+        ):
+            for key, sign in ((old_key, -1), (new_key, 1)):
+                upsert_increment(connection, ApplicationDailyRollup.__table__, {
+                    'council_id': key['council_id'],
+                    'day': day,
+                    'status': self._label(status),
+                    'category': key['category']
+                }, {
+                    'application_count': sign * count,
+                    'requested_total': sign * float(requested or 0)
+                })
+    
+    def _apply_grant(self, connection, key, count, funding):
+        upsert_increment(connection, GrantDailyRollup.__table__, key, {
+            'grant_count': count,
+            'funding_total': count * float(funding or 0)
+        })
+    
+    def _apply_application(self, connection, key, count, requested):
+        upsert_increment(connection, ApplicationDailyRollup.__table__, key, {
+            'application_count': count,
+            'requested_total': count * float(requested or 0)
+        })
+    
+    def _grant_key(self, target, value=None):
+        value = value or (lambda name: getattr(target, name, None))
+        return {
+            'council_id': value('council_id') or value('organization_id'),
+            'day': self._day(value('created_at')),
+            'status': self._label(value('status')),
+            'category': self._label(value('category'))
+        }
+    
+    def _application_key(self, connection, target, value=None):
+        value = value or (lambda name: getattr(target, name, None))
+        grants = Grant.__table__
+        grant = connection.execute(
+            select(self._council_column(grants), grants.c.category).where(grants.c.id == value('grant_id'))
+        ).first()
+        if grant is None:
+            return None
+        return {
+            'council_id': grant[0],
+            'day': self._day(value('created_at')),
+            'status': self._label(value('status')),
+            'category': self._label(grant[1])
+        }
+    
+    @staticmethod
+    def _previous(state, name):
+        """Attribute value as it was before the current flush"""
+        if name not in state.attrs:
+            return None
+        history = state.attrs[name].history
+        if history.deleted:
+            return history.deleted[0]
+        if history.unchanged:
+            return history.unchanged[0]
+        return state.attrs[name].value
+    
+    @staticmethod
+    def _council_column(grants):
+        # Grants are owned by the council organisation account unless a council_id column exists
+        return grants.c.get('council_id', grants.c.organization_id)
+    
+    @staticmethod
+    def _label(value):
+        if value is None:
+            return 'unknown'
+        return value.value if hasattr(value, 'value') else str(value)
+    
+    @staticmethod
+    def _day(value):
+        return (value or datetime.utcnow()).date()
+
+# Global rollup service instance
+analytics_rollup_service = AnalyticsRollupService()
@@ -0,0 +1,406 @@
+"""
+Analytics Aggregation Service for GrantThrive
+Computes dashboard summaries and monthly time series with grouped queries
+"""
+
+import os
+import csv
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Any
+from sqlalchemy import func, case
+from src.models.grant import Grant, GrantStatus
+from src.models.application import Application, ApplicationStatus
+from src.models.analytics_rollup import GrantDailyRollup, ApplicationDailyRollup
+from src.services.job_queue_service import job_queue
+
+PENDING_STATUSES = (ApplicationStatus.SUBMITTED, ApplicationStatus.UNDER_REVIEW)
+
+EXPORT_DIR = os.environ.get(
+    'ANALYTICS_EXPORT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'exports')
+)
+
+class AnalyticsService:
+    """Aggregates grant and application metrics in as few queries as possible"""
+    
+    def month_starts(self, start_date: datetime, end_date: datetime) -> List[datetime]:
+        """First day (midnight) of every month from start_date through end_date"""
+        current = datetime(start_date.year, start_date.month, 1)
+        months = []
+        while current <= end_date:
+            months.append(current)
+            current = self._next_month(current)
+        return months
+    
+    def monthly_trends(self, grants_query, applications_query, start_date: datetime,
+                       end_date: datetime) -> List[Dict[str, Any]]:
+        """
+        Monthly applications, grants, approvals and requested value
+
+        One grouped query per entity instead of four queries per month.
+
+        Returns:
+            list: One entry per month, oldest first
+        """
+        months = self.month_starts(start_date, end_date)
+        if not months:
+            return []
+        range_start = months[0]
+        range_end = self._next_month(months[-1])
+        
+        application_buckets = self._bucket_applications(applications_query, range_start, range_end)
+        grant_buckets = self._bucket_grants(grants_query, range_start, range_end)
+        
+        trends = []
+        for month in months:
+            key = (month.year, month.month)
+            applications = application_buckets.get(key, {})
+            trends.append({
+                'month': month.strftime('%b %Y'),
+                'applications': applications.get('applications', 0),
+                'grants': grant_buckets.get(key, 0),
+                'approved': applications.get('approved', 0),
+                'value': float(applications.get('value', 0))
+            })
+        return trends
+    
+    def application_summary(self, applications_query, now: datetime = None) -> Dict[str, Any]:
+        """Counts and amounts for an application query in a single aggregate query"""
+        now = now or datetime.utcnow()
+        one_month_ago = now - timedelta(days=30)
+        two_months_ago = now - timedelta(days=60)
+        approved = Application.status == ApplicationStatus.APPROVED
+        
+        row = applications_query.order_by(None).with_entities(
+            func.count(Application.id),
+            self._count_if(approved),
+            self._count_if(Application.status == ApplicationStatus.REJECTED),
+            self._count_if(Application.status.in_(PENDING_STATUSES)),
+            func.sum(Application.requested_amount),
+            func.sum(case((approved, Application.requested_amount), else_=0)),
+            self._count_if(Application.created_at >= one_month_ago),
+            self._count_if((Application.created_at >= two_months_ago) & (Application.created_at < one_month_ago))
+        ).one()
+        
+        return {
+            'total': row[0] or 0,
+            'approved': int(row[1] or 0),
+            'rejected': int(row[2] or 0),
+            'pending': int(row[3] or 0),
+            'total_requested': float(row[4] or 0),
+            'total_approved_amount': float(row[5] or 0),
+            'last_30_days': int(row[6] or 0),
+            'previous_30_days': int(row[7] or 0)
+        }
+    
+    def grant_summary(self, grants_query, now: datetime = None) -> Dict[str, Any]:
+        """Counts and funding totals for a grant query in a single aggregate query"""
+        now = now or datetime.utcnow()
+        
+        row = grants_query.order_by(None).with_entities(
+            func.count(Grant.id),
+            func.sum(Grant.funding_amount),
+            self._count_if(Grant.status == GrantStatus.OPEN),
+            self._count_if(Grant.created_at >= now - timedelta(days=30))
+        ).one()
+        
+        return {
+            'total': row[0] or 0,
+            'total_value': float(row[1] or 0),
+            'open': int(row[2] or 0),
+            'last_30_days': int(row[3] or 0)
+        }
+    
+    # Council-wide metrics read from the daily rollup tables
+    
+    def council_grant_summary(self, council_id, now: datetime = None) -> Dict[str, Any]:
+        """Same shape as grant_summary, aggregated from the council's grant rollups"""
+        cutoff = (now or datetime.utcnow()).date() - timedelta(days=30)
+        count = GrantDailyRollup.grant_count
+        
+        row = GrantDailyRollup.query.filter_by(council_id=council_id).with_entities(
+            func.sum(count),
+            func.sum(GrantDailyRollup.funding_total),
+            self._sum_if(GrantDailyRollup.status == GrantStatus.OPEN.value, count),
+            self._sum_if(GrantDailyRollup.day >= cutoff, count)
+        ).one()
+        
+        return {
+            'total': int(row[0] or 0),
+            'total_value': float(row[1] or 0),
+            'open': int(row[2] or 0),
+            'last_30_days': int(row[3] or 0)
+        }
+    
+    def council_application_summary(self, council_id, now: datetime = None) -> Dict[str, Any]:
+        """Same shape as application_summary, aggregated from the council's application rollups"""
+        today = (now or datetime.utcnow()).date()
+        one_month_ago = today - timedelta(days=30)
+        two_months_ago = today - timedelta(days=60)
+        count = ApplicationDailyRollup.application_count
+        requested = ApplicationDailyRollup.requested_total
+        status = ApplicationDailyRollup.status
+        day = ApplicationDailyRollup.day
+        
+        row = ApplicationDailyRollup.query.filter_by(council_id=council_id).with_entities(
+            func.sum(count),
+            self._sum_if(status == ApplicationStatus.APPROVED.value, count),
+            self._sum_if(status == ApplicationStatus.REJECTED.value, count),
+            self._sum_if(status.in_([s.value for s in PENDING_STATUSES]), count),
+            func.sum(requested),
+            self._sum_if(status == ApplicationStatus.APPROVED.value, requested),
+            self._sum_if(day >= one_month_ago, count),
+            self._sum_if((day >= two_months_ago) & (day < one_month_ago), count)
+        ).one()
+        
+        return {
+            'total': int(row[0] or 0),
+            'approved': int(row[1] or 0),
+            'rejected': int(row[2] or 0),
+            'pending': int(row[3] or 0),
+            'total_requested': float(row[4] or 0),
+            'total_approved_amount': float(row[5] or 0),
+            'last_30_days': int(row[6] or 0),
+            'previous_30_days': int(row[7] or 0)
+        }
+    
+    def council_category_distribution(self, council_id=None):
+        """(category, grant count, funding total) rows, all councils when council_id is None"""
+        query = GrantDailyRollup.query
+        if council_id is not None:
+            query = query.filter_by(council_id=council_id)
+        return query.with_entities(
+            GrantDailyRollup.category,
+            func.sum(GrantDailyRollup.grant_count),
+            func.sum(GrantDailyRollup.funding_total)
+        ).group_by(GrantDailyRollup.category).having(func.sum(GrantDailyRollup.grant_count) > 0).all()
+    
+    def council_status_distribution(self, council_id):
+        """(status, application count, requested total) rows for a council"""
+        return ApplicationDailyRollup.query.filter_by(council_id=council_id).with_entities(
+            ApplicationDailyRollup.status,
+            func.sum(ApplicationDailyRollup.application_count),
+            func.sum(ApplicationDailyRollup.requested_total)
+        ).group_by(ApplicationDailyRollup.status).having(
+            func.sum(ApplicationDailyRollup.application_count) > 0
+        ).all()
+    
+    def council_top_categories(self, council_id, limit: int = 5):
+        """(category, approved count, approved amount) rows, most approvals first"""
+        approved_count = func.sum(ApplicationDailyRollup.application_count)
+        return ApplicationDailyRollup.query.filter_by(
+            council_id=council_id,
+            status=ApplicationStatus.APPROVED.value
+        ).with_entities(
+            ApplicationDailyRollup.category,
+            approved_count,
+            func.sum(ApplicationDailyRollup.requested_total)
+        ).group_by(ApplicationDailyRollup.category).having(
+            approved_count > 0
+        ).order_by(approved_count.desc()).limit(limit).all()
+    
+    def council_monthly_trends(self, council_id, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """Same shape as monthly_trends, bucketed from the council's daily rollups"""
+        months = self.month_starts(start_date, end_date)
+        if not months:
+            return []
+        range_start = months[0].date()
+        range_end = self._next_month(months[-1]).date()
+        
+        application_rows = ApplicationDailyRollup.query.filter(
+            ApplicationDailyRollup.council_id == council_id,
+            ApplicationDailyRollup.day >= range_start,
+            ApplicationDailyRollup.day < range_end
+        ).with_entities(
+            ApplicationDailyRollup.day,
+            ApplicationDailyRollup.status,
+            ApplicationDailyRollup.application_count,
+            ApplicationDailyRollup.requested_total
+        )
+        grant_rows = GrantDailyRollup.query.filter(
+            GrantDailyRollup.council_id == council_id,
+            GrantDailyRollup.day >= range_start,
+            GrantDailyRollup.day < range_end
+        ).with_entities(GrantDailyRollup.day, GrantDailyRollup.grant_count)
+        
+        buckets = {(month.year, month.month): {'applications': 0, 'grants': 0, 'approved': 0, 'value': 0}
+                   for month in months}
+        for day, status, count, requested in application_rows:
+            bucket = buckets[(day.year, day.month)]
+            bucket['applications'] += count
+            bucket['value'] += requested or 0
+            if status == ApplicationStatus.APPROVED.value:
+                bucket['approved'] += count
+        for day, count in grant_rows:
+            buckets[(day.year, day.month)]['grants'] += count
+        
+        return [
+            {
+                'month': month.strftime('%b %Y'),
+                'applications': buckets[(month.year, month.month)]['applications'],
+                'grants': buckets[(month.year, month.month)]['grants'],
+                'approved': buckets[(month.year, month.month)]['approved'],
+                'value': float(buckets[(month.year, month.month)]['value'])
+            }
+            for month in months
+        ]
+    
+    def build_export(self, user_id, role: str, council_id, months: int = 12) -> Dict[str, Any]:
+        """Summary, monthly trends and category distribution for an analytics export"""
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=months * 30)
+        
+        if role in ['council_admin', 'council_staff']:
+            grant_stats = self.council_grant_summary(council_id)
+            application_stats = self.council_application_summary(council_id)
+            trends = self.council_monthly_trends(council_id, start_date, end_date)
+            categories = self.council_category_distribution(council_id)
+        else:
+            grants_query = Grant.query.filter_by(status='open')
+            applications_query = Application.query.filter_by(user_id=user_id)
+            grant_stats = self.grant_summary(grants_query)
+            application_stats = self.application_summary(applications_query)
+            trends = self.monthly_trends(grants_query, applications_query, start_date, end_date)
+            categories = grants_query.with_entities(
+                Grant.category, func.count(Grant.id), func.sum(Grant.amount)
+            ).group_by(Grant.category).all()
+        
+        return {
+            'generated_at': end_date.isoformat(),
+            'months': months,
+            'grants': grant_stats,
+            'applications': application_stats,
+            'trends': trends,
+            'categories': [
+                {'category': category or 'Other', 'grants': int(count or 0), 'total_value': float(total or 0)}
+                for category, count, total in categories
+            ]
+        }
+    
+    def overall_grant_stats(self) -> Dict[str, Any]:
+        """Platform-wide grant totals and category breakdown from the rollups"""
+        count = GrantDailyRollup.grant_count
+        row = GrantDailyRollup.query.with_entities(
+            func.sum(count),
+            self._sum_if(GrantDailyRollup.status == GrantStatus.OPEN.value, count),
+            func.sum(GrantDailyRollup.funding_total)
+        ).one()
+        
+        return {
+            'total_grants': int(row[0] or 0),
+            'open_grants': int(row[1] or 0),
+            'total_funding': float(row[2] or 0),
+            'category_breakdown': {
+                category: int(total or 0)
+                for category, total, _ in self.council_category_distribution()
+            }
+        }
+    
+    def _bucket_applications(self, applications_query, range_start, range_end) -> Dict[tuple, Dict[str, Any]]:
+        query = applications_query.order_by(None).filter(
+            Application.created_at >= range_start,
+            Application.created_at < range_end
+        )
+        approved = Application.status == ApplicationStatus.APPROVED
+        buckets = {}
+        
+        if self._supports_date_trunc(query):
+            month = func.date_trunc('month', Application.created_at)
+            rows = query.with_entities(
+                month,
+                func.count(Application.id),
+                self._count_if(approved),
+                func.sum(Application.requested_amount)
+            ).group_by(month)
+            for month_start, count, approved_count, value in rows:
+                buckets[(month_start.year, month_start.month)] = {
+                    'applications': count,
+                    'approved': int(approved_count or 0),
+                    'value': value or 0
+                }
+            return buckets
+        
+        # SQLite has no date_trunc - stream the narrow rows and bucket them here
+        rows = query.with_entities(
+            Application.created_at,
+            Application.status,
+            Application.requested_amount
+        ).yield_per(1000)
+        for created_at, status, requested_amount in rows:
+            bucket = buckets.setdefault(
+                (created_at.year, created_at.month),
+                {'applications': 0, 'approved': 0, 'value': 0}
+            )
+            bucket['applications'] += 1
+            if status == ApplicationStatus.APPROVED:
+                bucket['approved'] += 1
+            bucket['value'] += requested_amount or 0
+        return buckets
+    
+    def _bucket_grants(self, grants_query, range_start, range_end) -> Dict[tuple, int]:
+        query = grants_query.order_by(None).filter(
+            Grant.created_at >= range_start,
+            Grant.created_at < range_end
+        )
+        
+        if self._supports_date_trunc(query):
+            month = func.date_trunc('month', Grant.created_at)
+            rows = query.with_entities(month, func.count(Grant.id)).group_by(month)
+            return {(month_start.year, month_start.month): count for month_start, count in rows}
+        
+        buckets = {}
+        for (created_at,) in query.with_entities(Grant.created_at).yield_per(1000):
+            key = (created_at.year, created_at.month)
+            buckets[key] = buckets.get(key, 0) + 1
+        return buckets
+    
+    @staticmethod
+    def _count_if(condition):
+        return func.sum(case((condition, 1), else_=0))
+    
+    @staticmethod
+    def _sum_if(condition, column):
+        return func.sum(case((condition, column), else_=0))
+    
+    @staticmethod
+    def _supports_date_trunc(query) -> bool:
+        return query.session.get_bind().dialect.name == 'postgresql'
+    
+    @staticmethod
+    def _next_month(month_start: datetime) -> datetime:
+        if month_start.month == 12:
+            return month_start.replace(year=month_start.year + 1, month=1)
+        return month_start.replace(month=month_start.month + 1)
+
+# Global analytics service instance
+analytics_service = AnalyticsService()
+
+@job_queue.task('analytics.export', queue='exports', max_attempts=3)
+def run_analytics_export(payload):
+    """Build an export requested through /api/analytics/export and write it to EXPORT_DIR"""
+    export = analytics_service.build_export(
+        payload['user_id'], payload['role'], payload['council_id'], payload.get('months', 12)
+    )
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"analytics-{payload['user_id']}-{payload['requested_at']}.{payload['export_type']}")
+    
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', newline='') as f:
+        if payload['export_type'] == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(['section', 'metric', 'value'])
+            for section in ('grants', 'applications'):
+                for name, value in export[section].items():
+                    writer.writerow([section, name, value])
+            for category in export['categories']:
+                writer.writerow(['categories', category['category'], category['grants']])
+            writer.writerow([])
+            writer.writerow(['month', 'applications', 'grants', 'approved', 'value'])
+            for month in export['trends']:
+                writer.writerow([month['month'], month['applications'], month['grants'], month['approved'], month['value']])
+        else:
+            json.dump(export, f)
+    os.replace(temp_path, path)
+    
+    return {'path': path, 'bytes': os.path.getsize(path)}
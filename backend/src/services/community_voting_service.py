@@ -4,11 +4,11 @@ Handles all community voting functionality and campaign management
 """
 
 import hashlib
-import json
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import and_, or_
+from .voting_analytics_service import voting_analytics_service
 
 class CommunityVotingService:
     """Service for managing community voting campaigns and votes"""
@@ -102,8 +102,7 @@ class CommunityVotingService:
                 return {'success': False, 'error': 'Voting period is not active'}
             
             # Create voter hash for duplicate prevention
-            voter_identifier = f"{voter_data.get('email', '')}{voter_data.get('phone', '')}{voter_data.get('address', '')}"
-            voter_hash = hashlib.sha256(voter_identifier.encode()).hexdigest()
+            voter_hash = self.hash_voter(voter_data)
             
             # Check if user has already voted (if not anonymous)
             if not campaign.allow_anonymous_voting:
@@ -118,7 +117,7 @@ class CommunityVotingService:
                     return {'success': False, 'error': 'Maximum votes per user exceeded'}
             
             # Create IP hash for fraud prevention
-            ip_hash = hashlib.sha256(voter_data.get('ip_address', '').encode()).hexdigest()
+            ip_hash = self.hash_ip(voter_data)
             
             # Submit vote
             vote = CommunityVote(
@@ -133,11 +132,18 @@ class CommunityVotingService:
             )
             
             self.db.add(vote)
+            self.db.flush()
+            
+            # Update analytics in the same transaction as the vote
+            voting_analytics_service.apply_votes(self.db.connection(), [{
+                'campaign_id': campaign_id,
+                'option_id': option_id,
+                'voter_hash': voter_hash,
+                'voter_postcode': vote.voter_postcode,
+                'voter_age_group': vote.voter_age_group
+            }])
             self.db.commit()
             
-            # Update analytics
-            self._update_voting_analytics(campaign_id)
-            
             return {
                 'success': True,
                 'message': 'Vote submitted successfully',
@@ -154,36 +160,32 @@ class CommunityVotingService:
     def get_campaign_results(self, campaign_id: int, include_demographics: bool = False) -> Dict[str, Any]:
         """Get voting results for a campaign"""
         try:
-            from ..models.community_voting import VotingCampaign, VotingOption, CommunityVote
+            from ..models.community_voting import VotingCampaign, VotingOption
             
             campaign = self.db.query(VotingCampaign).filter(VotingCampaign.id == campaign_id).first()
             if not campaign:
                 return {'success': False, 'error': 'Campaign not found'}
             
-            # Get vote counts by option
-            vote_counts = self.db.query(
-                VotingOption.id,
-                VotingOption.title,
-                func.count(CommunityVote.id).label('vote_count')
-            ).join(
-                CommunityVote, VotingOption.id == CommunityVote.option_id
-            ).filter(
+            # Vote counts by option come from the running tallies
+            summary = voting_analytics_service.get_summary(self.db.connection(), campaign_id)
+            options = self.db.query(VotingOption.id, VotingOption.title).filter(
                 VotingOption.campaign_id == campaign_id
-            ).group_by(
-                VotingOption.id, VotingOption.title
             ).all()
             
             # Calculate total votes
-            total_votes = sum(count.vote_count for count in vote_counts)
+            total_votes = summary['total_votes']
             
             # Format results
             results = []
-            for count in vote_counts:
-                percentage = (count.vote_count / total_votes * 100) if total_votes > 0 else 0
+            for option in options:
+                vote_count = summary['option_votes'].get(option.id, 0)
+                if not vote_count:
+                    continue
+                percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0
                 results.append({
-                    'option_id': count.id,
-                    'title': count.title,
-                    'vote_count': count.vote_count,
+                    'option_id': option.id,
+                    'title': option.title,
+                    'vote_count': vote_count,
                     'percentage': round(percentage, 2)
                 })
             
@@ -199,7 +201,10 @@ class CommunityVotingService:
             
             # Add demographic breakdown if requested
             if include_demographics:
-                response['demographics'] = self._get_demographic_breakdown(campaign_id)
+                response['demographics'] = {
+                    'postcode_distribution': summary['postcode_distribution'],
+                    'age_group_distribution': summary['age_group_distribution']
+                }
             
             return response
             
@@ -267,72 +272,16 @@ class CommunityVotingService:
                 'error': f'Failed to add comment: {str(e)}'
             }
     
-    def _update_voting_analytics(self, campaign_id: int):
-        """Update voting analytics for a campaign"""
-        try:
-            from ..models.community_voting import VotingAnalytics, CommunityVote
-            
-            # Get or create analytics record
-            analytics = self.db.query(VotingAnalytics).filter(
-                VotingAnalytics.campaign_id == campaign_id
-            ).first()
-            
-            if not analytics:
-                from ..models.community_voting import VotingAnalytics
-                analytics = VotingAnalytics(campaign_id=campaign_id)
-                self.db.add(analytics)
-            
-            # Calculate metrics
-            votes = self.db.query(CommunityVote).filter(
-                CommunityVote.campaign_id == campaign_id
-            ).all()
-            
-            analytics.total_votes = len(votes)
-            analytics.unique_voters = len(set(vote.voter_hash for vote in votes))
-            
-            # Update postcode distribution
-            postcode_counts = {}
-            for vote in votes:
-                if vote.voter_postcode:
-                    postcode_counts[vote.voter_postcode] = postcode_counts.get(vote.voter_postcode, 0) + 1
-            analytics.postcode_distribution = json.dumps(postcode_counts)
-            
-            # Update age group distribution
-            age_counts = {}
-            for vote in votes:
-                if vote.voter_age_group:
-                    age_counts[vote.voter_age_group] = age_counts.get(vote.voter_age_group, 0) + 1
-            analytics.age_group_distribution = json.dumps(age_counts)
-            
-            self.db.commit()
-            
-        except Exception as e:
-            print(f"Error updating voting analytics: {str(e)}")
+    @staticmethod
+    def hash_voter(voter_data: Dict[str, Any]) -> str:
+        """Anonymised voter identifier used for duplicate prevention"""
+        voter_identifier = f"{voter_data.get('email', '')}{voter_data.get('phone', '')}{voter_data.get('address', '')}"
+        return hashlib.sha256(voter_identifier.encode()).hexdigest()
     
-    def _get_demographic_breakdown(self, campaign_id: int) -> Dict[str, Any]:
-        """Get demographic breakdown for campaign results"""
-        from ..models.community_voting import CommunityVote
-        
-        votes = self.db.query(CommunityVote).filter(
-            CommunityVote.campaign_id == campaign_id
-        ).all()
-        
-        # Postcode breakdown
-        postcode_counts = {}
-        for vote in votes:
-            if vote.voter_postcode:
-                postcode_counts[vote.voter_postcode] = postcode_counts.get(vote.voter_postcode, 0) + 1
-        
-        # Age group breakdown
-        age_counts = {}
-        for vote in votes:
-            if vote.voter_age_group:
-                age_counts[vote.voter_age_group] = age_counts.get(vote.voter_age_group, 0) + 1
-        
-        return {
-            'postcode_distribution': postcode_counts,
-            'age_group_distribution': age_counts
-        }
+    @staticmethod
+    def hash_ip(voter_data: Dict[str, Any]) -> str:
+        """Hashed client IP kept for fraud analysis"""
+        return hashlib.sha256((voter_data.get('ip_address') or '').encode()).hexdigest()
     
     def _serialize_campaign(self, campaign) -> Dict[str, Any]:
         """Serialize campaign object for API response"""
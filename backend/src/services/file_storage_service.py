@@ -0,0 +1,324 @@
+"""
+File Storage Service for GrantThrive
+Streamed uploads into a content-addressed, deduplicating blob store, with
+resumable chunked uploads and per-file metadata
+"""
+
+import os
+import uuid
+import hashlib
+import zipfile
+import mimetypes
+from datetime import datetime, timedelta
+from typing import Optional, List, BinaryIO, Iterator
+from sqlalchemy import update
+from src.models.user import db
+from src.models.stored_file import StoredFile, UploadSession
+
+class FileTooLarge(Exception):
+    """The upload is bigger than the limit (or than the size declared for it)"""
+
+class UploadOffsetMismatch(Exception):
+    """A chunk did not start where the upload left off"""
+    
+    def __init__(self, expected_offset: int):
+        super().__init__(f'Upload is at offset {expected_offset}')
+        self.expected_offset = expected_offset
+
+class _ZipChunkBuffer:
+    """
+    Write-only file object that zipfile writes an archive into
+
+    It has no seek()/tell(), so zipfile streams entries with data
+    descriptors instead of going back to patch headers; the bytes written
+    so far are taken out with drain() and sent to the client.
+    """
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class FileStorageService:
+    """
+    Stores uploaded files by the SHA-256 of their content
+
+    Uploads are copied to a temporary file in fixed-size chunks while
+    being hashed, so neither the request body nor the file is ever held in
+    memory and the size limit is enforced on the bytes actually received.
+    The temporary file is then renamed to blobs/ab/cd/<sha256>: the same
+    supporting document uploaded by many applicants is stored once, and a
+    StoredFile row per upload records who uploaded it and for which
+    application. A blob is removed when its last StoredFile is deleted.
+
+    Resumable uploads write each chunk at its offset in a part file and
+    advance UploadSession.received_bytes with a conditional UPDATE, so a
+    client can resume from the stored offset after a dropped connection.
+    The completed part file is hashed and stored like any other upload.
+    """
+    
+    def __init__(self, chunk_size: int = 1024 * 1024, session_ttl_hours: int = 24):
+        self.chunk_size = chunk_size
+        self.session_ttl_hours = session_ttl_hours
+        self.root = None
+    
+    def init_app(self, app, root: Optional[str] = None):
+        """Keep blobs, part files and temporary files under root (default <app root>/uploads)"""
+        self.root = root or os.path.join(app.root_path, 'uploads')
+        for directory in ('blobs', 'parts', 'tmp'):
+            os.makedirs(os.path.join(self.root, directory), exist_ok=True)
+    
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256[2:4], sha256)
+    
+    def store_stream(self, stream: BinaryIO, original_name: str, uploaded_by: int, file_type: str,
+                     application_id: Optional[int] = None, max_size: Optional[int] = None) -> StoredFile:
+        """
+        Store an upload read from a file-like object
+
+        Raises:
+            FileTooLarge: More than max_size bytes were sent
+        """
+        temp_path = os.path.join(self.root, 'tmp', uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise FileTooLarge(f'File exceeds {max_size} bytes')
+                    digest.update(chunk)
+                    f.write(chunk)
+            return self._commit(temp_path, digest.hexdigest(), size, original_name, uploaded_by,
+                                file_type, application_id)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def create_upload_session(self, original_name: str, total_size: int, uploaded_by: int, file_type: str,
+                              application_id: Optional[int] = None) -> UploadSession:
+        """Start a resumable upload of total_size bytes"""
+        upload = UploadSession(
+            id=uuid.uuid4().hex,
+            original_name=original_name,
+            file_type=file_type,
+            total_size=total_size,
+            received_bytes=0,
+            uploaded_by=uploaded_by,
+            application_id=application_id
+        )
+        db.session.add(upload)
+        db.session.commit()
+        open(self._part_path(upload.id), 'wb').close()
+        return upload
+    
+    def write_chunk(self, upload: UploadSession, offset: int, stream: BinaryIO) -> Optional[StoredFile]:
+        """
+        Append the next chunk of a resumable upload
+
+        Returns:
+            StoredFile: The stored file once the last byte has arrived, else None
+
+        Raises:
+            UploadOffsetMismatch: offset is not where the upload left off
+            FileTooLarge: The chunk runs past the declared total size
+        """
+        if offset != upload.received_bytes:
+            raise UploadOffsetMismatch(upload.received_bytes)
+        
+        written = 0
+        with open(self._part_path(upload.id), 'r+b') as f:
+            f.seek(offset)
+            while True:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                if offset + written + len(chunk) > upload.total_size:
+                    raise FileTooLarge(f'Upload exceeds its declared size of {upload.total_size} bytes')
+                f.write(chunk)
+                written += len(chunk)
+        
+        # Only one writer of a given range may advance the offset
+        result = db.session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == upload.id, UploadSession.received_bytes == offset)
+            .values(received_bytes=offset + written, updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        db.session.refresh(upload)
+        if result.rowcount == 0:
+            raise UploadOffsetMismatch(upload.received_bytes)
+        
+        if upload.received_bytes < upload.total_size:
+            return None
+        return self._complete(upload)
+    
+    def abort_upload(self, upload: UploadSession):
+        """Discard a resumable upload and its part file"""
+        part_path = self._part_path(upload.id)
+        db.session.delete(upload)
+        db.session.commit()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    
+    def cleanup_expired_sessions(self, ttl_hours: Optional[int] = None) -> int:
+        """
+        Abort resumable uploads with no chunk for ttl_hours
+
+        Returns:
+            int: Sessions removed
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=ttl_hours if ttl_hours is not None else self.session_ttl_hours)
+        expired = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+        for upload in expired:
+            self.abort_upload(upload)
+        return len(expired)
+    
+    def get_file(self, file_id: str) -> Optional[StoredFile]:
+        return db.session.get(StoredFile, file_id)
+    
+    def get_upload(self, upload_id: str) -> Optional[UploadSession]:
+        return db.session.get(UploadSession, upload_id)
+    
+    def files_for_user(self, user_id: int, application_id: Optional[int] = None, limit: int = 100,
+                       before: Optional[datetime] = None) -> List[StoredFile]:
+        """A user's uploads, newest first (ix_stored_files_uploader_uploaded)"""
+        query = StoredFile.query.filter(StoredFile.uploaded_by == user_id)
+        if application_id is not None:
+            query = query.filter(StoredFile.application_id == application_id)
+        if before is not None:
+            query = query.filter(StoredFile.uploaded_at < before)
+        return query.order_by(StoredFile.uploaded_at.desc()).limit(limit).all()
+    
+    def files_for_application(self, application_id: int, uploaded_by: Optional[int] = None) -> List[StoredFile]:
+        """An application's documents, newest first (ix_stored_files_application_uploaded)"""
+        query = StoredFile.query.filter(StoredFile.application_id == application_id)
+        if uploaded_by is not None:
+            query = query.filter(StoredFile.uploaded_by == uploaded_by)
+        return query.order_by(StoredFile.uploaded_at.desc()).all()
+    
+    def delete_file(self, record: StoredFile):
+        """Delete a file's record, and its blob if no other upload shares the content"""
+        sha256 = record.sha256
+        db.session.delete(record)
+        db.session.commit()
+        
+        if StoredFile.query.filter(StoredFile.sha256 == sha256).first() is None:
+            blob_path = self.blob_path(sha256)
+            if os.path.exists(blob_path):
+                os.remove(blob_path)
+    
+    # Already compressed formats gain nothing from deflate
+    STORED_EXTENSIONS = {'pdf', 'docx', 'xlsx', 'jpg', 'jpeg', 'png', 'gif', 'zip', 'rar'}
+    
+    def iter_zip(self, files: List[StoredFile]) -> Iterator[bytes]:
+        """
+        Stream a ZIP archive of files as it is built
+
+        Each blob is read in chunk_size pieces and the compressed bytes are
+        yielded as soon as zipfile produces them, so the archive is never
+        held in memory or written to a temporary file. Entries are named by
+        original file name, with a counter added to repeated names; files
+        whose blob is missing are left out.
+        """
+        buffer = _ZipChunkBuffer()
+        names = set()
+        with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+            for record in files:
+                blob_path = self.blob_path(record.sha256)
+                if not os.path.exists(blob_path):
+                    continue
+                
+                name = record.original_name
+                stem, extension = os.path.splitext(name)
+                counter = 1
+                while name in names:
+                    counter += 1
+                    name = f"{stem} ({counter}){extension}"
+                names.add(name)
+                
+                info = zipfile.ZipInfo(name, date_time=(record.uploaded_at or datetime.utcnow()).timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED if extension[1:].lower() in self.STORED_EXTENSIONS \
+                    else zipfile.ZIP_DEFLATED
+                # Known up front so zipfile switches to ZIP64 for files over 2GB
+                info.file_size = record.file_size
+                
+                with open(blob_path, 'rb') as source, archive.open(info, 'w') as entry:
+                    while True:
+                        chunk = source.read(self.chunk_size)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+                yield buffer.drain()
+        # Central directory
+        yield buffer.drain()
+    
+    def _complete(self, upload: UploadSession) -> StoredFile:
+        part_path = self._part_path(upload.id)
+        digest = hashlib.sha256()
+        with open(part_path, 'r+b') as f:
+            # A retried chunk may have left bytes past the declared end
+            f.truncate(upload.total_size)
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        
+        db.session.delete(upload)
+        try:
+            return self._commit(part_path, digest.hexdigest(), upload.total_size, upload.original_name,
+                                upload.uploaded_by, upload.file_type, upload.application_id)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+    
+    def _commit(self, temp_path: str, sha256: str, size: int, original_name: str, uploaded_by: int,
+                file_type: str, application_id: Optional[int]) -> StoredFile:
+        extension = original_name.rsplit('.', 1)[1].lower() if '.' in original_name else ''
+        record = StoredFile(
+            id=f"{uuid.uuid4().hex}.{extension}" if extension else uuid.uuid4().hex,
+            sha256=sha256,
+            original_name=original_name,
+            file_size=size,
+            file_type=file_type,
+            mime_type=mimetypes.guess_type(original_name)[0] or 'application/octet-stream',
+            uploaded_by=uploaded_by,
+            application_id=application_id
+        )
+        db.session.add(record)
+        db.session.commit()
+        
+        # The row is committed first so a concurrent delete of the same content
+        # sees this reference; replacing an existing blob is harmless because
+        # the content is identical
+        blob_path = self.blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(temp_path, blob_path)
+        return record
+    
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, 'parts', upload_id)
+
+# Global file storage service instance
+file_storage_service = FileStorageService(
+    chunk_size=int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024)),
+    session_ttl_hours=int(os.environ.get('UPLOAD_SESSION_TTL_HOURS', 24))
+)
@@ -8,11 +8,16 @@ import requests
 from datetime import datetime
 from typing import List, Dict, Optional, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, select, cast, case, Integer
 
 class GrantMappingService:
     """Service for managing grant locations and public mapping"""
     
+    # Public map feed: zoom levels up to this return clusters instead of markers
+    CLUSTER_MAX_ZOOM = 13
+    # Grid cells per 256px tile edge when clustering (64px cells)
+    CLUSTER_CELLS_PER_TILE = 4
+    
     def __init__(self, db_session: Session):
         self.db = db_session
         self.geocoding_api_key = None  # Set from environment variables
@@ -22,6 +27,13 @@ class GrantMappingService:
         try:
             from ..models.grant_mapping import GrantLocation
             
+            # Public maps are per council, so a location without one would never be shown
+            if not location_data.get('council_id'):
+                return {
+                    'success': False,
+                    'error': 'council_id is required'
+                }
+            
             # Geocode the address if coordinates not provided
             if not location_data.get('latitude') or not location_data.get('longitude'):
                 geocoding_result = self._geocode_address(location_data['address'])
@@ -36,6 +48,7 @@ class GrantMappingService:
             location = GrantLocation(
                 grant_id=grant_id,
                 application_id=location_data.get('application_id'),
+                council_id=location_data.get('council_id'),
                 address=location_data['address'],
                 suburb=location_data.get('suburb'),
                 postcode=location_data.get('postcode'),
@@ -117,73 +130,41 @@ class GrantMappingService:
                 'error': f'Failed to add project update: {str(e)}'
             }
     
-    def get_public_grant_map_data(self, council_id: str, filters: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Get grant map data for public display"""
+    def get_public_grant_map_data(self, council_id: str, filters: Dict[str, Any] = None,
+                                  bbox: Tuple[float, float, float, float] = None,
+                                  zoom: int = None) -> Dict[str, Any]:
+        """
+        Get grant map data for public display
+
+        Locations come back with their latest public project update from a
+        single windowed query. Below CLUSTER_MAX_ZOOM markers are grouped on
+        a grid in the database and only the clusters are returned.
+
+        Args:
+            council_id: Council whose map is being shown
+            filters: Optional postcode, suburb and project_status (matched
+                against each location's latest public update)
+            bbox: Optional (west, south, east, north) viewport in degrees
+            zoom: Optional map zoom level; enables clustering when low
+        """
         try:
-            from ..models.grant_mapping import GrantLocation, ProjectUpdate
-            
-            # Build base query
-            query = self.db.query(GrantLocation).filter(
-                GrantLocation.is_public_visible == True
-            )
-            
-            # Apply filters if provided
-            if filters:
-                if filters.get('postcode'):
-                    query = query.filter(GrantLocation.postcode == filters['postcode'])
-                
-                if filters.get('suburb'):
-                    query = query.filter(GrantLocation.suburb.ilike(f"%{filters['suburb']}%"))
-                
-                if filters.get('project_status'):
-                    # Join with project updates to filter by status
-                    query = query.join(ProjectUpdate).filter(
-                        ProjectUpdate.project_status == filters['project_status']
-                    )
-            
-            locations = query.all()
-            
-            # Format for map display
-            map_data = []
-            for location in locations:
-                # Get latest project update
-                latest_update = self.db.query(ProjectUpdate).filter(
-                    and_(
-                        ProjectUpdate.grant_id == location.grant_id,
-                        ProjectUpdate.is_public == True
-                    )
-                ).order_by(ProjectUpdate.submitted_at.desc()).first()
-                
-                location_data = {
-                    'id': location.id,
-                    'grant_id': location.grant_id,
-                    'coordinates': {
-                        'lat': location.latitude,
-                        'lng': location.longitude
-                    },
-                    'address': location.address,
-                    'suburb': location.suburb,
-                    'postcode': location.postcode,
-                    'location_type': location.location_type
+            conditions = self._map_location_conditions(council_id, filters, bbox)
+            
+            if zoom is not None and zoom <= self.CLUSTER_MAX_ZOOM:
+                clusters = self._get_map_clusters(conditions, filters, zoom)
+                return {
+                    'success': True,
+                    'clustered': True,
+                    'zoom': zoom,
+                    'total_locations': sum(cluster['count'] for cluster in clusters),
+                    'clusters': clusters
                 }
-                
-                # Add project information if available
-                if latest_update:
-                    location_data['project'] = {
-                        'title': latest_update.title,
-                        'description': latest_update.description,
-                        'status': latest_update.project_status,
-                        'completion_percentage': latest_update.completion_percentage,
-                        'beneficiaries_count': latest_update.beneficiaries_count,
-                        'photos': json.loads(latest_update.photos) if latest_update.photos else [],
-                        'last_updated': latest_update.submitted_at.isoformat(),
-                        'is_featured': latest_update.is_featured
-                    }
-                
-                map_data.append(location_data)
+            
+            map_data = self.get_map_markers(council_id, filters, bbox)
             
             return {
                 'success': True,
+                'clustered': False,
                 'total_locations': len(map_data),
                 'locations': map_data
             }
@@ -194,6 +175,15 @@ class GrantMappingService:
                 'error': f'Failed to get map data: {str(e)}'
             }
     
+    def get_map_markers(self, council_id: str, filters: Dict[str, Any] = None,
+                        bbox: Tuple[float, float, float, float] = None) -> List[Dict[str, Any]]:
+        """Every public marker for a council, unclustered (used for map snapshots)"""
+        conditions = self._map_location_conditions(council_id, filters, bbox)
+        return [
+            self._serialize_map_marker(row)
+            for row in self.db.execute(self._map_feed_query(conditions, filters)).mappings()
+        ]
+    
     def get_grant_project_details(self, grant_id: str) -> Dict[str, Any]:
         """Get detailed information about a specific grant project"""
         try:
@@ -350,6 +340,139 @@ class GrantMappingService:
                 'error': f'Failed to submit feedback: {str(e)}'
             }
     
+    def _map_location_conditions(self, council_id: str, filters: Dict[str, Any] = None,
+                                 bbox: Tuple[float, float, float, float] = None) -> List[Any]:
+        """WHERE clauses on grant_locations for a public map request"""
+        from ..models.grant_mapping import GrantLocation
+        
+        conditions = [
+            GrantLocation.council_id == council_id,
+            GrantLocation.is_public_visible == True
+        ]
+        
+        if bbox:
+            west, south, east, north = bbox
+            # Latitude first so the (council_id, latitude, longitude) index serves the range
+            conditions.append(GrantLocation.latitude.between(south, north))
+            conditions.append(GrantLocation.longitude.between(west, east))
+        
+        if filters:
+            if filters.get('postcode'):
+                conditions.append(GrantLocation.postcode == filters['postcode'])
+            
+            if filters.get('suburb'):
+                conditions.append(GrantLocation.suburb.ilike(f"%{filters['suburb']}%"))
+        
+        return conditions
+    
+    def _latest_update_subquery(self, conditions: List[Any]):
+        """Public project updates ranked newest first per grant, limited to the matching locations"""
+        from ..models.grant_mapping import GrantLocation, ProjectUpdate
+        
+        return select(
+            ProjectUpdate.grant_id,
+            ProjectUpdate.title,
+            ProjectUpdate.description,
+            ProjectUpdate.project_status,
+            ProjectUpdate.completion_percentage,
+            ProjectUpdate.beneficiaries_count,
+            ProjectUpdate.photos,
+            ProjectUpdate.submitted_at,
+            ProjectUpdate.is_featured,
+            func.row_number().over(
+                partition_by=ProjectUpdate.grant_id,
+                order_by=(ProjectUpdate.submitted_at.desc(), ProjectUpdate.id.desc())
+            ).label('update_rank')
+        ).where(and_(
+            ProjectUpdate.is_public == True,
+            ProjectUpdate.grant_id.in_(select(GrantLocation.grant_id).where(and_(*conditions)))
+        )).subquery('latest_update')
+    
+    def _map_feed_query(self, conditions: List[Any], filters: Dict[str, Any] = None):
+        """Locations joined to their latest public update in one statement"""
+        from ..models.grant_mapping import GrantLocation
+        
+        latest = self._latest_update_subquery(conditions)
+        query = select(
+            GrantLocation.id,
+            GrantLocation.grant_id,
+            GrantLocation.latitude,
+            GrantLocation.longitude,
+            GrantLocation.address,
+            GrantLocation.suburb,
+            GrantLocation.postcode,
+            GrantLocation.location_type,
+            latest.c.title,
+            latest.c.description,
+            latest.c.project_status,
+            latest.c.completion_percentage,
+            latest.c.beneficiaries_count,
+            latest.c.photos,
+            latest.c.submitted_at,
+            latest.c.is_featured
+        ).outerjoin(latest, and_(
+            latest.c.grant_id == GrantLocation.grant_id,
+            latest.c.update_rank == 1
+        )).where(and_(*conditions))
+        
+        if filters and filters.get('project_status'):
+            query = query.where(latest.c.project_status == filters['project_status'])
+        
+        return query.order_by(GrantLocation.id)
+    
+    def _floor(self, value):
+        """floor(value) as an integer (CAST rounds on PostgreSQL and truncates on SQLite)"""
+        if self.db.get_bind().dialect.name == 'sqlite':
+            # SQLite's floor() needs the math functions extension
+            truncated = cast(value, Integer)
+            return case((value < truncated, truncated - 1), else_=truncated)
+        return cast(func.floor(value), Integer)
+    
+    def _get_map_clusters(self, conditions: List[Any], filters: Dict[str, Any], zoom: int) -> List[Dict[str, Any]]:
+        """Group matching locations into grid cells sized for the zoom level"""
+        from ..models.grant_mapping import GrantLocation
+        
+        # Cell edge in degrees: a 256px tile spans 360 / 2^zoom degrees
+        cell = 360.0 / (2 ** max(zoom, 0)) / self.CLUSTER_CELLS_PER_TILE
+        # Floored like the snapshot's grid (map_snapshot_service) so both agree
+        cell_x = self._floor((GrantLocation.longitude + 180.0) / cell).label('cell_x')
+        cell_y = self._floor((GrantLocation.latitude + 90.0) / cell).label('cell_y')
+        
+        query = select(
+            cell_x,
+            cell_y,
+            func.count().label('count'),
+            func.avg(GrantLocation.latitude).label('lat'),
+            func.avg(GrantLocation.longitude).label('lng'),
+            func.min(GrantLocation.latitude).label('south'),
+            func.max(GrantLocation.latitude).label('north'),
+            func.min(GrantLocation.longitude).label('west'),
+            func.max(GrantLocation.longitude).label('east'),
+            func.min(GrantLocation.id).label('location_id')
+        ).where(and_(*conditions))
+        
+        if filters and filters.get('project_status'):
+            latest = self._latest_update_subquery(conditions)
+            query = query.join(latest, and_(
+                latest.c.grant_id == GrantLocation.grant_id,
+                latest.c.update_rank == 1
+            )).where(latest.c.project_status == filters['project_status'])
+        
+        clusters = []
+        for row in self.db.execute(query.group_by(cell_x, cell_y)).mappings():
+            cluster = {
+                'count': row['count'],
+                'coordinates': {'lat': row['lat'], 'lng': row['lng']},
+                'bounds': {
+                    'south': row['south'], 'west': row['west'],
+                    'north': row['north'], 'east': row['east']
+                }
+            }
+            if row['count'] == 1:
+                cluster['location_id'] = row['location_id']
+            clusters.append(cluster)
+        return clusters
+    
     def _geocode_address(self, address: str) -> Dict[str, Any]:
         """Geocode an address using Google Maps API or similar service"""
         try:
@@ -389,45 +512,54 @@ class GrantMappingService:
             }
     
     def _update_map_analytics(self, council_id: str, interaction_type: str, details: Dict[str, Any] = None):
-        """Update map usage analytics"""
+        """Update map usage analytics (buffered; written to map_analytics in periodic batches)"""
         try:
-            from ..models.grant_mapping import MapAnalytics
-            
-            # Get or create analytics record for today
-            today = datetime.utcnow().date()
-            analytics = self.db.query(MapAnalytics).filter(
-                and_(
-                    MapAnalytics.council_id == council_id,
-                    func.date(MapAnalytics.analytics_date) == today
-                )
-            ).first()
-            
-            if not analytics:
-                analytics = MapAnalytics(
-                    council_id=council_id,
-                    analytics_date=datetime.utcnow()
-                )
-                self.db.add(analytics)
+            from .map_snapshot_service import map_snapshot_service
             
-            # Update metrics based on interaction type
-            if interaction_type == 'view':
-                analytics.total_views += 1
-            elif interaction_type == 'marker_click':
-                analytics.marker_clicks += 1
-            elif interaction_type == 'social_share':
-                analytics.social_shares += 1
-            
-            self.db.commit()
+            if map_snapshot_service.engine is None:
+                map_snapshot_service.bind(self.db.get_bind())
+            map_snapshot_service.record_interaction(council_id, interaction_type)
             
         except Exception as e:
             print(f"Error updating map analytics: {str(e)}")
     
+    def _serialize_map_marker(self, row) -> Dict[str, Any]:
+        """Serialize a map feed row (location plus latest update columns)"""
+        location_data = {
+            'id': row['id'],
+            'grant_id': row['grant_id'],
+            'coordinates': {
+                'lat': row['latitude'],
+                'lng': row['longitude']
+            },
+            'address': row['address'],
+            'suburb': row['suburb'],
+            'postcode': row['postcode'],
+            'location_type': row['location_type']
+        }
+        
+        # Add project information if available
+        if row['submitted_at'] is not None:
+            location_data['project'] = {
+                'title': row['title'],
+                'description': row['description'],
+                'status': row['project_status'],
+                'completion_percentage': row['completion_percentage'],
+                'beneficiaries_count': row['beneficiaries_count'],
+                'photos': json.loads(row['photos']) if row['photos'] else [],
+                'last_updated': row['submitted_at'].isoformat(),
+                'is_featured': row['is_featured']
+            }
+        
+        return location_data
+    
     def _serialize_location(self, location) -> Dict[str, Any]:
         """Serialize location object for API response"""
         return {
             'id': location.id,
             'grant_id': location.grant_id,
             'application_id': location.application_id,
+            'council_id': location.council_id,
             'address': location.address,
             'suburb': location.suburb,
             'postcode': location.postcode,
@@ -0,0 +1,251 @@
+"""
+Grant Search Service for GrantThrive
+Full-text search over grants backed by SQLite FTS5 or PostgreSQL tsvector
+"""
+
+import os
+import re
+import time
+from typing import Optional
+from sqlalchemy import event, text, select, func, literal_column, Integer, Float
+from sqlalchemy.engine import Engine
+from src.models.grant import Grant
+
+# Columns covered by the search index, in FTS5 column order
+SEARCH_COLUMNS = ('title', 'short_description', 'description', 'eligibility_criteria', 'tags')
+
+# bm25 weights per column (same order as SEARCH_COLUMNS) - title matches rank highest
+FTS5_COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 2.0, 3.0)
+
+# PostgreSQL weighted document; the GIN index and the queries must use the same expression
+POSTGRES_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(short_description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(tags, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(eligibility_criteria, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'D')"
+)
+
+class GrantSearchService:
+    """Maintains the grant full-text index and applies ranked search to grant queries"""
+    
+    def __init__(self, fts_table: str = 'grants_fts', retry_seconds: int = 300):
+        self.fts_table = fts_table
+        self.retry_seconds = retry_seconds
+        self._ready = {}  # engine url -> True once the index exists
+        self._retry_at = {}  # engine url -> monotonic time of the next ensure_index attempt
+    
+    def ensure_index(self, bind) -> bool:
+        """Create the search index (and sync triggers) if missing"""
+        try:
+            created = self._run(bind, self._ensure_index)
+            self._mark_ready(bind)
+            return created
+        except Exception as e:
+            # FTS5 not compiled in, missing privileges or no grants table yet -
+            # fall back to LIKE search and try again after retry_seconds
+            print(f"Grant search index unavailable: {str(e)}")
+            key = self._key(bind)
+            self._ready.pop(key, None)
+            self._retry_at[key] = time.monotonic() + self.retry_seconds
+            return False
+    
+    def rebuild_index(self, bind):
+        """Rebuild the search index from the grants table"""
+        def rebuild(conn):
+            if conn.dialect.name == 'sqlite':
+                self._ensure_index(conn)
+                conn.execute(text(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"))
+            elif conn.dialect.name == 'postgresql':
+                conn.execute(text('REINDEX INDEX ix_grants_search_vector'))
+        
+        self._run(bind, rebuild)
+        self._mark_ready(bind)
+    
+    def is_available(self, bind) -> bool:
+        """Check whether full-text search can be used on this database"""
+        key = self._key(bind)
+        if self._ready.get(key):
+            return True
+        if time.monotonic() < self._retry_at.get(key, 0):
+            return False
+        self.ensure_index(bind)
+        return self._ready.get(key, False)
+    
+    def apply_search(self, query, search: str, bind, ranked: bool = True):
+        """
+        Restrict a Grant query to rows matching the search string
+
+        Args:
+            query: Grant query to filter
+            search (str): Raw search text from the client
+            bind: Engine or connection the query runs against
+            ranked (bool): Order results by relevance (best first)
+
+        Returns:
+            Query: Filtered (and optionally ordered) query
+        """
+        if not search or not search.strip():
+            return query
+        
+        if not self.is_available(bind) or bind.dialect.name not in ('sqlite', 'postgresql'):
+            return self._apply_like_search(query, search)
+        
+        matches = self.ranked_matches(search, bind.dialect.name)
+        if matches is None:
+            return query
+        
+        query = query.join(matches, Grant.id == matches.c.grant_id)
+        if ranked:
+            query = query.order_by(matches.c.rank)
+        return query
+    
+    def ranked_matches(self, search: str, dialect_name: str):
+        """
+        Build a subquery of (grant_id, rank) for a search string
+
+        Lower rank means a better match on both backends.
+        """
+        if dialect_name == 'sqlite':
+            match = self.build_fts5_query(search)
+            if not match:
+                return None
+            weights = ', '.join(str(weight) for weight in FTS5_COLUMN_WEIGHTS)
+            return text(
+                f"SELECT rowid AS grant_id, bm25({self.fts_table}, {weights}) AS rank "
+                f"FROM {self.fts_table} WHERE {self.fts_table} MATCH :match"
+            ).bindparams(match=match).columns(grant_id=Integer, rank=Float).subquery('grant_search')
+        
+        tsquery = self.build_tsquery(search)
+        if not tsquery:
+            return None
+        vector = literal_column(POSTGRES_SEARCH_VECTOR)
+        query = func.to_tsquery('english', tsquery)
+        return select(
+            Grant.id.label('grant_id'),
+            (-func.ts_rank(vector, query)).label('rank')
+        ).where(vector.op('@@')(query)).subquery('grant_search')
+    
+    @staticmethod
+    def tokenize(search: str):
+        """Split search text into lowercase word tokens"""
+        return re.findall(r'\w+', search.lower())[:16]
+    
+    def build_fts5_query(self, search: str) -> Optional[str]:
+        """Build an FTS5 MATCH expression; every term must match, the last one as a prefix"""
+        tokens = self.tokenize(search)
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens[:-1]]
+        terms.append(f'"{tokens[-1]}"*')
+        return ' '.join(terms)
+    
+    def build_tsquery(self, search: str) -> Optional[str]:
+        """Build a PostgreSQL tsquery; every term must match, the last one as a prefix"""
+        tokens = self.tokenize(search)
+        if not tokens:
+            return None
+        terms = tokens[:-1] + [f'{tokens[-1]}:*']
+        return ' & '.join(terms)
+    
+    def _apply_like_search(self, query, search: str):
+        """Substring search used when no full-text index is available"""
+        return query.filter(
+            Grant.title.contains(search) |
+            Grant.description.contains(search) |
+            Grant.short_description.contains(search)
+        )
+    
+    def _ensure_index(self, conn) -> bool:
+        """Create the index objects on an open connection"""
+        if conn.dialect.name == 'sqlite':
+            triggers = [f'{self.fts_table}_ai', f'{self.fts_table}_ad', f'{self.fts_table}_au']
+            existing = {
+                row[0] for row in conn.execute(
+                    text("SELECT name FROM sqlite_master WHERE (type = 'table' AND name = :name) "
+                         "OR (type = 'trigger' AND tbl_name = 'grants')"),
+                    {'name': self.fts_table}
+                )
+            }
+            if existing >= {self.fts_table, *triggers}:
+                return False
+            
+            # CREATE VIRTUAL TABLE commits on its own, so an earlier attempt may
+            # have left the table without its triggers; an index that is not
+            # kept in sync is worse than none, so start again from scratch
+            self._drop_sqlite_index(conn, triggers)
+            
+            columns = ', '.join(SEARCH_COLUMNS)
+            new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+            old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+            
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {self.fts_table} USING fts5("
+                f"{columns}, content='grants', content_rowid='id', "
+                f"tokenize='porter unicode61', prefix='2 3')"
+            ))
+            try:
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ai AFTER INSERT ON grants BEGIN "
+                    f"INSERT INTO {self.fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ad AFTER DELETE ON grants BEGIN "
+                    f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, {columns}) "
+                    f"VALUES ('delete', old.id, {old_values}); END"
+                ))
+                # Only re-index when searchable columns change (not on view_count bumps)
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {self.fts_table}_au AFTER UPDATE OF {columns} ON grants BEGIN "
+                    f"INSERT INTO {self.fts_table}({self.fts_table}, rowid, {columns}) "
+                    f"VALUES ('delete', old.id, {old_values}); "
+                    f"INSERT INTO {self.fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+                ))
+            except Exception:
+                self._drop_sqlite_index(conn, triggers)
+                raise
+            conn.execute(text(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"))
+            return True
+        
+        if conn.dialect.name == 'postgresql':
+            # Expression index is maintained by PostgreSQL itself on insert/update/delete
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_grants_search_vector ON grants "
+                f"USING GIN (({POSTGRES_SEARCH_VECTOR}))"
+            ))
+            return True
+        
+        raise RuntimeError(f'Full-text search not supported on {conn.dialect.name}')
+    
+    def _drop_sqlite_index(self, conn, triggers):
+        for trigger in triggers:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {self.fts_table}"))
+    
+    def _mark_ready(self, bind):
+        key = self._key(bind)
+        self._ready[key] = True
+        self._retry_at.pop(key, None)
+    
+    @staticmethod
+    def _run(bind, fn):
+        """Run fn with a connection, opening a transaction if given an engine"""
+        if isinstance(bind, Engine):
+            with bind.begin() as conn:
+                return fn(conn)
+        return fn(bind)
+    
+    @staticmethod
+    def _key(bind):
+        engine = bind if isinstance(bind, Engine) else bind.engine
+        return str(engine.url)
+
+# Global search service instance
+grant_search_service = GrantSearchService(
+    retry_seconds=int(os.environ.get('GRANT_SEARCH_RETRY_SECONDS', 300))
+)
+
+@event.listens_for(Grant.__table__, 'after_create')
+def _create_search_index(target, connection, **kwargs):
+    """Create the search index alongside a freshly created grants table"""
+    grant_search_service.ensure_index(connection)
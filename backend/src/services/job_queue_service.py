@@ -0,0 +1,346 @@
+"""
+Job Queue Service for GrantThrive
+Durable background jobs stored in the application database, claimed by
+worker processes so slow side-effects stay off the request thread
+"""
+
+import json
+import os
+import signal
+import socket
+import threading
+import importlib
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, List, Optional
+from sqlalchemy import select, update, func, and_
+from src.models.user import db
+from src.models.background_job import BackgroundJob
+
+# Modules whose @job_queue.task handlers a worker loads
+TASK_MODULES = [
+    'src.services.notification_service',
+    'src.services.push_notification_service',
+    'src.services.analytics_service',
+    'src.utils.email'
+]
+
+class JobQueue:
+    """
+    Enqueue, claim and settle rows in background_jobs
+
+    Claiming selects the next runnable job with FOR UPDATE SKIP LOCKED
+    (PostgreSQL) and flips it to running with an UPDATE guarded on
+    status = 'queued', so on SQLite, where row locks do not exist, two
+    workers racing for the same row still cannot both win it.
+
+    A failed job goes back to queued with exponential backoff until
+    max_attempts, then stays as 'dead' for inspection and requeue_dead().
+    Jobs left running by a crashed worker are requeued by recover_stale().
+    """
+    
+    def __init__(self, backoff_seconds: float = 10.0, max_backoff_seconds: float = 3600.0):
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.tasks = {}
+        self._local = threading.local()
+    
+    def task(self, name: str, queue: str = 'default', max_attempts: int = 5):
+        """Register a handler; it receives the job payload dict and may return a JSON-able result"""
+        def register(fn: Callable[[Dict[str, Any]], Any]):
+            self.tasks[name] = {'fn': fn, 'queue': queue, 'max_attempts': max_attempts}
+            return fn
+        return register
+    
+    def current_job(self) -> Optional[Dict[str, Any]]:
+        """The job whose handler is running on this thread (attempts, max_attempts, ...), else None"""
+        return getattr(self._local, 'job', None)
+    
+    def load_tasks(self):
+        for module in TASK_MODULES:
+            importlib.import_module(module)
+    
+    # Producers (request side, Flask-SQLAlchemy session)
+    
+    def enqueue(self, task: str, payload: Dict[str, Any] = None, queue: str = None,
+                run_at: datetime = None, max_attempts: int = None, priority: int = 0) -> int:
+        """
+        Add a job and commit it
+
+        Returns:
+            int: Job id
+        """
+        job = BackgroundJob(**self._job_values(task, payload, queue, run_at, max_attempts, priority))
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+    
+    def enqueue_many(self, task: str, payloads: List[Dict[str, Any]], queue: str = None,
+                     run_at: datetime = None, max_attempts: int = None, priority: int = 0) -> int:
+        """Add one job per payload in a single INSERT; returns the number queued"""
+        rows = [self._job_values(task, payload, queue, run_at, max_attempts, priority) for payload in payloads]
+        if rows:
+            db.session.execute(BackgroundJob.__table__.insert(), rows)
+            db.session.commit()
+        return len(rows)
+    
+    def get_job(self, job_id: int) -> Optional[BackgroundJob]:
+        return db.session.get(BackgroundJob, job_id)
+    
+    # Worker side (plain connections, one short transaction per step)
+    
+    def claim(self, engine, worker_id: str, queues: List[str]) -> Optional[Dict[str, Any]]:
+        """Take the next runnable job on queues, or None when there is nothing to do"""
+        jobs = BackgroundJob.__table__
+        for _ in range(5):
+            now = datetime.utcnow()
+            with engine.begin() as connection:
+                job_id = connection.execute(
+                    select(jobs.c.id).where(and_(
+                        jobs.c.queue.in_(queues),
+                        jobs.c.status == 'queued',
+                        jobs.c.run_at <= now
+                    )).order_by(jobs.c.priority.desc(), jobs.c.run_at, jobs.c.id)
+                    .limit(1).with_for_update(skip_locked=True)
+                ).scalar()
+                if job_id is None:
+                    return None
+                
+                claimed = connection.execute(
+                    update(jobs).where(and_(jobs.c.id == job_id, jobs.c.status == 'queued')).values(
+                        status='running', locked_by=worker_id, locked_at=now,
+                        started_at=now, attempts=jobs.c.attempts + 1
+                    )
+                ).rowcount
+                if claimed:
+                    return dict(connection.execute(select(jobs).where(jobs.c.id == job_id)).mappings().one())
+            # Lost the race for that row; look again
+        return None
+    
+    def complete(self, engine, job: Dict[str, Any], result: Any = None) -> bool:
+        """Record success; False if the job is no longer this worker's (requeued by recover_stale)"""
+        jobs = BackgroundJob.__table__
+        with engine.begin() as connection:
+            return connection.execute(update(jobs).where(self._held(job)).values(
+                status='succeeded', finished_at=datetime.utcnow(), locked_by=None, locked_at=None,
+                result=json.dumps(result, default=str) if result is not None else None
+            )).rowcount > 0
+    
+    def fail(self, engine, job: Dict[str, Any], error: str) -> Optional[str]:
+        """
+        Record a failure; returns the new status ('queued' for a retry, or 'dead'),
+        or None if the job is no longer this worker's
+        """
+        jobs = BackgroundJob.__table__
+        now = datetime.utcnow()
+        if job['attempts'] >= job['max_attempts']:
+            values = {'status': 'dead', 'finished_at': now}
+        else:
+            delay = min(self.backoff_seconds * (2 ** (job['attempts'] - 1)), self.max_backoff_seconds)
+            values = {'status': 'queued', 'run_at': now + timedelta(seconds=delay)}
+        
+        with engine.begin() as connection:
+            settled = connection.execute(update(jobs).where(self._held(job)).values(
+                last_error=error[:4000], locked_by=None, locked_at=None, **values
+            )).rowcount
+        return values['status'] if settled else None
+    
+    def _held(self, job: Dict[str, Any]):
+        """
+        The job row, only while it is still running under the claim in job
+
+        recover_stale may have requeued it and another worker claimed it
+        since; settling then would overwrite that worker's run.
+        """
+        jobs = BackgroundJob.__table__
+        return and_(jobs.c.id == job['id'], jobs.c.status == 'running', jobs.c.locked_by == job['locked_by'])
+    
+    def recover_stale(self, engine, stale_after_seconds: float) -> int:
+        """Requeue jobs running longer than stale_after_seconds (worker presumed lost; the attempt still counts)"""
+        jobs = BackgroundJob.__table__
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+        with engine.begin() as connection:
+            return connection.execute(
+                update(jobs).where(and_(jobs.c.status == 'running', jobs.c.locked_at < cutoff)).values(
+                    status='queued', locked_by=None, locked_at=None,
+                    last_error='Worker lost while running job'
+                )
+            ).rowcount
+    
+    def requeue_dead(self, engine, job_id: int = None, task: str = None) -> int:
+        """Give dead-lettered jobs a fresh set of attempts"""
+        jobs = BackgroundJob.__table__
+        conditions = [jobs.c.status == 'dead']
+        if job_id is not None:
+            conditions.append(jobs.c.id == job_id)
+        if task is not None:
+            conditions.append(jobs.c.task == task)
+        with engine.begin() as connection:
+            return connection.execute(
+                update(jobs).where(and_(*conditions)).values(
+                    status='queued', attempts=0, run_at=datetime.utcnow(), finished_at=None
+                )
+            ).rowcount
+    
+    def get_metrics(self, engine, window_minutes: int = 60) -> Dict[str, Any]:
+        """
+        Queue depth, oldest runnable job and per-task latency
+
+        wait is run_at -> started_at (time spent queued once due), run is
+        started_at -> finished_at, both over jobs finished in the window.
+        """
+        jobs = BackgroundJob.__table__
+        now = datetime.utcnow()
+        since = now - timedelta(minutes=window_minutes)
+        
+        with engine.connect() as connection:
+            counts = {}
+            for queue, status, count in connection.execute(
+                select(jobs.c.queue, jobs.c.status, func.count()).group_by(jobs.c.queue, jobs.c.status)
+            ):
+                counts.setdefault(queue, {})[status] = count
+            
+            oldest = connection.execute(
+                select(func.min(jobs.c.run_at)).where(and_(jobs.c.status == 'queued', jobs.c.run_at <= now))
+            ).scalar()
+            
+            per_task = {}
+            for task, status, run_at, started_at, finished_at in connection.execute(
+                select(jobs.c.task, jobs.c.status, jobs.c.run_at, jobs.c.started_at, jobs.c.finished_at)
+                .where(and_(jobs.c.finished_at >= since, jobs.c.started_at.isnot(None)))
+            ):
+                stats = per_task.setdefault(task, {'succeeded': 0, 'dead': 0, 'wait': [], 'run': []})
+                stats[status] = stats.get(status, 0) + 1
+                stats['wait'].append(max(0.0, (started_at - run_at).total_seconds()))
+                stats['run'].append((finished_at - started_at).total_seconds())
+        
+        return {
+            'queues': counts,
+            'oldest_runnable_age_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+            'window_minutes': window_minutes,
+            'tasks': {
+                task: {
+                    'succeeded': stats['succeeded'],
+                    'dead': stats['dead'],
+                    'wait_p50_seconds': _percentile(stats['wait'], 50),
+                    'wait_p95_seconds': _percentile(stats['wait'], 95),
+                    'run_p50_seconds': _percentile(stats['run'], 50),
+                    'run_p95_seconds': _percentile(stats['run'], 95)
+                }
+                for task, stats in per_task.items()
+            }
+        }
+    
+    def _job_values(self, task, payload, queue, run_at, max_attempts, priority) -> Dict[str, Any]:
+        registered = self.tasks.get(task, {})
+        now = datetime.utcnow()
+        return {
+            'task': task,
+            'payload': json.dumps(payload or {}, default=str),
+            'queue': queue or registered.get('queue', 'default'),
+            'status': 'queued',
+            'priority': priority,
+            'attempts': 0,
+            'max_attempts': max_attempts or registered.get('max_attempts', 5),
+            'run_at': run_at or now,
+            'created_at': now
+        }
+
+class JobWorker:
+    """
+    Runs jobs from the given queues on `concurrency` threads
+
+    Each thread claims one job at a time and executes its handler inside
+    the Flask app context. SIGTERM/SIGINT stop claiming and let running
+    jobs finish. burst=True exits once the queues are empty (cron, tests).
+    """
+    
+    def __init__(self, app, job_queue: JobQueue, queues: List[str], concurrency: int = 4,
+                 poll_interval: float = 1.0, stale_after_seconds: float = 900.0, burst: bool = False):
+        self.app = app
+        self.job_queue = job_queue
+        self.queues = queues
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stale_after_seconds = stale_after_seconds
+        self.burst = burst
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+    
+    def run(self):
+        self.job_queue.load_tasks()
+        with self.app.app_context():
+            self.engine = db.engine
+        
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: self.stop())
+            signal.signal(signal.SIGINT, lambda *_: self.stop())
+        
+        threads = [
+            threading.Thread(target=self._loop, name=f'job-worker-{index}', daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        while any(thread.is_alive() for thread in threads):
+            recovered = self.job_queue.recover_stale(self.engine, self.stale_after_seconds)
+            if recovered:
+                print(f"Requeued {recovered} stale jobs")
+            self._stop.wait(min(60.0, self.stale_after_seconds / 2))
+            for thread in threads:
+                thread.join(timeout=0.1)
+        
+        return {'processed': self.processed, 'failed': self.failed}
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _loop(self):
+        while not self._stop.is_set():
+            job = self.job_queue.claim(self.engine, self.worker_id, self.queues)
+            if job is None:
+                if self.burst:
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            self._execute(job)
+    
+    def _execute(self, job: Dict[str, Any]):
+        handler = self.job_queue.tasks.get(job['task'])
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for task {job['task']}")
+            self.job_queue._local.job = job
+            try:
+                with self.app.app_context():
+                    result = handler['fn'](json.loads(job['payload'] or '{}'))
+            finally:
+                self.job_queue._local.job = None
+            if not self.job_queue.complete(self.engine, job, result):
+                print(f"Job {job['id']} ({job['task']}) finished after its claim was lost; result discarded")
+                return
+            with self._lock:
+                self.processed += 1
+        except Exception as e:
+            status = self.job_queue.fail(self.engine, job, f"{type(e).__name__}: {str(e)}")
+            if status is None:
+                print(f"Job {job['id']} ({job['task']}) failed after its claim was lost: {str(e)}")
+                return
+            with self._lock:
+                self.failed += 1
+            print(f"Job {job['id']} ({job['task']}) failed on attempt {job['attempts']}, now {status}: {str(e)}")
+
+def _percentile(values: List[float], percent: int) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))], 3)
+
+# Global job queue instance
+job_queue = JobQueue(
+    backoff_seconds=float(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', 10)),
+    max_backoff_seconds=float(os.environ.get('JOB_RETRY_MAX_BACKOFF_SECONDS', 3600))
+)
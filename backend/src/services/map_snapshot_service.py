@@ -0,0 +1,350 @@
+"""
+Map Snapshot Service for GrantThrive
+Pre-rendered per-council GeoJSON and cluster layers for the public grant map,
+rebuilt when grant locations or project updates change
+"""
+
+import os
+import json
+import time
+import uuid
+import math
+import hashlib
+import threading
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import event, inspect, select, update, and_, func
+from sqlalchemy.orm import Session, object_session
+from ..models.grant_mapping import GrantLocation, ProjectUpdate, MapAnalytics
+from ..utils.counters import BufferedCounter
+from .grant_mapping_service import GrantMappingService
+
+class MapSnapshotService:
+    """
+    Writes each council's public map to disk and serves it by ETag
+
+    A snapshot is the council's full marker set as a GeoJSON
+    FeatureCollection plus one cluster layer per zoom in cluster_zooms,
+    gridded exactly like the live feed. Files are written atomically and
+    their SHA-256 ETags recorded in a per-council manifest, so a request
+    costs a manifest stat and, usually, a 304.
+
+    Commits that touch a GrantLocation or ProjectUpdate mark the affected
+    councils stale; a background thread rebuilds them shortly after. Other
+    worker processes pick the new files up from the manifest mtime.
+    Bulk Core-level writes bypass the ORM events and need rebuild().
+
+    Map interactions are counted through a BufferedCounter and written to
+    map_analytics in one transaction per flush instead of one per view.
+    """
+    
+    SESSION_KEY = 'map_snapshot_councils'
+    
+    def __init__(self, snapshot_dir: str, cluster_zooms: List[int] = None, rebuild_delay: float = 2.0):
+        self.snapshot_dir = snapshot_dir
+        self.cluster_zooms = cluster_zooms if cluster_zooms is not None else list(
+            range(4, GrantMappingService.CLUSTER_MAX_ZOOM + 1)
+        )
+        self.rebuild_delay = rebuild_delay
+        self.engine = None
+        self._lock = threading.Lock()
+        self._stale = set()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._manifests = {}  # council id -> (manifest mtime, manifest)
+        self._bodies = {}  # file path -> (mtime, bytes)
+        self.builds = 0
+        self.analytics_counter = BufferedCounter(
+            'map_interactions',
+            self._flush_analytics,
+            flush_interval=float(os.environ.get('MAP_ANALYTICS_FLUSH_SECONDS', 30)),
+            flush_threshold=int(os.environ.get('MAP_ANALYTICS_FLUSH_THRESHOLD', 1000))
+        )
+        os.makedirs(snapshot_dir, exist_ok=True)
+    
+    def bind(self, engine):
+        """Use engine for rebuilds and analytics flushes"""
+        self.engine = engine
+    
+    # Building
+    
+    def rebuild(self, council_id: str) -> Dict[str, str]:
+        """
+        Render and write a council's snapshot files
+
+        Returns:
+            dict: file name -> ETag, as recorded in the manifest
+        """
+        session = Session(bind=self.engine)
+        try:
+            markers = GrantMappingService(session).get_map_markers(council_id)
+        finally:
+            session.close()
+        
+        files = {'locations.geojson': self._render_geojson(markers)}
+        for zoom in self.cluster_zooms:
+            files[f'clusters-{zoom}.json'] = self._render_clusters(markers, zoom)
+        
+        council_dir = self._council_dir(council_id)
+        os.makedirs(council_dir, exist_ok=True)
+        etags = {}
+        for name, body in files.items():
+            etags[name] = hashlib.sha256(body).hexdigest()[:32]
+            self._write_atomic(os.path.join(council_dir, name), body)
+        
+        manifest = {
+            'council_id': council_id,
+            'built_at': datetime.utcnow().isoformat(),
+            'total_locations': len(markers),
+            'files': etags
+        }
+        self._write_atomic(os.path.join(council_dir, 'manifest.json'), json.dumps(manifest).encode())
+        with self._lock:
+            self.builds += 1
+        return etags
+    
+    def invalidate(self, council_ids):
+        """Queue councils for a rebuild after rebuild_delay (edits arriving together coalesce)"""
+        council_ids = {council_id for council_id in council_ids if council_id}
+        if not council_ids:
+            return
+        with self._lock:
+            self._stale.update(council_ids)
+        self._ensure_thread()
+        self._wakeup.set()
+    
+    # Serving
+    
+    def get_file(self, council_id: str, name: str) -> Optional[Tuple[bytes, str]]:
+        """
+        A snapshot file and its ETag, building the snapshot on first request
+
+        Only councils with public locations are built, so arbitrary council
+        ids in public URLs cannot create snapshot directories.
+
+        Returns:
+            tuple: (body, etag), or None if the council has no public map or
+            no such file is produced
+        """
+        manifest = self._manifest(council_id)
+        if manifest is None:
+            if not self.has_locations(council_id):
+                return None
+            self.rebuild(council_id)
+            manifest = self._manifest(council_id)
+        
+        etag = manifest['files'].get(name)
+        if etag is None:
+            return None
+        return self._body(os.path.join(self._council_dir(council_id), name)), etag
+    
+    def has_locations(self, council_id: str) -> bool:
+        """Whether the council has any publicly visible grant location"""
+        locations = GrantLocation.__table__
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(locations.c.id).where(and_(
+                    locations.c.council_id == council_id,
+                    locations.c.is_public_visible == True
+                )).limit(1)
+            ).first() is not None
+    
+    def get_etag(self, council_id: str, name: str) -> Optional[str]:
+        """ETag of a snapshot file without reading it, for If-None-Match checks"""
+        manifest = self._manifest(council_id)
+        return manifest['files'].get(name) if manifest else None
+    
+    # Analytics
+    
+    def record_interaction(self, council_id: str, interaction_type: str = 'view'):
+        """Count a map interaction ('view', 'marker_click' or 'social_share')"""
+        self.analytics_counter.increment((council_id, date.today().isoformat(), interaction_type))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'builds': self.builds,
+                'stale_councils': len(self._stale),
+                'analytics': self.analytics_counter.get_stats()
+            }
+    
+    # Internals
+    
+    def _render_geojson(self, markers: List[Dict[str, Any]]) -> bytes:
+        features = []
+        for marker in markers:
+            properties = dict(marker)
+            coordinates = properties.pop('coordinates')
+            features.append({
+                'type': 'Feature',
+                'id': marker['id'],
+                'geometry': {'type': 'Point', 'coordinates': [coordinates['lng'], coordinates['lat']]},
+                'properties': properties
+            })
+        return json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':')).encode()
+    
+    def _render_clusters(self, markers: List[Dict[str, Any]], zoom: int) -> bytes:
+        """Same grid as GrantMappingService._get_map_clusters, computed from the loaded markers"""
+        cell = 360.0 / (2 ** zoom) / GrantMappingService.CLUSTER_CELLS_PER_TILE
+        cells = {}
+        for marker in markers:
+            lat, lng = marker['coordinates']['lat'], marker['coordinates']['lng']
+            key = (math.floor((lng + 180.0) / cell), math.floor((lat + 90.0) / cell))
+            cells.setdefault(key, []).append((lat, lng, marker['id']))
+        
+        clusters = []
+        for points in cells.values():
+            lats = [point[0] for point in points]
+            lngs = [point[1] for point in points]
+            cluster = {
+                'count': len(points),
+                'coordinates': {'lat': sum(lats) / len(lats), 'lng': sum(lngs) / len(lngs)},
+                'bounds': {'south': min(lats), 'west': min(lngs), 'north': max(lats), 'east': max(lngs)}
+            }
+            if len(points) == 1:
+                cluster['location_id'] = points[0][2]
+            clusters.append(cluster)
+        
+        return json.dumps({
+            'zoom': zoom,
+            'total_locations': len(markers),
+            'clusters': clusters
+        }, separators=(',', ':')).encode()
+    
+    def _council_dir(self, council_id: str) -> str:
+        # Council ids come from URLs; hash them into a safe directory name
+        return os.path.join(self.snapshot_dir, hashlib.sha1(council_id.encode()).hexdigest())
+    
+    def _manifest(self, council_id: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._council_dir(council_id), 'manifest.json')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._manifests.get(council_id)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                cached = (mtime, json.load(f))
+            self._manifests[council_id] = cached
+        return cached[1]
+    
+    def _body(self, path: str) -> bytes:
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._bodies.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                cached = (mtime, f.read())
+            self._bodies[path] = cached
+        return cached[1]
+    
+    def _write_atomic(self, path: str, body: bytes):
+        # Unique per call: threads of one process can write the same file at once
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+    
+    def _ensure_thread(self):
+        # Same lazy, fork-aware start as BufferedCounter
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='map-snapshot-builder', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Let the rest of an editing burst land before rendering
+            time.sleep(self.rebuild_delay)
+            with self._lock:
+                councils, self._stale = self._stale, set()
+            for council_id in councils:
+                try:
+                    self.rebuild(council_id)
+                except Exception as e:
+                    print(f"Map snapshot rebuild failed for {council_id}: {str(e)}")
+    
+    def _flush_analytics(self, counts: Dict[Tuple[str, str, str], int]):
+        """Add buffered interaction counts to each council's daily map_analytics row"""
+        columns = {'view': 'total_views', 'marker_click': 'marker_clicks', 'social_share': 'social_shares'}
+        totals = {}
+        for (council_id, day, interaction_type), count in counts.items():
+            column = columns.get(interaction_type)
+            if column:
+                row = totals.setdefault((council_id, day), dict.fromkeys(columns.values(), 0))
+                row[column] += count
+        
+        analytics = MapAnalytics.__table__
+        with self.engine.begin() as connection:
+            for (council_id, day), increments in totals.items():
+                result = connection.execute(
+                    update(analytics).where(and_(
+                        analytics.c.council_id == council_id,
+                        func.date(analytics.c.analytics_date) == day
+                    )).values(
+                        last_updated=datetime.utcnow(),
+                        **{name: func.coalesce(analytics.c[name], 0) + amount for name, amount in increments.items()}
+                    )
+                )
+                if result.rowcount == 0:
+                    connection.execute(analytics.insert().values(
+                        council_id=council_id,
+                        analytics_date=datetime.fromisoformat(day),
+                        last_updated=datetime.utcnow(),
+                        **increments
+                    ))
+
+# Global map snapshot service instance
+map_snapshot_service = MapSnapshotService(
+    snapshot_dir=os.environ.get(
+        'MAP_SNAPSHOT_DIR',
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'map_snapshots')
+    )
+)
+
+# Change tracking: collect affected councils during flush, rebuild after commit
+
+def _session_councils(target) -> Optional[set]:
+    session = object_session(target)
+    return session.info.setdefault(MapSnapshotService.SESSION_KEY, set()) if session is not None else None
+
+@event.listens_for(GrantLocation, 'after_insert')
+@event.listens_for(GrantLocation, 'after_update')
+@event.listens_for(GrantLocation, 'after_delete')
+def _grant_location_changed(mapper, connection, target):
+    councils = _session_councils(target)
+    if councils is None:
+        return
+    councils.add(target.council_id)
+    # A location moved between councils leaves the old map stale too
+    councils.update(inspect(target).attrs.council_id.history.deleted)
+
+@event.listens_for(ProjectUpdate, 'after_insert')
+@event.listens_for(ProjectUpdate, 'after_update')
+@event.listens_for(ProjectUpdate, 'after_delete')
+def _project_update_changed(mapper, connection, target):
+    councils = _session_councils(target)
+    if councils is None:
+        return
+    locations = GrantLocation.__table__
+    councils.update(connection.execute(
+        select(locations.c.council_id).where(locations.c.grant_id == target.grant_id).distinct()
+    ).scalars())
+
+@event.listens_for(Session, 'after_commit')
+def _rebuild_after_commit(session):
+    councils = session.info.pop(MapSnapshotService.SESSION_KEY, None)
+    if councils:
+        if map_snapshot_service.engine is None:
+            map_snapshot_service.bind(session.get_bind())
+        map_snapshot_service.invalidate(councils)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(MapSnapshotService.SESSION_KEY, None)
@@ -0,0 +1,282 @@
+"""
+Notification Log Service for GrantThrive
+Persistent notification history with batched appends, retention and
+per-day statistics
+"""
+
+import os
+import atexit
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, delete, func, and_
+from sqlalchemy.exc import IntegrityError, DataError
+from src.models.user import db
+from src.models.notification_log import NotificationLogEntry, NotificationDailyStat
+from src.utils.db_helpers import upsert_increment
+
+class NotificationLogStore:
+    """
+    Stores notification delivery summaries in notification_log
+
+    append() only buffers; the buffer is written on an interval or once
+    flush_threshold summaries are waiting, as one multi-row INSERT plus
+    one upsert per (council, day, event type, channel) into
+    notification_daily_stats, in the same transaction. A failed batch is
+    retried one summary at a time: summaries the database rejects are
+    discarded, and on any other error the rest go back in the buffer for
+    the next attempt. The buffer holds at most max_pending summaries (new
+    ones are dropped and counted beyond that), and a final flush runs at
+    exit.
+
+    History reads page through the (council_id, timestamp) index and
+    statistics are summed from the daily rows, so neither grows with the
+    number of notifications ever sent. compact() drops log rows past the
+    retention period; the daily statistics are kept.
+    """
+    
+    def __init__(self, flush_interval: float = 2.0, flush_threshold: int = 500, retention_days: int = 90,
+                 max_pending: int = 50000):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.retention_days = retention_days
+        self.max_pending = max_pending
+        self.app = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self.flushes = 0
+        self.flushed_entries = 0
+        self.failed_flushes = 0
+        self.rejected_entries = 0
+        self.dropped_entries = 0
+        atexit.register(self.flush)
+    
+    def init_app(self, app):
+        """Run flushes inside this Flask app's context"""
+        self.app = app
+    
+    def append(self, delivery_summary: Dict[str, Any]):
+        """Buffer a delivery summary for writing"""
+        row = self._row(delivery_summary)
+        with self._lock:
+            # Database unavailable for a long time; don't grow without bound
+            if len(self._pending) >= self.max_pending:
+                self.dropped_entries += 1
+            else:
+                self._pending.append(row)
+            over_threshold = len(self._pending) >= self.flush_threshold
+        self._ensure_thread()
+        if over_threshold:
+            self._wakeup.set()
+    
+    def flush(self) -> int:
+        """
+        Write all buffered summaries now
+
+        Returns:
+            int: Number of summaries written
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, []
+            
+            try:
+                self._write_in_context(batch)
+            except Exception as e:
+                print(f"Notification log flush failed, retrying one at a time: {str(e)}")
+                self.failed_flushes += 1
+                return self._write_each(batch)
+            
+            self.flushes += 1
+            self.flushed_entries += len(batch)
+            return len(batch)
+    
+    def history(self, council_id: str, limit: Optional[int] = 100,
+                before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        A council's notifications, most recent first
+
+        Args:
+            council_id (str): Council identifier
+            limit (int): Page size (None for everything retained)
+            before (datetime): Only entries older than this (the last
+                timestamp of the previous page)
+        """
+        self.flush()
+        query = NotificationLogEntry.query.filter(NotificationLogEntry.council_id == council_id)
+        if before is not None:
+            query = query.filter(NotificationLogEntry.timestamp < before)
+        query = query.order_by(NotificationLogEntry.timestamp.desc(), NotificationLogEntry.id.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        return [entry.to_dict() for entry in query]
+    
+    def statistics(self, council_id: str, start_date: Optional[date] = None,
+                   end_date: Optional[date] = None) -> Dict[str, Any]:
+        """Totals for a council between two days (inclusive), from the daily rows"""
+        self.flush()
+        stats = NotificationDailyStat
+        conditions = [stats.council_id == council_id]
+        if start_date is not None:
+            conditions.append(stats.day >= start_date)
+        if end_date is not None:
+            conditions.append(stats.day <= end_date)
+        
+        rows = db.session.query(
+            stats.event_type,
+            stats.effective_preference,
+            func.sum(stats.notification_count),
+            func.sum(stats.emails_sent),
+            func.sum(stats.sms_sent),
+            func.sum(stats.delivered_count)
+        ).filter(and_(*conditions)).group_by(stats.event_type, stats.effective_preference).all()
+        
+        summary = {
+            'total_notifications': 0,
+            'emails_sent': 0,
+            'sms_sent': 0,
+            'successful_deliveries': 0,
+            'failed_deliveries': 0,
+            'by_event_type': {},
+            'by_preference': {}
+        }
+        for event_type, preference, count, emails, sms, delivered in rows:
+            count = int(count or 0)
+            summary['total_notifications'] += count
+            summary['emails_sent'] += int(emails or 0)
+            summary['sms_sent'] += int(sms or 0)
+            summary['successful_deliveries'] += int(delivered or 0)
+            summary['failed_deliveries'] += count - int(delivered or 0)
+            summary['by_event_type'][event_type] = summary['by_event_type'].get(event_type, 0) + count
+            summary['by_preference'][preference] = summary['by_preference'].get(preference, 0) + count
+        return summary
+    
+    def compact(self, engine, retention_days: Optional[int] = None, batch_size: int = 5000) -> int:
+        """
+        Delete log entries older than the retention period, a batch at a time
+
+        Returns:
+            int: Entries deleted
+        """
+        cutoff = datetime.now() - timedelta(days=retention_days if retention_days is not None else self.retention_days)
+        log = NotificationLogEntry.__table__
+        deleted = 0
+        while True:
+            # Short transactions so appends are never held up behind one large DELETE
+            with engine.begin() as connection:
+                ids = connection.execute(
+                    select(log.c.id).where(log.c.timestamp < cutoff).order_by(log.c.id).limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    return deleted
+                connection.execute(delete(log).where(log.c.id.in_(ids)))
+            deleted += len(ids)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending_entries': pending,
+            'flushes': self.flushes,
+            'flushed_entries': self.flushed_entries,
+            'failed_flushes': self.failed_flushes,
+            'rejected_entries': self.rejected_entries,
+            'dropped_entries': self.dropped_entries
+        }
+    
+    def _row(self, delivery_summary: Dict[str, Any]) -> Dict[str, Any]:
+        timestamp = delivery_summary.get('timestamp')
+        return {
+            'council_id': delivery_summary['council_id'],
+            'applicant_id': delivery_summary.get('applicant_id'),
+            'event_type': delivery_summary['event_type'],
+            'effective_preference': delivery_summary['effective_preference'],
+            'email_sent': bool(delivery_summary.get('email_sent')),
+            'sms_sent': bool(delivery_summary.get('sms_sent')),
+            'email_result': _truncate(delivery_summary.get('email_result')),
+            'sms_result': _truncate(delivery_summary.get('sms_result')),
+            'result': _truncate(delivery_summary.get('result')),
+            'timestamp': datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+        }
+    
+    def _write_each(self, batch: List[Dict[str, Any]]) -> int:
+        """Write a failed batch row by row so one rejected summary cannot block the log"""
+        written = 0
+        for index, row in enumerate(batch):
+            try:
+                self._write_in_context([row])
+            except (IntegrityError, DataError) as e:
+                # The database will never accept this row; retrying it would stall every flush
+                print(f"Notification log entry rejected and discarded: {str(e)}")
+                self.rejected_entries += 1
+                continue
+            except Exception as e:
+                print(f"Notification log flush failed, will retry: {str(e)}")
+                with self._lock:
+                    self._pending[:0] = batch[index:]
+                    del self._pending[self.max_pending:]
+                break
+            written += 1
+        self.flushed_entries += written
+        return written
+    
+    def _write_in_context(self, batch: List[Dict[str, Any]]):
+        if self.app is not None:
+            with self.app.app_context():
+                self._write(db.engine, batch)
+        else:
+            self._write(db.engine, batch)
+    
+    def _write(self, engine, batch: List[Dict[str, Any]]):
+        daily = {}
+        for row in batch:
+            key = (row['council_id'], row['timestamp'].date(), row['event_type'], row['effective_preference'])
+            counts = daily.setdefault(key, {'notification_count': 0, 'emails_sent': 0, 'sms_sent': 0, 'delivered_count': 0})
+            counts['notification_count'] += 1
+            counts['emails_sent'] += row['email_sent']
+            counts['sms_sent'] += row['sms_sent']
+            counts['delivered_count'] += row['email_sent'] or row['sms_sent']
+        
+        with engine.begin() as connection:
+            connection.execute(NotificationLogEntry.__table__.insert(), batch)
+            for (council_id, day, event_type, preference), counts in daily.items():
+                upsert_increment(connection, NotificationDailyStat.__table__, {
+                    'council_id': council_id,
+                    'day': day,
+                    'event_type': event_type,
+                    'effective_preference': preference
+                }, counts)
+    
+    def _ensure_thread(self):
+        # Same lazy, fork-aware start as BufferedCounter
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='notification-log-flusher', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+def _truncate(value, length: int = 500):
+    return str(value)[:length] if value is not None else None
+
+# Global notification log store instance
+notification_log_store = NotificationLogStore(
+    flush_interval=float(os.environ.get('NOTIFICATION_LOG_FLUSH_SECONDS', 2)),
+    flush_threshold=int(os.environ.get('NOTIFICATION_LOG_FLUSH_THRESHOLD', 500)),
+    retention_days=int(os.environ.get('NOTIFICATION_LOG_RETENTION_DAYS', 90)),
+    max_pending=int(os.environ.get('NOTIFICATION_LOG_MAX_PENDING', 50000))
+)
@@ -4,7 +4,7 @@ Handles both SMS and Email notifications based on admin-configured preferences
 """
 
 import os
-from datetime import datetime
+from datetime import date, datetime
 from ..models.communication_preferences import (
     CommunicationPreferences, 
     ApplicantCommunicationPreferences,
@@ -13,6 +13,22 @@ from ..models.communication_preferences import (
 )
 from ..integrations.sms_api import SMSConnector
 from ..utils.email import EmailService
+from ..utils.email_templates import render_email, council_branding
+from .job_queue_service import job_queue
+from .notification_log_service import notification_log_store
+
+# Subject format and compiled body template (src/templates/email) per event
+EMAIL_TEMPLATES = {
+    NotificationEvent.APPLICATION_RECEIVED: (
+        'Grant Application Received - {grant_title}', 'notification_application_received.html'
+    ),
+    NotificationEvent.APPLICATION_APPROVED: (
+        '🎉 Grant Application APPROVED - {grant_title}', 'notification_application_approved.html'
+    ),
+    NotificationEvent.APPLICATION_REJECTED: (
+        'Grant Application Update - {grant_title}', 'notification_application_rejected.html'
+    )
+}
 
 class NotificationService:
     """
@@ -24,12 +40,14 @@ class NotificationService:
         self.email_service = EmailService()
         self.sms_service = None  # Will be initialized when needed
         
+        # Recipients per bulk notification job (one send_bulk_email call each)
+        self.bulk_batch_size = max(1, int(os.environ.get('NOTIFICATION_BULK_BATCH_SIZE', 100)))
+        
         # In-memory storage for demo (in production, use database)
         self.council_preferences = {}
         self.applicant_preferences = {}
         
-        # Notification tracking
-        self.notification_log = []
+        # Notification tracking is persistent and shared (notification_log_store)
     
     def get_council_preferences(self, council_id):
         """
@@ -97,47 +115,132 @@ class NotificationService:
         
         return self.applicant_preferences[key]
     
-    def send_notification(self, notification_data):
+    def send_notification(self, notification_data, effective_preference=None, log=True):
         """
         Send notification based on council and applicant preferences
         
         Args:
             notification_data (dict): Notification information
+            effective_preference (CommunicationType or str): Channel already resolved
+                when the notification was queued (optional)
+            log (bool): Record the delivery summary in the notification log
             
         Returns:
             tuple: (success: bool, delivery_summary: dict or error_message: str)
         """
         try:
-            # Extract notification data
-            council_id = notification_data.get('council_id')
-            applicant_id = notification_data.get('applicant_id')
-            event_type_str = notification_data.get('event_type')
-            email_address = notification_data.get('email_address')
-            phone_number = notification_data.get('phone_number')
-            grant_data = notification_data.get('grant_data', {})
-            custom_message = notification_data.get('custom_message')
-            
-            # Validate required data
-            if not council_id or not event_type_str:
-                return False, "Council ID and event type are required"
+            notification = self._prepare_notification(notification_data, effective_preference)
+            if isinstance(notification, str):
+                return False, notification
             
-            try:
-                event_type = NotificationEvent(event_type_str)
-            except ValueError:
-                return False, f"Invalid event type: {event_type_str}"
+            # Send email if required
+            if notification['effective_preference'] in [CommunicationType.EMAIL, CommunicationType.BOTH]:
+                if notification['email_address']:
+                    email_success, email_result = self._send_email_notification(
+                        notification['email_address'], notification['event_type'], notification['grant_data'],
+                        notification['custom_message'], notification['council_prefs']
+                    )
+                    notification['summary']['email_sent'] = email_success
+                    notification['summary']['email_result'] = email_result
+                else:
+                    notification['summary']['email_result'] = "No email address provided"
             
-            # Get preferences
-            council_prefs = self.get_council_preferences(council_id)
+            return self._finish_notification(notification, log)
             
-            # Determine effective communication preference
-            if applicant_id and council_prefs.allow_applicant_preference_override:
-                applicant_prefs = self.get_applicant_preferences(applicant_id, council_id)
-                effective_preference = applicant_prefs.get_effective_preference(council_prefs, event_type)
-            else:
-                effective_preference = council_prefs.get_communication_preference(event_type)
+        except Exception as e:
+            return False, f"Notification service error: {str(e)}"
+    
+    def send_notification_batch(self, notifications, log=True):
+        """
+        Send many notifications, with all their emails in one send_bulk_email call
+        
+        Args:
+            notifications (list): (notification_data, effective_preference) pairs;
+                effective_preference may be None
+            log (bool): Record the delivery summaries in the notification log
             
-            # Prepare delivery summary
-            delivery_summary = {
+        Returns:
+            list: (success, delivery_summary or error_message) per notification, in order
+        """
+        results = [None] * len(notifications)
+        prepared = []
+        messages = []
+        emailed = []
+        for index, (notification_data, effective_preference) in enumerate(notifications):
+            try:
+                notification = self._prepare_notification(notification_data, effective_preference)
+                if isinstance(notification, str):
+                    results[index] = (False, notification)
+                    continue
+                prepared.append((index, notification))
+                
+                if notification['effective_preference'] in [CommunicationType.EMAIL, CommunicationType.BOTH]:
+                    if notification['email_address']:
+                        subject, body = self._email_content(notification)
+                        messages.append({
+                            'to_email': notification['email_address'],
+                            'subject': subject,
+                            'html_content': body
+                        })
+                        emailed.append(notification)
+                    else:
+                        notification['summary']['email_result'] = "No email address provided"
+            
+            except Exception as e:
+                results[index] = (False, f"Notification service error: {str(e)}")
+        
+        if messages:
+            try:
+                outcomes = self.email_service.send_bulk_email(messages)
+            except Exception as e:
+                outcomes = [{'success': False, 'error': str(e)}] * len(messages)
+            
+            for notification, outcome in zip(emailed, outcomes):
+                notification['summary']['email_sent'] = outcome['success']
+                notification['summary']['email_result'] = "Email sent" if outcome['success'] else \
+                    f"Email delivery failed: {outcome.get('error')}"
+        
+        for index, notification in prepared:
+            try:
+                results[index] = self._finish_notification(notification, log)
+            except Exception as e:
+                results[index] = (False, f"Notification service error: {str(e)}")
+        
+        return results
+    
+    def _prepare_notification(self, notification_data, effective_preference=None):
+        """Validated notification with its channel and an empty delivery summary, or an error message"""
+        council_id = notification_data.get('council_id')
+        applicant_id = notification_data.get('applicant_id')
+        event_type_str = notification_data.get('event_type')
+        
+        # Validate required data
+        if not council_id or not event_type_str:
+            return "Council ID and event type are required"
+        
+        try:
+            event_type = NotificationEvent(event_type_str)
+        except ValueError:
+            return f"Invalid event type: {event_type_str}"
+        
+        # Get preferences
+        council_prefs = self.get_council_preferences(council_id)
+        
+        # Determine effective communication preference
+        if effective_preference is None:
+            effective_preference = self._resolve_preference(council_prefs, applicant_id, event_type)
+        else:
+            effective_preference = CommunicationType(effective_preference)
+        
+        return {
+            'event_type': event_type,
+            'council_prefs': council_prefs,
+            'effective_preference': effective_preference,
+            'email_address': notification_data.get('email_address'),
+            'phone_number': notification_data.get('phone_number'),
+            'grant_data': notification_data.get('grant_data', {}),
+            'custom_message': notification_data.get('custom_message'),
+            'summary': {
                 'council_id': council_id,
                 'applicant_id': applicant_id,
                 'event_type': event_type_str,
@@ -148,49 +251,161 @@ class NotificationService:
                 'sms_result': None,
                 'timestamp': datetime.now().isoformat()
             }
+        }
+    
+    def _finish_notification(self, notification, log=True):
+        """Send the SMS part, decide overall success and (if log) log the delivery summary"""
+        effective_preference = notification['effective_preference']
+        council_prefs = notification['council_prefs']
+        phone_number = notification['phone_number']
+        delivery_summary = notification['summary']
+        
+        # Send SMS if required
+        if effective_preference in [CommunicationType.SMS, CommunicationType.BOTH]:
+            if phone_number and council_prefs.is_within_business_hours():
+                sms_success, sms_result = self._send_sms_notification(
+                    phone_number, notification['event_type'], notification['grant_data'],
+                    notification['custom_message'], council_prefs
+                )
+                delivery_summary['sms_sent'] = sms_success
+                delivery_summary['sms_result'] = sms_result
+            elif not phone_number:
+                delivery_summary['sms_result'] = "No phone number provided"
+            else:
+                delivery_summary['sms_result'] = "Outside business hours - SMS not sent"
+        
+        # Determine overall success
+        if effective_preference == CommunicationType.EMAIL:
+            success = delivery_summary['email_sent']
+        elif effective_preference == CommunicationType.SMS:
+            success = delivery_summary['sms_sent']
+        elif effective_preference == CommunicationType.BOTH:
+            success = delivery_summary['email_sent'] or delivery_summary['sms_sent']
+        else:  # NONE
+            success = True  # Successfully did nothing
+            delivery_summary['result'] = "No communication required (preference: NONE)"
+        
+        # Log notification (buffered, written to notification_log in batches)
+        if log:
+            notification_log_store.append(delivery_summary)
+        
+        return success, delivery_summary
+    
+    def enqueue_notification(self, notification_data):
+        """
+        Queue a notification for a job worker instead of sending it in the request
+        
+        The channel is resolved now, and the council's preferences travel
+        with the job, so the worker sends what this process would have sent.
+        
+        Args:
+            notification_data (dict): Notification information
             
-            # Send email if required
-            if effective_preference in [CommunicationType.EMAIL, CommunicationType.BOTH]:
-                if email_address:
-                    email_success, email_result = self._send_email_notification(
-                        email_address, event_type, grant_data, custom_message, council_prefs
-                    )
-                    delivery_summary['email_sent'] = email_success
-                    delivery_summary['email_result'] = email_result
-                else:
-                    delivery_summary['email_result'] = "No email address provided"
-            
-            # Send SMS if required
-            if effective_preference in [CommunicationType.SMS, CommunicationType.BOTH]:
-                if phone_number and council_prefs.is_within_business_hours():
-                    sms_success, sms_result = self._send_sms_notification(
-                        phone_number, event_type, grant_data, custom_message, council_prefs
-                    )
-                    delivery_summary['sms_sent'] = sms_success
-                    delivery_summary['sms_result'] = sms_result
-                elif not phone_number:
-                    delivery_summary['sms_result'] = "No phone number provided"
-                else:
-                    delivery_summary['sms_result'] = "Outside business hours - SMS not sent"
+        Returns:
+            tuple: (success: bool, queued: dict or error_message: str)
+        """
+        try:
+            payload = self._job_payload(notification_data)
+            if isinstance(payload, str):
+                return False, payload
             
-            # Log notification
-            self.notification_log.append(delivery_summary)
+            job_id = job_queue.enqueue('notifications.send', payload)
+            return True, {'job_id': job_id, 'effective_preference': payload['effective_preference']}
+        
+        except Exception as e:
+            return False, f"Notification service error: {str(e)}"
+    
+    def enqueue_bulk_notification(self, bulk_notification_data):
+        """
+        Queue notification jobs for many recipients, bulk_batch_size per job
+        
+        Each job sends its recipients' emails in one send_bulk_email call.
+        
+        Args:
+            bulk_notification_data (dict): Bulk notification information
             
-            # Determine overall success
-            if effective_preference == CommunicationType.EMAIL:
-                success = delivery_summary['email_sent']
-            elif effective_preference == CommunicationType.SMS:
-                success = delivery_summary['sms_sent']
-            elif effective_preference == CommunicationType.BOTH:
-                success = delivery_summary['email_sent'] or delivery_summary['sms_sent']
-            else:  # NONE
-                success = True  # Successfully did nothing
-                delivery_summary['result'] = "No communication required (preference: NONE)"
+        Returns:
+            tuple: (success: bool, queued_summary: dict or error_message: str)
+        """
+        try:
+            recipients = bulk_notification_data.get('recipients', [])
+            base_notification = bulk_notification_data.get('notification_template', {})
             
-            return success, delivery_summary
+            if not recipients:
+                return False, "No recipients provided"
             
+            payloads = []
+            rejected = []
+            for recipient in recipients:
+                payload = self._job_payload({**base_notification, **recipient})
+                if isinstance(payload, str):
+                    rejected.append({'recipient': recipient.get('applicant_id', 'unknown'), 'error': payload})
+                else:
+                    payloads.append(payload)
+            
+            batches = [
+                self._batch_payload(payloads[start:start + self.bulk_batch_size])
+                for start in range(0, len(payloads), self.bulk_batch_size)
+            ]
+            job_queue.enqueue_many('notifications.send_batch', batches)
+            return len(payloads) > 0, {
+                'total_recipients': len(recipients),
+                'queued': len(payloads),
+                'jobs': len(batches),
+                'rejected': rejected
+            }
+        
         except Exception as e:
-            return False, f"Notification service error: {str(e)}"
+            return False, f"Bulk notification error: {str(e)}"
+    
+    def _resolve_preference(self, council_prefs, applicant_id, event_type):
+        if applicant_id and council_prefs.allow_applicant_preference_override:
+            applicant_prefs = self.get_applicant_preferences(applicant_id, council_prefs.council_id)
+            return applicant_prefs.get_effective_preference(council_prefs, event_type)
+        return council_prefs.get_communication_preference(event_type)
+    
+    def _job_payload(self, notification_data):
+        """Job payload for a notification, or an error message if it cannot be sent"""
+        council_id = notification_data.get('council_id')
+        event_type_str = notification_data.get('event_type')
+        if not council_id or not event_type_str:
+            return "Council ID and event type are required"
+        
+        try:
+            event_type = NotificationEvent(event_type_str)
+        except ValueError:
+            return f"Invalid event type: {event_type_str}"
+        
+        council_prefs = self.get_council_preferences(council_id)
+        effective_preference = self._resolve_preference(
+            council_prefs, notification_data.get('applicant_id'), event_type
+        )
+        return {
+            'notification_data': notification_data,
+            'effective_preference': effective_preference.value,
+            'council_preferences': council_prefs.to_dict()
+        }
+    
+    def _batch_payload(self, payloads):
+        """One batch job payload for several single-notification payloads"""
+        return {
+            'notifications': [
+                {'notification_data': p['notification_data'], 'effective_preference': p['effective_preference']}
+                for p in payloads
+            ],
+            'council_preferences': {
+                p['council_preferences']['council_id']: p['council_preferences'] for p in payloads
+            }
+        }
+    
+    def _email_content(self, notification):
+        """(subject, body) of a prepared notification's email"""
+        council_id = notification['council_prefs'].council_id
+        if notification['custom_message']:
+            return self._generate_custom_email(
+                notification['event_type'], notification['grant_data'], notification['custom_message'], council_id
+            )
+        return self._generate_standard_email(notification['event_type'], notification['grant_data'], council_id)
     
     def _send_email_notification(self, email_address, event_type, grant_data, custom_message, council_prefs):
         """
@@ -209,19 +424,20 @@ class NotificationService:
         try:
             # Generate email content
             if custom_message:
-                subject, body = self._generate_custom_email(event_type, grant_data, custom_message)
+                subject, body = self._generate_custom_email(
+                    event_type, grant_data, custom_message, council_prefs.council_id
+                )
             else:
-                subject, body = self._generate_standard_email(event_type, grant_data)
+                subject, body = self._generate_standard_email(event_type, grant_data, council_prefs.council_id)
             
             # Send email using email service
-            success, result = self.email_service.send_email(
+            success = self.email_service.send_email(
                 to_email=email_address,
                 subject=subject,
-                body=body,
-                is_html=True
+                html_content=body
             )
             
-            return success, result
+            return success, "Email sent" if success else "Email delivery failed"
             
         except Exception as e:
             return False, f"Email sending error: {str(e)}"
@@ -270,87 +486,44 @@ class NotificationService:
         except Exception as e:
             return False, f"SMS sending error: {str(e)}"
     
-    def _generate_standard_email(self, event_type, grant_data):
+    def _generate_standard_email(self, event_type, grant_data, council_id=None):
         """
         Generate standard email content for event type
         
         Args:
             event_type (NotificationEvent): Type of notification
             grant_data (dict): Grant information
+            council_id (str): Council whose branding to use (optional)
             
         Returns:
             tuple: (subject: str, body: str)
         """
         grant_title = grant_data.get('grant_title', 'Grant Application')
         grant_id = grant_data.get('grant_id', 'N/A')
-        organization = grant_data.get('organization_name', '')
-        amount = grant_data.get('funding_amount', 0)
-        
-        email_templates = {
-            NotificationEvent.APPLICATION_RECEIVED: {
-                'subject': f'Grant Application Received - {grant_title}',
-                'body': f'''
-                <h2>Application Received Successfully</h2>
-                <p>Dear {organization},</p>
-                <p>We have successfully received your grant application:</p>
-                <ul>
-                    <li><strong>Grant:</strong> {grant_title}</li>
-                    <li><strong>Application ID:</strong> {grant_id}</li>
-                    <li><strong>Funding Requested:</strong> ${amount:,.2f}</li>
-                </ul>
-                <p>We will review your application and notify you of the outcome.</p>
-                <p>Thank you for applying!</p>
-                <p>Best regards,<br>GrantThrive Platform</p>
-                '''
-            },
-            NotificationEvent.APPLICATION_APPROVED: {
-                'subject': f'🎉 Grant Application APPROVED - {grant_title}',
-                'body': f'''
-                <h2 style="color: #28a745;">Congratulations! Your Grant Application Has Been Approved</h2>
-                <p>Dear {organization},</p>
-                <p>We are delighted to inform you that your grant application has been <strong>APPROVED</strong>:</p>
-                <ul>
-                    <li><strong>Grant:</strong> {grant_title}</li>
-                    <li><strong>Application ID:</strong> {grant_id}</li>
-                    <li><strong>Approved Amount:</strong> ${amount:,.2f}</li>
-                </ul>
-                <p>Please check your GrantThrive account for next steps and required documentation.</p>
-                <p>Congratulations on this achievement!</p>
-                <p>Best regards,<br>GrantThrive Platform</p>
-                '''
-            },
-            NotificationEvent.APPLICATION_REJECTED: {
-                'subject': f'Grant Application Update - {grant_title}',
-                'body': f'''
-                <h2>Grant Application Update</h2>
-                <p>Dear {organization},</p>
-                <p>Thank you for your interest in our grant program. Unfortunately, your application was not successful this time:</p>
-                <ul>
-                    <li><strong>Grant:</strong> {grant_title}</li>
-                    <li><strong>Application ID:</strong> {grant_id}</li>
-                </ul>
-                <p>Please check your GrantThrive account for detailed feedback and information about future opportunities.</p>
-                <p>We encourage you to apply for future grants that match your organization's goals.</p>
-                <p>Best regards,<br>GrantThrive Platform</p>
-                '''
-            }
-        }
         
-        template = email_templates.get(event_type, {
-            'subject': f'Grant Update - {grant_title}',
-            'body': f'<p>You have a new update regarding your grant application {grant_id}.</p>'
-        })
+        subject_format, template_name = EMAIL_TEMPLATES.get(
+            event_type, ('Grant Update - {grant_title}', 'notification_update.html')
+        )
+        body = render_email(
+            template_name,
+            grant_title=grant_title,
+            grant_id=grant_id,
+            organization=grant_data.get('organization_name', ''),
+            amount=grant_data.get('funding_amount', 0),
+            branding=council_branding(council_id)
+        )
         
-        return template['subject'], template['body']
+        return subject_format.format(grant_title=grant_title), body
     
-    def _generate_custom_email(self, event_type, grant_data, custom_message):
+    def _generate_custom_email(self, event_type, grant_data, custom_message, council_id=None):
         """
         Generate custom email content
         
         Args:
             event_type (NotificationEvent): Type of notification
             grant_data (dict): Grant information
-            custom_message (str): Custom message content
+            custom_message (str): Custom message content (trusted HTML from council staff)
+            council_id (str): Council whose branding to use (optional)
             
         Returns:
             tuple: (subject: str, body: str)
@@ -358,13 +531,11 @@ class NotificationService:
         grant_title = grant_data.get('grant_title', 'Grant Application')
         
         subject = f'Grant Update - {grant_title}'
-        body = f'''
-        <h2>Grant Program Update</h2>
-        <div style="background-color: #f8f9fa; padding: 15px; border-left: 4px solid #007bff; margin: 20px 0;">
-            {custom_message}
-        </div>
-        <p>Best regards,<br>GrantThrive Platform</p>
-        '''
+        body = render_email(
+            'notification_custom.html',
+            custom_message=custom_message,
+            branding=council_branding(council_id)
+        )
         
         return subject, body
     
@@ -410,12 +581,13 @@ class NotificationService:
                 'results': []
             }
             
-            for recipient in recipients:
-                # Merge recipient data with base notification
-                notification_data = {**base_notification, **recipient}
-                
-                success, delivery_result = self.send_notification(notification_data)
-                
+            # Merge recipient data with base notification; the emails go out in
+            # parallel over the pooled, rate-limited SMTP engine
+            outcomes = self.send_notification_batch(
+                [({**base_notification, **recipient}, None) for recipient in recipients]
+            )
+            
+            for recipient, (success, delivery_result) in zip(recipients, outcomes):
                 if success:
                     results_summary['successful_deliveries'] += 1
                     if delivery_result.get('email_sent'):
@@ -437,29 +609,21 @@ class NotificationService:
         except Exception as e:
             return False, f"Bulk notification error: {str(e)}"
     
-    def get_notification_history(self, council_id, limit=100):
+    def get_notification_history(self, council_id, limit=100, before=None):
         """
         Get notification history for a council
         
         Args:
             council_id (str): Council identifier
             limit (int): Maximum number of records to return
+            before (str): ISO timestamp; only older records (next page) (optional)
             
         Returns:
-            list: Notification history
+            list: Notification history, most recent first
         """
-        council_notifications = [
-            log for log in self.notification_log 
-            if log.get('council_id') == council_id
-        ]
-        
-        # Sort by timestamp (most recent first)
-        council_notifications.sort(
-            key=lambda x: x.get('timestamp', ''), 
-            reverse=True
+        return notification_log_store.history(
+            council_id, limit, datetime.fromisoformat(before) if before else None
         )
-        
-        return council_notifications[:limit]
     
     def get_notification_statistics(self, council_id, start_date=None, end_date=None):
         """
@@ -467,43 +631,85 @@ class NotificationService:
         
         Args:
             council_id (str): Council identifier
-            start_date (str): Start date filter (optional)
-            end_date (str): End date filter (optional)
+            start_date (str): First day to include, ISO date (optional)
+            end_date (str): Last day to include, ISO date (optional)
             
         Returns:
             dict: Notification statistics
         """
-        notifications = self.get_notification_history(council_id, limit=None)
-        
-        # Filter by date range if provided
-        if start_date or end_date:
-            filtered_notifications = []
-            for notif in notifications:
-                notif_date = notif.get('timestamp', '')
-                if start_date and notif_date < start_date:
-                    continue
-                if end_date and notif_date > end_date:
-                    continue
-                filtered_notifications.append(notif)
-            notifications = filtered_notifications
-        
-        stats = {
-            'total_notifications': len(notifications),
-            'emails_sent': sum(1 for n in notifications if n.get('email_sent')),
-            'sms_sent': sum(1 for n in notifications if n.get('sms_sent')),
-            'successful_deliveries': sum(1 for n in notifications if n.get('email_sent') or n.get('sms_sent')),
-            'failed_deliveries': sum(1 for n in notifications if not n.get('email_sent') and not n.get('sms_sent')),
-            'by_event_type': {},
-            'by_preference': {}
-        }
-        
-        # Count by event type and preference
-        for notif in notifications:
-            event_type = notif.get('event_type', 'unknown')
-            preference = notif.get('effective_preference', 'unknown')
-            
-            stats['by_event_type'][event_type] = stats['by_event_type'].get(event_type, 0) + 1
-            stats['by_preference'][preference] = stats['by_preference'].get(preference, 0) + 1
-        
-        return stats
+        return notification_log_store.statistics(
+            council_id,
+            date.fromisoformat(start_date[:10]) if start_date else None,
+            date.fromisoformat(end_date[:10]) if end_date else None
+        )
+
+@job_queue.task('notifications.send', queue='notifications')
+def send_queued_notification(payload):
+    """Worker side of enqueue_notification; raises so the job is retried when nothing was delivered"""
+    service = NotificationService()
+    council_prefs = CommunicationPreferences.from_dict(payload['council_preferences'])
+    service.council_preferences[council_prefs.council_id] = council_prefs
+    
+    success, result = service.send_notification(
+        payload['notification_data'], payload['effective_preference'], log=False
+    )
+    # A retried notification is logged once, with its final outcome
+    job = job_queue.current_job()
+    if isinstance(result, dict) and (success or job is None or job['attempts'] >= job['max_attempts']):
+        notification_log_store.append(result)
+    if not success:
+        raise RuntimeError(result if isinstance(result, str) else
+                           result.get('email_result') or result.get('sms_result') or 'Notification not delivered')
+    return result
+
+@job_queue.task('notifications.send_batch', queue='notifications', max_attempts=1)
+def send_queued_notification_batch(payload):
+    """
+    Worker side of enqueue_bulk_notification
 
+    The batch job itself is never retried (max_attempts=1), since that
+    would send again to the recipients already delivered; each
+    notification that was attempted but not delivered is queued as its
+    own notifications.send job, which is.
+    """
+    service = NotificationService()
+    for prefs in payload['council_preferences'].values():
+        council_prefs = CommunicationPreferences.from_dict(prefs)
+        service.council_preferences[council_prefs.council_id] = council_prefs
+    
+    notifications = payload['notifications']
+    results = service.send_notification_batch(
+        [(item['notification_data'], item['effective_preference']) for item in notifications], log=False
+    )
+    retry_indexes = [
+        index for index, (success, result) in enumerate(results) if not success and isinstance(result, dict)
+    ]
+    retries = [
+        {**notifications[index],
+         'council_preferences': payload['council_preferences'][notifications[index]['notification_data']['council_id']]}
+        for index in retry_indexes
+    ]
+    summary = {
+        'sent': sum(1 for success, _ in results if success),
+        'retried': len(retries),
+        'failed': sum(1 for success, _ in results if not success) - len(retries)
+    }
+    retried = set(retry_indexes)
+    try:
+        job_queue.enqueue_many('notifications.send', retries)
+    except Exception as e:
+        retried = set()
+        # Raising would only mark this job dead; keep who was not retried in its result
+        print(f"Notification retries not queued ({len(retries)} recipients): {str(e)}")
+        summary.update({
+            'retried': 0,
+            'failed': summary['failed'] + len(retries),
+            'retry_error': str(e),
+            'not_retried': [item['notification_data'].get('applicant_id', 'unknown') for item in retries]
+        })
+    
+    # Retried notifications are logged by their own job once it settles
+    for index, (success, result) in enumerate(results):
+        if isinstance(result, dict) and index not in retried:
+            notification_log_store.append(result)
+    return summary
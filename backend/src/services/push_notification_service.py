@@ -5,8 +5,9 @@ Enables real-time browser push notifications for grant updates
 
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
+from .job_queue_service import job_queue
 
 class PushNotificationService:
     """
@@ -258,20 +259,17 @@ class PushNotificationService:
             
             payload = self.create_notification_payload(notification_type, data)
             
-            # In production, this would store in database and use a job queue
-            notification_record = {
-                'id': f"notif_{int(datetime.now().timestamp())}_{user_id}",
+            # Stored as a background job that becomes runnable at send_time
+            # (job times are naive UTC; a naive send_time is server local time)
+            job_id = job_queue.enqueue('push.send', {
                 'user_id': user_id,
-                'type': notification_type,
-                'payload': payload,
-                'scheduled_time': send_time.isoformat(),
-                'status': 'scheduled',
-                'created_at': datetime.now().isoformat()
-            }
+                'notification_type': notification_type,
+                'data': data
+            }, run_at=send_time.astimezone(timezone.utc).replace(tzinfo=None))
             
             return {
                 'success': True,
-                'notification_id': notification_record['id'],
+                'notification_id': job_id,
                 'scheduled_time': send_time.isoformat(),
                 'payload': payload
             }
@@ -483,3 +481,12 @@ class PushNotificationService:
         """
         return self.vapid_public_key
 
+@job_queue.task('push.send', queue='push', max_attempts=3)
+def send_scheduled_push(payload):
+    """Worker side of schedule_notification"""
+    result = PushNotificationService().send_immediate_notification(
+        payload['user_id'], payload['notification_type'], payload['data']
+    )
+    if not result.get('success'):
+        raise RuntimeError(result.get('error') or 'Push notification not sent')
+    return {'sent_at': result.get('sent_at'), 'delivery_status': result.get('delivery_status')}
@@ -0,0 +1,503 @@
+"""
+Vote Ingestion Service for GrantThrive
+High-throughput vote intake for busy campaigns: in-memory validation, a
+durable local spool and batched database writes
+"""
+
+import os
+import json
+import time
+import fcntl
+import queue
+import atexit
+import socket
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, func, and_, update
+from ..models.community_voting import (
+    VotingCampaign, VotingOption, CommunityVote, VoteIngestCheckpoint
+)
+from .community_voting_service import CommunityVotingService
+from .voting_analytics_service import voting_analytics_service
+from ..utils.db_helpers import is_rejected_row
+
+class VoteSpool:
+    """
+    Append-only JSON Lines spool of accepted votes
+
+    Every accepted vote is written (and flushed) with a sequence number
+    before it is acknowledged, so a restart loses nothing that was
+    accepted. The database keeps the highest sequence number written per
+    spool in vote_ingest_checkpoints, in the same transaction as the votes,
+    so replay after a crash is exactly-once. Once everything spooled has
+    been written the file is truncated.
+
+    A spool belongs to one process at a time: claim() takes an exclusive
+    lock on the first free slot file (<stem>.0.jsonl, <stem>.1.jsonl, ...),
+    so each web worker has its own spool, sequence numbers and checkpoint
+    row, and a restarted worker picks up whatever a crashed one left in
+    its slot.
+    """
+    
+    MAX_SLOTS = 64
+    
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self.spool_id = f"{socket.gethostname()}:{os.path.abspath(path)}"
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.close()
+            raise
+        self._last_seq = max((entry['seq'] for entry in self.read()), default=0)
+    
+    @classmethod
+    def claim(cls, path: str, fsync: bool = False) -> 'VoteSpool':
+        """Open the first spool slot for path that no other process holds"""
+        stem, extension = os.path.splitext(path)
+        for slot in range(cls.MAX_SLOTS):
+            try:
+                return cls(f"{stem}.{slot}{extension}", fsync=fsync)
+            except BlockingIOError:
+                continue
+        raise RuntimeError(f"All {cls.MAX_SLOTS} vote spool slots for {path} are in use")
+    
+    def advance_to(self, seq: int):
+        """Never hand out a sequence number at or below seq (the committed checkpoint)"""
+        with self._lock:
+            self._last_seq = max(self._last_seq, seq)
+    
+    def append(self, vote: Dict[str, Any]) -> int:
+        with self._lock:
+            self._last_seq += 1
+            entry = dict(vote, seq=self._last_seq)
+            self._file.write(json.dumps(entry, default=str) + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            return self._last_seq
+    
+    def read(self) -> List[Dict[str, Any]]:
+        """Every intact entry in the spool; a torn final line is skipped"""
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+    
+    def compact(self, committed_seq: int) -> bool:
+        """Truncate the spool if every entry in it has been written"""
+        with self._lock:
+            if committed_seq < self._last_seq:
+                return False
+            self._file.truncate(0)
+            self._file.seek(0)
+            return True
+    
+    def close(self):
+        # Closing releases the slot lock; LOCK_UN is not used because a
+        # forked child shares the lock with its parent
+        with self._lock:
+            self._file.close()
+
+class VoteIngestionService:
+    """
+    Accepts votes in memory and writes them to the database in batches
+
+    submit() validates against cached campaign windows/options and cached
+    per-voter vote counts (warmed with one GROUP BY per campaign on the
+    (campaign_id, voter_hash) index), spools the vote and queues it. A
+    single writer thread drains the queue in batches: one transaction
+    re-checks the per-voter limit against the database (other workers may
+    have accepted votes too), inserts the batch, applies the analytics
+    deltas and advances the spool checkpoint.
+
+    When the queue is full submit() refuses the vote instead of letting
+    the backlog grow without bound; callers answer 503 with Retry-After.
+    """
+    
+    def __init__(self, spool_path: str, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.2, campaign_ttl: float = 60.0, fsync: bool = False):
+        self.spool_path = spool_path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.campaign_ttl = campaign_ttl
+        self.fsync = fsync
+        self.engine = None
+        self.spool = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._campaigns = {}  # campaign id -> (loaded at, campaign settings dict)
+        self._voter_counts = {}  # campaign id -> {voter hash: votes in the database}
+        self._pending = Counter()  # (campaign id, voter hash) -> accepted but not yet written
+        self._thread = None
+        self._stopping = threading.Event()
+        self._committed_seq = 0
+        self.stats = Counter()
+    
+    def start(self, engine):
+        """Bind to an engine, replay unwritten spooled votes and start the writer"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.engine = engine
+            VoteIngestCheckpoint.__table__.create(engine, checkfirst=True)
+            self.spool = VoteSpool.claim(self.spool_path, fsync=self.fsync)
+            self._committed_seq = self._load_checkpoint()
+            # The spool may have been compacted to empty since the checkpoint was written
+            self.spool.advance_to(self._committed_seq)
+        
+        replayed = 0
+        for entry in self.spool.read():
+            if entry['seq'] > self._committed_seq:
+                self._pending[(entry['campaign_id'], entry['voter_hash'])] += 1
+                self._queue.put(entry)
+                replayed += 1
+        if replayed:
+            print(f"Vote ingestion replaying {replayed} spooled votes")
+        
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='vote-ingestion-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+    
+    def submit(self, campaign_id: int, option_id: int, voter_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate and queue a vote
+
+        Returns:
+            dict: success flag plus either 'queued' or an 'error' and, for
+            backpressure, 'retry_after' seconds
+        """
+        campaign = self._campaign(campaign_id)
+        if campaign is None:
+            return self._reject('campaign_not_found', 'Campaign not found')
+        
+        now = datetime.utcnow()
+        if not campaign['is_active'] or now < campaign['start_date'] or now > campaign['end_date']:
+            return self._reject('outside_window', 'Voting period is not active')
+        if option_id not in campaign['option_ids']:
+            return self._reject('invalid_option', 'Invalid voting option')
+        
+        voter_data = self._voter_fields(voter_data)
+        if isinstance(voter_data, str):
+            return self._reject('invalid_voter_data', voter_data)
+        
+        voter_hash = CommunityVotingService.hash_voter(voter_data)
+        vote = {
+            'campaign_id': campaign_id,
+            'option_id': option_id,
+            'voter_hash': voter_hash,
+            'voter_postcode': voter_data.get('postcode'),
+            'voter_age_group': voter_data.get('age_group'),
+            'ip_address_hash': CommunityVotingService.hash_ip(voter_data),
+            'is_verified': bool(voter_data.get('is_verified', False)),
+            'verification_method': voter_data.get('verification_method', 'none'),
+            'vote_timestamp': now.isoformat()
+        }
+        
+        key = (campaign_id, voter_hash)
+        with self._lock:
+            if self._queue.full():
+                self.stats['rejected_backpressure'] += 1
+                return {'success': False, 'error': 'Vote queue is full, please retry', 'retry_after': 1}
+            if not campaign['allow_anonymous_voting']:
+                cast = self._voter_counts[campaign_id].get(voter_hash, 0) + self._pending[key]
+                if cast >= campaign['max_votes_per_user']:
+                    self.stats['rejected_max_votes'] += 1
+                    return {'success': False, 'error': 'Maximum votes per user exceeded'}
+            self._pending[key] += 1
+            vote['seq'] = self.spool.append(vote)
+            self._queue.put_nowait(vote)
+            self.stats['accepted'] += 1
+        
+        return {'success': True, 'queued': True, 'message': 'Vote received'}
+    
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wait until everything queued so far has been written"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.01)
+        return False
+    
+    def stop(self):
+        """Write what is queued and stop the writer; unwritten votes stay in the spool"""
+        if self._thread is None:
+            return
+        self.flush()
+        self._stopping.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'committed_seq': self._committed_seq,
+                'campaigns_cached': len(self._campaigns),
+                **self.stats
+            }
+    
+    # Writer
+    
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            delay = 0.5
+            while True:
+                # Votes settled before a failure part way through a split batch are not written again
+                remaining = [vote for vote in batch if vote['seq'] > self._committed_seq]
+                if not remaining:
+                    break
+                try:
+                    self._write_batch(remaining)
+                    break
+                except Exception as e:
+                    # Keep the batch (it is still spooled) and retry; never drop accepted votes
+                    self.stats['write_failures'] += 1
+                    print(f"Vote ingestion batch write failed, retrying: {str(e)}")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 30)
+            for _ in batch:
+                self._queue.task_done()
+    
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        """
+        Write a batch, or split it when the database refuses some of its votes
+
+        A vote the database rejects on its own (bad value, over-length
+        field) is dead-lettered: logged, counted and checkpointed past, so
+        it cannot stall the writer or be replayed from the spool.
+        """
+        try:
+            self._write_votes(batch)
+        except Exception as e:
+            if not is_rejected_row(e):
+                raise
+            if len(batch) == 1:
+                self._dead_letter(batch[0], e)
+                return
+            print(f"Vote ingestion batch of {len(batch)} rejected, writing one at a time: {str(e)}")
+            for vote in batch:
+                self._write_batch([vote])
+    
+    def _dead_letter(self, vote: Dict[str, Any], error: Exception):
+        print(f"Vote rejected by the database and discarded: {json.dumps(vote)} ({str(error)})")
+        with self.engine.begin() as connection:
+            self._save_checkpoint(connection, vote['seq'])
+        self._settle([vote], [], 0)
+        with self._lock:
+            self.stats['dead_lettered'] += 1
+    
+    def _write_votes(self, batch: List[Dict[str, Any]]):
+        votes = CommunityVote.__table__
+        written, rejected = [], 0
+        
+        with self.engine.begin() as connection:
+            # Authoritative per-voter limit check; other processes may have written votes too
+            limits = self._limits(connection, {vote['campaign_id'] for vote in batch})
+            counts = {}
+            for campaign_id in limits:
+                voter_hashes = {vote['voter_hash'] for vote in batch if vote['campaign_id'] == campaign_id}
+                counts.update({
+                    (campaign_id, voter_hash): count
+                    for voter_hash, count in connection.execute(
+                        select(votes.c.voter_hash, func.count()).where(and_(
+                            votes.c.campaign_id == campaign_id,
+                            votes.c.voter_hash.in_(voter_hashes)
+                        )).group_by(votes.c.voter_hash)
+                    )
+                })
+            
+            for vote in batch:
+                key = (vote['campaign_id'], vote['voter_hash'])
+                limit = limits.get(vote['campaign_id'])
+                if limit is not None and counts.get(key, 0) >= limit:
+                    rejected += 1
+                    continue
+                counts[key] = counts.get(key, 0) + 1
+                written.append(vote)
+            
+            if written:
+                connection.execute(votes.insert(), [
+                    {
+                        'campaign_id': vote['campaign_id'],
+                        'option_id': vote['option_id'],
+                        'voter_hash': vote['voter_hash'],
+                        'voter_postcode': vote['voter_postcode'],
+                        'voter_age_group': vote['voter_age_group'],
+                        'ip_address_hash': vote['ip_address_hash'],
+                        'is_verified': vote['is_verified'],
+                        'verification_method': vote['verification_method'],
+                        'vote_timestamp': datetime.fromisoformat(vote['vote_timestamp'])
+                    }
+                    for vote in written
+                ])
+                voting_analytics_service.apply_votes(connection, written)
+            
+            self._save_checkpoint(connection, max(vote['seq'] for vote in batch))
+        
+        self._settle(batch, written, rejected)
+    
+    def _settle(self, batch: List[Dict[str, Any]], written: List[Dict[str, Any]], rejected: int):
+        """Bookkeeping once a batch's checkpoint is committed"""
+        with self._lock:
+            self._committed_seq = max(vote['seq'] for vote in batch)
+            for vote in batch:
+                key = (vote['campaign_id'], vote['voter_hash'])
+                self._pending[key] -= 1
+                if self._pending[key] <= 0:
+                    del self._pending[key]
+            for vote in written:
+                cached = self._voter_counts.get(vote['campaign_id'])
+                if cached is not None:
+                    cached[vote['voter_hash']] = cached.get(vote['voter_hash'], 0) + 1
+            self.stats['written'] += len(written)
+            self.stats['rejected_at_write'] += rejected
+            self.stats['batches'] += 1
+            if self._queue.qsize() == 0:
+                self.spool.compact(self._committed_seq)
+    
+    # Caches
+    
+    def _campaign(self, campaign_id: int) -> Optional[Dict[str, Any]]:
+        cached = self._campaigns.get(campaign_id)
+        if cached is not None and time.monotonic() - cached[0] < self.campaign_ttl:
+            return cached[1]
+        
+        campaigns = VotingCampaign.__table__
+        options = VotingOption.__table__
+        votes = CommunityVote.__table__
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(campaigns).where(campaigns.c.id == campaign_id)
+            ).mappings().first()
+            if row is None:
+                return None
+            option_ids = set(connection.execute(
+                select(options.c.id).where(options.c.campaign_id == campaign_id)
+            ).scalars())
+            voter_counts = dict(connection.execute(
+                select(votes.c.voter_hash, func.count()).where(
+                    votes.c.campaign_id == campaign_id
+                ).group_by(votes.c.voter_hash)
+            ).all())
+        
+        campaign = {
+            'is_active': row['is_active'] if row['is_active'] is not None else True,
+            'start_date': row['start_date'],
+            'end_date': row['end_date'],
+            'allow_anonymous_voting': bool(row['allow_anonymous_voting']),
+            'max_votes_per_user': row['max_votes_per_user'] or 3,
+            'option_ids': option_ids
+        }
+        with self._lock:
+            self._campaigns[campaign_id] = (time.monotonic(), campaign)
+            self._voter_counts[campaign_id] = voter_counts
+        return campaign
+    
+    def _limits(self, connection, campaign_ids) -> Dict[int, int]:
+        """Per-voter vote limit for each campaign that enforces one"""
+        campaigns = VotingCampaign.__table__
+        return {
+            row.id: row.max_votes_per_user or 3
+            for row in connection.execute(
+                select(campaigns.c.id, campaigns.c.max_votes_per_user, campaigns.c.allow_anonymous_voting)
+                .where(campaigns.c.id.in_(campaign_ids))
+            )
+            if not row.allow_anonymous_voting
+        }
+    
+    def _load_checkpoint(self) -> int:
+        checkpoints = VoteIngestCheckpoint.__table__
+        with self.engine.connect() as connection:
+            last_seq = connection.execute(
+                select(checkpoints.c.last_seq).where(checkpoints.c.spool_id == self.spool.spool_id)
+            ).scalar()
+        return last_seq or 0
+    
+    def _save_checkpoint(self, connection, seq: int):
+        checkpoints = VoteIngestCheckpoint.__table__
+        result = connection.execute(
+            update(checkpoints).where(checkpoints.c.spool_id == self.spool.spool_id)
+            .values(last_seq=seq, updated_at=datetime.utcnow())
+        )
+        if result.rowcount == 0:
+            connection.execute(checkpoints.insert().values(
+                spool_id=self.spool.spool_id, last_seq=seq, updated_at=datetime.utcnow()
+            ))
+    
+    # Stored as given, within the community_votes column lengths
+    VOTER_TEXT_FIELDS = {
+        'email': None,
+        'phone': None,
+        'address': None,
+        'postcode': CommunityVote.__table__.c.voter_postcode.type.length,
+        'age_group': CommunityVote.__table__.c.voter_age_group.type.length,
+        'verification_method': CommunityVote.__table__.c.verification_method.type.length
+    }
+    
+    def _voter_fields(self, voter_data: Dict[str, Any]):
+        """voter_data with its text fields as strings (or None), or an error message"""
+        cleaned = dict(voter_data)
+        for name, max_length in self.VOTER_TEXT_FIELDS.items():
+            value = voter_data.get(name)
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                return f'{name} must be a string'
+            value = str(value)
+            if max_length is not None and len(value) > max_length:
+                return f'{name} must be at most {max_length} characters'
+            cleaned[name] = value
+        return cleaned
+    
+    def _reject(self, reason: str, message: str) -> Dict[str, Any]:
+        self.stats[f'rejected_{reason}'] += 1
+        return {'success': False, 'error': message}
+
+# Global vote ingestion service instance
+vote_ingestion_service = VoteIngestionService(
+    spool_path=os.environ.get(
+        'VOTE_SPOOL_PATH',
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'vote_spool.jsonl')
+    ),
+    max_queue=int(os.environ.get('VOTE_QUEUE_MAX', 10000)),
+    batch_size=int(os.environ.get('VOTE_BATCH_SIZE', 500)),
+    fsync=os.environ.get('VOTE_SPOOL_FSYNC', 'false').lower() in ('1', 'true', 'yes')
+)
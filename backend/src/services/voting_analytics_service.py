@@ -0,0 +1,259 @@
+"""
+Voting Analytics Service for GrantThrive
+Maintains campaign vote totals, unique voters and demographic tallies incrementally
+"""
+
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional
+from sqlalchemy import select, func, and_, inspect, Index
+from ..models.community_voting import VotingAnalytics, VotingTally, CampaignVoter, CommunityVote
+from ..utils.db_helpers import upsert_increment
+
+class VotingAnalyticsService:
+    """
+    Applies per-vote deltas to the campaign analytics tables
+
+    Every accepted vote adds one to its campaign's total, to one tally per
+    dimension and to its voter's row in campaign_voters; unique_voters goes
+    up only when that row is created. Work per vote is a handful of indexed
+    upserts regardless of how many votes the campaign already holds.
+    reconcile() recomputes everything from community_votes for drift repair.
+    """
+    
+    # Tally dimension -> CommunityVote column it buckets on
+    DIMENSIONS = {
+        'option': 'option_id',
+        'postcode': 'voter_postcode',
+        'age_group': 'voter_age_group'
+    }
+    
+    def apply_votes(self, connection, votes: Iterable[Dict[str, Any]]):
+        """
+        Add a batch of newly inserted votes to the analytics
+
+        Deltas are summed per key first, so a batch costs one upsert per
+        distinct campaign/bucket/voter rather than one per vote.
+
+        Args:
+            connection: Connection inside the transaction that inserted the votes
+            votes: Dicts with campaign_id, voter_hash and the DIMENSIONS columns
+        """
+        totals = Counter()
+        tallies = Counter()
+        voters = Counter()
+        for vote in votes:
+            campaign_id = vote['campaign_id']
+            totals[campaign_id] += 1
+            voters[(campaign_id, vote['voter_hash'])] += 1
+            for dimension, column in self.DIMENSIONS.items():
+                value = vote.get(column)
+                if value not in (None, ''):
+                    tallies[(campaign_id, dimension, str(value))] += 1
+        
+        for (campaign_id, dimension, bucket), count in tallies.items():
+            upsert_increment(connection, VotingTally.__table__, {
+                'campaign_id': campaign_id, 'dimension': dimension, 'bucket': bucket
+            }, {'votes': count})
+        
+        voter_table = CampaignVoter.__table__
+        new_voters = Counter()
+        for (campaign_id, voter_hash), count in voters.items():
+            upsert_increment(connection, voter_table, {
+                'campaign_id': campaign_id, 'voter_hash': voter_hash
+            }, {'votes': count})
+            # The upsert holds the row lock, so exactly one writer sees its own count as the total
+            recorded = connection.execute(
+                select(voter_table.c.votes).where(and_(
+                    voter_table.c.campaign_id == campaign_id,
+                    voter_table.c.voter_hash == voter_hash
+                ))
+            ).scalar()
+            if recorded == count:
+                new_voters[campaign_id] += 1
+        
+        for campaign_id, count in totals.items():
+            upsert_increment(connection, VotingAnalytics.__table__, {'campaign_id': campaign_id}, {
+                'total_votes': count,
+                'unique_voters': new_voters[campaign_id]
+            })
+    
+    def ensure_schema(self, connection) -> bool:
+        """
+        Bring a database from before the running tallies up to date
+
+        create_all() neither creates tables in this metadata nor adds
+        constraints to existing ones, so the tally and voter tables are
+        created here, and voting_analytics gets the unique index on
+        campaign_id that the upserts' ON CONFLICT needs (duplicate rows,
+        which reconcile() rewrites anyway, are removed first).
+
+        Returns:
+            bool: False when the database has no voting tables
+        """
+        inspector = inspect(connection)
+        if not inspector.has_table(CommunityVote.__tablename__) or \
+                not inspector.has_table(VotingAnalytics.__tablename__):
+            return False
+        VotingTally.__table__.create(connection, checkfirst=True)
+        CampaignVoter.__table__.create(connection, checkfirst=True)
+        
+        analytics = VotingAnalytics.__table__
+        unique_on_campaign = any(
+            constraint['column_names'] == ['campaign_id']
+            for constraint in inspector.get_unique_constraints(analytics.name)
+        ) or any(
+            index['unique'] and index['column_names'] == ['campaign_id']
+            for index in inspector.get_indexes(analytics.name)
+        )
+        if not unique_on_campaign:
+            keep = select(func.min(analytics.c.id)).group_by(analytics.c.campaign_id).scalar_subquery()
+            connection.execute(analytics.delete().where(analytics.c.id.not_in(keep)))
+            Index('uq_voting_analytics_campaign', analytics.c.campaign_id, unique=True).create(connection)
+        return True
+    
+    def ensure_populated(self, connection) -> bool:
+        """
+        Build the tallies on a database that has votes but none tallied yet
+
+        Campaign results read only the tallies, so votes cast before them
+        would otherwise show as 0 until a manual reconcile.
+
+        Returns:
+            bool: Whether a reconcile was run
+        """
+        if not self.ensure_schema(connection):
+            return False
+        has_tallies = connection.execute(
+            select(VotingTally.__table__.c.campaign_id).limit(1)
+        ).first() is not None
+        if has_tallies:
+            return False
+        has_votes = connection.execute(select(CommunityVote.__table__.c.id).limit(1)).first() is not None
+        if not has_votes:
+            return False
+        self.reconcile(connection)
+        return True
+    
+    def get_summary(self, connection, campaign_id: int) -> Dict[str, Any]:
+        """Totals and per-dimension tallies for a campaign"""
+        analytics = VotingAnalytics.__table__
+        row = connection.execute(
+            select(analytics.c.total_votes, analytics.c.unique_voters).where(
+                analytics.c.campaign_id == campaign_id
+            )
+        ).first()
+        
+        tallies = {dimension: {} for dimension in self.DIMENSIONS}
+        tally_table = VotingTally.__table__
+        for dimension, bucket, votes in connection.execute(
+            select(tally_table.c.dimension, tally_table.c.bucket, tally_table.c.votes).where(and_(
+                tally_table.c.campaign_id == campaign_id,
+                tally_table.c.votes > 0
+            ))
+        ):
+            tallies.setdefault(dimension, {})[bucket] = votes
+        
+        return {
+            'total_votes': row[0] if row else 0,
+            'unique_voters': row[1] if row else 0,
+            'option_votes': {int(option_id): votes for option_id, votes in tallies['option'].items()},
+            'postcode_distribution': tallies['postcode'],
+            'age_group_distribution': tallies['age_group']
+        }
+    
+    def reconcile(self, connection, campaign_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Recompute analytics from community_votes and overwrite the running tables
+
+        Args:
+            connection: Open connection; the caller owns the transaction
+            campaign_id: Limit to one campaign (default: every campaign with votes)
+
+        Returns:
+            dict: campaigns reconciled and how many had drifted
+        """
+        votes = CommunityVote.__table__
+        analytics = VotingAnalytics.__table__
+        tally_table = VotingTally.__table__
+        voter_table = CampaignVoter.__table__
+        
+        def scoped(table_or_query, column):
+            return table_or_query.where(column == campaign_id) if campaign_id is not None else table_or_query
+        
+        before = {
+            row.campaign_id: (row.total_votes or 0, row.unique_voters or 0)
+            for row in connection.execute(
+                scoped(select(analytics.c.campaign_id, analytics.c.total_votes, analytics.c.unique_voters),
+                       analytics.c.campaign_id)
+            )
+        }
+        
+        connection.execute(scoped(tally_table.delete(), tally_table.c.campaign_id))
+        connection.execute(scoped(voter_table.delete(), voter_table.c.campaign_id))
+        
+        tally_rows = []
+        distributions = {}
+        for dimension, column_name in self.DIMENSIONS.items():
+            column = votes.c[column_name]
+            for row_campaign, bucket, count in connection.execute(
+                scoped(
+                    select(votes.c.campaign_id, column, func.count()).where(column.isnot(None)),
+                    votes.c.campaign_id
+                ).group_by(votes.c.campaign_id, column)
+            ):
+                if bucket == '':
+                    continue
+                tally_rows.append({
+                    'campaign_id': row_campaign, 'dimension': dimension,
+                    'bucket': str(bucket), 'votes': count
+                })
+                distributions.setdefault(row_campaign, {}).setdefault(dimension, {})[str(bucket)] = count
+        if tally_rows:
+            connection.execute(tally_table.insert(), tally_rows)
+        
+        voter_rows = [
+            {'campaign_id': row_campaign, 'voter_hash': voter_hash, 'votes': count}
+            for row_campaign, voter_hash, count in connection.execute(
+                scoped(select(votes.c.campaign_id, votes.c.voter_hash, func.count()), votes.c.campaign_id)
+                .group_by(votes.c.campaign_id, votes.c.voter_hash)
+            )
+        ]
+        if voter_rows:
+            connection.execute(voter_table.insert(), voter_rows)
+        
+        after = Counter()
+        unique = Counter()
+        for row in voter_rows:
+            after[row['campaign_id']] += row['votes']
+            unique[row['campaign_id']] += 1
+        
+        drifted = 0
+        now = datetime.utcnow()
+        for row_campaign in set(after) | set(before):
+            totals = (after[row_campaign], unique[row_campaign])
+            if before.get(row_campaign) != totals:
+                drifted += 1
+            dimension_counts = distributions.get(row_campaign, {})
+            values = {
+                'total_votes': totals[0],
+                'unique_voters': totals[1],
+                'postcode_distribution': json.dumps(dimension_counts.get('postcode', {})),
+                'age_group_distribution': json.dumps(dimension_counts.get('age_group', {})),
+                'last_updated': now
+            }
+            if row_campaign in before:
+                connection.execute(
+                    analytics.update().where(analytics.c.campaign_id == row_campaign).values(**values)
+                )
+            else:
+                connection.execute(analytics.insert().values(campaign_id=row_campaign, **values))
+        
+        return {
+            'campaigns': len(set(after) | set(before)),
+            'drifted': drifted
+        }
+
+# Global voting analytics service instance
+voting_analytics_service = VotingAnalyticsService()
@@ -1,11 +1,29 @@
+import os
+import io
+import re
+import csv
 import json
+import time
+import queue
+import atexit
+import threading
 from datetime import datetime
 from flask import request, g
+from sqlalchemy import MetaData, Table, Column, Index, select, delete, update, inspect, text, func, bindparam, and_, or_
 from src.models.user import db
+from src.utils.db_helpers import is_rejected_row
 
 class AuditLog(db.Model):
     """Audit log model for tracking all system activities"""
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        # Compliance reports: a user's, resource's or event type's activity, newest first
+        db.Index('ix_audit_logs_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_audit_logs_resource_timestamp', 'resource_type', 'resource_id', 'timestamp'),
+        db.Index('ix_audit_logs_event_timestamp', 'event_type', 'timestamp'),
+        db.Index('ix_audit_logs_severity_timestamp', 'severity', 'timestamp'),
+        db.Index('ix_audit_logs_success_timestamp', 'success', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -29,6 +47,7 @@ class AuditLog(db.Model):
     old_values = db.Column(db.Text, nullable=True)  # JSON string of old values
     new_values = db.Column(db.Text, nullable=True)  # JSON string of new values
     additional_data = db.Column(db.Text, nullable=True)  # JSON string of additional context
+    severity = db.Column(db.String(20), nullable=True)  # Security events: INFO, WARNING, CRITICAL, ...
     
     # Metadata
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -39,58 +58,376 @@ class AuditLog(db.Model):
     user = db.relationship('User', backref=db.backref('audit_logs', lazy=True))
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'event_type': self.event_type,
-            'resource_type': self.resource_type,
-            'resource_id': self.resource_id,
-            'user_id': self.user_id,
-            'user_email': self.user_email,
-            'user_role': self.user_role,
-            'ip_address': self.ip_address,
-            'user_agent': self.user_agent,
-            'endpoint': self.endpoint,
-            'method': self.method,
-            'old_values': json.loads(self.old_values) if self.old_values else None,
-            'new_values': json.loads(self.new_values) if self.new_values else None,
-            'additional_data': json.loads(self.additional_data) if self.additional_data else None,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'success': self.success,
-            'error_message': self.error_message
-        }
+        return audit_row_to_dict(self)
+
+def audit_row_to_dict(row):
+    """API form of an audit_logs row (model instance or result row from any audit table)"""
+    return {
+        'id': row.id,
+        'event_type': row.event_type,
+        'resource_type': row.resource_type,
+        'resource_id': row.resource_id,
+        'user_id': row.user_id,
+        'user_email': row.user_email,
+        'user_role': row.user_role,
+        'ip_address': row.ip_address,
+        'user_agent': row.user_agent,
+        'endpoint': row.endpoint,
+        'method': row.method,
+        'old_values': json.loads(row.old_values) if row.old_values else None,
+        'new_values': json.loads(row.new_values) if row.new_values else None,
+        'additional_data': json.loads(row.additional_data) if row.additional_data else None,
+        'severity': row.severity,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'success': row.success,
+        'error_message': row.error_message
+    }
+
+def ensure_audit_schema(engine):
+    """
+    Bring an existing audit_logs table up to date
+    
+    create_all() only creates missing tables, so a database from before the
+    severity column gets it added here, with severity copied out of the
+    security events' additional_data, plus the report indexes.
+    """
+    table = AuditLog.__table__
+    with engine.begin() as connection:
+        columns = {column['name'] for column in inspect(connection).get_columns(table.name)}
+        if 'severity' not in columns:
+            connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN severity VARCHAR(20)'))
+            rows = connection.execute(
+                select(table.c.id, table.c.additional_data).where(table.c.resource_type == 'SECURITY')
+            ).all()
+            updates = [
+                {'row_id': row_id, 'severity': json.loads(additional_data).get('severity')}
+                for row_id, additional_data in rows if additional_data
+            ]
+            if updates:
+                connection.execute(
+                    update(table).where(table.c.id == bindparam('row_id')).values(severity=bindparam('severity')),
+                    updates
+                )
+        
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+class AuditArchive:
+    """
+    Monthly archive tables for audit_logs
+    
+    audit_logs keeps the recent months. archive() moves each older calendar
+    month, a batch at a time, into its own table audit_logs_YYYY_MM with
+    the same columns and report indexes. Reports read audit_logs and then
+    the archive tables newest first, skipping months outside the requested
+    dates, so recent activity never scans years of history and an expired
+    month can be exported or dropped as a single table.
+    """
+    
+    TABLE_PATTERN = re.compile(r'audit_logs_(\d{4})_(\d{2})$')
+    
+    def __init__(self):
+        self._metadata = MetaData()
+        self._tables = {}  # month start -> Table
+        self._lock = threading.Lock()
+    
+    def table_for(self, month):
+        """Archive table for the calendar month starting at month"""
+        with self._lock:
+            table = self._tables.get(month)
+            if table is None:
+                name = f'audit_logs_{month.year:04d}_{month.month:02d}'
+                live = AuditLog.__table__
+                columns = [Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+                           for column in live.columns]
+                indexes = [Index(index.name.replace('ix_audit_logs_', f'ix_{name}_'), *[column.name for column in index.columns])
+                           for index in live.indexes]
+                table = self._tables[month] = Table(name, self._metadata, *columns, *indexes)
+            return table
+    
+    def months(self, connection):
+        """Months that have an archive table, newest first"""
+        months = []
+        for name in inspect(connection).get_table_names():
+            match = self.TABLE_PATTERN.match(name)
+            if match:
+                months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+        return sorted(months, reverse=True)
+    
+    def tables(self, connection, start_date=None, end_date=None):
+        """audit_logs, then the archive tables overlapping [start_date, end_date], newest first"""
+        tables = [AuditLog.__table__]
+        for month in self.months(connection):
+            if end_date is not None and month > end_date:
+                continue
+            if start_date is not None and _add_months(month, 1) <= start_date:
+                continue
+            tables.append(self.table_for(month))
+        return tables
+    
+    def archive(self, engine, keep_months=12, batch_size=5000):
+        """
+        Move audit events older than keep_months whole months into archive tables
+        
+        Returns:
+            dict: Events moved per archive table
+        """
+        audit_writer.flush()
+        live = AuditLog.__table__
+        cutoff = _add_months(datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0), -keep_months)
+        moved = {}
+        while True:
+            # Short transactions so audit writes are never held up behind one large move
+            with engine.begin() as connection:
+                oldest = connection.execute(select(func.min(live.c.timestamp)).where(live.c.timestamp < cutoff)).scalar()
+                if oldest is None:
+                    return moved
+                month = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                table = self.table_for(month)
+                table.create(connection, checkfirst=True)
+                
+                ids = connection.execute(
+                    select(live.c.id)
+                    .where(live.c.timestamp >= month, live.c.timestamp < _add_months(month, 1))
+                    .order_by(live.c.id).limit(batch_size)
+                ).scalars().all()
+                connection.execute(table.insert().from_select(
+                    [column.name for column in live.columns], select(live).where(live.c.id.in_(ids))
+                ))
+                connection.execute(delete(live).where(live.c.id.in_(ids)))
+            moved[table.name] = moved.get(table.name, 0) + len(ids)
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+class AuditLogWriter:
+    """
+    Writes audit events from a bounded in-process queue
+    
+    submit() only puts the event's row on the queue. A writer thread takes
+    up to batch_size rows at a time and inserts them with one multi-row
+    INSERT on its own connection, so audit rows never share a transaction
+    with the request's db.session. When the queue is full the overflow
+    policy decides what happens to a new event: 'sync' writes it in the
+    calling thread (the default; nothing is lost), 'block' waits for room,
+    'drop' discards it and counts the drop. flush() writes everything
+    queued in the calling thread and runs at interpreter exit.
+    
+    A batch that fails is retried one row at a time: rows the database
+    rejects (constraint or data errors) are logged and discarded so they
+    cannot hold up every later event, while any other error (database
+    unavailable) requeues the remaining rows for a later retry.
+    """
+    
+    OVERFLOW_POLICIES = ('sync', 'block', 'drop')
+    
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0, overflow='sync'):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow}")
+        
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.app = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self.written = 0
+        self.batches = 0
+        self.sync_writes = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.rejected = 0
+        atexit.register(self.flush)
+    
+    def init_app(self, app):
+        """Run writes inside this Flask app's context"""
+        self.app = app
+    
+    def submit(self, row):
+        """
+        Queue an audit_logs row for writing
+        
+        Returns:
+            bool: False if the event was dropped
+        """
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            pass
+        
+        if self.overflow == 'block':
+            self._queue.put(row)
+            return True
+        if self.overflow == 'drop':
+            with self._lock:
+                self.dropped += 1
+            return False
+        
+        if not self._write([row]):
+            return False
+        with self._lock:
+            self.sync_writes += 1
+        return True
+    
+    def flush(self):
+        """
+        Write every queued event now
+        
+        Returns:
+            int: Number of events written
+        """
+        written = 0
+        while True:
+            batch = self._take()
+            if not batch or not self._write(batch):
+                return written
+            written += len(batch)
+    
+    def get_stats(self):
+        with self._lock:
+            return {
+                'queued_events': self._queue.qsize(),
+                'written_events': self.written,
+                'batches': self.batches,
+                'sync_writes': self.sync_writes,
+                'dropped_events': self.dropped,
+                'failed_batches': self.failed_batches,
+                'rejected_events': self.rejected,
+                'overflow_policy': self.overflow
+            }
+    
+    def _take(self, timeout=None):
+        """Up to batch_size queued rows; waits up to timeout for the first"""
+        try:
+            batch = [self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _write(self, rows):
+        try:
+            self._execute(rows)
+        except Exception as e:
+            # Don't let audit logging break the main application
+            print(f"Audit logging error ({len(rows)} events), retrying one at a time: {str(e)}")
+            return self._write_each(rows)
+        
+        with self._lock:
+            self.written += len(rows)
+            self.batches += 1
+        return True
+    
+    def _write_each(self, rows):
+        """Write a failed batch row by row so one rejected row cannot block the rest"""
+        for index, row in enumerate(rows):
+            try:
+                self._execute([row])
+            except Exception as e:
+                if is_rejected_row(e):
+                    # The database will never accept this row; retrying it would stall the queue
+                    print(f"Audit event rejected and discarded ({row.get('event_type')}): {str(e)}")
+                    with self._lock:
+                        self.rejected += 1
+                    continue
+                print(f"Audit logging error ({len(rows) - index} events): {str(e)}")
+                self._requeue(rows[index:])
+                return False
+            with self._lock:
+                self.written += 1
+        return True
+    
+    def _execute(self, rows):
+        if self.app is not None:
+            with self.app.app_context():
+                self._insert(db.engine, rows)
+        else:
+            self._insert(db.engine, rows)
+    
+    def _insert(self, engine, rows):
+        with engine.begin() as connection:
+            connection.execute(AuditLog.__table__.insert(), rows)
+    
+    def _requeue(self, rows):
+        # Retried with the next batch; whatever no longer fits is counted as dropped
+        lost = 0
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                lost += 1
+        with self._lock:
+            self.failed_batches += 1
+            self.dropped += lost
+    
+    def _ensure_thread(self):
+        # Same lazy, fork-aware start as BufferedCounter
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            batch = self._take(timeout=self.flush_interval)
+            if batch and not self._write(batch):
+                # Database unavailable: back off before retrying the requeued events
+                time.sleep(self.flush_interval)
 
 class AuditLogger:
     """Audit logging service"""
     
     @staticmethod
     def log_event(event_type, resource_type, resource_id=None, old_values=None, 
-                  new_values=None, additional_data=None, success=True, error_message=None):
-        """Log an audit event"""
+                  new_values=None, additional_data=None, success=True, error_message=None,
+                  severity=None):
+        """
+        Log an audit event
+        
+        The event is captured from the current request and user now and
+        written by audit_writer shortly after; returns the queued row, or
+        None if it could not be recorded.
+        """
         try:
             # Get current user if available
             user = getattr(g, 'current_user', None)
             
             # Create audit log entry
-            audit_log = AuditLog(
-                event_type=event_type,
-                resource_type=resource_type,
-                resource_id=str(resource_id) if resource_id else None,
-                user_id=user.id if user else None,
-                user_email=user.email if user else None,
-                user_role=user.role if user else None,
-                ip_address=request.remote_addr if request else None,
-                user_agent=request.headers.get('User-Agent') if request else None,
-                endpoint=request.endpoint if request else None,
-                method=request.method if request else None,
-                old_values=json.dumps(old_values) if old_values else None,
-                new_values=json.dumps(new_values) if new_values else None,
-                additional_data=json.dumps(additional_data) if additional_data else None,
-                success=success,
-                error_message=error_message
-            )
+            audit_log = {
+                'event_type': event_type,
+                'resource_type': resource_type,
+                'resource_id': str(resource_id) if resource_id else None,
+                'user_id': user.id if user else None,
+                'user_email': user.email if user else None,
+                'user_role': getattr(user.role, 'value', user.role) if user else None,
+                'ip_address': request.remote_addr if request else None,
+                'user_agent': request.headers.get('User-Agent') if request else None,
+                'endpoint': request.endpoint if request else None,
+                'method': request.method if request else None,
+                'old_values': json.dumps(old_values) if old_values else None,
+                'new_values': json.dumps(new_values) if new_values else None,
+                'additional_data': json.dumps(additional_data) if additional_data else None,
+                'severity': severity,
+                'timestamp': datetime.utcnow(),
+                'success': success,
+                'error_message': error_message
+            }
             
-            db.session.add(audit_log)
-            db.session.commit()
+            if not audit_writer.submit(audit_log):
+                return None
             
             return audit_log
             
@@ -152,7 +489,8 @@ class AuditLogger:
             additional_data={
                 'details': details,
                 'severity': severity
-            }
+            },
+            severity=severity
         )
     
     @staticmethod
@@ -213,89 +551,173 @@ def audit_decorator(event_type, resource_type):
     return decorator
 
 class ComplianceReporter:
-    """Generate compliance reports from audit logs"""
+    """
+    Generate compliance reports from audit logs
+    
+    Rows are read a keyset page at a time from audit_logs and the monthly
+    archive tables (newest first); iter_logs() and stream_report() never
+    hold more than one page, for exports spanning years of audit data.
+    """
+    
+    PAGE_SIZE = 1000
+    
+    REPORT_TYPES = ('user_activity', 'resource_access', 'security_events', 'failed_operations')
+    
+    CSV_FIELDS = ['id', 'timestamp', 'event_type', 'resource_type', 'resource_id', 'user_id', 'user_email',
+                  'user_role', 'ip_address', 'user_agent', 'endpoint', 'method', 'severity', 'success',
+                  'error_message', 'old_values', 'new_values', 'additional_data']
     
     @staticmethod
-    def get_user_activity_report(user_id, start_date=None, end_date=None):
-        """Get activity report for a specific user"""
-        query = AuditLog.query.filter_by(user_id=user_id)
+    def iter_logs(filters, start_date=None, end_date=None, page_size=None):
+        """
+        Audit events matching column == value filters, newest first
         
-        if start_date:
-            query = query.filter(AuditLog.timestamp >= start_date)
+        Yields:
+            dict: One event (AuditLog.to_dict() form)
+        """
+        audit_writer.flush()
+        page_size = page_size or ComplianceReporter.PAGE_SIZE
+        with db.engine.connect() as connection:
+            for table in audit_archive.tables(connection, start_date, end_date):
+                conditions = [table.c[name] == value for name, value in filters.items()]
+                if start_date:
+                    conditions.append(table.c.timestamp >= start_date)
+                if end_date:
+                    conditions.append(table.c.timestamp <= end_date)
+                
+                last = None
+                while True:
+                    page_conditions = list(conditions)
+                    if last is not None:
+                        page_conditions.append(or_(
+                            table.c.timestamp < last.timestamp,
+                            and_(table.c.timestamp == last.timestamp, table.c.id < last.id)
+                        ))
+                    rows = connection.execute(
+                        select(table).where(and_(*page_conditions))
+                        .order_by(table.c.timestamp.desc(), table.c.id.desc())
+                        .limit(page_size)
+                    ).all()
+                    for row in rows:
+                        yield audit_row_to_dict(row)
+                    if len(rows) < page_size:
+                        break
+                    last = rows[-1]
+    
+    @staticmethod
+    def report_filters(report_type, user_id=None, resource_type=None, resource_id=None, severity=None):
+        """
+        iter_logs() filters for one of REPORT_TYPES
         
-        if end_date:
-            query = query.filter(AuditLog.timestamp <= end_date)
+        Raises:
+            ValueError: Unknown report type or a required argument missing
+        """
+        if report_type == 'user_activity':
+            if user_id is None:
+                raise ValueError('user_id is required for the user_activity report')
+            return {'user_id': int(user_id)}
+        if report_type == 'resource_access':
+            if not resource_type or resource_id is None:
+                raise ValueError('resource_type and resource_id are required for the resource_access report')
+            return {'resource_type': resource_type, 'resource_id': str(resource_id)}
+        if report_type == 'security_events':
+            return {'resource_type': 'SECURITY', 'severity': severity} if severity else {'resource_type': 'SECURITY'}
+        if report_type == 'failed_operations':
+            return {'success': False}
+        raise ValueError(f'Unknown audit report: {report_type}')
+    
+    @staticmethod
+    def stream_report(rows, format='ndjson'):
+        """
+        Encode report rows as NDJSON or CSV, one chunk of text per page
+        
+        Suitable for a streamed Flask Response.
+        """
+        if format not in ('ndjson', 'csv'):
+            raise ValueError(f'Unsupported report format: {format}')
+        
+        buffer = io.StringIO()
+        writer = None
+        if format == 'csv':
+            writer = csv.DictWriter(buffer, fieldnames=ComplianceReporter.CSV_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+        
+        count = 0
+        for row in rows:
+            if writer is None:
+                buffer.write(json.dumps(row) + '\n')
+            else:
+                for field in ('old_values', 'new_values', 'additional_data'):
+                    if row[field] is not None:
+                        row[field] = json.dumps(row[field])
+                writer.writerow(row)
+            count += 1
+            if count % ComplianceReporter.PAGE_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
         
-        logs = query.order_by(AuditLog.timestamp.desc()).all()
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    @staticmethod
+    def get_user_activity_report(user_id, start_date=None, end_date=None):
+        """Get activity report for a specific user"""
+        activities = list(ComplianceReporter.iter_logs({'user_id': user_id}, start_date, end_date))
         
         return {
             'user_id': user_id,
-            'total_activities': len(logs),
-            'activities': [log.to_dict() for log in logs]
+            'total_activities': len(activities),
+            'activities': activities
         }
     
     @staticmethod
     def get_resource_access_report(resource_type, resource_id, start_date=None, end_date=None):
         """Get access report for a specific resource"""
-        query = AuditLog.query.filter_by(resource_type=resource_type, resource_id=str(resource_id))
-        
-        if start_date:
-            query = query.filter(AuditLog.timestamp >= start_date)
-        
-        if end_date:
-            query = query.filter(AuditLog.timestamp <= end_date)
-        
-        logs = query.order_by(AuditLog.timestamp.desc()).all()
+        accesses = list(ComplianceReporter.iter_logs(
+            {'resource_type': resource_type, 'resource_id': str(resource_id)}, start_date, end_date
+        ))
         
         return {
             'resource_type': resource_type,
             'resource_id': resource_id,
-            'total_accesses': len(logs),
-            'accesses': [log.to_dict() for log in logs]
+            'total_accesses': len(accesses),
+            'accesses': accesses
         }
     
     @staticmethod
     def get_security_events_report(start_date=None, end_date=None, severity=None):
         """Get security events report"""
-        query = AuditLog.query.filter_by(resource_type='SECURITY')
-        
-        if start_date:
-            query = query.filter(AuditLog.timestamp >= start_date)
-        
-        if end_date:
-            query = query.filter(AuditLog.timestamp <= end_date)
-        
-        logs = query.order_by(AuditLog.timestamp.desc()).all()
+        filters = {'resource_type': 'SECURITY'}
         
         # Filter by severity if specified
         if severity:
-            filtered_logs = []
-            for log in logs:
-                additional_data = json.loads(log.additional_data) if log.additional_data else {}
-                if additional_data.get('severity') == severity:
-                    filtered_logs.append(log)
-            logs = filtered_logs
+            filters['severity'] = severity
+        
+        events = list(ComplianceReporter.iter_logs(filters, start_date, end_date))
         
         return {
-            'total_events': len(logs),
-            'events': [log.to_dict() for log in logs]
+            'total_events': len(events),
+            'events': events
         }
     
     @staticmethod
     def get_failed_operations_report(start_date=None, end_date=None):
         """Get report of failed operations"""
-        query = AuditLog.query.filter_by(success=False)
-        
-        if start_date:
-            query = query.filter(AuditLog.timestamp >= start_date)
-        
-        if end_date:
-            query = query.filter(AuditLog.timestamp <= end_date)
-        
-        logs = query.order_by(AuditLog.timestamp.desc()).all()
+        failures = list(ComplianceReporter.iter_logs({'success': False}, start_date, end_date))
         
         return {
-            'total_failures': len(logs),
-            'failures': [log.to_dict() for log in logs]
+            'total_failures': len(failures),
+            'failures': failures
         }
 
+# Global audit log writer instance
+audit_writer = AuditLogWriter(
+    max_queue=int(os.environ.get('AUDIT_QUEUE_SIZE', 10000)),
+    batch_size=int(os.environ.get('AUDIT_BATCH_SIZE', 500)),
+    flush_interval=float(os.environ.get('AUDIT_FLUSH_SECONDS', 1)),
+    overflow=os.environ.get('AUDIT_OVERFLOW_POLICY', 'sync')
+)
+
+# Global audit archive instance
+audit_archive = AuditArchive()
@@ -0,0 +1,220 @@
+"""
+Authentication Cache for GrantThrive
+Bounded TTL cache of verified token -> user snapshot, with revocation on logout
+
+Both the cache and the revocation list live in process memory. Under gunicorn
+with more than one worker, a token revoked on logout is only rejected by the
+worker that handled the logout; the others accept it until it expires. Such
+deployments need the revocation list in a shared backend (Redis or a database
+table) consulted by revoke()/is_revoked().
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.models.user import User, UserRole, UserStatus
+
+class UserSnapshot:
+    """
+    Read-only copy of the user fields request handlers need
+
+    Exposes the same attributes/properties routes use on User (id, email,
+    role, status, is_admin, ...) without holding a session-bound object
+    across requests. Call load() when an ORM instance is required.
+    """
+    
+    __slots__ = ('id', 'email', 'first_name', 'last_name', 'organization_name',
+                 'role', 'status', 'council_id', '_data')
+    
+    def __init__(self, user):
+        self.id = user.id
+        self.email = user.email
+        self.first_name = user.first_name
+        self.last_name = user.last_name
+        self.organization_name = user.organization_name
+        self.role = user.role
+        self.status = user.status
+        self.council_id = getattr(user, 'council_id', None)
+        self._data = user.to_dict()
+    
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+    
+    @property
+    def is_admin(self):
+        return self.role in [UserRole.COUNCIL_ADMIN, UserRole.SYSTEM_ADMIN]
+    
+    @property
+    def is_council_staff(self):
+        return self.role in [UserRole.COUNCIL_STAFF, UserRole.COUNCIL_ADMIN]
+    
+    @property
+    def is_government_user(self):
+        return (self.email.lower().endswith('.gov.au') or
+                self.email.lower().endswith('.govt.nz'))
+    
+    @property
+    def is_active(self):
+        return self.status == UserStatus.ACTIVE
+    
+    def to_dict(self):
+        return dict(self._data)
+    
+    def load(self):
+        """Fetch the live User row"""
+        return User.query.get(self.id)
+
+class AuthCache:
+    """Thread-safe LRU cache with per-entry expiry, keyed by token digest"""
+    
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # token digest -> (expires_at, snapshot)
+        self._tokens_by_user = {}  # user id -> set of token digests
+        self._revoked = {}  # token digest -> wall-clock expiry of the token
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        """Cached snapshot for a token, or None on miss/expiry"""
+        key = self._digest(token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, token: str, snapshot: UserSnapshot, token_expires_at: Optional[float] = None):
+        """Cache a snapshot until the TTL or the token's own expiry, whichever is first"""
+        key = self._digest(token)
+        lifetime = self.ttl_seconds
+        if token_expires_at is not None:
+            lifetime = min(lifetime, token_expires_at - time.time())
+        if lifetime <= 0:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (time.monotonic() + lifetime, snapshot)
+            self._tokens_by_user.setdefault(snapshot.id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+    
+    def invalidate_user(self, user_id):
+        """Drop every cached token for a user (status/role change, deletion)"""
+        with self._lock:
+            for key in list(self._tokens_by_user.get(user_id, ())):
+                self._discard(key)
+                self.invalidations += 1
+    
+    def revoke(self, token: str, token_expires_at: Optional[float] = None):
+        """Reject a token from now on (logout) and drop its cache entry
+
+        Applies to this process only; see the module docstring.
+        """
+        key = self._digest(token)
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+                self.invalidations += 1
+            self._revoked[key] = token_expires_at or (time.time() + self.ttl_seconds)
+            self._prune_revoked()
+    
+    def is_revoked(self, token: str) -> bool:
+        key = self._digest(token)
+        with self._lock:
+            expires_at = self._revoked.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._revoked[key]
+                return False
+            return True
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'revoked_tokens': len(self._revoked)
+            }
+    
+    def _discard(self, key):
+        """Remove an entry; caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_keys = self._tokens_by_user.get(entry[1].id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._tokens_by_user[entry[1].id]
+    
+    def _prune_revoked(self):
+        """Forget revocations for tokens that have expired anyway; caller holds the lock"""
+        if len(self._revoked) <= self.max_entries:
+            return
+        now = time.time()
+        for key in [key for key, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[key]
+    
+    @staticmethod
+    def _digest(token: str) -> str:
+        # Key on a digest so raw bearer tokens are not kept in memory
+        return hashlib.sha256(token.encode()).hexdigest()
+
+# Global auth cache instance
+auth_cache = AuthCache(
+    max_entries=int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', 10000)),
+    ttl_seconds=int(os.environ.get('AUTH_CACHE_TTL_SECONDS', 60))
+)
+
+@event.listens_for(User, 'after_update')
+def _invalidate_on_user_change(mapper, connection, target):
+    """Status or role changes must take effect on the very next request"""
+    state = inspect(target)
+    if state.attrs.status.history.has_changes() or state.attrs.role.history.has_changes():
+        auth_cache.invalidate_user(target.id)
+        # A concurrent request may re-cache the old row before this commits
+        if state.session is not None:
+            state.session.info.setdefault('auth_cache_invalidate', set()).add(target.id)
+
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_user_delete(mapper, connection, target):
+    auth_cache.invalidate_user(target.id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop('auth_cache_invalidate', ()):
+        auth_cache.invalidate_user(user_id)
@@ -0,0 +1,123 @@
+"""
+Buffered Counters for GrantThrive
+Accumulate hot increments (views, clicks) in memory and write them in batches
+"""
+
+import os
+import atexit
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Any
+
+class BufferedCounter:
+    """
+    In-process counter buffer flushed on an interval or when it grows large
+
+    Increments are summed per key under a lock; flush() swaps the buffer out
+    and hands the totals to flush_fn in one call, so N views of a grant
+    become a single UPDATE. If flush_fn raises, the totals are merged back
+    and retried on the next flush. A final flush runs at interpreter exit.
+
+    Counts are held per process, so each worker flushes its own share.
+    """
+    
+    def __init__(self, name: str, flush_fn: Callable[[Dict[Any, int]], None],
+                 flush_interval: float = 5.0, flush_threshold: int = 1000):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.app = None
+        self._pending = defaultdict(int)
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self.flushes = 0
+        self.flushed_increments = 0
+        self.failed_flushes = 0
+        atexit.register(self.flush)
+    
+    def init_app(self, app):
+        """Run flushes inside this Flask app's context"""
+        self.app = app
+    
+    def increment(self, key, amount: int = 1):
+        """Buffer an increment for key"""
+        with self._lock:
+            self._pending[key] += amount
+            self._pending_total += amount
+            over_threshold = self._pending_total >= self.flush_threshold
+        self._ensure_thread()
+        if over_threshold:
+            self._wakeup.set()
+    
+    def pending(self, key) -> int:
+        """Increments buffered for key and not yet written"""
+        with self._lock:
+            return self._pending.get(key, 0)
+    
+    def flush(self) -> int:
+        """
+        Write all buffered increments now
+
+        Returns:
+            int: Number of increments written
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = dict(self._pending)
+                self._pending.clear()
+                self._pending_total = 0
+            
+            try:
+                if self.app is not None:
+                    with self.app.app_context():
+                        self.flush_fn(batch)
+                else:
+                    self.flush_fn(batch)
+            except Exception as e:
+                print(f"{self.name} counter flush failed, will retry: {str(e)}")
+                with self._lock:
+                    for key, amount in batch.items():
+                        self._pending[key] += amount
+                        self._pending_total += amount
+                self.failed_flushes += 1
+                return 0
+            
+            written = sum(batch.values())
+            self.flushes += 1
+            self.flushed_increments += written
+            return written
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'name': self.name,
+                'pending_keys': len(self._pending),
+                'pending_increments': self._pending_total,
+                'flushes': self.flushes,
+                'flushed_increments': self.flushed_increments,
+                'failed_flushes': self.failed_flushes
+            }
+    
+    def _ensure_thread(self):
+        # Started lazily (and restarted after a fork) so each worker process gets its own flusher
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-flusher', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
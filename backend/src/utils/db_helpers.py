@@ -0,0 +1,74 @@
+"""
+Database helpers for GrantThrive
+Dialect-aware upserts used by counters and rollup tables, and the
+classification of failed writes used by the buffered writers
+"""
+
+from functools import lru_cache
+from sqlalchemy import update, and_, bindparam
+from sqlalchemy.exc import StatementError, DBAPIError, IntegrityError, DataError, ProgrammingError, InterfaceError
+
+def upsert_increment(connection, table, keys, increments):
+    """
+    Add increments to the row identified by keys, creating it if missing
+
+    Args:
+        connection: Open SQLAlchemy connection (runs inside the caller's transaction)
+        table: Table with a unique constraint covering the key columns
+        keys (dict): Column name -> value identifying the row
+        increments (dict): Column name -> amount to add
+
+    Uses INSERT ... ON CONFLICT DO UPDATE on SQLite and PostgreSQL so
+    concurrent writers never lose an increment.
+    """
+    dialect = connection.dialect.name
+    
+    if dialect in ('sqlite', 'postgresql'):
+        statement = _upsert_statement(dialect, table, tuple(keys), tuple(increments))
+        connection.execute(statement, {**keys, **increments})
+        return
+    
+    # Generic fallback: update first, insert when no row matched
+    condition = and_(*[table.c[name] == value for name, value in keys.items()])
+    result = connection.execute(
+        update(table).where(condition).values(
+            **{name: table.c[name] + amount for name, amount in increments.items()}
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**keys, **increments))
+
+@lru_cache(maxsize=256)
+def _upsert_statement(dialect, table, key_names, increment_names):
+    """
+    Bound-parameter upsert for one table/column shape
+
+    Building the ON CONFLICT clause (its excluded alias in particular) costs
+    far more than executing it, so each shape is constructed once.
+    """
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    
+    statement = insert(table).values({name: bindparam(name) for name in key_names + increment_names})
+    return statement.on_conflict_do_update(
+        index_elements=[table.c[name] for name in key_names],
+        set_={name: table.c[name] + statement.excluded[name] for name in increment_names}
+    )
+
+def is_rejected_row(error):
+    """
+    Whether a failed write was refused because of the rows themselves
+
+    Constraint violations, out-of-range or over-length values and values
+    the driver cannot bind fail the same way on every retry, so buffered
+    writers discard such rows. Anything else (an unreachable or restarting
+    database, a dropped connection) may succeed later and is retried.
+    """
+    if isinstance(error, DBAPIError):
+        if error.connection_invalidated:
+            return False
+        return isinstance(error, (IntegrityError, DataError, ProgrammingError, InterfaceError))
+    # Raised while binding parameters, before the driver is involved
+    return isinstance(error, StatementError)
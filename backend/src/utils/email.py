@@ -1,12 +1,95 @@
-import smtplib
-import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email import encoders
+from email import encoders, base64mime
+from email.policy import compat32
 import os
+import uuid
 from datetime import datetime
-from jinja2 import Template
+from .smtp_delivery import get_delivery_engine
+from .email_templates import render_email
+from ..services.job_queue_service import job_queue
+
+# Header folding as Message.as_string() does it (no line length limit)
+HEADER_POLICY = compat32.clone(max_line_length=0)
+
+class MessageBatch:
+    """
+    Rendered MIME messages for a bulk send, with shared parts encoded once
+
+    Messages have the same structure as EmailService.build_message, but the
+    sender header, the attachment parts (read and base64-encoded once) and
+    any subject or body repeated across recipients are cached as finished
+    text. Each further message only costs its To header and whichever
+    bodies actually differ.
+    """
+    
+    def __init__(self, from_header, attachments=None):
+        self.boundary = f"{'=' * 15}{uuid.uuid4().hex}=="
+        self._from = HEADER_POLICY.fold('From', from_header)
+        self._attachments = ''.join(
+            f"--{self.boundary}\n{part.as_string()}\n" for part in _attachment_parts(attachments)
+        )
+        self._subjects = {}
+        self._parts = {}
+    
+    def render(self, to_email, subject, html_content, text_content=None):
+        """The complete message for one recipient, ready for sendmail"""
+        subject_header = self._subjects.get(subject)
+        if subject_header is None:
+            subject_header = self._subjects[subject] = HEADER_POLICY.fold('Subject', subject)
+        
+        body = ''
+        if text_content:
+            body += f"--{self.boundary}\n{self._part(text_content, 'plain')}\n"
+        body += f"--{self.boundary}\n{self._part(html_content, 'html')}\n"
+        
+        return (
+            f'Content-Type: multipart/alternative; boundary="{self.boundary}"\n'
+            f'MIME-Version: 1.0\n'
+            f'{subject_header}{self._from}{HEADER_POLICY.fold("To", to_email)}\n'
+            f'{body}{self._attachments}--{self.boundary}--\n'
+        )
+    
+    def _part(self, content, subtype):
+        key = (subtype, content)
+        encoded = self._parts.get(key)
+        if encoded is None:
+            encoded = self._parts[key] = _text_part(content, subtype)
+        return encoded
+
+def _text_part(content, subtype):
+    """MIMEText(content, subtype).as_string(), without building the Message"""
+    if '\r' in content:
+        # Line endings get normalised by the generator; let it do that
+        return MIMEText(content, subtype).as_string()
+    try:
+        content.encode('us-ascii')
+    except UnicodeEncodeError:
+        return (
+            f'Content-Type: text/{subtype}; charset="utf-8"\nMIME-Version: 1.0\n'
+            f'Content-Transfer-Encoding: base64\n\n{base64mime.body_encode(content.encode("utf-8"))}'
+        )
+    return (
+        f'Content-Type: text/{subtype}; charset="us-ascii"\nMIME-Version: 1.0\n'
+        f'Content-Transfer-Encoding: 7bit\n\n{content}'
+    )
+
+def _attachment_parts(attachments):
+    parts = []
+    for attachment_path in attachments or []:
+        if os.path.exists(attachment_path):
+            with open(attachment_path, 'rb') as attachment:
+                part = MIMEBase('application', 'octet-stream')
+                part.set_payload(attachment.read())
+            
+            encoders.encode_base64(part)
+            part.add_header(
+                'Content-Disposition',
+                f'attachment; filename= {os.path.basename(attachment_path)}'
+            )
+            parts.append(part)
+    return parts
 
 class EmailService:
     """Email service for sending notifications"""
@@ -20,184 +103,113 @@ class EmailService:
         self.from_email = os.getenv('FROM_EMAIL', 'noreply@grantthrive.com')
         self.from_name = os.getenv('FROM_NAME', 'GrantThrive')
         
+    def build_message(self, to_email, subject, html_content, text_content=None, attachments=None):
+        """Build the MIME message for one recipient"""
+        message = MIMEMultipart('alternative')
+        message['Subject'] = subject
+        message['From'] = f"{self.from_name} <{self.from_email}>"
+        message['To'] = to_email
+        
+        # Add text content
+        if text_content:
+            text_part = MIMEText(text_content, 'plain')
+            message.attach(text_part)
+        
+        # Add HTML content
+        html_part = MIMEText(html_content, 'html')
+        message.attach(html_part)
+        
+        # Add attachments
+        for part in _attachment_parts(attachments):
+            message.attach(part)
+        
+        return message
+    
+    @property
+    def delivery(self):
+        """Pooled delivery engine for this relay account (shared by every EmailService)"""
+        return get_delivery_engine(self.smtp_server, self.smtp_port, self.smtp_username, self.smtp_password)
+    
     def send_email(self, to_email, subject, html_content, text_content=None, attachments=None):
         """Send email with HTML content"""
         try:
-            # Create message
-            message = MIMEMultipart('alternative')
-            message['Subject'] = subject
-            message['From'] = f"{self.from_name} <{self.from_email}>"
-            message['To'] = to_email
-            
-            # Add text content
-            if text_content:
-                text_part = MIMEText(text_content, 'plain')
-                message.attach(text_part)
-            
-            # Add HTML content
-            html_part = MIMEText(html_content, 'html')
-            message.attach(html_part)
+            message = self.build_message(to_email, subject, html_content, text_content, attachments)
             
-            # Add attachments
-            if attachments:
-                for attachment_path in attachments:
-                    if os.path.exists(attachment_path):
-                        with open(attachment_path, 'rb') as attachment:
-                            part = MIMEBase('application', 'octet-stream')
-                            part.set_payload(attachment.read())
-                        
-                        encoders.encode_base64(part)
-                        part.add_header(
-                            'Content-Disposition',
-                            f'attachment; filename= {os.path.basename(attachment_path)}'
-                        )
-                        message.attach(part)
+            # Send over a pooled, already authenticated connection
+            result = self.delivery.send(self.from_email, to_email, message.as_string())
+            if not result['success']:
+                print(f"Email sending failed: {result['error']}")
             
-            # Send email
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                server.login(self.smtp_username, self.smtp_password)
-                server.sendmail(self.from_email, to_email, message.as_string())
-            
-            return True
+            return result['success']
             
         except Exception as e:
             print(f"Email sending failed: {str(e)}")
             return False
     
+    def queue_email(self, to_email, subject, html_content, text_content=None, attachments=None):
+        """Hand an email to the job workers; returns True once it is queued, not sent"""
+        try:
+            job_queue.enqueue('email.send', {
+                'to_email': to_email,
+                'subject': subject,
+                'html_content': html_content,
+                'text_content': text_content,
+                'attachments': attachments
+            })
+            return True
+        
+        except Exception as e:
+            print(f"Email queueing failed: {str(e)}")
+            return False
+    
+    def send_bulk_email(self, messages):
+        """
+        Send many emails in parallel over pooled connections
+
+        Args:
+            messages (list): Dicts with to_email, subject, html_content and
+                optionally text_content and attachments
+
+        Returns:
+            list: Per-message results (to, success, attempts, error), in order
+        """
+        # One batch per distinct attachment set, so each file is encoded once
+        batches = {}
+        prepared = []
+        for item in messages:
+            attachments = tuple(item.get('attachments') or ())
+            batch = batches.get(attachments)
+            if batch is None:
+                batch = batches[attachments] = MessageBatch(f"{self.from_name} <{self.from_email}>", attachments)
+            prepared.append({
+                'from_addr': self.from_email,
+                'to_addrs': item['to_email'],
+                'message': batch.render(
+                    item['to_email'], item['subject'], item['html_content'], item.get('text_content')
+                )
+            })
+        
+        return self.delivery.send_many(prepared)
+    
     def send_welcome_email(self, user_email, user_name, user_role):
         """Send welcome email to new user"""
         subject = "Welcome to GrantThrive!"
         
-        html_template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background-color: #1e40af; color: white; padding: 20px; text-align: center; }
-                .content { padding: 20px; background-color: #f9f9f9; }
-                .button { display: inline-block; padding: 12px 24px; background-color: #1e40af; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0; }
-                .footer { padding: 20px; text-align: center; font-size: 12px; color: #666; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Welcome to GrantThrive!</h1>
-                </div>
-                <div class="content">
-                    <h2>Hello {{ user_name }},</h2>
-                    <p>Welcome to GrantThrive, Australia's leading grant management platform!</p>
-                    
-                    {% if user_role == 'community_member' %}
-                    <p>As a community member, you can now:</p>
-                    <ul>
-                        <li>Browse available grants from councils across Australia</li>
-                        <li>Submit grant applications online</li>
-                        <li>Track your application progress</li>
-                        <li>Access resources and community support</li>
-                    </ul>
-                    {% elif user_role == 'council_staff' or user_role == 'council_admin' %}
-                    <p>As council staff, you can now:</p>
-                    <ul>
-                        <li>Manage grant programs for your council</li>
-                        <li>Review and process applications</li>
-                        <li>Communicate with applicants</li>
-                        <li>Generate reports and analytics</li>
-                    </ul>
-                    {% elif user_role == 'professional_consultant' %}
-                    <p>As a professional consultant, you can now:</p>
-                    <ul>
-                        <li>Access the consultant marketplace</li>
-                        <li>Connect with potential clients</li>
-                        <li>Manage your consulting projects</li>
-                        <li>Access professional resources</li>
-                    </ul>
-                    {% endif %}
-                    
-                    <p>Get started by logging into your account:</p>
-                    <a href="https://grantthrive.com/login" class="button">Login to GrantThrive</a>
-                    
-                    <p>If you have any questions, our support team is here to help!</p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 GrantThrive. All rights reserved.</p>
-                    <p>This email was sent to {{ user_email }}</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        template = Template(html_template)
-        html_content = template.render(
+        html_content = render_email(
+            'welcome.html',
             user_name=user_name,
             user_email=user_email,
             user_role=user_role
         )
         
-        return self.send_email(user_email, subject, html_content)
+        return self.queue_email(user_email, subject, html_content)
     
     def send_application_confirmation(self, user_email, user_name, grant_title, application_id):
         """Send application confirmation email"""
         subject = f"Application Submitted: {grant_title}"
         
-        html_template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background-color: #059669; color: white; padding: 20px; text-align: center; }
-                .content { padding: 20px; background-color: #f9f9f9; }
-                .button { display: inline-block; padding: 12px 24px; background-color: #059669; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0; }
-                .footer { padding: 20px; text-align: center; font-size: 12px; color: #666; }
-                .highlight { background-color: #ecfdf5; padding: 15px; border-left: 4px solid #059669; margin: 15px 0; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Application Submitted Successfully!</h1>
-                </div>
-                <div class="content">
-                    <h2>Hello {{ user_name }},</h2>
-                    <p>Your grant application has been successfully submitted!</p>
-                    
-                    <div class="highlight">
-                        <strong>Grant:</strong> {{ grant_title }}<br>
-                        <strong>Application ID:</strong> #{{ application_id }}<br>
-                        <strong>Submitted:</strong> {{ current_date }}
-                    </div>
-                    
-                    <h3>What happens next?</h3>
-                    <ol>
-                        <li>Your application will be reviewed by the grant committee</li>
-                        <li>You'll receive updates via email as your application progresses</li>
-                        <li>The review process typically takes 2-4 weeks</li>
-                        <li>You'll be notified of the final decision</li>
-                    </ol>
-                    
-                    <p>You can track your application progress anytime:</p>
-                    <a href="https://grantthrive.com/applications/{{ application_id }}" class="button">View Application Status</a>
-                    
-                    <p>Thank you for using GrantThrive!</p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 GrantThrive. All rights reserved.</p>
-                    <p>This email was sent to {{ user_email }}</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        template = Template(html_template)
-        html_content = template.render(
+        html_content = render_email(
+            'application_confirmation.html',
             user_name=user_name,
             user_email=user_email,
             grant_title=grant_title,
@@ -205,7 +217,7 @@ class EmailService:
             current_date=datetime.now().strftime("%B %d, %Y")
         )
         
-        return self.send_email(user_email, subject, html_content)
+        return self.queue_email(user_email, subject, html_content)
     
     def send_application_status_update(self, user_email, user_name, grant_title, application_id, new_status, message=None):
         """Send application status update email"""
@@ -218,66 +230,8 @@ class EmailService:
         
         subject = f"Application Update: {grant_title}"
         
-        html_template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background-color: {% if new_status == 'approved' %}#059669{% elif new_status == 'rejected' %}#dc2626{% else %}#1e40af{% endif %}; color: white; padding: 20px; text-align: center; }
-                .content { padding: 20px; background-color: #f9f9f9; }
-                .button { display: inline-block; padding: 12px 24px; background-color: #1e40af; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0; }
-                .footer { padding: 20px; text-align: center; font-size: 12px; color: #666; }
-                .highlight { background-color: {% if new_status == 'approved' %}#ecfdf5{% elif new_status == 'rejected' %}#fef2f2{% else %}#eff6ff{% endif %}; padding: 15px; border-left: 4px solid {% if new_status == 'approved' %}#059669{% elif new_status == 'rejected' %}#dc2626{% else %}#1e40af{% endif %}; margin: 15px 0; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Application Status Update</h1>
-                </div>
-                <div class="content">
-                    <h2>Hello {{ user_name }},</h2>
-                    <p>{{ status_message }}</p>
-                    
-                    <div class="highlight">
-                        <strong>Grant:</strong> {{ grant_title }}<br>
-                        <strong>Application ID:</strong> #{{ application_id }}<br>
-                        <strong>New Status:</strong> {{ new_status|title }}<br>
-                        <strong>Updated:</strong> {{ current_date }}
-                    </div>
-                    
-                    {% if message %}
-                    <h3>Additional Information:</h3>
-                    <p>{{ message }}</p>
-                    {% endif %}
-                    
-                    {% if new_status == 'approved' %}
-                    <h3>Congratulations!</h3>
-                    <p>Your grant application has been approved. You will receive further instructions about the next steps and funding disbursement.</p>
-                    {% elif new_status == 'requires_clarification' %}
-                    <h3>Action Required</h3>
-                    <p>Please review the feedback and provide the requested information to continue the review process.</p>
-                    {% elif new_status == 'rejected' %}
-                    <h3>Next Steps</h3>
-                    <p>While this application was not successful, we encourage you to review the feedback and consider applying for future grant opportunities.</p>
-                    {% endif %}
-                    
-                    <p>View your application for more details:</p>
-                    <a href="https://grantthrive.com/applications/{{ application_id }}" class="button">View Application</a>
-                </div>
-                <div class="footer">
-                    <p>© 2024 GrantThrive. All rights reserved.</p>
-                    <p>This email was sent to {{ user_email }}</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        template = Template(html_template)
-        html_content = template.render(
+        html_content = render_email(
+            'application_status_update.html',
             user_name=user_name,
             user_email=user_email,
             grant_title=grant_title,
@@ -288,63 +242,27 @@ class EmailService:
             current_date=datetime.now().strftime("%B %d, %Y")
         )
         
-        return self.send_email(user_email, subject, html_content)
+        return self.queue_email(user_email, subject, html_content)
     
     def send_admin_approval_notification(self, admin_email, user_name, user_email, user_role):
         """Send notification to admin about new user registration"""
         subject = f"New User Registration Requires Approval: {user_name}"
         
-        html_template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background-color: #f59e0b; color: white; padding: 20px; text-align: center; }
-                .content { padding: 20px; background-color: #f9f9f9; }
-                .button { display: inline-block; padding: 12px 24px; background-color: #f59e0b; color: white; text-decoration: none; border-radius: 5px; margin: 10px 0; }
-                .footer { padding: 20px; text-align: center; font-size: 12px; color: #666; }
-                .highlight { background-color: #fffbeb; padding: 15px; border-left: 4px solid #f59e0b; margin: 15px 0; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>New User Registration</h1>
-                </div>
-                <div class="content">
-                    <h2>Admin Approval Required</h2>
-                    <p>A new user has registered and requires approval:</p>
-                    
-                    <div class="highlight">
-                        <strong>Name:</strong> {{ user_name }}<br>
-                        <strong>Email:</strong> {{ user_email }}<br>
-                        <strong>Role:</strong> {{ user_role|title }}<br>
-                        <strong>Registration Date:</strong> {{ current_date }}
-                    </div>
-                    
-                    <p>Please review and approve or reject this registration:</p>
-                    <a href="https://grantthrive.com/admin/users/pending" class="button">Review Registration</a>
-                </div>
-                <div class="footer">
-                    <p>© 2024 GrantThrive. All rights reserved.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        template = Template(html_template)
-        html_content = template.render(
+        html_content = render_email(
+            'admin_approval.html',
             user_name=user_name,
             user_email=user_email,
             user_role=user_role,
             current_date=datetime.now().strftime("%B %d, %Y")
         )
         
-        return self.send_email(admin_email, subject, html_content)
+        return self.queue_email(admin_email, subject, html_content)
 
 # Global email service instance
 email_service = EmailService()
 
+@job_queue.task('email.send', queue='email', max_attempts=4)
+def send_queued_email(payload):
+    """Worker side of queue_email (the delivery engine has already retried transient errors)"""
+    if not email_service.send_email(**payload):
+        raise RuntimeError(f"Email to {payload['to_email']} not delivered")
@@ -0,0 +1,62 @@
+"""
+Email Templates for GrantThrive
+Jinja2 email templates compiled once per process, and per-council branding
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, Any
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
+from ..data.australian_councils import AUSTRALIAN_COUNCILS, NEW_ZEALAND_COUNCILS
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'email')
+
+DEFAULT_SIGNATURE = 'GrantThrive Platform'
+
+# auto_reload=False: a template is read and compiled on first use, then
+# served from the environment's cache without stat()ing the file again
+_environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    auto_reload=False,
+    cache_size=-1
+)
+_environment.filters['currency'] = lambda value: f"{float(value or 0):,.2f}"
+
+def get_template(name: str):
+    """Compiled template from src/templates/email"""
+    return _environment.get_template(name)
+
+def render_email(name: str, **context) -> str:
+    """Render an email template; values are HTML-escaped unless marked |safe"""
+    return get_template(name).render(**context)
+
+def precompile_templates() -> int:
+    """Compile every email template now (e.g. before a bulk send); returns the count"""
+    names = _environment.list_templates(extensions=['html'])
+    for name in names:
+        get_template(name)
+    return len(names)
+
+@lru_cache(maxsize=None)
+def council_branding(council_id: str = None) -> Dict[str, Any]:
+    """
+    Branding values used by the notification templates, built once per council
+
+    Councils not in the reference data get the GrantThrive defaults.
+    """
+    council = _councils_by_id().get(council_id)
+    if council is None:
+        return {'name': 'GrantThrive', 'website': 'https://grantthrive.com', 'contact_email': None,
+                'signature': Markup(DEFAULT_SIGNATURE)}
+    return {
+        'name': council['name'],
+        'website': council.get('website'),
+        'contact_email': council.get('contact_email'),
+        'signature': escape(council['name']) + Markup(f'<br>via {DEFAULT_SIGNATURE}')
+    }
+
+@lru_cache(maxsize=1)
+def _councils_by_id() -> Dict[str, Dict[str, Any]]:
+    return {council['id']: council for council in AUSTRALIAN_COUNCILS + NEW_ZEALAND_COUNCILS}
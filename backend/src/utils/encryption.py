@@ -1,31 +1,82 @@
 import os
+import re
 import base64
 import hashlib
-from cryptography.fernet import Fernet
+from functools import lru_cache
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
+KDF_ITERATIONS = 100000
+
+@lru_cache(maxsize=32)
+def derive_key(password, salt, iterations=KDF_ITERATIONS):
+    """
+    Fernet key for a password, derived with PBKDF2-HMAC-SHA256
+    
+    Derivation is deliberately slow (~50 ms), so each (password, salt) pair
+    is derived once per process and reused.
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(password))
+
+def keys_from_environment():
+    """
+    Versioned encryption passwords from the environment
+    
+    GRANTTHRIVE_ENCRYPTION_KEY is version 1; a rotation adds
+    GRANTTHRIVE_ENCRYPTION_KEY_V2, _V3, ... The highest version encrypts new
+    data and every version can still decrypt.
+    """
+    keys = {1: os.environ.get('GRANTTHRIVE_ENCRYPTION_KEY', 'default-key-change-in-production')}
+    for name, value in os.environ.items():
+        match = re.fullmatch(r'GRANTTHRIVE_ENCRYPTION_KEY_V(\d+)', name)
+        if match and value:
+            keys[int(match.group(1))] = value
+    return keys
+
 class EncryptionManager:
     """Handles encryption and decryption of sensitive data"""
     
-    def __init__(self, password=None):
-        """Initialize encryption manager with password or environment variable"""
-        if password is None:
-            password = os.environ.get('GRANTTHRIVE_ENCRYPTION_KEY', 'default-key-change-in-production')
+    def __init__(self, password=None, keys=None):
+        """
+        Initialize encryption manager with password or environment variable
+        
+        Args:
+            password: Single encryption password (version 1)
+            keys: {version: password} for rotated keys; overrides password
+        """
+        if keys is None:
+            keys = {1: password} if password is not None else keys_from_environment()
         
-        self.password = password.encode()
+        self.keys = {version: key.encode() if isinstance(key, str) else key for version, key in keys.items()}
+        self.current_version = max(self.keys)
+        self.password = self.keys[self.current_version]
         self.salt = b'grantthrive_salt'  # In production, use random salt per encryption
+        self._fernet = None
         
-    def _get_key(self):
+    def _get_key(self, version=None):
         """Derive encryption key from password"""
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=self.salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(self.password))
-        return key
+        return derive_key(self.keys[version or self.current_version], self.salt)
+    
+    @property
+    def fernet(self):
+        """
+        MultiFernet over every key version, newest first
+        
+        Encrypts with the current version and decrypts with whichever
+        version the data was encrypted under. Built on first use.
+        """
+        if self._fernet is None:
+            self._fernet = MultiFernet([
+                Fernet(self._get_key(version)) for version in sorted(self.keys, reverse=True)
+            ])
+        return self._fernet
     
     def encrypt(self, data):
         """Encrypt sensitive data"""
@@ -35,8 +86,7 @@ class EncryptionManager:
         if isinstance(data, str):
             data = data.encode()
         
-        f = Fernet(self._get_key())
-        encrypted_data = f.encrypt(data)
+        encrypted_data = self.fernet.encrypt(data)
         return base64.urlsafe_b64encode(encrypted_data).decode()
     
     def decrypt(self, encrypted_data):
@@ -46,12 +96,49 @@ class EncryptionManager:
         
         try:
             encrypted_bytes = base64.urlsafe_b64decode(encrypted_data.encode())
-            f = Fernet(self._get_key())
-            decrypted_data = f.decrypt(encrypted_bytes)
+            decrypted_data = self.fernet.decrypt(encrypted_bytes)
             return decrypted_data.decode()
         except Exception:
             return None
     
+    def encrypt_many(self, values):
+        """Encrypt a list of values (e.g. one column of a row set); empty values give None"""
+        fernet = self.fernet
+        encrypted = []
+        for data in values:
+            if not data:
+                encrypted.append(None)
+                continue
+            if isinstance(data, str):
+                data = data.encode()
+            encrypted.append(base64.urlsafe_b64encode(fernet.encrypt(data)).decode())
+        return encrypted
+    
+    def decrypt_many(self, values):
+        """Decrypt a list of values; empty or undecryptable values give None"""
+        fernet = self.fernet
+        decrypted = []
+        for encrypted_data in values:
+            if not encrypted_data:
+                decrypted.append(None)
+                continue
+            try:
+                decrypted.append(fernet.decrypt(base64.urlsafe_b64decode(encrypted_data.encode())).decode())
+            except Exception:
+                decrypted.append(None)
+        return decrypted
+    
+    def rotate(self, encrypted_data):
+        """Re-encrypt data under the current key version (None if it cannot be decrypted)"""
+        if not encrypted_data:
+            return None
+        
+        try:
+            token = self.fernet.rotate(base64.urlsafe_b64decode(encrypted_data.encode()))
+        except Exception:
+            return None
+        return base64.urlsafe_b64encode(token).decode()
+    
     def hash_data(self, data):
         """Create one-way hash of data"""
         if isinstance(data, str):
@@ -74,6 +161,14 @@ def decrypt_sensitive_field(encrypted_data):
     """Decrypt a sensitive field"""
     return encryption_manager.decrypt(encrypted_data)
 
+def encrypt_sensitive_fields(values):
+    """Encrypt a list of sensitive values"""
+    return encryption_manager.encrypt_many(values)
+
+def decrypt_sensitive_fields(encrypted_values):
+    """Decrypt a list of sensitive values"""
+    return encryption_manager.decrypt_many(encrypted_values)
+
 def hash_sensitive_data(data):
     """Hash sensitive data for storage"""
     return encryption_manager.hash_data(data)
@@ -85,13 +180,16 @@ def verify_sensitive_data(data, hash_value):
 class SecureDataHandler:
     """Handles secure storage and retrieval of sensitive application data"""
     
+    DOCUMENT_FIELDS = ['file_path', 'original_filename']
+    FINANCIAL_FIELDS = ['bank_account', 'bsb', 'account_number', 'abn']
+    
     @staticmethod
     def encrypt_document_metadata(metadata):
         """Encrypt document metadata"""
         if not metadata:
             return None
         
-        sensitive_fields = ['file_path', 'original_filename']
+        sensitive_fields = SecureDataHandler.DOCUMENT_FIELDS
         encrypted_metadata = metadata.copy()
         
         for field in sensitive_fields:
@@ -106,7 +204,7 @@ class SecureDataHandler:
         if not encrypted_metadata:
             return None
         
-        sensitive_fields = ['file_path', 'original_filename']
+        sensitive_fields = SecureDataHandler.DOCUMENT_FIELDS
         decrypted_metadata = encrypted_metadata.copy()
         
         for field in sensitive_fields:
@@ -121,7 +219,7 @@ class SecureDataHandler:
         if not financial_data:
             return None
         
-        sensitive_fields = ['bank_account', 'bsb', 'account_number', 'abn']
+        sensitive_fields = SecureDataHandler.FINANCIAL_FIELDS
         encrypted_data = financial_data.copy()
         
         for field in sensitive_fields:
@@ -136,7 +234,7 @@ class SecureDataHandler:
         if not encrypted_data:
             return None
         
-        sensitive_fields = ['bank_account', 'bsb', 'account_number', 'abn']
+        sensitive_fields = SecureDataHandler.FINANCIAL_FIELDS
         decrypted_data = encrypted_data.copy()
         
         for field in sensitive_fields:
@@ -145,6 +243,29 @@ class SecureDataHandler:
         
         return decrypted_data
     
+    @staticmethod
+    def encrypt_rows(rows, sensitive_fields):
+        """
+        Encrypt the sensitive fields of a row set (list of dicts)
+        
+        Returns copies of the rows; each field is encrypted as one batch.
+        """
+        return SecureDataHandler._transform_rows(rows, sensitive_fields, encrypt_sensitive_fields)
+    
+    @staticmethod
+    def decrypt_rows(rows, sensitive_fields):
+        """Decrypt the sensitive fields of a row set (e.g. an application export)"""
+        return SecureDataHandler._transform_rows(rows, sensitive_fields, decrypt_sensitive_fields)
+    
+    @staticmethod
+    def _transform_rows(rows, sensitive_fields, transform):
+        transformed = [row.copy() for row in rows]
+        for field in sensitive_fields:
+            present = [row for row in transformed if field in row]
+            for row, value in zip(present, transform([row[field] for row in present])):
+                row[field] = value
+        return transformed
+    
     @staticmethod
     def anonymize_personal_data(data):
         """Anonymize personal data for analytics"""
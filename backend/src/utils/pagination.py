@@ -0,0 +1,90 @@
+"""
+Pagination helpers for GrantThrive
+Keyset (cursor) pagination on (created_at, id) as an alternative to OFFSET paging
+"""
+
+import json
+import base64
+from datetime import datetime
+from flask import request
+from sqlalchemy import or_, and_
+
+def encode_cursor(created_at, row_id):
+    """Build an opaque cursor pointing just after the given row"""
+    payload = json.dumps({'c': created_at.isoformat(), 'i': row_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (created_at, id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['c']), int(payload['i'])
+    except Exception:
+        raise ValueError('Invalid pagination cursor')
+
+def wants_cursor():
+    """Cursor mode is opt-in: any request carrying ?cursor= (empty for the first page)"""
+    return 'cursor' in request.args
+
+def wants_total():
+    """The total count is only computed when asked for with ?include_total=true"""
+    return request.args.get('include_total', 'false').lower() in ('1', 'true', 'yes')
+
+def keyset_paginate(query, model, cursor=None, per_page=20, include_total=False):
+    """
+    Fetch one page newest-first using (created_at, id) as the key
+
+    Args:
+        query: Filtered query for model
+        model: Mapped class with created_at and id columns
+        cursor (str): Cursor from the previous page, or None/'' for the first page
+        per_page (int): Page size (at least 1)
+        include_total (bool): Also run COUNT(*) over the filtered set
+
+    Returns:
+        dict: items, next_cursor, has_next and (optionally) total
+    """
+    per_page = max(1, per_page)
+    total = query.order_by(None).count() if include_total else None
+    
+    query = query.order_by(None).order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+    
+    # One extra row tells us whether another page exists without counting
+    rows = query.limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+    
+    page = {
+        'items': items,
+        'has_next': has_next,
+        'next_cursor': encode_cursor(items[-1].created_at, items[-1].id) if has_next else None
+    }
+    if include_total:
+        page['total'] = total
+    return page
+
+def cursor_pagination_meta(page, per_page):
+    """Pagination block for cursor-mode responses"""
+    meta = {
+        'per_page': max(1, per_page),
+        'next_cursor': page['next_cursor'],
+        'has_next': page['has_next']
+    }
+    if 'total' in page:
+        meta['total'] = page['total']
+    return meta
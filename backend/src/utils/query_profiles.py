@@ -0,0 +1,96 @@
+"""
+Query Loading Profiles for GrantThrive
+Named eager-loading strategies per listing, plus query counting for regression checks
+"""
+
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload, configure_mappers
+
+# Profile name -> (loader strategy, relationship name) pairs, per model.
+# Many-to-one relationships use joinedload (one JOIN, safe with LIMIT);
+# collections use selectinload (one extra IN query, no row explosion).
+LOAD_PROFILES = {
+    'Application': {
+        'list': ((joinedload, 'grant'), (joinedload, 'applicant')),
+        'detail': ((joinedload, 'grant'), (joinedload, 'applicant'), (joinedload, 'reviewer')),
+        'review': ((joinedload, 'applicant'),)
+    },
+    'Grant': {
+        'list': (),
+        'detail': ((joinedload, 'created_by'),),
+        'with_applications': ((joinedload, 'created_by'), (selectinload, 'applications'))
+    },
+    'User': {
+        'list': (),
+        'with_applications': ((selectinload, 'applications'),),
+        'with_grants': ((selectinload, 'created_grants'),)
+    }
+}
+
+def load_options(model, profile):
+    """
+    Loader options for a model's named profile
+
+    Args:
+        model: Mapped class (Application, Grant, User)
+        profile (str): Profile name from LOAD_PROFILES
+
+    Returns:
+        list: Options to pass to query.options()
+    """
+    # Backrefs (Application.grant, User.applications) only exist once mappers are configured
+    configure_mappers()
+    try:
+        spec = LOAD_PROFILES[model.__name__][profile]
+    except KeyError:
+        raise ValueError(f'Unknown load profile {profile!r} for {model.__name__}')
+    return [strategy(getattr(model, name)) for strategy, name in spec]
+
+def apply_profile(query, model, profile):
+    """Apply a named eager-loading profile to a query"""
+    options = load_options(model, profile)
+    return query.options(*options) if options else query
+
+class QueryCounter:
+    """Records SQL statements executed against an engine"""
+    
+    def __init__(self):
+        self.statements = []
+    
+    @property
+    def count(self):
+        return len(self.statements)
+    
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries(engine):
+    """
+    Count queries executed against an engine inside the block
+
+    Usage:
+        with count_queries(db.engine) as counter:
+            client.get('/api/applications')
+        print(counter.count)
+    """
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """
+    Fail if the block executes more than limit queries
+
+    Intended for tests guarding listing endpoints against N+1 regressions.
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n'.join(f'  {i + 1}. {sql}' for i, sql in enumerate(counter.statements))
+        raise AssertionError(f'Expected at most {limit} queries, got {counter.count}:\n{statements}')
@@ -0,0 +1,262 @@
+"""
+SMTP Delivery for GrantThrive
+Pooled, authenticated SMTP connections with parallel sending, per-provider
+throughput limits and retry with backoff
+"""
+
+import os
+import ssl
+import time
+import queue
+import random
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+from ..middleware.rate_limiter import InMemoryRateLimiter
+
+# Default sustained messages/second per relay; SMTP_MAX_RATE overrides
+PROVIDER_RATE_LIMITS = {
+    'smtp.gmail.com': 5,
+    'smtp.office365.com': 5,
+    'smtp.sendgrid.net': 100,
+    'smtp.mailgun.org': 50,
+    'amazonaws.com': 14  # SES default sending rate, any region
+}
+DEFAULT_RATE_LIMIT = 10
+
+class SMTPConnectionPool:
+    """
+    Reusable SMTP sessions (connect, STARTTLS and login done once each)
+
+    Connections are checked out one per sending thread and returned after
+    the message. A connection idle for longer than keepalive_seconds is
+    probed with NOOP before reuse, one that has sent max_messages is
+    retired (many relays cap messages per session), and one that raised
+    is discarded rather than returned.
+    """
+    
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = True, size: int = 4, max_messages: int = 100,
+                 keepalive_seconds: float = 30.0, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.max_messages = max_messages
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+    
+    @contextmanager
+    def connection(self):
+        """Check out a ready connection; it is discarded if the block raises"""
+        self._slots.acquire()
+        entry = None
+        try:
+            entry = self._checkout()
+            yield entry['smtp']
+            entry['messages'] += 1
+            entry['last_used'] = time.monotonic()
+            if entry['messages'] >= self.max_messages:
+                self._quit(entry)
+            else:
+                self._idle.put(entry)
+        except BaseException:
+            if entry is not None:
+                self._quit(entry)
+            raise
+        finally:
+            self._slots.release()
+    
+    def close(self):
+        """Quit every idle connection"""
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+    
+    def _checkout(self) -> Dict[str, Any]:
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if time.monotonic() - entry['last_used'] < self.keepalive_seconds:
+                return entry
+            try:
+                if entry['smtp'].noop()[0] == 250:
+                    return entry
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._quit(entry)
+    
+    def _open(self) -> Dict[str, Any]:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls(context=ssl.create_default_context())
+            if self.username:
+                smtp.login(self.username, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return {'smtp': smtp, 'messages': 0, 'last_used': time.monotonic()}
+    
+    def _quit(self, entry: Dict[str, Any]):
+        try:
+            entry['smtp'].quit()
+        except (smtplib.SMTPException, OSError):
+            entry['smtp'].close()
+
+class SMTPDeliveryEngine:
+    """
+    Sends messages through a connection pool with a worker pool
+
+    Throughput is capped per provider with the rate limiter's token bucket
+    (bursts up to one second's worth). Transient failures - dropped
+    connections, timeouts and 4xx replies - are retried with exponential
+    backoff and jitter on a fresh connection; 5xx replies fail at once.
+    """
+    
+    def __init__(self, pool: SMTPConnectionPool, workers: int = 4, rate_limit: Optional[float] = None,
+                 max_attempts: int = 4, backoff_seconds: float = 1.0):
+        self.pool = pool
+        self.workers = workers
+        self.rate_limit = rate_limit or provider_rate_limit(pool.host)
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.provider = pool.host
+        self._limiter = InMemoryRateLimiter(strategy='token_bucket', max_clients=16)
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+    
+    def send(self, from_addr: str, to_addrs, message: str) -> Dict[str, Any]:
+        """
+        Deliver one message, retrying transient failures
+
+        Returns:
+            dict: to, success, attempts and error (None on success)
+        """
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            self._throttle()
+            try:
+                with self.pool.connection() as smtp:
+                    smtp.sendmail(from_addr, to_addrs, message)
+                self._count(sent=1)
+                return {'to': to_addrs, 'success': True, 'attempts': attempt, 'error': None}
+            except Exception as e:
+                error = str(e)
+                if not _is_transient(e) or attempt == self.max_attempts:
+                    break
+                self._count(retries=1)
+                time.sleep(self.backoff_seconds * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+        
+        self._count(failed=1)
+        return {'to': to_addrs, 'success': False, 'attempts': attempt, 'error': error}
+    
+    def send_many(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Deliver messages in parallel
+
+        Args:
+            messages: Dicts with from_addr, to_addrs and message (the rendered string)
+
+        Returns:
+            list: One send() result per message, in input order
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='smtp-send') as executor:
+            return list(executor.map(
+                lambda item: self.send(item['from_addr'], item['to_addrs'], item['message']),
+                messages
+            ))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'provider': self.provider,
+                'rate_limit': self.rate_limit,
+                'workers': self.workers,
+                'pool_size': self.pool.size,
+                'connections_opened': self.pool.connections_opened,
+                'sent': self.sent,
+                'failed': self.failed,
+                'retries': self.retries,
+                'throttled_seconds': round(self.throttled_seconds, 3)
+            }
+    
+    def _throttle(self):
+        waited = 0.0
+        # Bucket holds one second's worth of messages (at least one)
+        capacity = max(1.0, self.rate_limit)
+        while not self._limiter.hit(self.provider, capacity, capacity / self.rate_limit).allowed:
+            # The decision's retry_after is whole seconds; a token arrives every 1/rate
+            time.sleep(1.0 / self.rate_limit)
+            waited += 1.0 / self.rate_limit
+        if waited:
+            self._count(throttled_seconds=waited)
+    
+    def _count(self, sent=0, failed=0, retries=0, throttled_seconds=0.0):
+        with self._stats_lock:
+            self.sent += sent
+            self.failed += failed
+            self.retries += retries
+            self.throttled_seconds += throttled_seconds
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # Socket errors and timeouts
+    return isinstance(error, OSError)
+
+def provider_rate_limit(host: str) -> float:
+    """Messages/second allowed for a relay: SMTP_MAX_RATE, else the provider default"""
+    if os.getenv('SMTP_MAX_RATE'):
+        return float(os.getenv('SMTP_MAX_RATE'))
+    for domain, limit in PROVIDER_RATE_LIMITS.items():
+        if host == domain or host.endswith('.' + domain):
+            return limit
+    return DEFAULT_RATE_LIMIT
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_delivery_engine(host: str, port: int, username: Optional[str] = None,
+                        password: Optional[str] = None) -> SMTPDeliveryEngine:
+    """Shared engine (and connection pool) per relay account, configured from SMTP_* settings"""
+    key = (host, port, username)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            pool = SMTPConnectionPool(
+                host, port, username, password,
+                use_tls=os.getenv('SMTP_USE_TLS', 'true').lower() in ('1', 'true', 'yes'),
+                size=int(os.getenv('SMTP_POOL_SIZE', '4')),
+                max_messages=int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', '100'))
+            )
+            engine = SMTPDeliveryEngine(
+                pool,
+                workers=int(os.getenv('SMTP_WORKERS', str(pool.size))),
+                max_attempts=int(os.getenv('SMTP_MAX_ATTEMPTS', '4'))
+            )
+            _engines[key] = engine
+        return engine
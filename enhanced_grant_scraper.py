@@ -13,18 +13,26 @@ import re
 from datetime import datetime, timedelta
 from urllib.parse import urljoin, parse_qs, urlparse
 import logging
+from grant_fetch_pipeline import PageFetcher, report_fetch_stats
+from grant_page_cache import PageCache
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class EnhancedGrantScraper:
-    def __init__(self):
+    def __init__(self, cache_path='grant_page_cache.db'):
         self.base_url = "https://www.grants.gov.au"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        # One request at a time, no faster than the old 2 second spacing;
+        # pages unchanged since the last run are revalidated rather than downloaded
+        self.fetcher = PageFetcher(
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            },
+            max_workers=1,
+            requests_per_second=0.5,
+            cache=PageCache(cache_path) if cache_path else None
+        )
         self.grants_data = []
         
     def search_grants(self, start_date="01-Mar-2025", end_date="03-Sep-2025", max_pages=10):
@@ -50,7 +58,7 @@ class EnhancedGrantScraper:
         
         # Perform the search
         search_result_url = f"{self.base_url}/Gd/ListResult"
-        response = self.session.get(search_result_url, params=search_params)
+        response = self.fetcher.get(search_result_url, params=search_params)
         
         if response.status_code != 200:
             logger.error(f"Failed to perform search: {response.status_code}")
@@ -87,7 +95,7 @@ class EnhancedGrantScraper:
         
         try:
             # Get the grant decision page
-            response = self.session.get(gd_info['gd_url'])
+            response = self.fetcher.get(gd_info['gd_url'])
             if response.status_code != 200:
                 logger.error(f"Failed to get grant decision page: {response.status_code}")
                 return []
@@ -103,7 +111,7 @@ class EnhancedGrantScraper:
             awards_url = urljoin(self.base_url, awards_link['href'])
             
             # Get the grant awards page
-            awards_response = self.session.get(awards_url)
+            awards_response = self.fetcher.get(awards_url)
             if awards_response.status_code != 200:
                 logger.error(f"Failed to get grant awards page: {awards_response.status_code}")
                 return []
@@ -142,7 +150,7 @@ class EnhancedGrantScraper:
         logger.info(f"Scraping grant award: {ga_info['ga_id']}")
         
         try:
-            response = self.session.get(ga_info['ga_url'])
+            response = self.fetcher.get(ga_info['ga_url'])
             if response.status_code != 200:
                 logger.error(f"Failed to get grant award page: {response.status_code}")
                 return None
@@ -311,7 +319,6 @@ class EnhancedGrantScraper:
         for gd_info in grant_decisions[:10]:  # Limit to first 10 for testing
             grant_awards = self.get_grant_awards_from_decision(gd_info)
             all_grant_awards.extend(grant_awards)
-            time.sleep(1)  # Be respectful to the server
         
         logger.info(f"Found {len(all_grant_awards)} total grant awards")
         
@@ -323,8 +330,6 @@ class EnhancedGrantScraper:
             grant_data = self.scrape_grant_award_details(ga_info)
             if grant_data:
                 scraped_grants.append(grant_data)
-            
-            time.sleep(2)  # Be respectful to the server
         
         self.grants_data = scraped_grants
         logger.info(f"Successfully scraped {len(scraped_grants)} grants")
@@ -366,6 +371,8 @@ def main():
         max_grants=25  # Limit for initial testing
     )
     
+    report_fetch_stats(scraper.fetcher)
+    
     if grants:
         # Save the data
         scraper.save_data("real_australian_grants_6months")
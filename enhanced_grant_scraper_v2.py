@@ -12,19 +12,30 @@ import time
 import re
 from datetime import datetime, timedelta
 from urllib.parse import urljoin, parse_qs, urlparse
+import argparse
 import logging
+from grant_fetch_pipeline import PageFetcher, ScrapeCheckpoint, report_fetch_stats
+from grant_page_cache import PageCache
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class EnhancedGrantScraperV2:
-    def __init__(self):
+    def __init__(self, max_workers=4, requests_per_second=2.0, checkpoint_path=None,
+                 fixtures_dir=None, record_dir=None, cache_path=None, cache_ttl=0):
         self.base_url = "https://www.grants.gov.au"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.fetcher = PageFetcher(
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            },
+            max_workers=max_workers,
+            requests_per_second=requests_per_second,
+            fixtures_dir=fixtures_dir,
+            record_dir=record_dir,
+            cache=PageCache(cache_path, ttl_seconds=cache_ttl) if cache_path else None
+        )
+        self.checkpoint = ScrapeCheckpoint(checkpoint_path) if checkpoint_path else None
         self.grants_data = []
         
     def search_grants(self, start_date="01-Mar-2025", end_date="03-Sep-2025", max_pages=10):
@@ -47,7 +58,7 @@ class EnhancedGrantScraperV2:
         
         # Perform the search
         search_result_url = f"{self.base_url}/Gd/ListResult"
-        response = self.session.get(search_result_url, params=search_params)
+        response = self.fetcher.get(search_result_url, params=search_params)
         
         if response.status_code != 200:
             logger.error(f"Failed to perform search: {response.status_code}")
@@ -84,7 +95,7 @@ class EnhancedGrantScraperV2:
         
         try:
             # Get the grant decision page
-            response = self.session.get(gd_info['gd_url'])
+            response = self.fetcher.get(gd_info['gd_url'])
             if response.status_code != 200:
                 logger.error(f"Failed to get grant decision page: {response.status_code}")
                 return []
@@ -100,7 +111,7 @@ class EnhancedGrantScraperV2:
             awards_url = urljoin(self.base_url, awards_link['href'])
             
             # Get the grant awards page
-            awards_response = self.session.get(awards_url)
+            awards_response = self.fetcher.get(awards_url)
             if awards_response.status_code != 200:
                 logger.error(f"Failed to get grant awards page: {awards_response.status_code}")
                 return []
@@ -139,7 +150,7 @@ class EnhancedGrantScraperV2:
         logger.info(f"Scraping grant award: {ga_info['ga_id']}")
         
         try:
-            response = self.session.get(ga_info['ga_url'])
+            response = self.fetcher.get(ga_info['ga_url'])
             if response.status_code != 200:
                 logger.error(f"Failed to get grant award page: {response.status_code}")
                 return None
@@ -286,12 +297,26 @@ class EnhancedGrantScraperV2:
         
         grant_data['delivery_location'] = delivery_info
     
-    def scrape_all_grants(self, start_date="01-Mar-2025", end_date="03-Sep-2025", max_grants=50):
+    def scrape_all_grants(self, start_date="01-Mar-2025", end_date="03-Sep-2025", max_grants=50,
+                          max_decisions=10):
         """
         Main method to scrape all grants within the date range
+        
+        Decision and award pages are fetched concurrently under the fetcher's
+        per-host budget. Awards already in the checkpoint are not fetched
+        again; max_grants/max_decisions of None mean no limit.
         """
         logger.info("Starting comprehensive grant scraping with enhanced location extraction...")
         
+        # Only an interrupted run with the same parameters is resumed
+        if self.checkpoint is not None:
+            self.checkpoint.start_run({
+                'start_date': start_date,
+                'end_date': end_date,
+                'max_grants': max_grants,
+                'max_decisions': max_decisions
+            })
+        
         # Step 1: Search for grant decisions
         grant_decisions = self.search_grants(start_date, end_date)
         
@@ -301,19 +326,20 @@ class EnhancedGrantScraperV2:
         
         # Step 2: Process each grant decision to get grant awards
         all_grant_awards = []
-        for gd_info in grant_decisions[:10]:  # Limit to first 10 for testing
-            grant_awards = self.get_grant_awards_from_decision(gd_info)
-            all_grant_awards.extend(grant_awards)
-            time.sleep(1)  # Be respectful to the server
+        for grant_awards in self.fetcher.map(self.get_grant_awards_from_decision,
+                                             grant_decisions[:max_decisions]):
+            all_grant_awards.extend(grant_awards or [])
         
         logger.info(f"Found {len(all_grant_awards)} total grant awards")
         
-        # Step 3: Scrape detailed information for each grant award
-        scraped_grants = []
-        for i, ga_info in enumerate(all_grant_awards[:max_grants]):
-            logger.info(f"Processing grant {i+1}/{min(len(all_grant_awards), max_grants)}")
-            
-            grant_data = self.scrape_grant_award_details(ga_info)
+        # Step 3: Scrape detailed information for each grant award not already checkpointed
+        scraped_grants = self.checkpoint.grants() if self.checkpoint else []
+        pending = [ga_info for ga_info in all_grant_awards[:max_grants]
+                   if self.checkpoint is None or ga_info['ga_id'] not in self.checkpoint]
+        if len(pending) < len(all_grant_awards[:max_grants]):
+            logger.info(f"Skipping {len(all_grant_awards[:max_grants]) - len(pending)} awards already in the checkpoint")
+        
+        for grant_data in self.fetcher.map(self._scrape_award, pending):
             if grant_data:
                 scraped_grants.append(grant_data)
                 
@@ -323,14 +349,21 @@ class EnhancedGrantScraperV2:
                 if recipient_loc.get('state') or delivery_loc.get('state'):
                     logger.info(f"  ✓ Location extracted: {recipient_loc.get('city', 'N/A')}, {recipient_loc.get('state', delivery_loc.get('state', 'N/A'))}")
                 else:
-                    logger.warning(f"  ✗ No location data found for {ga_info['ga_id']}")
-            
-            time.sleep(2)  # Be respectful to the server
+                    logger.warning(f"  ✗ No location data found for {grant_data['ga_id']}")
         
         self.grants_data = scraped_grants
         logger.info(f"Successfully scraped {len(scraped_grants)} grants")
         return scraped_grants
     
+    def _scrape_award(self, ga_info):
+        """Scrape one grant award and checkpoint it as soon as it is done"""
+        # fetcher.map only yields once every award has been fetched, so an
+        # interrupted run must have checkpointed its awards from the workers
+        grant_data = self.scrape_grant_award_details(ga_info)
+        if grant_data and self.checkpoint is not None:
+            self.checkpoint.add(grant_data['ga_id'], grant_data)
+        return grant_data
+    
     def save_data(self, filename_base="real_grants_data_v2"):
         """
         Save the scraped data to JSON and CSV files
@@ -358,19 +391,60 @@ def main():
     """
     Main function to run the enhanced scraper
     """
-    scraper = EnhancedGrantScraperV2()
+    parser = argparse.ArgumentParser(description='Enhanced grants.gov.au scraper')
+    parser.add_argument('--full-scan', action='store_true',
+                        help='scrape every decision and award in the date range')
+    parser.add_argument('--start-date', default='01-Mar-2025', help='DD-Mon-YYYY')
+    parser.add_argument('--end-date', default='03-Sep-2025', help='DD-Mon-YYYY')
+    parser.add_argument('--max-grants', type=int, default=25)
+    parser.add_argument('--workers', type=int, default=4, help='concurrent page fetches')
+    parser.add_argument('--requests-per-second', type=float, default=2.0,
+                        help='politeness budget per host')
+    parser.add_argument('--checkpoint', help='resume file of already-scraped awards '
+                        '(default: grants_checkpoint_v2.jsonl; none when --offline)')
+    parser.add_argument('--fresh', action='store_true', help='discard the checkpoint and start over')
+    parser.add_argument('--offline', metavar='DIR', help='replay saved HTML fixtures instead of fetching')
+    parser.add_argument('--record', metavar='DIR', help='save every fetched page as a fixture')
+    parser.add_argument('--cache', default='grant_page_cache.db', help='conditional-GET page cache file')
+    parser.add_argument('--no-cache', action='store_true', help='always download every page')
+    parser.add_argument('--cache-ttl', type=float, default=0,
+                        help='seconds a cached page is reused without revalidating')
+    parser.add_argument('--stats-file', help='write fetch and cache statistics to this JSON file')
+    args = parser.parse_args()
+    
+    # Offline runs are measurements, so they do not resume unless asked to
+    checkpoint_path = args.checkpoint or (None if args.offline else 'grants_checkpoint_v2.jsonl')
+    
+    scraper = EnhancedGrantScraperV2(
+        max_workers=args.workers,
+        requests_per_second=args.requests_per_second,
+        checkpoint_path=checkpoint_path,
+        fixtures_dir=args.offline,
+        record_dir=args.record,
+        cache_path=None if args.no_cache or args.offline else args.cache,
+        cache_ttl=args.cache_ttl
+    )
+    if args.fresh and scraper.checkpoint is not None:
+        scraper.checkpoint.reset()
     
     # Scrape grants from the last 6 months with enhanced location extraction
     grants = scraper.scrape_all_grants(
-        start_date="01-Mar-2025",
-        end_date="03-Sep-2025",
-        max_grants=25  # Limit for initial testing
+        start_date=args.start_date,
+        end_date=args.end_date,
+        max_grants=None if args.full_scan else args.max_grants,  # Limit for initial testing
+        max_decisions=None if args.full_scan else 10
     )
     
+    report_fetch_stats(scraper.fetcher, args.stats_file)
+    
     if grants:
         # Save the data
         scraper.save_data("real_australian_grants_6months_v2")
         
+        # The run is complete, so the next one starts from scratch
+        if scraper.checkpoint is not None:
+            scraper.checkpoint.complete()
+        
         # Print summary with location stats
         print(f"\n=== ENHANCED SCRAPING SUMMARY ===")
         print(f"Total grants scraped: {len(grants)}")
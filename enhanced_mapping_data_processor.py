@@ -5,7 +5,10 @@ Adds proper coordinates and geographic data for interactive mapping
 """
 
 import json
+import os
 import logging
+import argparse
+from mapping_data_stream import MappingDataWriter, MappingSummary, peak_rss_mb
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -58,6 +61,21 @@ class EnhancedMappingDataProcessor:
                 'state': 'ACT'
             }
         }
+        
+        # City -> regions containing it, for clustering in one pass over the grants
+        self.city_regions = {}
+        for region_name, region_info in self.regions.items():
+            for city in region_info['cities']:
+                self.city_regions.setdefault(city, []).append(region_name)
+        
+        # Map extent shown before any grant is selected
+        self.map_bounds = {
+            'north': -12.4634,  # Darwin
+            'south': -42.8821,  # Hobart
+            'east': 153.0251,   # Brisbane
+            'west': 115.8605    # Perth
+        }
+        self.map_center = {'lat': -25.2744, 'lng': 133.7751}  # Australia center
     
     def load_mapping_data(self, filename="real_grant_mapping_data_v2.json"):
         """Load the processed mapping data"""
@@ -70,11 +88,38 @@ class EnhancedMappingDataProcessor:
             logger.error(f"Error loading mapping data: {str(e)}")
             return None
     
-    def enhance_grant_coordinates(self, grant):
+    def open_mapping_stream(self, filename):
+        """
+        Mapping data as (everything but the grants, iterator over the grants)
+        
+        NDJSON files (GrantDataProcessor.stream_mapping_data(format='ndjson'))
+        are read a line at a time, with the rest of the document taken from
+        the <name>_meta.json next to them. A .json document has to be parsed
+        whole, but its grants are handed out one at a time all the same.
+        """
+        if filename.endswith('.ndjson'):
+            meta_filename = os.path.splitext(filename)[0] + '_meta.json'
+            meta = {}
+            if os.path.exists(meta_filename):
+                with open(meta_filename, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            
+            def grants():
+                with open(filename, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+            return meta, grants()
+        
+        with open(filename, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta, iter(meta.pop('grants'))
+    
+    def enhance_grant_coordinates(self, grant, log=True):
         """Add proper coordinates to a grant based on location data"""
         location = grant.get('location', {})
-        city = location.get('city', '').upper()
-        state = location.get('state', '').upper()
+        city = (location.get('city') or '').upper()
+        state = (location.get('state') or '').upper()
         
         # Try to find coordinates by city name first
         if city and city in self.location_coordinates:
@@ -86,7 +131,8 @@ class EnhancedMappingDataProcessor:
             # Ensure postcode is set
             if not location.get('postcode'):
                 grant['location']['postcode'] = coord_info['postcode']
-            logger.info(f"  ✓ Coordinates added for {city}: {coord_info['lat']}, {coord_info['lng']}")
+            if log:
+                logger.info(f"  ✓ Coordinates added for {city}: {coord_info['lat']}, {coord_info['lng']}")
             return True
         
         # Fallback to state center
@@ -100,10 +146,12 @@ class EnhancedMappingDataProcessor:
                 grant['location']['city'] = state
             if not location.get('postcode'):
                 grant['location']['postcode'] = coord_info['postcode']
-            logger.info(f"  ✓ State center coordinates added for {state}: {coord_info['lat']}, {coord_info['lng']}")
+            if log:
+                logger.info(f"  ✓ State center coordinates added for {state}: {coord_info['lat']}, {coord_info['lng']}")
             return True
         
-        logger.warning(f"  ✗ No coordinates found for city: {city}, state: {state}")
+        if log:
+            logger.warning(f"  ✗ No coordinates found for city: {city}, state: {state}")
         return False
     
     def create_map_markers(self, grants):
@@ -111,65 +159,79 @@ class EnhancedMappingDataProcessor:
         markers = []
         
         for grant in grants:
-            coordinates = grant.get('location', {}).get('coordinates')
-            if coordinates:
-                marker = {
-                    'id': grant['id'],
-                    'lat': coordinates['lat'],
-                    'lng': coordinates['lng'],
-                    'title': grant['title'],
-                    'value': grant['value'],
-                    'value_formatted': grant['value_formatted'],
-                    'category': grant['category']['primary'],
-                    'color': grant['category']['color'],
-                    'icon': grant['category']['icon'],
-                    'size_category': grant['size_category'],
-                    'location_name': f"{grant['location'].get('city', '')}, {grant['location'].get('state', '')}",
-                    'recipient': grant['recipient'],
-                    'agency': grant['agency'],
-                    'url': grant['url']
-                }
+            marker = self.create_map_marker(grant)
+            if marker:
                 markers.append(marker)
         
         logger.info(f"Created {len(markers)} map markers")
         return markers
     
+    def create_map_marker(self, grant):
+        """Map marker for one grant, or None if it has no coordinates"""
+        coordinates = grant.get('location', {}).get('coordinates')
+        if not coordinates:
+            return None
+        return {
+            'id': grant['id'],
+            'lat': coordinates['lat'],
+            'lng': coordinates['lng'],
+            'title': grant['title'],
+            'value': grant['value'],
+            'value_formatted': grant['value_formatted'],
+            'category': grant['category']['primary'],
+            'color': grant['category']['color'],
+            'icon': grant['category']['icon'],
+            'size_category': grant['size_category'],
+            'location_name': f"{grant['location'].get('city', '')}, {grant['location'].get('state', '')}",
+            'recipient': grant['recipient'],
+            'agency': grant['agency'],
+            'url': grant['url']
+        }
+    
     def create_region_clusters(self, grants):
         """Create regional clusters for map visualization"""
-        clusters = []
-        
-        for region_name, region_info in self.regions.items():
-            region_grants = []
-            total_value = 0
-            
-            for grant in grants:
-                city = grant.get('location', {}).get('city', '').upper()
-                if city in region_info['cities']:
-                    region_grants.append(grant)
-                    total_value += grant.get('value', 0)
-            
-            if region_grants:
-                cluster = {
-                    'name': region_name,
-                    'center': region_info['center'],
-                    'state': region_info['state'],
-                    'grant_count': len(region_grants),
-                    'total_value': total_value,
-                    'total_value_formatted': f"${total_value:,.2f}",
-                    'grants': region_grants,
-                    'categories': {}
-                }
-                
-                # Count categories in this region
-                for grant in region_grants:
-                    category = grant['category']['primary']
-                    cluster['categories'][category] = cluster['categories'].get(category, 0) + 1
-                
-                clusters.append(cluster)
+        totals = {}
+        for grant in grants:
+            self.add_to_region_clusters(totals, grant)
         
+        clusters = self.finish_region_clusters(totals)
         logger.info(f"Created {len(clusters)} regional clusters")
         return clusters
     
+    def add_to_region_clusters(self, totals, grant):
+        """
+        Count a grant towards the clusters of its city's regions
+        
+        Clusters list the IDs of their grants (grant_ids) rather than
+        carrying a copy of each grant, which is already in 'grants'.
+        """
+        city = (grant.get('location', {}).get('city') or '').upper()
+        for region_name in self.city_regions.get(city, ()):
+            region = totals.setdefault(region_name, {'grant_ids': [], 'total_value': 0, 'categories': {}})
+            region['grant_ids'].append(grant['id'])
+            region['total_value'] += grant.get('value', 0)
+            category = grant['category']['primary']
+            region['categories'][category] = region['categories'].get(category, 0) + 1
+    
+    def finish_region_clusters(self, totals):
+        """Clusters, in region order, for the regions that have grants"""
+        clusters = []
+        for region_name, region_info in self.regions.items():
+            region = totals.get(region_name)
+            if not region:
+                continue
+            clusters.append({
+                'name': region_name,
+                'center': region_info['center'],
+                'state': region_info['state'],
+                'grant_count': len(region['grant_ids']),
+                'total_value': region['total_value'],
+                'total_value_formatted': f"${region['total_value']:,.2f}",
+                'grant_ids': region['grant_ids'],
+                'categories': region['categories']
+            })
+        return clusters
+    
     def enhance_mapping_data(self, mapping_data):
         """Enhance the mapping data with coordinates and geographic features"""
         if not mapping_data:
@@ -197,13 +259,8 @@ class EnhancedMappingDataProcessor:
         mapping_data['map_data'] = {
             'markers': map_markers,
             'clusters': region_clusters,
-            'bounds': {
-                'north': -12.4634,  # Darwin
-                'south': -42.8821,  # Hobart
-                'east': 153.0251,   # Brisbane
-                'west': 115.8605    # Perth
-            },
-            'center': {'lat': -25.2744, 'lng': 133.7751}  # Australia center
+            'bounds': self.map_bounds,
+            'center': self.map_center
         }
         
         # Update summary with geographic stats
@@ -221,35 +278,122 @@ class EnhancedMappingDataProcessor:
             logger.info(f"Saved enhanced mapping data to {filename}")
             
             # Create a summary report
-            summary_filename = filename.replace('.json', '_summary.txt')
-            with open(summary_filename, 'w', encoding='utf-8') as f:
-                f.write("=== ENHANCED GRANT MAPPING DATA SUMMARY ===\n\n")
-                f.write(f"Total Grants: {mapping_data['summary']['total_grants']}\n")
-                f.write(f"Total Value: ${mapping_data['summary']['total_value']:,.2f}\n")
-                f.write(f"Coordinates Coverage: {mapping_data['summary']['coordinates_coverage']}\n")
-                f.write(f"Map Markers: {mapping_data['summary']['map_markers']}\n")
-                f.write(f"Regional Clusters: {mapping_data['summary']['regions']}\n\n")
-                
-                f.write("Regional Distribution:\n")
-                for cluster in mapping_data['map_data']['clusters']:
-                    f.write(f"  {cluster['name']}: {cluster['grant_count']} grants, {cluster['total_value_formatted']}\n")
-                
-                f.write("\nState Distribution:\n")
-                for state, count in mapping_data['summary']['states'].items():
-                    percentage = (count / mapping_data['summary']['total_grants']) * 100
-                    f.write(f"  {state}: {count} grants ({percentage:.1f}%)\n")
-            
-            logger.info(f"Saved enhanced summary to {summary_filename}")
+            self.save_summary_report(mapping_data['summary'], mapping_data['map_data']['clusters'], filename)
             
         except Exception as e:
             logger.error(f"Error saving enhanced data: {str(e)}")
+    
+    def stream_enhanced_data(self, grants, filename="enhanced_grant_mapping_data.json", meta=None,
+                             format='json', chunk_size=1000):
+        """
+        Enhance and save mapping data one grant at a time
+        
+        Each grant is given coordinates, written out and counted towards the
+        markers, clusters and summary before the next is read, so memory
+        holds running totals rather than the national grant list. The output
+        has the same layout as save_enhanced_data(); format='ndjson' puts
+        grants and markers in their own line-per-record files (see
+        MappingDataWriter).
+        
+        Args:
+            grants: Iterable of mapping grants (see open_mapping_stream)
+            meta: The rest of the input document (categories, states, ...)
+        
+        Returns:
+            dict: The summary block
+        """
+        summary = MappingSummary()
+        totals = {}
+        coordinates_added = 0
+        
+        writer = MappingDataWriter(filename, format=format, streams=('grants', 'markers'), chunk_size=chunk_size)
+        with writer:
+            for grant in grants:
+                if self.enhance_grant_coordinates(grant, log=False):
+                    coordinates_added += 1
+                writer.write(grant)
+                marker = self.create_map_marker(grant)
+                if marker:
+                    writer.write(marker, 'markers')
+                self.add_to_region_clusters(totals, grant)
+                summary.add(grant)
+            
+            clusters = self.finish_region_clusters(totals)
+            summary_data = summary.to_dict()
+            summary_data['coordinates_coverage'] = f"{coordinates_added}/{summary.total_grants}"
+            summary_data['regions'] = len(clusters)
+            summary_data['map_markers'] = writer.counts['markers']
+            
+            document = {'summary': summary_data}
+            document.update((key, value) for key, value in (meta or {}).items()
+                            if key not in ('grants', 'summary', 'map_data'))
+            document['map_data'] = {
+                'markers': MappingDataWriter.STREAM,
+                'clusters': clusters,
+                'bounds': self.map_bounds,
+                'center': self.map_center
+            }
+            writer.close(document)
+        
+        logger.info(f"Added coordinates to {summary_data['coordinates_coverage']} grants")
+        logger.info(f"Streamed enhanced mapping data to {filename} ({format}); peak RSS {peak_rss_mb():.0f} MB")
+        self.save_summary_report(summary_data, clusters, filename)
+        return summary_data
+    
+    def save_summary_report(self, summary, clusters, filename):
+        """Write the <name>_summary.txt report next to the enhanced data"""
+        summary_filename = os.path.splitext(filename)[0] + '_summary.txt'
+        with open(summary_filename, 'w', encoding='utf-8') as f:
+            f.write("=== ENHANCED GRANT MAPPING DATA SUMMARY ===\n\n")
+            f.write(f"Total Grants: {summary['total_grants']}\n")
+            f.write(f"Total Value: ${summary['total_value']:,.2f}\n")
+            f.write(f"Coordinates Coverage: {summary['coordinates_coverage']}\n")
+            f.write(f"Map Markers: {summary['map_markers']}\n")
+            f.write(f"Regional Clusters: {summary['regions']}\n\n")
+            
+            f.write("Regional Distribution:\n")
+            for cluster in clusters:
+                f.write(f"  {cluster['name']}: {cluster['grant_count']} grants, {cluster['total_value_formatted']}\n")
+            
+            f.write("\nState Distribution:\n")
+            for state, count in summary['states'].items():
+                percentage = (count / summary['total_grants']) * 100
+                f.write(f"  {state}: {count} grants ({percentage:.1f}%)\n")
+        
+        logger.info(f"Saved enhanced summary to {summary_filename}")
 
 def main():
     """Main function to enhance the mapping data"""
+    parser = argparse.ArgumentParser(description='Add coordinates, markers and clusters to grant mapping data')
+    parser.add_argument('--input', default='real_grant_mapping_data_v2.json', help='mapping data (.json or .ndjson)')
+    parser.add_argument('--output', default='enhanced_grant_mapping_data.json')
+    parser.add_argument('--stream', action='store_true',
+                        help='process one grant at a time (for national-scale data)')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json', help='output format with --stream')
+    args = parser.parse_args()
+    
     processor = EnhancedMappingDataProcessor()
     
+    if args.stream or args.input.endswith('.ndjson'):
+        try:
+            meta, grants = processor.open_mapping_stream(args.input)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error loading mapping data: {str(e)}")
+            print("Failed to load mapping data")
+            return
+        
+        summary = processor.stream_enhanced_data(grants, args.output, meta=meta, format=args.format)
+        
+        print(f"\n=== ENHANCEMENT SUMMARY ===")
+        print(f"Total grants: {summary['total_grants']}")
+        print(f"Coordinates added: {summary['coordinates_coverage']}")
+        print(f"Map markers created: {summary['map_markers']}")
+        print(f"Regional clusters: {summary['regions']}")
+        print(f"Peak RSS: {peak_rss_mb():.0f} MB")
+        return
+    
     # Load the current mapping data
-    mapping_data = processor.load_mapping_data("real_grant_mapping_data_v2.json")
+    mapping_data = processor.load_mapping_data(args.input)
     
     if not mapping_data:
         print("Failed to load mapping data")
@@ -260,7 +404,7 @@ def main():
     
     if enhanced_data:
         # Save the enhanced data
-        processor.save_enhanced_data(enhanced_data, "enhanced_grant_mapping_data.json")
+        processor.save_enhanced_data(enhanced_data, args.output)
         
         # Print summary
         print(f"\n=== ENHANCEMENT SUMMARY ===")
@@ -272,6 +416,7 @@ def main():
         print(f"\nRegional clusters:")
         for cluster in enhanced_data['map_data']['clusters']:
             print(f"  {cluster['name']}: {cluster['grant_count']} grants, {cluster['total_value_formatted']}")
+        logger.info(f"Peak RSS: {peak_rss_mb():.0f} MB")
     else:
         print("Failed to enhance mapping data")
 
@@ -12,11 +12,16 @@ from datetime import datetime
 import re
 from collections import defaultdict
 import logging
+import argparse
+from mapping_data_stream import MappingDataWriter, MappingSummary, peak_rss_mb
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Text fields searched for category keywords, in the order categorize_grant() joins them
+CATEGORY_TEXT_FIELDS = ['category', 'grant_program', 'grant_activity', 'purpose', 'agency']
+
 class GrantDataProcessor:
     def __init__(self):
         self.grants_data = []
@@ -101,6 +106,22 @@ class GrantDataProcessor:
             '0800': {'lat': -12.4634, 'lng': 130.8456, 'city': 'Darwin', 'state': 'NT'},
             '2600': {'lat': -35.2809, 'lng': 149.1300, 'city': 'Canberra', 'state': 'ACT'}
         }
+        
+        # Approximate state centres for postcodes not in the table
+        self.state_centers = {
+            'NSW': {'lat': -32.0, 'lng': 147.0},
+            'VIC': {'lat': -37.0, 'lng': 144.0},
+            'QLD': {'lat': -22.0, 'lng': 144.0},
+            'SA': {'lat': -30.0, 'lng': 135.0},
+            'WA': {'lat': -25.0, 'lng': 122.0},
+            'TAS': {'lat': -42.0, 'lng': 147.0},
+            'NT': {'lat': -19.0, 'lng': 133.0},
+            'ACT': {'lat': -35.3, 'lng': 149.1}
+        }
+        
+        # Columnar path (process_grants_columnar)
+        self.processed_frame = None
+        self._keyword_matcher = None
     
     def load_sample_data(self):
         """Load sample grant data for demonstration"""
@@ -254,19 +275,8 @@ class GrantDataProcessor:
             return self.postcode_coordinates[postcode]
         
         # For unknown postcodes, return approximate state center
-        state_centers = {
-            'NSW': {'lat': -32.0, 'lng': 147.0},
-            'VIC': {'lat': -37.0, 'lng': 144.0},
-            'QLD': {'lat': -22.0, 'lng': 144.0},
-            'SA': {'lat': -30.0, 'lng': 135.0},
-            'WA': {'lat': -25.0, 'lng': 122.0},
-            'TAS': {'lat': -42.0, 'lng': 147.0},
-            'NT': {'lat': -19.0, 'lng': 133.0},
-            'ACT': {'lat': -35.3, 'lng': 149.1}
-        }
-        
-        if state and state in state_centers:
-            coords = state_centers[state].copy()
+        if state and state in self.state_centers:
+            coords = self.state_centers[state].copy()
             coords['city'] = 'Unknown'
             coords['state'] = state
             return coords
@@ -328,73 +338,347 @@ class GrantDataProcessor:
             processed_grants.append(processed_grant)
         
         self.processed_data = processed_grants
+        self.processed_frame = None
         logger.info(f"Processed {len(processed_grants)} grants")
         return processed_grants
     
+    def load_dataframe(self, grants=None):
+        """Scraped grants (self.grants_data by default) as a DataFrame, one column per field"""
+        frame = pd.DataFrame.from_records(self.grants_data if grants is None else grants)
+        logger.info(f"Loaded {len(frame)} grants into a DataFrame")
+        return frame
+    
+    def load_postcode_table(self, filename):
+        """
+        Add postcode coordinates from a CSV file (e.g. a full national dataset)
+        
+        Expects postcode and lat/latitude and lng/long/longitude columns, plus
+        optional city/locality and state. Postcodes already in the table keep
+        their coordinates, as does the first row for a repeated postcode.
+        """
+        df = pd.read_csv(filename, dtype=str, keep_default_na=False)
+        columns = {column.lower(): column for column in df.columns}
+        lat = columns.get('lat') or columns.get('latitude')
+        lng = columns.get('lng') or columns.get('long') or columns.get('longitude')
+        city = columns.get('city') or columns.get('locality')
+        state = columns.get('state')
+        
+        df = df[(df[lat] != '') & (df[lng] != '')]
+        added = 0
+        for index, postcode in enumerate(df[columns['postcode']].map(_normalise_postcode)):
+            if not postcode or postcode in self.postcode_coordinates:
+                continue
+            row = df.iloc[index]
+            self.postcode_coordinates[postcode] = {
+                'lat': float(row[lat]),
+                'lng': float(row[lng]),
+                'city': row[city].title() if city and row[city] else 'Unknown',
+                'state': row[state] if state and row[state] else 'Unknown'
+            }
+            added += 1
+        
+        logger.info(f"Added {added} postcodes from {filename}")
+        return added
+    
+    def process_grants_columnar(self, frame=None):
+        """
+        Process all grants column-at-a-time; same fields as process_grants()
+        
+        Categorisation runs the keyword matcher over each distinct value of
+        each text field rather than over every grant, coordinates are a join
+        against the postcode table and dates are parsed in one call per
+        column. The result is kept in self.processed_frame, which
+        generate_mapping_data() and generate_summary_report() read from.
+        """
+        df = self.load_dataframe() if frame is None else frame.copy()
+        n = len(df)
+        
+        # Add categorization
+        primary, all_categories, category_scores = self._categorize_frame(df)
+        df['primary_category'] = primary
+        df['all_categories'] = all_categories
+        df['category_scores'] = category_scores
+        
+        # Add size category
+        values = self._column(df, 'value_aud', np.nan)
+        values = pd.to_numeric(values, errors='coerce').fillna(0).to_numpy(dtype=float)
+        df['size_category'] = np.select(
+            [values == 0, values < 50000, values < 500000, values < 5000000],
+            ['Unknown', 'Small', 'Medium', 'Large'],
+            'Major'
+        )
+        
+        # Add geographic data
+        postcode = self._map_distinct(self._column(df, 'recipient_postcode'), _normalise_postcode)
+        postcode = np.where(postcode != '', postcode, self._map_distinct(self._column(df, 'delivery_postcode'), _normalise_postcode))
+        state = self._map_distinct(self._column(df, 'recipient_state'), str.strip)
+        state = np.where(state != '', state, self._map_distinct(self._column(df, 'delivery_state'), str.strip))
+        
+        postcodes = pd.DataFrame.from_dict(self.postcode_coordinates, orient='index')
+        centers = pd.DataFrame.from_dict(self.state_centers, orient='index')
+        by_postcode = postcodes.reindex(postcode)
+        by_state = centers.reindex(state)
+        known_postcode = by_postcode['lat'].notna().to_numpy()
+        known_state = by_state['lat'].notna().to_numpy()
+        located = (postcode != '') | (state != '')
+        
+        latitude = np.where(known_postcode, by_postcode['lat'], np.where(known_state, by_state['lat'], -25.0))
+        longitude = np.where(known_postcode, by_postcode['lng'], np.where(known_state, by_state['lng'], 133.0))
+        mapped_city = np.where(known_postcode, by_postcode['city'], 'Unknown').astype(object)
+        mapped_state = np.where(known_postcode, by_postcode['state'],
+                                np.where(known_state, state, 'Unknown')).astype(object)
+        df['latitude'] = np.where(located, latitude, np.nan)
+        df['longitude'] = np.where(located, longitude, np.nan)
+        df['mapped_city'] = np.where(located, mapped_city, None)
+        df['mapped_state'] = np.where(located, mapped_state, None)
+        
+        # Add category styling
+        df['category_color'] = df['primary_category'].map({name: info['color'] for name, info in self.categories.items()})
+        df['category_icon'] = df['primary_category'].map({name: info['icon'] for name, info in self.categories.items()})
+        
+        # Add processed timestamp
+        df['processed_at'] = datetime.now().isoformat()
+        
+        # Parse dates
+        for date_field in ['approval_date', 'publish_date']:
+            if date_field not in df:
+                continue
+            raw = df[date_field]
+            parsed = pd.to_datetime(raw.where(raw.map(type) == str), format='%d-%b-%Y', errors='coerce')
+            missing = parsed.isna().to_numpy()
+            iso = np.datetime_as_string(parsed.to_numpy(dtype='datetime64[s]'), unit='s').astype(object)
+            iso[missing] = None
+            df[f'{date_field}_parsed'] = iso
+            
+            unparsed = int((missing & raw.notna().to_numpy() & (raw.astype(str) != '').to_numpy()).sum())
+            if unparsed:
+                logger.warning(f"Could not parse {unparsed} {date_field} values")
+        
+        self.processed_frame = df
+        logger.info(f"Processed {n} grants")
+        return df
+    
+    def processed_records(self):
+        """Processed grants as a list of dicts (missing values as None)"""
+        if self.processed_frame is None:
+            return self.processed_data
+        return self.processed_frame.astype(object).where(self.processed_frame.notna(), None).to_dict('records')
+    
+    def _categorize_frame(self, df):
+        """
+        categorize_grant() for a whole frame
+        
+        A keyword counts for a grant if it occurs anywhere in the lowercased,
+        space-joined text fields, as in categorize_grant(). Each field's
+        distinct values are scanned once with the combined keyword pattern;
+        keywords containing a space can also straddle two adjacent fields,
+        which is checked separately from the field's suffix and the next
+        field's prefix.
+        """
+        matcher = self._get_keyword_matcher()
+        keyword_count = len(matcher['keywords'])
+        n = len(df)
+        presence = np.zeros((n, keyword_count), dtype=bool)
+        
+        fields = []
+        for field in CATEGORY_TEXT_FIELDS:
+            codes, uniques = self._factorize_text(self._column(df, field))
+            uniques = [text.lower() for text in uniques]
+            table = np.zeros((len(uniques), keyword_count), dtype=bool)
+            for row, text in enumerate(uniques):
+                for keyword in set(matcher['pattern'].findall(text)):
+                    table[row, matcher['implied'][keyword]] = True
+            presence |= table[codes]
+            fields.append((codes, uniques))
+        
+        for (codes, uniques), (next_codes, next_uniques) in zip(fields, fields[1:]):
+            for keyword_index, head, tail in matcher['spanning']:
+                ends = np.fromiter((text.endswith(head) for text in uniques), dtype=bool, count=len(uniques))
+                starts = np.fromiter((text.startswith(tail) for text in next_uniques), dtype=bool, count=len(next_uniques))
+                presence[:, keyword_index] |= ends[codes] & starts[next_codes]
+        
+        scores = presence.astype(np.int32) @ matcher['weights']
+        
+        # One result object per distinct score pattern, shared by every grant that has it
+        base = int(matcher['weights'].sum(axis=0).max()) + 1
+        digits = base ** np.arange(scores.shape[1], dtype=np.int64)
+        inverse, pattern_keys = pd.factorize(scores.astype(np.int64) @ digits)
+        patterns = (pattern_keys[:, None] // digits) % base
+        category_names = list(self.categories)
+        primary_by_pattern = np.empty(len(patterns), dtype=object)
+        all_by_pattern = np.empty(len(patterns), dtype=object)
+        scores_by_pattern = np.empty(len(patterns), dtype=object)
+        for index, pattern in enumerate(patterns):
+            if pattern.any():
+                primary_by_pattern[index] = category_names[int(pattern.argmax())]
+                all_by_pattern[index] = [name for name, score in zip(category_names, pattern) if score]
+                scores_by_pattern[index] = {name: int(score) for name, score in zip(category_names, pattern) if score}
+            else:
+                primary_by_pattern[index] = 'Other'
+                all_by_pattern[index] = ['Other']
+                scores_by_pattern[index] = {'Other': 1}
+        
+        return primary_by_pattern[inverse], all_by_pattern[inverse], scores_by_pattern[inverse]
+    
+    def _get_keyword_matcher(self):
+        """Combined pattern for every category keyword, built once per processor"""
+        if self._keyword_matcher is not None:
+            return self._keyword_matcher
+        
+        keywords = []
+        for category_info in self.categories.values():
+            for keyword in category_info['keywords']:
+                if keyword not in keywords:
+                    keywords.append(keyword)
+        index = {keyword: position for position, keyword in enumerate(keywords)}
+        
+        # A keyword listed twice in a category scores twice, as in categorize_grant()
+        weights = np.zeros((len(keywords), len(self.categories)), dtype=np.int32)
+        for column, category_info in enumerate(self.categories.values()):
+            for keyword in category_info['keywords']:
+                weights[index[keyword], column] += 1
+        
+        # Overlapping, longest-first matches; every keyword that is a prefix of
+        # a match ('tech' of 'technology') is present at the same position
+        alternatives = '|'.join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+        self._keyword_matcher = {
+            'keywords': keywords,
+            'weights': weights,
+            'pattern': re.compile(f'(?=({alternatives}))'),
+            'implied': {keyword: [index[other] for other in keywords if keyword.startswith(other)]
+                        for keyword in keywords},
+            'spanning': [(index[keyword], keyword[:position], keyword[position + 1:])
+                         for keyword in keywords
+                         for position, char in enumerate(keyword) if char == ' ']
+        }
+        return self._keyword_matcher
+    
+    @staticmethod
+    def _column(df, name, default=''):
+        return df[name] if name in df else pd.Series(default, index=df.index, dtype=object)
+    
+    @staticmethod
+    def _factorize_text(series):
+        """Codes into the column's distinct values as strings; missing values are ''"""
+        codes, uniques = pd.factorize(series)
+        # Missing values get code -1, which picks the trailing ''
+        return codes, [str(value) for value in uniques] + ['']
+    
+    @classmethod
+    def _map_distinct(cls, series, func):
+        """func applied to each distinct value of a text column, as an object array"""
+        codes, uniques = cls._factorize_text(series)
+        return np.array([func(value) for value in uniques], dtype=object)[codes]
+    
     def generate_mapping_data(self):
         """Generate data specifically formatted for mapping visualization"""
-        mapping_data = {
-            'grants': [],
-            'summary': {
-                'total_grants': len(self.processed_data),
-                'total_value': sum(g.get('value_aud', 0) for g in self.processed_data),
-                'categories': {},
-                'states': {},
-                'size_distribution': {}
-            },
+        summary = MappingSummary()
+        grants = []
+        for mapping_grant in self.iter_mapping_grants():
+            grants.append(mapping_grant)
+            summary.add(mapping_grant)
+        
+        return {
+            'grants': grants,
+            'summary': summary.to_dict(),
             'categories': self.categories,
             'states': self.state_mapping
         }
+    
+    def iter_mapping_grants(self, chunk_size=10000):
+        """
+        Mapping records for the processed grants, one at a time
+        
+        Records for the columnar path are built chunk_size grants at a time,
+        so only one chunk's column values are held as Python objects.
+        """
+        if self.processed_frame is None:
+            for grant in self.processed_data:
+                yield self._mapping_grant(grant)
+            return
+        
+        df = self.processed_frame
+        for start in range(0, len(df), chunk_size):
+            yield from self._frame_mapping_grants(df.iloc[start:start + chunk_size])
+    
+    def _mapping_grant(self, grant):
+        return {
+            'id': grant.get('ga_id'),
+            'title': grant.get('grant_activity', 'Unknown Grant'),
+            'description': grant.get('purpose', ''),
+            'value': grant.get('value_aud', 0),
+            'value_formatted': f"${grant.get('value_aud', 0):,.2f}",
+            'agency': grant.get('agency', 'Unknown Agency'),
+            'recipient': grant.get('recipient_name', 'Unknown Recipient'),
+            'location': {
+                'lat': grant.get('latitude'),
+                'lng': grant.get('longitude'),
+                'city': grant.get('mapped_city'),
+                'state': grant.get('mapped_state'),
+                'postcode': grant.get('recipient_postcode')
+            },
+            'category': {
+                'primary': grant.get('primary_category'),
+                'all': grant.get('all_categories', []),
+                'color': grant.get('category_color'),
+                'icon': grant.get('category_icon')
+            },
+            'size_category': grant.get('size_category'),
+            'dates': {
+                'approval': grant.get('approval_date'),
+                'publish': grant.get('publish_date'),
+                'term': grant.get('grant_term')
+            },
+            'program': grant.get('grant_program', ''),
+            'url': f"https://www.grants.gov.au/Ga/Show/{grant.get('ga_id', '')}"
+        }
+    
+    def _frame_mapping_grants(self, df):
+        """_mapping_grant() for rows of process_grants_columnar() output"""
+        def values(name, default=None):
+            column = self._column(df, name, default)
+            return column.astype(object).where(column.notna(), default).tolist()
         
-        # Process each grant for mapping
-        for grant in self.processed_data:
-            mapping_grant = {
-                'id': grant.get('ga_id'),
-                'title': grant.get('grant_activity', 'Unknown Grant'),
-                'description': grant.get('purpose', ''),
-                'value': grant.get('value_aud', 0),
-                'value_formatted': f"${grant.get('value_aud', 0):,.2f}",
-                'agency': grant.get('agency', 'Unknown Agency'),
-                'recipient': grant.get('recipient_name', 'Unknown Recipient'),
+        columns = zip(
+            values('ga_id'), values('grant_activity', 'Unknown Grant'), values('purpose', ''), values('value_aud', 0),
+            values('agency', 'Unknown Agency'), values('recipient_name', 'Unknown Recipient'),
+            values('latitude'), values('longitude'), values('mapped_city'), values('mapped_state'),
+            values('recipient_postcode'), values('primary_category'), values('all_categories', []),
+            values('category_color'), values('category_icon'), values('size_category'),
+            values('approval_date'), values('publish_date'), values('grant_term'), values('grant_program', '')
+        )
+        for (ga_id, title, purpose, value, agency, recipient, lat, lng, city, state, postcode, primary,
+             all_categories, color, icon, size_category, approval, publish, term, program) in columns:
+            yield {
+                'id': ga_id,
+                'title': title,
+                'description': purpose,
+                'value': value,
+                'value_formatted': f"${value:,.2f}",
+                'agency': agency,
+                'recipient': recipient,
                 'location': {
-                    'lat': grant.get('latitude'),
-                    'lng': grant.get('longitude'),
-                    'city': grant.get('mapped_city'),
-                    'state': grant.get('mapped_state'),
-                    'postcode': grant.get('recipient_postcode')
+                    'lat': lat,
+                    'lng': lng,
+                    'city': city,
+                    'state': state,
+                    'postcode': postcode
                 },
                 'category': {
-                    'primary': grant.get('primary_category'),
-                    'all': grant.get('all_categories', []),
-                    'color': grant.get('category_color'),
-                    'icon': grant.get('category_icon')
+                    'primary': primary,
+                    'all': all_categories,
+                    'color': color,
+                    'icon': icon
                 },
-                'size_category': grant.get('size_category'),
+                'size_category': size_category,
                 'dates': {
-                    'approval': grant.get('approval_date'),
-                    'publish': grant.get('publish_date'),
-                    'term': grant.get('grant_term')
+                    'approval': approval,
+                    'publish': publish,
+                    'term': term
                 },
-                'program': grant.get('grant_program', ''),
-                'url': f"https://www.grants.gov.au/Ga/Show/{grant.get('ga_id', '')}"
+                'program': program,
+                'url': f"https://www.grants.gov.au/Ga/Show/{ga_id if ga_id is not None else ''}"
             }
-            
-            mapping_data['grants'].append(mapping_grant)
-            
-            # Update summary statistics
-            primary_cat = grant.get('primary_category', 'Other')
-            mapping_data['summary']['categories'][primary_cat] = \
-                mapping_data['summary']['categories'].get(primary_cat, 0) + 1
-            
-            state = grant.get('mapped_state', 'Unknown')
-            mapping_data['summary']['states'][state] = \
-                mapping_data['summary']['states'].get(state, 0) + 1
-            
-            size_cat = grant.get('size_category', 'Unknown')
-            mapping_data['summary']['size_distribution'][size_cat] = \
-                mapping_data['summary']['size_distribution'].get(size_cat, 0) + 1
-        
-        return mapping_data
     
     def save_mapping_data(self, filename='grant_mapping_data.json'):
         """Save processed mapping data to JSON file"""
@@ -406,28 +690,64 @@ class GrantDataProcessor:
         logger.info(f"Mapping data saved to {filename}")
         return mapping_data
     
-    def generate_summary_report(self):
-        """Generate a summary report of the processed data"""
-        if not self.processed_data:
-            return "No data to summarize"
+    def stream_mapping_data(self, filename='grant_mapping_data.json', format='json', chunk_size=10000):
+        """
+        Save mapping data without holding every mapping record in memory
         
-        total_grants = len(self.processed_data)
-        total_value = sum(g.get('value_aud', 0) for g in self.processed_data)
+        Grants are written as they are built and the summary is kept as
+        running totals, so memory stays flat however many grants there are.
+        format='json' gives the same document as save_mapping_data() (summary
+        after the grants); format='ndjson' writes one grant per line, with
+        the summary, categories and states in <name>_meta.json.
         
-        # Category distribution
-        category_counts = defaultdict(int)
-        for grant in self.processed_data:
-            category_counts[grant.get('primary_category', 'Other')] += 1
+        Returns:
+            dict: The summary block
+        """
+        summary = MappingSummary()
+        writer = MappingDataWriter(filename, format=format, chunk_size=chunk_size)
+        with writer:
+            for mapping_grant in self.iter_mapping_grants(chunk_size):
+                writer.write(mapping_grant)
+                summary.add(mapping_grant)
+            writer.close({
+                'summary': summary.to_dict(),
+                'categories': self.categories,
+                'states': self.state_mapping
+            })
         
-        # State distribution
-        state_counts = defaultdict(int)
-        for grant in self.processed_data:
-            state_counts[grant.get('mapped_state', 'Unknown')] += 1
-        
-        # Size distribution
-        size_counts = defaultdict(int)
-        for grant in self.processed_data:
-            size_counts[grant.get('size_category', 'Unknown')] += 1
+        logger.info(f"Mapping data for {summary.total_grants} grants streamed to {filename} ({format}); "
+                    f"peak RSS {peak_rss_mb():.0f} MB")
+        return summary.to_dict()
+    
+    def generate_summary_report(self):
+        """Generate a summary report of the processed data"""
+        if self.processed_frame is not None and len(self.processed_frame):
+            df = self.processed_frame
+            total_grants = len(df)
+            total_value = float(pd.to_numeric(self._column(df, 'value_aud', 0), errors='coerce').fillna(0).sum())
+            category_counts = df['primary_category'].value_counts().to_dict()
+            state_counts = df['mapped_state'].fillna('Unknown').value_counts().to_dict()
+            size_counts = df['size_category'].value_counts().to_dict()
+        elif not self.processed_data:
+            return "No data to summarize"
+        else:
+            total_grants = len(self.processed_data)
+            total_value = sum(g.get('value_aud', 0) for g in self.processed_data)
+            
+            # Category distribution
+            category_counts = defaultdict(int)
+            for grant in self.processed_data:
+                category_counts[grant.get('primary_category', 'Other')] += 1
+            
+            # State distribution
+            state_counts = defaultdict(int)
+            for grant in self.processed_data:
+                state_counts[grant.get('mapped_state', 'Unknown')] += 1
+            
+            # Size distribution
+            size_counts = defaultdict(int)
+            for grant in self.processed_data:
+                size_counts[grant.get('size_category', 'Unknown')] += 1
         
         report = f"""
 === GRANT DATA PROCESSING SUMMARY ===
@@ -458,18 +778,37 @@ Average Grant Value: ${total_value/total_grants:,.2f}
         
         return report
 
+def _normalise_postcode(value):
+    """Postcode as a 4-digit string; CSV loads turn '0800' into 800 or 800.0"""
+    postcode = str(value).strip()
+    if postcode.endswith('.0'):
+        postcode = postcode[:-2]
+    if postcode.isdigit() and len(postcode) < 4:
+        postcode = postcode.zfill(4)
+    return postcode
+
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description='Process scraped grants into mapping data')
+    parser.add_argument('--input', help='scraper output (JSON or CSV); sample data when omitted')
+    parser.add_argument('--output', default='grant_mapping_data.json')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                        help='ndjson writes one grant per line plus a _meta.json summary')
+    args = parser.parse_args()
+    
     processor = GrantDataProcessor()
     
-    # Load sample data (in real implementation, would load from scraper output)
-    processor.load_sample_data()
+    # Load scraper output, or sample data for demonstration
+    if args.input:
+        processor.load_data_from_file(args.input)
+    else:
+        processor.load_sample_data()
     
     # Process the grants
-    processed_grants = processor.process_grants()
+    processor.process_grants_columnar()
     
-    # Generate mapping data
-    mapping_data = processor.save_mapping_data()
+    # Stream mapping data to disk
+    processor.stream_mapping_data(args.output, format=args.format)
     
     # Generate and print summary report
     report = processor.generate_summary_report()
@@ -477,11 +816,12 @@ def main():
     
     # Save processed data
     with open('processed_grants.json', 'w', encoding='utf-8') as f:
-        json.dump(processed_grants, f, indent=2, ensure_ascii=False)
+        json.dump(processor.processed_records(), f, indent=2, ensure_ascii=False)
     
+    logger.info(f"Peak RSS: {peak_rss_mb():.0f} MB")
     print(f"\\nProcessing complete!")
     print(f"- Processed grants saved to: processed_grants.json")
-    print(f"- Mapping data saved to: grant_mapping_data.json")
+    print(f"- Mapping data saved to: {args.output}")
     print(f"- Ready for visualization in GrantThrive mapping component")
 
 if __name__ == "__main__":
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+GrantThrive Grant Fetch Pipeline
+Bounded-concurrency page fetching for the grants.gov.au scrapers, with a
+per-host politeness budget, a resumable on-disk checkpoint of scraped
+grant awards and an offline mode that replays saved HTML fixtures
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+
+logger = logging.getLogger(__name__)
+
+class StoredResponse:
+    """Minimal stand-in for requests.Response built from a saved page"""
+    
+    def __init__(self, url, content, status_code=200, headers=None):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+    
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for url: {self.url}", response=self)
+
+class HostBudget:
+    """
+    Per-host politeness budget shared by all fetch threads
+
+    Request starts to the same host are spaced at least 1/requests_per_second
+    apart and at most max_concurrent requests are in flight to it at once.
+    A 429/503 from a host pushes its next slot back by the Retry-After delay.
+    """
+    
+    def __init__(self, requests_per_second=2.0, max_concurrent=4):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.max_concurrent = max_concurrent
+        self._hosts = {}  # host -> [semaphore, next slot (monotonic)]
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+    
+    def acquire(self, host):
+        state = self._state(host)
+        state[0].acquire()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, state[1])
+            state[1] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            self.waited_seconds += delay
+            time.sleep(delay)
+    
+    def release(self, host):
+        self._state(host)[0].release()
+    
+    def back_off(self, host, seconds):
+        """Delay every later request to host by at least seconds"""
+        state = self._state(host)
+        with self._lock:
+            state[1] = max(state[1], time.monotonic() + seconds)
+    
+    def _state(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = [threading.BoundedSemaphore(self.max_concurrent), 0.0]
+            return state
+
+class ScrapeCheckpoint:
+    """
+    Append-only JSON Lines record of grant awards already scraped
+
+    Each completed award is written as one {"ga_id", "grant"} line and
+    flushed immediately, so a run killed part way through loses at most the
+    award in flight. On restart the scraped awards are reloaded and their
+    GA IDs skipped. A torn final line is ignored.
+
+    The checkpoint only covers one interrupted run: its first line records
+    the run parameters (date range, limits) given to start_run(), a run
+    with different parameters starts afresh, and complete() removes the
+    file once a run's output has been saved. Scheduled runs therefore
+    re-scrape (through the page cache) instead of replaying old awards.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._grants = {}
+        self._run = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._load()
+    
+    def __contains__(self, ga_id):
+        return ga_id in self._grants
+    
+    def __len__(self):
+        return len(self._grants)
+    
+    def start_run(self, run):
+        """Resume only if the checkpoint was written by a run with these parameters"""
+        with self._lock:
+            if self._grants and self._run != run:
+                logger.info(f"Checkpoint {self.path} is from a different run {self._run}; starting fresh")
+                self._discard()
+            self._run = run
+    
+    def interrupted_run(self):
+        """Parameters of the run this checkpoint can resume, or None"""
+        with self._lock:
+            return dict(self._run) if self._grants and self._run else None
+    
+    def add(self, ga_id, grant):
+        with self._lock:
+            if ga_id in self._grants:
+                return
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                self._file = open(self.path, 'a', encoding='utf-8')
+                if new_file:
+                    self._file.write(json.dumps({'run': self._run}) + '\n')
+            self._file.write(json.dumps({'ga_id': ga_id, 'grant': grant}, ensure_ascii=False) + '\n')
+            self._file.flush()
+            self._grants[ga_id] = grant
+    
+    def grants(self):
+        """Scraped grants in the order they completed"""
+        with self._lock:
+            return list(self._grants.values())
+    
+    def reset(self):
+        """Forget all progress and start a fresh checkpoint"""
+        with self._lock:
+            self._discard()
+    
+    def complete(self):
+        """The run finished and its output is saved; nothing is left to resume"""
+        with self._lock:
+            self._discard()
+            self._run = None
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def _discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._grants = {}
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if 'run' in entry:
+                        self._run = entry['run']
+                        continue
+                    self._grants[entry['ga_id']] = entry['grant']
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Skipping unreadable checkpoint line in {self.path}")
+        logger.info(f"Resuming from checkpoint {self.path}: {len(self._grants)} awards already scraped")
+
+def request_url(url, params=None):
+    """Full URL a GET with these params is sent to"""
+    return requests.Request('GET', url, params=params).prepare().url
+
+def fixture_key(url, params=None):
+    """Stable file name for a page, derived from its full request URL"""
+    return hashlib.sha1(request_url(url, params).encode('utf-8')).hexdigest() + '.html'
+
+class PageFetcher:
+    """
+    Thread-safe page fetcher used by the scrapers
+
+    Each worker thread gets its own requests.Session (connection reuse
+    without sharing a session across threads). Live requests go through
+    the HostBudget instead of fixed sleeps. With fixtures_dir set, pages are
+    served from saved HTML files and the network is never touched; with
+    record_dir set, every fetched page is also saved there for later replay.
+    With a PageCache, live requests are conditional and unchanged pages are
+    answered from disk.
+    """
+    
+    def __init__(self, headers=None, max_workers=4, requests_per_second=2.0,
+                 fixtures_dir=None, record_dir=None, timeout=30, cache=None):
+        self.headers = headers or {}
+        self.max_workers = max_workers
+        self.fixtures_dir = fixtures_dir
+        self.record_dir = record_dir
+        self.timeout = timeout
+        self.cache = cache
+        self.budget = HostBudget(requests_per_second, max_concurrent=max_workers)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._started = None
+        self.pages = 0
+        self.bytes = 0
+        self.failures = 0
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+    
+    @property
+    def offline(self):
+        return self.fixtures_dir is not None
+    
+    def get(self, url, params=None):
+        """
+        Fetch one page
+
+        Returns:
+            Response: requests.Response, or StoredResponse in offline mode
+
+        Raises:
+            requests.RequestException: On network errors (online mode)
+        """
+        if self._started is None:
+            self._started = time.perf_counter()
+        
+        if self.offline:
+            response = self._get_fixture(url, params)
+        else:
+            response = self._get_live(url, params)
+        
+        with self._stats_lock:
+            if response.status_code == 200:
+                self.pages += 1
+                self.bytes += len(response.content)
+            else:
+                self.failures += 1
+        
+        if self.record_dir and response.status_code == 200:
+            with open(os.path.join(self.record_dir, fixture_key(url, params)), 'wb') as f:
+                f.write(response.content)
+        return response
+    
+    def map(self, fn, items):
+        """
+        Apply fn to every item on the worker pool
+
+        Results come back in input order; an item whose fn raises is logged
+        and yields None so one bad page cannot abort the run.
+        """
+        def run(item):
+            try:
+                return fn(item)
+            except Exception as e:
+                logger.error(f"Error processing {item}: {str(e)}")
+                return None
+        
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [run(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(run, items))
+    
+    def get_stats(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            'mode': 'offline' if self.offline else 'live',
+            'pages': self.pages,
+            'failures': self.failures,
+            'bytes': self.bytes,
+            'elapsed_seconds': round(elapsed, 3),
+            'pages_per_second': round(self.pages / elapsed, 2) if elapsed else 0.0,
+            'politeness_wait_seconds': round(self.budget.waited_seconds, 3),
+            'cache': self.cache.get_stats() if self.cache is not None and not self.offline else None
+        }
+    
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+    
+    def _get_live(self, url, params):
+        full_url = request_url(url, params)
+        entry = self.cache.lookup(full_url) if self.cache is not None else None
+        if entry is not None and entry['fresh']:
+            self.cache.record('fresh', len(entry['body']))
+            return StoredResponse(full_url, entry['body'])
+        
+        host = urlparse(url).netloc
+        self.budget.acquire(host)
+        try:
+            response = self._session().get(
+                url,
+                params=params,
+                headers=self.cache.conditional_headers(entry) if entry is not None else None,
+                timeout=self.timeout
+            )
+        finally:
+            self.budget.release(host)
+        if response.status_code in (429, 503):
+            retry_after = response.headers.get('Retry-After', '')
+            self.budget.back_off(host, float(retry_after) if retry_after.isdigit() else 30.0)
+        
+        if self.cache is None:
+            return response
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(full_url)
+            self.cache.record('revalidated', len(entry['body']))
+            return StoredResponse(full_url, entry['body'], headers=response.headers)
+        self.cache.record('miss')
+        if response.status_code == 200:
+            self.cache.store(
+                full_url,
+                response.content,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+        return response
+    
+    def _get_fixture(self, url, params):
+        path = os.path.join(self.fixtures_dir, fixture_key(url, params))
+        if not os.path.exists(path):
+            return StoredResponse(url, b'', status_code=404)
+        with open(path, 'rb') as f:
+            return StoredResponse(url, f.read())
+
+def report_fetch_stats(fetcher, stats_file=None):
+    """Print the fetch/cache summary and optionally write it as JSON for the scheduler"""
+    stats = fetcher.get_stats()
+    print(f"\n=== FETCH SUMMARY ({stats['mode']}) ===")
+    print(f"Pages: {stats['pages']} ({stats['failures']} failed) in "
+          f"{stats['elapsed_seconds']}s = {stats['pages_per_second']} pages/s")
+    cache = stats['cache']
+    if cache:
+        print(f"Page cache: {cache['hit_rate'] * 100:.1f}% hit rate "
+              f"({cache['fresh_hits']} fresh, {cache['revalidated']} revalidated, "
+              f"{cache['misses']} fetched, {cache['bytes_saved']:,} bytes not downloaded)")
+    
+    if stats_file:
+        with open(stats_file, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+    return stats
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+GrantThrive Grant Page Cache
+Disk-backed HTTP response cache for the grants.gov.au scrapers, so
+unchanged decision and award pages are revalidated instead of downloaded
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import threading
+
+class PageCache:
+    """
+    Conditional-GET cache keyed by full request URL
+
+    Each entry keeps the page body zlib-compressed together with its ETag
+    and Last-Modified validators in a local SQLite file. A later fetch of
+    the same URL sends If-None-Match / If-Modified-Since and a 304 is
+    answered from disk. Entries younger than ttl_seconds are served without
+    contacting the server at all (0 disables that; award pages rarely change
+    once published, so scrapers may opt in).
+
+    Connections are per thread so the fetcher's worker pool can share one
+    cache file.
+    """
+    
+    def __init__(self, path='grant_page_cache.db', ttl_seconds=0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stores = 0
+        self.bytes_saved = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def lookup(self, url):
+        """
+        Cached entry for url
+
+        Returns:
+            dict: body, etag, last_modified, stored_at and fresh (servable
+            without a request), or None if the URL is not cached
+        """
+        row = self._connection().execute(
+            'SELECT body, etag, last_modified, stored_at FROM pages WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        body, etag, last_modified, stored_at = row
+        return {
+            'body': zlib.decompress(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': stored_at,
+            'fresh': self.ttl_seconds > 0 and time.time() - stored_at < self.ttl_seconds
+        }
+    
+    def conditional_headers(self, entry):
+        """Validator headers for revalidating a cached entry"""
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def store(self, url, body, etag=None, last_modified=None):
+        self._connection().execute(
+            'INSERT INTO pages (url, body, etag, last_modified, stored_at) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(url) DO UPDATE SET body = excluded.body, etag = excluded.etag, '
+            'last_modified = excluded.last_modified, stored_at = excluded.stored_at',
+            (url, zlib.compress(body, 6), etag, last_modified, time.time())
+        )
+        with self._stats_lock:
+            self.stores += 1
+    
+    def touch(self, url):
+        """Mark a revalidated entry as fresh again"""
+        self._connection().execute('UPDATE pages SET stored_at = ? WHERE url = ?', (time.time(), url))
+    
+    def record(self, outcome, saved_bytes=0):
+        """Count a lookup outcome: 'fresh', 'revalidated' or 'miss'"""
+        with self._stats_lock:
+            if outcome == 'fresh':
+                self.fresh_hits += 1
+            elif outcome == 'revalidated':
+                self.revalidated += 1
+            else:
+                self.misses += 1
+            self.bytes_saved += saved_bytes
+    
+    def get_stats(self):
+        with self._stats_lock:
+            lookups = self.fresh_hits + self.revalidated + self.misses
+            hits = self.fresh_hits + self.revalidated
+            return {
+                'lookups': lookups,
+                'fresh_hits': self.fresh_hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'stores': self.stores,
+                'bytes_saved': self.bytes_saved
+            }
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pages ('
+                'url TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, '
+                'last_modified TEXT, stored_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+GrantThrive Grant Processing Benchmark
+Times GrantDataProcessor.process_grants() against process_grants_columnar()
+on synthetic scraped grants and checks both give the same mapping data
+
+Usage:
+    python grant_processing_benchmark.py [--records 500000] [--seed 7]
+"""
+
+import time
+import random
+import argparse
+import logging
+from grant_data_processor import GrantDataProcessor
+
+PROGRAMS = [
+    'Digital Learning Initiative', 'Community Solar Initiative', 'Regional Roads Upgrade',
+    'Aged Care Workforce Fund', 'Local Heritage Grants', 'Flood Recovery Assistance',
+    'Small Business Digital Transformation', 'Pre-emptive Early Intervention Pilot', 'Sports Club Equipment'
+]
+ACTIVITIES = [
+    'Implementation of digital learning platforms in regional schools',
+    'Installation of community solar panels and battery storage systems',
+    'Resurfacing and maintenance of rural roads',
+    'Mental health support services for older residents',
+    'Restoration of a heritage listed museum building',
+    'Volunteer emergency response training',
+    'Software upgrade for neighbourhood centres',
+    'Purchase of uniforms'
+]
+PURPOSES = [
+    'Reduce carbon emissions and provide renewable energy access to rural communities.',
+    'Enhance digital literacy and access to technology in rural and remote schools.',
+    'Improve safety and resilience against bushfire and flood.',
+    'Support local jobs, trade and investment.',
+    'Strengthen social cohesion and civic engagement.',
+    'Deliver an arts festival and cultural exhibition.',
+    ''
+]
+CATEGORIES = ['Services for People with Disabilities', 'Education and Training', 'Environment and Sustainability',
+              'Community Development', 'Arts and Culture', 'Aged', 'Sport and Recreation']
+AGENCIES = ['Department of Social Services', 'Department of Education', 'Department of Health and Aged Care',
+            'Department of Climate Change, Energy, the Environment and Water', 'Department of Industry']
+POSTCODES = ['5000', '3000', '2000', '4000', '6000', '7000', '0800', '2600', '2480', '3550', '', None]
+STATES = ['NSW', 'VIC', 'QLD', 'SA', 'WA', 'TAS', 'NT', 'ACT', 'XX', '']
+DATES = ['25-Jan-2024', '15-Feb-2024', '10-Mar-2024', '01-Jul-2023', '2024-01-25', '', None]
+VALUES = [0.0, 12500.0, 49999.99, 50000.0, 275000.5, 499999.0, 1250000.0, 4999999.0, 8620954.34]
+
+def synthetic_grants(count, seed):
+    rng = random.Random(seed)
+    grants = []
+    for index in range(count):
+        postcode = rng.choice(POSTCODES)
+        state = rng.choice(STATES)
+        grants.append({
+            'ga_id': f'GA{index:07d}',
+            'agency': rng.choice(AGENCIES),
+            'approval_date': rng.choice(DATES),
+            'publish_date': rng.choice(DATES),
+            'category': rng.choice(CATEGORIES),
+            'grant_term': '01-Jul-2024 to 30-Jun-2026',
+            'value_aud': rng.choice(VALUES),
+            'grant_program': rng.choice(PROGRAMS),
+            'grant_activity': rng.choice(ACTIVITIES),
+            'purpose': rng.choice(PURPOSES),
+            'recipient_name': f'Recipient {index % 5000}',
+            'recipient_postcode': postcode,
+            'recipient_state': state,
+            'delivery_postcode': rng.choice(POSTCODES) if not postcode else postcode,
+            'delivery_state': rng.choice(STATES) if not state else state
+        })
+    return grants
+
+def same_mapping(legacy, columnar):
+    """Grants compared field by field; total value allowed float rounding"""
+    if legacy['grants'] != columnar['grants']:
+        for before, after in zip(legacy['grants'], columnar['grants']):
+            if before != after:
+                print(f"first difference:\n  legacy   {before}\n  columnar {after}")
+                break
+        return False
+    legacy_summary = dict(legacy['summary'])
+    columnar_summary = dict(columnar['summary'])
+    if abs(legacy_summary.pop('total_value') - columnar_summary.pop('total_value')) > 1e-3:
+        return False
+    return legacy_summary == columnar_summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Grant processing benchmark')
+    parser.add_argument('--records', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    # Unparseable dates would otherwise log one warning per grant on the legacy path
+    logging.getLogger('grant_data_processor').setLevel(logging.ERROR)
+    
+    grants = synthetic_grants(args.records, args.seed)
+    print(f"{args.records:,} synthetic grants")
+    
+    processor = GrantDataProcessor()
+    processor.grants_data = grants
+    
+    started = time.perf_counter()
+    processor.process_grants()
+    legacy_mapping = processor.generate_mapping_data()
+    legacy_seconds = time.perf_counter() - started
+    print(f"process_grants + mapping:           {legacy_seconds:7.2f}s")
+    
+    processor.processed_data = []
+    started = time.perf_counter()
+    processor.process_grants_columnar()
+    columnar_mapping = processor.generate_mapping_data()
+    columnar_seconds = time.perf_counter() - started
+    print(f"process_grants_columnar + mapping:  {columnar_seconds:7.2f}s")
+    
+    print(f"speedup: {legacy_seconds / columnar_seconds:.1f}x")
+    print(f"mapping data identical: {same_mapping(legacy_mapping, columnar_mapping)}")
+
+if __name__ == '__main__':
+    main()
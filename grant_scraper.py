@@ -12,40 +12,50 @@ import re
 from datetime import datetime, timedelta
 from urllib.parse import urljoin, urlparse, parse_qs
 from bs4 import BeautifulSoup
+import argparse
 import logging
+from grant_fetch_pipeline import PageFetcher, ScrapeCheckpoint, report_fetch_stats
+from grant_page_cache import PageCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class GrantsGovAuScraper:
-    def __init__(self):
+    def __init__(self, max_workers=4, requests_per_second=2.0, checkpoint_path=None,
+                 fixtures_dir=None, record_dir=None, cache_path=None, cache_ttl=0):
         self.base_url = "https://www.grants.gov.au"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'GrantThrive Data Collector (Educational/Research Purpose)',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-        })
+        self.fetcher = PageFetcher(
+            headers={
+                'User-Agent': 'GrantThrive Data Collector (Educational/Research Purpose)',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+            },
+            max_workers=max_workers,
+            requests_per_second=requests_per_second,
+            fixtures_dir=fixtures_dir,
+            record_dir=record_dir,
+            cache=PageCache(cache_path, ttl_seconds=cache_ttl) if cache_path else None
+        )
+        self.checkpoint = ScrapeCheckpoint(checkpoint_path) if checkpoint_path else None
         self.grants_data = []
-        self.rate_limit_delay = 2  # seconds between requests
+        self.retry_delay = 5  # seconds before retrying a failed request
         
     def get_page(self, url, params=None, retries=3):
-        """Get a page with error handling and rate limiting"""
+        """Get a page with error handling; pacing is handled by the fetcher's host budget"""
         for attempt in range(retries):
             try:
-                time.sleep(self.rate_limit_delay)
-                response = self.session.get(url, params=params, timeout=30)
+                response = self.fetcher.get(url, params=params)
                 response.raise_for_status()
                 return response
             except requests.RequestException as e:
                 logger.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
-                if attempt == retries - 1:
-                    logger.error(f"Failed to fetch {url} after {retries} attempts")
+                if attempt == retries - 1 or self.fetcher.offline:
+                    logger.error(f"Failed to fetch {url} after {attempt + 1} attempts")
                     return None
-                time.sleep(5)  # Wait longer between retries
+                time.sleep(self.retry_delay)  # Wait longer between retries
         return None
     
     def search_grant_decisions(self, start_date=None, end_date=None, agency=None, page=1):
@@ -279,19 +289,26 @@ class GrantsGovAuScraper:
         else:
             return 'Major'
     
-    def scrape_grants(self, start_date=None, end_date=None, max_pages=5):
-        """Main scraping function"""
+    def scrape_grants(self, start_date=None, end_date=None, max_pages=5, days=180):
+        """Main scraping function (defaults to the last `days` days)"""
         logger.info("Starting grant data scraping...")
         
-        # Default to last 6 months if no dates provided
+        # Default to the last `days` days if no dates provided
         if not end_date:
-            end_date = datetime.now()
+            end_date = self._resumed_end_date(start_date, max_pages) or datetime.now()
         if not start_date:
-            start_date = end_date - timedelta(days=180)
+            start_date = end_date - timedelta(days=days)
         
         logger.info(f"Scraping grants from {start_date.strftime('%d-%b-%Y')} to {end_date.strftime('%d-%b-%Y')}")
         
-        all_grants = []
+        # Awards finished by an interrupted earlier run with the same parameters are kept and skipped
+        if self.checkpoint is not None:
+            self.checkpoint.start_run({
+                'start_date': start_date.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d'),
+                'max_pages': max_pages
+            })
+        all_grants = self.checkpoint.grants() if self.checkpoint else []
         
         # Search for grant decisions
         for page in range(1, max_pages + 1):
@@ -302,47 +319,79 @@ class GrantsGovAuScraper:
                 logger.info("No more grant decisions found")
                 break
             
-            # Process each grant decision
-            for gd in grant_decisions:
-                logger.info(f"Processing {gd['gd_id']}...")
-                
-                # Get grant decision details
-                gd_details = self.get_grant_decision_details(gd['url'])
-                if not gd_details:
+            # Fetch decision pages and their award lists concurrently
+            award_jobs = []
+            for result in self.fetcher.map(self._collect_decision_awards, grant_decisions):
+                if not result:
                     continue
-                
-                # Get associated grant awards
-                if 'awards_url' in gd_details:
-                    awards = self.get_grant_awards(gd_details['awards_url'])
-                    
-                    # Process each grant award
-                    for award in awards:
-                        logger.info(f"Processing award {award['ga_id']}...")
-                        
-                        award_details = self.get_grant_award_details(award['url'])
-                        if award_details:
-                            # Combine decision and award data
-                            combined_data = {**gd_details, **award_details}
-                            
-                            # Add categorization
-                            combined_data['categories'] = self.categorize_grant(combined_data)
-                            combined_data['size_category'] = self.determine_grant_size(
-                                combined_data.get('value_aud')
-                            )
-                            
-                            # Add timestamp
-                            combined_data['scraped_at'] = datetime.now().isoformat()
-                            
-                            all_grants.append(combined_data)
-                            
-                            logger.info(f"Collected grant: {award['ga_id']} - "
-                                      f"{combined_data.get('recipient_name', 'Unknown')} - "
-                                      f"${combined_data.get('value_aud', 0):,.2f}")
+                gd_details, awards = result
+                for award in awards:
+                    if self.checkpoint is not None and award['ga_id'] in self.checkpoint:
+                        continue
+                    award_jobs.append((gd_details, award))
+            
+            # Then every new award page on the same bounded pool
+            for combined_data in self.fetcher.map(self._scrape_award, award_jobs):
+                if combined_data:
+                    all_grants.append(combined_data)
         
         self.grants_data = all_grants
         logger.info(f"Scraping completed. Collected {len(all_grants)} grants.")
         return all_grants
     
+    def _resumed_end_date(self, start_date, max_pages):
+        """
+        End date of the interrupted run in the checkpoint, if this run resumes it
+
+        A default end date of "now" would change the run parameters after
+        midnight and discard the checkpoint, so a resumed run keeps its own.
+        """
+        run = self.checkpoint.interrupted_run() if self.checkpoint is not None else None
+        if not run or run.get('max_pages') != max_pages:
+            return None
+        if start_date and start_date.strftime('%Y-%m-%d') != run.get('start_date'):
+            return None
+        logger.info(f"Resuming the interrupted run up to {run['end_date']}")
+        return datetime.strptime(run['end_date'], '%Y-%m-%d')
+    
+    def _collect_decision_awards(self, gd):
+        """Fetch a grant decision and the list of awards it links to"""
+        logger.info(f"Processing {gd['gd_id']}...")
+        
+        gd_details = self.get_grant_decision_details(gd['url'])
+        if not gd_details or 'awards_url' not in gd_details:
+            return None
+        return gd_details, self.get_grant_awards(gd_details['awards_url'])
+    
+    def _scrape_award(self, job):
+        """Fetch one grant award, combine it with its decision and checkpoint it"""
+        gd_details, award = job
+        logger.info(f"Processing award {award['ga_id']}...")
+        
+        award_details = self.get_grant_award_details(award['url'])
+        if not award_details:
+            return None
+        
+        # Combine decision and award data
+        combined_data = {**gd_details, **award_details}
+        
+        # Add categorization
+        combined_data['categories'] = self.categorize_grant(combined_data)
+        combined_data['size_category'] = self.determine_grant_size(
+            combined_data.get('value_aud')
+        )
+        
+        # Add timestamp
+        combined_data['scraped_at'] = datetime.now().isoformat()
+        
+        if self.checkpoint is not None:
+            self.checkpoint.add(award['ga_id'], combined_data)
+        
+        logger.info(f"Collected grant: {award['ga_id']} - "
+                  f"{combined_data.get('recipient_name', 'Unknown')} - "
+                  f"${combined_data.get('value_aud', 0):,.2f}")
+        return combined_data
+    
     def save_to_json(self, filename='grants_data.json'):
         """Save scraped data to JSON file"""
         with open(filename, 'w', encoding='utf-8') as f:
@@ -413,20 +462,62 @@ class GrantsGovAuScraper:
 
 def main():
     """Main execution function"""
-    scraper = GrantsGovAuScraper()
+    parser = argparse.ArgumentParser(description='Scrape grant awards from grants.gov.au')
+    parser.add_argument('--start-date', help='YYYY-MM-DD (default: 90 days before end date)')
+    parser.add_argument('--end-date', help='YYYY-MM-DD (default: today)')
+    parser.add_argument('--max-pages', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4, help='concurrent page fetches')
+    parser.add_argument('--requests-per-second', type=float, default=2.0,
+                        help='politeness budget per host')
+    parser.add_argument('--checkpoint', help='resume file of already-scraped awards '
+                        '(default: grants_checkpoint.jsonl; none when --offline)')
+    parser.add_argument('--fresh', action='store_true', help='discard the checkpoint and start over')
+    parser.add_argument('--offline', metavar='DIR', help='replay saved HTML fixtures instead of fetching')
+    parser.add_argument('--record', metavar='DIR', help='save every fetched page as a fixture')
+    parser.add_argument('--cache', default='grant_page_cache.db', help='conditional-GET page cache file')
+    parser.add_argument('--no-cache', action='store_true', help='always download every page')
+    parser.add_argument('--cache-ttl', type=float, default=0,
+                        help='seconds a cached page is reused without revalidating')
+    parser.add_argument('--stats-file', help='write fetch and cache statistics to this JSON file')
+    args = parser.parse_args()
+    
+    # Offline runs are measurements, so they do not resume unless asked to
+    checkpoint_path = args.checkpoint or (None if args.offline else 'grants_checkpoint.jsonl')
+    
+    scraper = GrantsGovAuScraper(
+        max_workers=args.workers,
+        requests_per_second=args.requests_per_second,
+        checkpoint_path=checkpoint_path,
+        fixtures_dir=args.offline,
+        record_dir=args.record,
+        cache_path=None if args.no_cache or args.offline else args.cache,
+        cache_ttl=args.cache_ttl
+    )
+    if args.fresh and scraper.checkpoint is not None:
+        scraper.checkpoint.reset()
     
     # Scrape recent grants (last 3 months, max 3 pages for testing)
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=90)
+    # Without --end-date, an interrupted run resumes with its own end date
+    end_date = datetime.strptime(args.end_date, '%Y-%m-%d') if args.end_date else None
+    start_date = datetime.strptime(args.start_date, '%Y-%m-%d') if args.start_date else None
     
-    grants = scraper.scrape_grants(start_date=start_date, end_date=end_date, max_pages=3)
+    grants = scraper.scrape_grants(start_date=start_date, end_date=end_date, max_pages=args.max_pages, days=90)
+    
+    report_fetch_stats(scraper.fetcher, args.stats_file)
     
     # Save data
     scraper.save_to_json('grants_data.json')
     scraper.save_to_csv('grants_data.csv')
     
+    # The run is complete, so the next one starts from scratch
+    if scraper.checkpoint is not None:
+        scraper.checkpoint.complete()
+    
     # Print summary
     stats = scraper.get_summary_stats()
+    if not stats:
+        print("No grants collected")
+        return
     print(f"\\n=== SCRAPING SUMMARY ===")
     print(f"Total Grants: {stats['total_grants']}")
     print(f"Total Value: ${stats['total_value']:,.2f}")
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+GrantThrive Mapping Data Stream
+Incremental writing of grant mapping data (chunked JSON or NDJSON), running
+summary totals and peak memory reporting for the mapping data processors
+"""
+
+import os
+import sys
+import json
+import resource
+import tempfile
+import shutil
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class MappingSummary:
+    """
+    Running totals for the 'summary' block of the mapping data
+
+    Gives the same values as building the summary from the full grant list,
+    one mapping grant at a time.
+    """
+    
+    def __init__(self):
+        self.total_grants = 0
+        self.total_value = 0
+        self.categories = {}
+        self.states = {}
+        self.size_distribution = {}
+    
+    def add(self, grant):
+        self.total_grants += 1
+        self.total_value += grant.get('value') or 0
+        
+        category = grant['category']['primary']
+        self.categories[category] = self.categories.get(category, 0) + 1
+        
+        state = grant['location'].get('state')
+        state = state if state is not None else 'Unknown'
+        self.states[state] = self.states.get(state, 0) + 1
+        
+        size_category = grant.get('size_category', 'Unknown')
+        self.size_distribution[size_category] = self.size_distribution.get(size_category, 0) + 1
+    
+    def to_dict(self):
+        return {
+            'total_grants': self.total_grants,
+            'total_value': self.total_value,
+            'categories': self.categories,
+            'states': self.states,
+            'size_distribution': self.size_distribution
+        }
+
+class MappingDataWriter:
+    """
+    Writes mapping data one item at a time instead of from one large dict
+
+    Items are written to named streams; the first stream (normally 'grants')
+    is the one most items go to. The remaining, small part of the document
+    (summary, categories, ...) is passed to close() once every item has been
+    written, with a STREAM placeholder under the key of each other stream,
+    e.g. {'map_data': {'markers': MappingDataWriter.STREAM}}.
+
+    format='json': a single JSON document with the first stream as its first
+    key, the same shape json.dump() would give. Items of other streams are
+    spooled to temporary files and copied into place at close().
+    format='ndjson': one item per line, the first stream in filename and
+    every other stream in <stem>_<name>.ndjson; the rest of the document goes
+    to <stem>_meta.json with each placeholder replaced by its file name.
+
+    Output is buffered and written every chunk_size items.
+    """
+    
+    STREAM = object()
+    
+    def __init__(self, filename, format='json', streams=('grants',), chunk_size=1000):
+        if format not in ('json', 'ndjson'):
+            raise ValueError(f"Unsupported mapping data format: {format}")
+        
+        self.filename = filename
+        self.format = format
+        self.streams = list(streams)
+        self.chunk_size = chunk_size
+        self.counts = {name: 0 for name in self.streams}
+        self._buffers = {name: [] for name in self.streams}
+        self._files = {}
+        
+        stem = os.path.splitext(filename)[0]
+        for index, name in enumerate(self.streams):
+            if format == 'ndjson':
+                path = filename if index == 0 else f"{stem}_{name}.ndjson"
+                self._files[name] = open(path, 'w', encoding='utf-8')
+            elif index == 0:
+                self._files[name] = open(filename, 'w', encoding='utf-8')
+                self._files[name].write(f'{{\n  {json.dumps(name)}: [\n')
+            else:
+                self._files[name] = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.meta_filename = f"{stem}_meta.json" if format == 'ndjson' else None
+    
+    def write(self, item, stream=None):
+        name = stream or self.streams[0]
+        buffer = self._buffers[name]
+        buffer.append(json.dumps(item, ensure_ascii=False))
+        self.counts[name] += 1
+        if len(buffer) >= self.chunk_size:
+            self._flush(name)
+    
+    def close(self, document=None):
+        """Write the rest of the document and close every file"""
+        for name in self.streams:
+            self._flush(name)
+        document = dict(document or {})
+        
+        if self.format == 'ndjson':
+            stem = os.path.splitext(self.filename)[0]
+            names = {name: os.path.basename(f"{stem}_{name}.ndjson") for name in self.streams[1:]}
+            with open(self.meta_filename, 'w', encoding='utf-8') as f:
+                json.dump(self._fill(document, names), f, indent=2, ensure_ascii=False)
+            for handle in self._files.values():
+                handle.close()
+            return
+        
+        # Placeholders become marker strings in the encoded document, which
+        # are then swapped for the spooled arrays
+        markers = {name: f"\x00stream:{name}\x00" for name in self.streams[1:]}
+        encoded = json.dumps(self._fill(document, markers), indent=2, ensure_ascii=False)
+        
+        out = self._files[self.streams[0]]
+        out.write('\n  ]')
+        rest = encoded[1:-1].strip('\n')
+        if rest:
+            out.write(',\n')
+            placed = [name for name in self.streams[1:] if json.dumps(markers[name]) in rest]
+            for name in sorted(placed, key=lambda name: rest.find(json.dumps(markers[name]))):
+                before, _, rest = rest.partition(json.dumps(markers[name]))
+                out.write(before)
+                self._copy_array(self._files[name], out)
+            out.write(rest)
+        out.write('\n}\n')
+        for handle in self._files.values():
+            handle.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            for handle in self._files.values():
+                handle.close()
+    
+    def _flush(self, name):
+        buffer = self._buffers[name]
+        if not buffer:
+            return
+        handle = self._files[name]
+        if self.format == 'ndjson':
+            handle.write('\n'.join(buffer) + '\n')
+        else:
+            # Items already written need a separator before this chunk
+            separator = ',\n' if self.counts[name] > len(buffer) else ''
+            handle.write(separator + ',\n'.join(buffer))
+        buffer.clear()
+    
+    def _fill(self, value, replacements):
+        if value is self.STREAM:
+            raise ValueError("Stream placeholder given without a stream name")
+        if isinstance(value, dict):
+            filled = {}
+            for key, item in value.items():
+                filled[key] = replacements[key] if item is self.STREAM else self._fill(item, replacements)
+            return filled
+        return value
+    
+    @staticmethod
+    def _copy_array(spool, out):
+        out.write('[\n')
+        spool.seek(0)
+        shutil.copyfileobj(spool, out)
+        out.write('\n]')